@@ -0,0 +1,149 @@
+from contextlib import contextmanager
+import random
+import time
+
+from sqlalchemy import event
+
+from src.models.project import Project
+from src.models.repository import Repository
+from src.models.task import Task, TaskStatus, TaskType
+from src.models.upwork import UpworkDiary, WorkRecordUpworkDiary
+from src.models.user import User
+from src.models.work import Work, WorkStatus, WorkType
+from src.models.work_record import WorkOutcome, WorkRecord
+from src.utils.db import db
+
+
+BENCHMARK_PROJECT_ID = 99999
+BENCHMARK_REPOSITORY_ID = 99999
+
+
+class QueryCounter(object):
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, *args, **kwargs):
+        self.count += 1
+
+
+@contextmanager
+def count_queries():
+    """
+    Count the sql statements executed by the current app's engine inside the block
+    """
+    counter = QueryCounter()
+    engine = db.engine
+    event.listen(engine, 'before_cursor_execute', counter)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', counter)
+
+
+def timed(func, repeat=5):
+    """
+    Run a function a number of times and return the last result with the best
+    run duration in seconds
+    """
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        duration = time.perf_counter() - start
+        best = duration if best is None else min(best, duration)
+
+    return result, best
+
+
+@contextmanager
+def seeded_dataset(user_count, work_records_per_user, seed=0):
+    """
+    Seed the database with contributors, tasks, work items, work records and
+    upwork diaries and remove them when the block exits. must be used inside an
+    app context of an app configured with an empty database
+    Arguments:
+        user_count - number of contributors to create
+        work_records_per_user - number of work records to create per contributor
+        seed - random seed so runs are reproducible
+    Yields:
+        List of created users
+    """
+    rand = random.Random(seed)
+    now_epoch_ms = int(time.time() * 1000)
+
+    project = Project(BENCHMARK_PROJECT_ID, 'benchmark_project', 'missing', 'missing')
+    db.session.add(project)
+    db.session.commit()
+    repository = Repository(BENCHMARK_REPOSITORY_ID, 'benchmark_repo', 'missing', BENCHMARK_PROJECT_ID)
+    db.session.add(repository)
+
+    users = []
+    for i in range(user_count):
+        user = User(
+            f'benchmark-{i}@test.test', 'missing', f'first{i}', f'last{i}', None, None,
+            rand.choice([None, 10, 20, 40]), rand.choice([None, 15, 25, 40]), False, 'missing',
+            upwork_user=f'benchmark-upwork-{i}'
+        )
+        user.activated = True
+        db.session.add(user)
+        users.append(user)
+    db.session.commit()
+
+    delegator = users[0]
+    for user in users:
+        for j in range(work_records_per_user):
+            task = Task.from_cuckoo(
+                delegator.id, 'benchmark task', rand.choice(list(TaskStatus)), rand.randint(1, 5),
+                TaskType.CUCKOO_CODING, repository_id=BENCHMARK_REPOSITORY_ID
+            )
+            db.session.add(task)
+            db.session.flush()
+
+            work = Work.from_cuckoo(
+                task.id, rand.choice(list(WorkStatus)), rand.choice([WorkType.CUCKOO_CODING, WorkType.CUCKOO_ITERATION, WorkType.REVIEW_TASK]),
+                'benchmark work', priority=task.priority
+            )
+            work.reserved_worker_id = rand.choice([None, user.id])
+            db.session.add(work)
+            db.session.flush()
+
+            start_time_epoch_ms = now_epoch_ms - rand.randint(1, 60 * 24 * 60 * 60 * 1000)
+            work_record = WorkRecord(
+                user.id, work.id, False, start_time_epoch_ms, 'UTC',
+                rand.choice(list(WorkOutcome) + [None])
+            )
+            work_record.duration_seconds = rand.choice([None, rand.randint(60, 4 * 60 * 60)])
+            db.session.add(work_record)
+            db.session.flush()
+
+            if work_record.duration_seconds and rand.random() < 0.5:
+                diary = UpworkDiary(
+                    user.id, user.upwork_user, user.name, start_time_epoch_ms,
+                    start_time_epoch_ms + work_record.duration_seconds * 1000,
+                    work_record.duration_seconds // 60, 'benchmark diary'
+                )
+                db.session.add(diary)
+                db.session.flush()
+                db.session.add(WorkRecordUpworkDiary(
+                    work_record.id, diary.id, work_record.duration_seconds, rand.randint(1, 100),
+                    work_record.duration_seconds, rand.randint(1, 100)
+                ))
+
+        db.session.commit()
+
+    try:
+        yield users
+    finally:
+        db.session.rollback()
+
+        # work items, work records and their upwork diary links are removed by cascade
+        for task in Task.query.filter_by(repository_id=BENCHMARK_REPOSITORY_ID).all():
+            db.session.delete(task)
+        db.session.flush()
+        for user in users:
+            UpworkDiary.query.filter_by(user_id=user.id).delete()
+            db.session.delete(user)
+        db.session.delete(repository)
+        db.session.delete(project)
+        db.session.commit()
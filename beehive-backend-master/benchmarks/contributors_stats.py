@@ -0,0 +1,255 @@
+"""
+Compare the per-user contributors stats queries with the contributor stats
+rollup used by the contributors stats endpoint, both when refreshing the rollup
+with its grouped aggregate queries and when reading it.
+
+Run from the backend directory against an empty testing database:
+    PYTHONPATH="$(pwd)/src:$PYTHONPATH" python -m benchmarks.contributors_stats
+"""
+import argparse
+import decimal
+import time
+
+from sqlalchemy import and_, or_
+from sqlalchemy.sql import label
+
+from src import app as flask_app
+from src.models.task import Task, TaskStatus
+from src.models.upwork import WorkRecordUpworkDiary
+from src.models.work import Work, WorkStatus, WorkType
+from src.models.work_record import WorkOutcome, WorkRecord
+from src.logic.contributor_stats import refresh_contributor_stats
+from src.resources.shared_queries import get_contributors_work_stats
+from src.utils.db import db
+
+from .common import count_queries, seeded_dataset, timed
+
+
+# fields that depend on the time the stats were computed at
+TIME_DEPENDENT_FIELDS = ('time_since_last_engagement', 'time_since_last_work')
+
+
+def per_user_contributors_work_stats(users):
+    """
+    The previous contributors stats implementation, running a set of queries per user
+    """
+    records = []
+    for user in users:
+        active_work = 'none'
+        active_work_record = WorkRecord.query.filter_by(active=True) \
+            .filter(WorkRecord.user_id == user.id) \
+            .order_by(WorkRecord.id.desc()).first()
+
+        if active_work_record != None:
+            active_work = active_work_record.work_id
+
+        number_of_reserved_works = Work.query \
+            .with_entities(Work.task_id) \
+            .filter(Work.reserved_worker_id == user.id) \
+            .filter(Work.status == WorkStatus.AVAILABLE) \
+            .join(Task, and_(
+                Work.task_id == Task.id,
+                Task.status.in_([TaskStatus.PENDING, TaskStatus.MODIFICATIONS_REQUESTED, TaskStatus.IN_PROCESS]))
+            ).count()
+
+        number_of_works_in_review = WorkRecord.query \
+            .with_entities(WorkRecord.work_id) \
+            .filter(WorkRecord.user_id == user.id) \
+            .join(Work, Work.id == WorkRecord.work_id,) \
+            .filter(Work.work_type.in_([WorkType.REVIEW_TASK, WorkType.CUCKOO_ITERATION])) \
+            .with_entities(Work.task_id) \
+            .join(Task, and_(
+                Work.task_id == Task.id,
+                Task.status.in_([TaskStatus.IN_PROCESS]))
+            ).count()
+
+        number_of_completed_works = WorkRecord.query \
+            .with_entities(WorkRecord.work_id) \
+            .filter(WorkRecord.user_id == user.id) \
+            .join(Work, Work.id == WorkRecord.work_id,) \
+            .filter(Work.status == WorkStatus.COMPLETE) \
+            .count()
+
+        number_of_total_works = WorkRecord.query \
+            .with_entities(WorkRecord.work_id) \
+            .join(Work, Work.id == WorkRecord.work_id,) \
+            .filter(WorkRecord.user_id == user.id) \
+            .count()
+
+        number_of_cancelled_works = Work.query \
+            .with_entities(Work.task_id) \
+            .filter(Work.reserved_worker_id == user.id) \
+            .join(Task, and_(
+                Work.task_id == Task.id,
+                Task.status.in_([TaskStatus.CANCELLED]))
+            ).count()
+
+        number_of_skipped_works = WorkRecord.query \
+            .filter(and_(WorkRecord.user_id == user.id, WorkRecord.outcome == WorkOutcome.SKIPPED)) \
+            .count()
+
+        skipped_total_works_ratio = f"{(number_of_skipped_works / number_of_total_works):.2f}" if number_of_total_works > 0 else '-'
+
+        time_since_last_engagement = 0
+        last_engagement = WorkRecord.query \
+            .filter(WorkRecord.user_id == user.id) \
+            .order_by(WorkRecord.id.desc()).first()
+        now_in_millisec = time.time() * 1000
+        if last_engagement != None:
+            time_since_last_engagement = (now_in_millisec - last_engagement.start_time_epoch_ms - (last_engagement.duration_seconds if (last_engagement.duration_seconds != None and last_engagement.duration_seconds < 999999999) else 0)*1000)
+            time_since_last_engagement = time_since_last_engagement / 1000
+
+        time_since_last_work = 0
+        last_work_record = WorkRecord.query \
+            .filter(WorkRecord.user_id == user.id) \
+            .filter(or_(WorkRecord.outcome.notin_([WorkOutcome.SKIPPED]), WorkRecord.outcome.is_(None))) \
+            .order_by(WorkRecord.id.desc()).first()
+
+        work_record_stats = WorkRecord.query \
+            .with_entities(WorkRecord.work_id) \
+            .join(Work, WorkRecord.work_id == Work.id) \
+            .filter(WorkRecord.user_id == user.id) \
+            .filter(and_(WorkRecord.duration_seconds != None, WorkRecord.duration_seconds < 999999999)) \
+            .add_columns(
+                label(
+                    'work_records_total_duration_seconds',
+                    db.func.sum(WorkRecord.duration_seconds)
+                )
+            ) \
+            .group_by(WorkRecord.work_id).all()
+
+        work_record_upwork_diary_stats = WorkRecordUpworkDiary.query \
+            .join(WorkRecord, WorkRecordUpworkDiary.work_record_id == WorkRecord.id) \
+            .filter(WorkRecord.user_id == user.id) \
+            .filter(WorkRecordUpworkDiary.net_duration_seconds != None) \
+            .add_columns(
+                label(
+                    'work_records_net_duration_seconds',
+                    db.func.sum(WorkRecordUpworkDiary.net_duration_seconds)
+                ),
+                label(
+                    'work_records_cost',
+                    db.func.sum(WorkRecordUpworkDiary.cost)
+                )
+            ) \
+            .group_by(WorkRecordUpworkDiary.id, WorkRecord.work_id).all()
+
+        average_work_price = None
+        average_gross_work_duration_seconds = None
+        average_net_work_duration_seconds = None
+        if work_record_stats:
+            average_gross_work_duration_seconds = sum(x.work_records_total_duration_seconds for x in work_record_stats) / len(work_record_stats)
+        if work_record_upwork_diary_stats:
+            average_net_work_duration_seconds = sum(x.work_records_net_duration_seconds or 0 for x in work_record_upwork_diary_stats) / len(work_record_upwork_diary_stats)
+            average_work_price = sum(x.work_records_cost or 0 for x in work_record_upwork_diary_stats)  / len(work_record_upwork_diary_stats)
+
+        if last_work_record != None:
+            time_since_last_work = (now_in_millisec - last_work_record.start_time_epoch_ms - (last_work_record.duration_seconds if (last_work_record.duration_seconds != None and last_work_record.duration_seconds < 999999999) else 0)*1000)
+            time_since_last_work = time_since_last_work / 1000
+
+        first_work_record = WorkRecord.query \
+            .filter(WorkRecord.user_id == user.id) \
+            .order_by(WorkRecord.id.asc()).first()
+        average_billable = 'none'
+        billable_hours_availability_ratio = '0.00'
+        if len(work_record_stats) > 0 and first_work_record != None and last_work_record != None:
+            weeks = ((last_work_record.utc_end_time or last_work_record.utc_start_time) - first_work_record.utc_start_time).days / 7
+            average_billable_per_week = sum(x.work_records_net_duration_seconds or 0 for x in work_record_upwork_diary_stats) / max(decimal.Decimal(weeks), 1)
+            average_billable_per_week_hours = average_billable_per_week / 60 / 60
+            average_billable = f"{average_billable_per_week_hours:.2f}"
+            if user.availability_weekly_hours:
+                billable_hours_availability_ratio = f"{(average_billable_per_week_hours / user.availability_weekly_hours * 100):.2f}"
+
+        iterations = WorkRecord.query.with_entities(WorkRecord.work_id).filter(WorkRecord.user_id == user.id).add_columns(label('correspondences',db.func.count())).group_by(WorkRecord.work_id)
+        average_iterations_per_work = WorkRecord.query.with_entities(label('avg', db.func.avg(iterations.subquery().columns.correspondences))).scalar()
+
+        records.append({
+            'id': user.id,
+            'name': user.name,
+            'active_work': active_work,
+            'number_of_reserved_works': number_of_reserved_works,
+            'number_of_works_in_review': number_of_works_in_review,
+            'number_of_completed_works': number_of_completed_works,
+            'number_of_total_works': number_of_total_works,
+            'number_of_cancelled_works': number_of_cancelled_works,
+            'number_of_skipped_works': number_of_skipped_works,
+            'skipped_total_works_ratio': skipped_total_works_ratio,
+            'time_since_last_engagement': time_since_last_engagement,
+            'time_since_last_work': time_since_last_work,
+            'billable_hours_availability_ratio': billable_hours_availability_ratio,
+            'average_billable': average_billable,
+            'weekly_availability': user.availability_weekly_hours,
+            'average_gross_work_duration': average_gross_work_duration_seconds,
+            'average_net_work_duration': average_net_work_duration_seconds,
+            'average_work_price': average_work_price,
+            'average_iterations_per_work': average_iterations_per_work,
+            'hourly_rate': f"${user.price_per_hour}" if user.price_per_hour != None else 'none',
+        })
+
+    return records
+
+
+def values_equal(value, other):
+    if value == other:
+        return True
+
+    # numeric aggregates may come back as decimals from one implementation and
+    # floats from the other
+    try:
+        return float(value) == float(other)
+    except (TypeError, ValueError):
+        return False
+
+
+def compare_records(per_user_records, grouped_records):
+    mismatches = []
+    for per_user, grouped in zip(per_user_records, grouped_records):
+        for key, value in per_user.items():
+            other = grouped[key]
+            if key in TIME_DEPENDENT_FIELDS:
+                if abs(value - other) > 60:
+                    mismatches.append((per_user['id'], key, value, other))
+            elif not values_equal(value, other):
+                mismatches.append((per_user['id'], key, value, other))
+
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=50, help='number of contributors on the page')
+    parser.add_argument('--records', type=int, default=40, help='number of work records per contributor')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app = flask_app.create_app('testing')
+    with app.app_context():
+        with seeded_dataset(args.users, args.records) as users:
+            with count_queries() as per_user_queries:
+                per_user_records, per_user_duration = timed(lambda: per_user_contributors_work_stats(users), args.repeat)
+
+            user_ids = [u.id for u in users]
+            with count_queries() as refresh_queries:
+                _, refresh_duration = timed(lambda: refresh_contributor_stats(user_ids), args.repeat)
+            db.session.commit()
+
+            with count_queries() as rollup_queries:
+                grouped_records, rollup_duration = timed(lambda: get_contributors_work_stats(users), args.repeat)
+
+            mismatches = compare_records(per_user_records, grouped_records)
+
+    print(f'contributors page of {args.users} users with {args.records} work records each')
+    print(f'per-user queries: {per_user_duration * 1000:.1f}ms, {per_user_queries.count // args.repeat} queries')
+    print(f'rollup refresh:   {refresh_duration * 1000:.1f}ms, {refresh_queries.count // args.repeat} queries')
+    print(f'rollup read:      {rollup_duration * 1000:.1f}ms, {rollup_queries.count // args.repeat} queries')
+
+    if mismatches:
+        for mismatch in mismatches:
+            print('mismatch: user {} field {} per-user {!r} grouped {!r}'.format(*mismatch))
+        raise SystemExit(1)
+
+    print('results are identical')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+Compare /metrics scrape time when the request metrics' path label holds the
+request path, which creates a series per id in the url, with the route template
+label used by utils/metrics, for gunicorn workers serving requests for thousands
+of distinct task, work and user ids.
+
+Does not need a database, run from the backend directory:
+    PYTHONPATH="$(pwd)/src:$PYTHONPATH" python -m benchmarks.metrics_scrape
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+
+from flask import Flask, request
+from prometheus_client import CollectorRegistry, Histogram, generate_latest, values
+from prometheus_client.multiprocess import MultiProcessCollector
+
+from src.utils.metrics import route_template_label
+
+from .common import timed
+
+
+BENCHMARK_URLS = [
+    '/api/v1/task/{id}',
+    '/api/v1/work/{id}',
+    '/api/v1/backoffice/user-profile/{id}',
+    '/api/v1/stats/contributor/{id}'
+]
+
+
+def request_path_label():
+    """
+    The previous path label
+    """
+    return request.path
+
+
+PATH_LABELS = {
+    'path': request_path_label,
+    'template': route_template_label
+}
+
+
+def benchmark_app():
+    app = Flask(__name__)
+    app.add_url_rule('/api/v1/task/<string:task_id>', 'task', lambda task_id: '')
+    app.add_url_rule('/api/v1/work/<int:work_id>', 'work', lambda work_id: '')
+    app.add_url_rule('/api/v1/backoffice/user-profile/<string:user_id>', 'user_profile', lambda user_id: '')
+    app.add_url_rule('/api/v1/stats/contributor/<string:user_id>', 'contributor_stats', lambda user_id: '')
+
+    return app
+
+
+def serve_requests(multiproc_dir, label, request_count, id_count, seed):
+    """
+    Record the request duration metric of a gunicorn worker into its multiprocess files
+    """
+    os.environ['PROMETHEUS_MULTIPROC_DIR'] = multiproc_dir
+    values.ValueClass = values.MultiProcessValue()
+
+    # the request duration histogram recorded by prometheus_flask_exporter
+    request_duration = Histogram(
+        'flask_http_request_duration_seconds',
+        'Flask HTTP request duration in seconds',
+        ['method', 'status', 'endpoint', 'path'],
+        registry=CollectorRegistry()
+    )
+    path_label = PATH_LABELS[label]
+
+    app = benchmark_app()
+    rng = random.Random(seed)
+    for _ in range(request_count):
+        url = rng.choice(BENCHMARK_URLS).format(id=rng.randrange(id_count))
+        with app.test_request_context(url):
+            request_duration.labels(method='GET', status='200', endpoint=request.endpoint, path=path_label()).observe(rng.random())
+
+
+def scrape(multiproc_dir):
+    registry = CollectorRegistry()
+    MultiProcessCollector(registry, path=multiproc_dir)
+
+    return generate_latest(registry)
+
+
+def run_workers(label, workers, requests, ids):
+    """
+    Returns:
+        Number of scraped series, size of the metric files in bytes and best scrape duration
+    """
+    with tempfile.TemporaryDirectory() as multiproc_dir:
+        context = multiprocessing.get_context('fork')
+        processes = [
+            context.Process(target=serve_requests, args=(multiproc_dir, label, requests, ids, seed))
+            for seed in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+        size = sum(entry.stat().st_size for entry in os.scandir(multiproc_dir))
+        output, duration = timed(lambda: scrape(multiproc_dir))
+        series = sum(1 for line in output.decode().splitlines() if line and not line.startswith('#'))
+
+    return series, size, duration
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=3, help='number of gunicorn workers')
+    parser.add_argument('--requests', type=int, default=10000, help='number of requests per worker')
+    parser.add_argument('--ids', type=int, default=5000, help='number of distinct ids in urls')
+    args = parser.parse_args()
+
+    print(f'{args.workers} workers serving {args.requests} requests each for {args.ids} distinct ids')
+    for label in PATH_LABELS:
+        series, size, duration = run_workers(label, args.workers, args.requests, args.ids)
+        print(f'{label + ":":10}{duration * 1000:.1f}ms scrape, {series} series, {size / 1024 / 1024:.1f}MiB metric files')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Compare creating tasks with the previous random id allocation, which queried
+for every new id whether it is taken, with ids drawn without a query and
+flushed by add_with_random_ids, and with ids allocated in bulk for a bulk insert.
+
+Run from the backend directory against an empty testing database:
+    PYTHONPATH="$(pwd)/src:$PYTHONPATH" python -m benchmarks.task_ids
+"""
+import argparse
+import random
+import string
+import time
+
+from sqlalchemy import insert
+
+from src import app as flask_app
+from src.models.task import Task, TaskStatus, TaskType
+from src.utils.db import add_with_random_ids, db
+
+from .common import BENCHMARK_REPOSITORY_ID, count_queries, seeded_dataset
+
+
+def select_checked_id():
+    """
+    The previous id allocation, reseeding the random generator for every id and
+    querying whether it is taken
+    """
+    chars = string.ascii_lowercase + string.ascii_uppercase + string.digits
+    for _ in range(5):
+        random.seed()
+        random_id = ''.join(random.choice(chars) for i in range(8))
+        if Task.query.filter_by(id=random_id).first() is None:
+            return random_id
+
+    raise Exception('failed to find an available id over 5 attempts')
+
+
+def benchmark_task(delegator):
+    return Task.from_cuckoo(delegator.id, 'benchmark task', TaskStatus.NEW, 1, TaskType.CUCKOO_CODING, repository_id=BENCHMARK_REPOSITORY_ID)
+
+
+def create_select_checked(delegator, count):
+    tasks = []
+    for _ in range(count):
+        task = benchmark_task(delegator)
+        task.id = select_checked_id()
+        tasks.append(task)
+
+    db.session.add_all(tasks)
+    db.session.commit()
+
+
+def create_unchecked(delegator, count):
+    add_with_random_ids([benchmark_task(delegator) for _ in range(count)])
+    db.session.commit()
+
+
+def create_bulk(delegator, count):
+    rows = [{
+        'id': task_id,
+        'delegating_user_id': delegator.id,
+        'description': 'benchmark task',
+        'status': TaskStatus.NEW,
+        'priority': 1,
+        'task_type': TaskType.CUCKOO_CODING,
+        'repository_id': BENCHMARK_REPOSITORY_ID
+    } for task_id in Task.allocate_ids(count)]
+
+    db.session.execute(insert(Task), rows)
+    db.session.commit()
+
+
+def run(create, delegator, count):
+    """
+    Returns:
+        Number of queries and duration of creating the tasks
+    """
+    with count_queries() as queries:
+        start = time.perf_counter()
+        create(delegator, count)
+        duration = time.perf_counter() - start
+
+    created = Task.query.filter_by(repository_id=BENCHMARK_REPOSITORY_ID).count()
+    if created != count:
+        raise SystemExit(f'{create.__name__} created {created} tasks instead of {count}')
+
+    # tasks without work items, remove them without loading them
+    Task.query.filter_by(repository_id=BENCHMARK_REPOSITORY_ID).delete(synchronize_session=False)
+    db.session.commit()
+    db.session.expire_all()
+
+    return queries.count, duration
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tasks', type=int, default=10000, help='number of tasks to create')
+    args = parser.parse_args()
+
+    app = flask_app.create_app('testing')
+    with app.app_context():
+        with seeded_dataset(1, 0) as users:
+            results = [
+                (name, *run(create, users[0], args.tasks))
+                for name, create in [
+                    ('select-checked', create_select_checked),
+                    ('unchecked', create_unchecked),
+                    ('bulk', create_bulk)
+                ]
+            ]
+
+    print(f'creating {args.tasks} tasks')
+    for name, queries, duration in results:
+        print(f'{name + ":":16}{duration * 1000:.1f}ms, {queries} queries')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Compare the statements run to label new tasks with tags and skills when each
+name is looked up with its own query, as the previous get_or_create did, with
+get_or_create_many resolving all names at once, with and without the catalogue
+cache.
+
+Run from the backend directory against an empty testing database and redis:
+    PYTHONPATH="$(pwd)/src:$PYTHONPATH" python -m benchmarks.task_labels
+"""
+import argparse
+import time
+
+from src import app as flask_app
+from src.models.skill import Skill
+from src.models.tag import Tag
+from src.models.task import Task, TaskStatus, TaskType
+from src.utils.catalogue_cache import catalogue_cache
+from src.utils.db import add_with_random_ids, db
+
+from .common import BENCHMARK_REPOSITORY_ID, count_queries, seeded_dataset
+
+
+def get_or_create_per_name(model, name):
+    """
+    The previous get_or_create, querying every name
+    """
+    item = model.query.filter_by(name=name).first()
+    if item is None:
+        item = model(name=name)
+        db.session.add(item)
+
+    return item
+
+
+def label_per_name(tags, skills):
+    return [get_or_create_per_name(Tag, t) for t in tags], [get_or_create_per_name(Skill, s) for s in skills]
+
+
+def label_bulk(tags, skills):
+    return Tag.get_or_create_many(tags), Skill.get_or_create_many(skills)
+
+
+def create_tasks(label, delegator_id, count, tags, skills):
+    for _ in range(count):
+        task_tags, task_skills = label(tags, skills)
+        task = Task.from_cuckoo(
+            delegator_id, 'benchmark task', TaskStatus.NEW, 1, TaskType.CUCKOO_CODING,
+            tags=task_tags, skills=task_skills, repository_id=BENCHMARK_REPOSITORY_ID
+        )
+        add_with_random_ids([task])
+        db.session.commit()
+        db.session.expire_all()
+
+
+def run(label, delegator_id, count, labels, cache_ttl_seconds):
+    """
+    Returns:
+        Number of queries and duration of creating the tasks
+    """
+    catalogue_cache.ttl_seconds = cache_ttl_seconds
+    tags = [f'benchmark-tag-{i}' for i in range(labels)]
+    skills = [f'benchmark-skill-{i}' for i in range(labels)]
+
+    # the catalogue exists already, only the lookups are measured
+    db.session.add_all([Tag(t) for t in tags] + [Skill(s) for s in skills])
+    db.session.commit()
+    db.session.expunge_all()
+
+    with count_queries() as queries:
+        start = time.perf_counter()
+        create_tasks(label, delegator_id, count, tags, skills)
+        duration = time.perf_counter() - start
+
+    # task tags and skills are removed with the tasks
+    Task.query.filter_by(repository_id=BENCHMARK_REPOSITORY_ID).delete(synchronize_session=False)
+    Tag.query.filter(Tag.name.in_(tags)).delete(synchronize_session=False)
+    Skill.query.filter(Skill.name.in_(skills)).delete(synchronize_session=False)
+    db.session.commit()
+    catalogue_cache.invalidate(Tag)
+
+    return queries.count, duration
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tasks', type=int, default=200, help='number of tasks to create')
+    parser.add_argument('--labels', type=int, default=10, help='number of tags and of skills per task')
+    args = parser.parse_args()
+
+    app = flask_app.create_app('testing')
+    with app.app_context():
+        with seeded_dataset(1, 0) as users:
+            results = [
+                (name, *run(label, users[0].id, args.tasks, args.labels, cache_ttl_seconds))
+                for name, label, cache_ttl_seconds in [
+                    ('per-name', label_per_name, 0),
+                    ('bulk', label_bulk, 0),
+                    ('bulk-cached', label_bulk, 10 * 60)
+                ]
+            ]
+
+    print(f'creating {args.tasks} tasks with {args.labels} tags and {args.labels} skills each')
+    for name, queries, duration in results:
+        print(f'{name + ":":16}{duration * 1000:.1f}ms, {queries} queries')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""
+Compare the per-row upwork cost report, which loads the related rows of each
+diary lazily, with the batched streaming report used by UpworkCostReport, on
+the upwork diaries of the seeded contributors over the last 60 days.
+
+Run from the backend directory against an empty testing database:
+    PYTHONPATH="$(pwd)/src:$PYTHONPATH" python -m benchmarks.upwork_cost_report
+"""
+import argparse
+import csv
+from datetime import datetime, timedelta
+import io
+import time
+import tracemalloc
+
+from sqlalchemy.sql import and_
+
+from src import app as flask_app
+from src.logic.upwork_cost_report import iter_cost_report_rows
+from src.models.diary_log import DiaryLog
+from src.models.upwork import UpworkDiary
+from src.models.user import User
+from src.utils.db import db
+
+from .common import count_queries, seeded_dataset
+
+
+def per_row_report(start_date, end_date):
+    """
+    The previous report implementation, loading all diaries and the related rows
+    of each diary one at a time
+    """
+    rows = []
+    upwork_diary_items = UpworkDiary.query \
+        .filter(
+            and_(
+                UpworkDiary.rounded_utc_start_time < end_date + timedelta(days=1),
+                UpworkDiary.rounded_utc_end_time >= start_date
+            )
+        ) \
+        .order_by(UpworkDiary.id.asc()) \
+        .all()
+
+    for upwork_diary in upwork_diary_items:
+        diary_columns = [upwork_diary.id, upwork_diary.upwork_user_id, upwork_diary.upwork_user_name, upwork_diary.duration_string, str(timedelta(minutes=upwork_diary.duration_min))]
+
+        upwork_diary_work_records = [wrud.work_record for wrud in upwork_diary.work_record_upwork_diaries]
+        if not upwork_diary_work_records:
+            user = User.query.filter(User.upwork_user == upwork_diary.upwork_user_id).first()
+            rows.append(diary_columns + [None] * 6 + [user.id if user else None, user.name if user else None] + [None] * 4)
+            continue
+
+        for work_record in upwork_diary_work_records:
+            wrud = [wrud for wrud in upwork_diary.work_record_upwork_diaries if wrud.work_record_id == work_record.id][0]
+            rows.append(diary_columns + [
+                str(wrud.upwork_cost),
+                str(timedelta(seconds=wrud.upwork_duration_seconds)),
+                work_record.id,
+                work_record.work_id,
+                work_record.work.task_id,
+                work_record.work.task.name,
+                work_record.user_id,
+                work_record.user.name,
+                ';'.join([t.name for t in work_record.work.tags]),
+                ';'.join([s.name for s in work_record.work.skills]),
+                f'{work_record.utc_start_time.strftime("%Y/%m/%d %H:%M")} - {work_record.utc_end_time.strftime("%Y/%m/%d %H:%M")}',
+                str(timedelta(seconds=work_record.duration_seconds))
+            ])
+
+    for manual_diary in DiaryLog.query.filter(DiaryLog.date <= end_date, DiaryLog.date >= start_date).order_by(DiaryLog.id.asc()).all():
+        rows.append([manual_diary.id, None, None, None, manual_diary.date, manual_diary.cost, str(timedelta(minutes=int(manual_diary.duration_hours*60))), None, None, None, manual_diary.text, manual_diary.user_role.email, None, manual_diary.project, None, None, None])
+
+    return [rows]
+
+
+def run_report(report, start_date, end_date):
+    """
+    Write a report to csv while tracing the memory allocated by it
+    Returns:
+        Number of rows, csv text and peak traced memory in bytes
+    """
+    # loaded rows are reloaded by each report, the seeded users must stay attached for the cleanup
+    db.session.expire_all()
+    tracemalloc.start()
+
+    output = io.StringIO()
+    writer = csv.writer(output, quoting=csv.QUOTE_ALL)
+    count = 0
+    for rows in report(start_date, end_date):
+        writer.writerows(rows)
+        count += len(rows)
+
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return count, output.getvalue(), peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=20, help='number of contributors')
+    parser.add_argument('--records', type=int, default=500, help='number of work records per contributor')
+    args = parser.parse_args()
+
+    end_date = datetime.utcnow().date()
+    start_date = end_date - timedelta(days=60)
+
+    app = flask_app.create_app('testing')
+    with app.app_context():
+        with seeded_dataset(args.users, args.records):
+            with count_queries() as per_row_queries:
+                start = time.perf_counter()
+                per_row_count, per_row_csv, per_row_peak = run_report(per_row_report, start_date, end_date)
+                per_row_duration = time.perf_counter() - start
+
+            with count_queries() as batched_queries:
+                start = time.perf_counter()
+                batched_count, batched_csv, batched_peak = run_report(iter_cost_report_rows, start_date, end_date)
+                batched_duration = time.perf_counter() - start
+
+    print(f'cost report of {per_row_count} rows for {args.users} users with {args.records} work records each')
+    print(f'per-row:  {per_row_duration * 1000:.1f}ms, {per_row_queries.count} queries, {per_row_peak / 1024 / 1024:.1f}MiB peak')
+    print(f'batched:  {batched_duration * 1000:.1f}ms, {batched_queries.count} queries, {batched_peak / 1024 / 1024:.1f}MiB peak')
+
+    if per_row_csv != batched_csv:
+        print(f'mismatch: per-row report has {per_row_count} rows, batched report has {batched_count} rows')
+        raise SystemExit(1)
+
+    print('reports are identical')
+
+
+if __name__ == '__main__':
+    main()
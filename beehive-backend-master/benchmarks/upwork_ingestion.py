@@ -0,0 +1,196 @@
+"""
+Compare the per-row upwork diary ingestion with the batched pipeline used by
+save_upwork_diaries and update_work_records_net_duration, on a synthetic week
+of upwork snapshots for the seeded contributors.
+
+Run from the backend directory against an empty testing database:
+    PYTHONPATH="$(pwd)/src:$PYTHONPATH" python -m benchmarks.upwork_ingestion
+"""
+import argparse
+from datetime import datetime, timedelta
+import random
+import time
+from unittest.mock import patch
+
+from sqlalchemy import and_
+
+from src import app as flask_app
+from src.models.upwork import UpworkDiary, WorkRecordUpworkDiary
+from src.models.user import User
+from src.models.work_record import WorkRecord
+from src.utils.db import db
+from src.utils.upwork import UPWORK_MARKETPLACE_HOURLY_FEE, save_upwork_diaries, update_work_records_net_duration
+
+from .common import count_queries, seeded_dataset
+
+
+SNAPSHOT_DESCRIPTION = 'benchmark snapshot'
+
+
+def synthetic_week(users, snapshots_per_day, seed=0):
+    """
+    Build a week of upwork snapshots per day, in the shape returned by
+    UpworkClient.get_work_diary, with 10 minute aligned snapshots
+    Returns:
+        List of 7 lists of snapshots, one per day
+    """
+    rand = random.Random(seed)
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    days = []
+    for i in range(1, 8):
+        day_start = int((today - timedelta(days=i)).timestamp())
+        snapshots = []
+        for user in users:
+            for segment in rand.sample(range(144), min(snapshots_per_day, 144)):
+                start = day_start + segment * 600
+                duration_min = rand.randint(1, 10)
+                snapshots.append({
+                    'user': {'id': user.upwork_user, 'name': user.name},
+                    'time': {'first_worked_int': str(start), 'last_worked_int': str(start + duration_min * 60)},
+                    'duration_int': duration_min,
+                    'task': {'memo': SNAPSHOT_DESCRIPTION}
+                })
+        days.append(snapshots)
+
+    return days
+
+
+def per_row_ingestion(days):
+    """
+    The previous ingestion implementation, running a set of queries per snapshot
+    and per diary
+    """
+    for snapshots in days:
+        upwork_diaries = []
+        for snapshot in snapshots:
+            user_id = None
+            user = User.query.filter_by(upwork_user=snapshot['user']['id']).first()
+            if user:
+                user_id = user.id
+
+            upwork_diaries.append(UpworkDiary.insert_or_update(
+                user_id,
+                snapshot['user']['id'],
+                snapshot['user']['name'],
+                int(snapshot['time']['first_worked_int']) * 1000,
+                int(snapshot['time']['last_worked_int']) * 1000,
+                snapshot['duration_int'],
+                snapshot['task']['memo']
+            ))
+        db.session.commit()
+
+        for upwork_diary in upwork_diaries:
+            matched_work_records = db.session.query(WorkRecord) \
+                .filter(
+                    WorkRecord.user_id == upwork_diary.user_id,
+                    and_(
+                        WorkRecord.start_time_diff_sec(upwork_diary.utc_start_time) < 172800,
+                        WorkRecord.end_time_diff_sec(upwork_diary.utc_end_time) < 172800
+                    )
+                ) \
+                .order_by(WorkRecord.start_time_diff_sec(upwork_diary.utc_start_time).asc()) \
+                .all()
+
+            for work_record in matched_work_records:
+                work_record_end_time_utc = work_record.utc_end_time or datetime.utcnow()
+                net_duration_seconds = int((min(work_record_end_time_utc, upwork_diary.utc_end_time) - max(work_record.utc_start_time, upwork_diary.utc_start_time)).total_seconds())
+                if net_duration_seconds > 0:
+                    upwork_duration_seconds = int((min(work_record_end_time_utc, upwork_diary.rounded_utc_end_time) - max(work_record.utc_start_time, upwork_diary.rounded_utc_start_time)).total_seconds())
+                    cost = None
+                    upwork_cost = None
+                    if upwork_diary.user.price_per_hour:
+                        cost = float(upwork_diary.user.price_per_hour) * net_duration_seconds / 60 / 60
+                        upwork_cost = float(upwork_diary.user.price_per_hour) * upwork_duration_seconds / 3600 * (1 + UPWORK_MARKETPLACE_HOURLY_FEE)
+
+                    WorkRecordUpworkDiary.insert_or_update(
+                        work_record.id, upwork_diary.id, net_duration_seconds, cost, upwork_duration_seconds, upwork_cost
+                    )
+        db.session.commit()
+
+
+def batched_ingestion(days):
+    days = iter(days)
+    with patch('src.utils.upwork.upwork_client_manager.get_client') as mock_get_client:
+        mock_get_client.return_value.get_work_diary.side_effect = lambda date: {'snapshots': next(days)}
+        for _ in range(7):
+            update_work_records_net_duration(save_upwork_diaries(None))
+
+
+def ingested_rows():
+    rows = db.session.query(
+        UpworkDiary.upwork_user_id,
+        UpworkDiary.start_time_epoch_ms,
+        WorkRecordUpworkDiary.work_record_id,
+        WorkRecordUpworkDiary.net_duration_seconds,
+        WorkRecordUpworkDiary.upwork_duration_seconds,
+        WorkRecordUpworkDiary.cost,
+        WorkRecordUpworkDiary.upwork_cost
+    ) \
+        .join(WorkRecordUpworkDiary, WorkRecordUpworkDiary.upwork_diary_id == UpworkDiary.id) \
+        .filter(UpworkDiary.description == SNAPSHOT_DESCRIPTION) \
+        .all()
+
+    return sorted(tuple(r) for r in rows)
+
+
+def reset_ingestion():
+    diary_ids = [r[0] for r in db.session.query(UpworkDiary.id).filter(UpworkDiary.description == SNAPSHOT_DESCRIPTION).all()]
+    if diary_ids:
+        WorkRecordUpworkDiary.query.filter(WorkRecordUpworkDiary.upwork_diary_id.in_(diary_ids)).delete(synchronize_session=False)
+        UpworkDiary.query.filter(UpworkDiary.id.in_(diary_ids)).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def timed_ingestion(func, days, repeat):
+    """
+    Run an ingestion a number of times, each from an empty state
+    Returns:
+        The ingested rows of the last run, the best run duration in seconds and
+        the number of queries of a run
+    """
+    best = None
+    for _ in range(repeat):
+        reset_ingestion()
+        with count_queries() as queries:
+            start = time.perf_counter()
+            func(days)
+            duration = time.perf_counter() - start
+        best = duration if best is None else min(best, duration)
+
+    rows = ingested_rows()
+    reset_ingestion()
+    return rows, best, queries.count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=20, help='number of contributors with snapshots')
+    parser.add_argument('--records', type=int, default=200, help='number of work records per contributor')
+    parser.add_argument('--snapshots', type=int, default=30, help='number of snapshots per contributor per day')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    app = flask_app.create_app('testing')
+    with app.app_context():
+        with seeded_dataset(args.users, args.records) as users:
+            days = synthetic_week(users, args.snapshots)
+
+            per_row_rows, per_row_duration, per_row_queries = timed_ingestion(per_row_ingestion, days, args.repeat)
+            batched_rows, batched_duration, batched_queries = timed_ingestion(batched_ingestion, days, args.repeat)
+
+    print(f'week of {sum(len(d) for d in days)} snapshots for {args.users} users with {args.records} work records each')
+    print(f'per-row: {per_row_duration * 1000:.1f}ms, {per_row_queries} queries')
+    print(f'batched: {batched_duration * 1000:.1f}ms, {batched_queries} queries')
+
+    if per_row_rows != batched_rows:
+        print(f'mismatch: per-row matched {len(per_row_rows)} rows, batched matched {len(batched_rows)} rows')
+        for row in sorted(set(per_row_rows) ^ set(batched_rows))[:20]:
+            print(f'  {row}')
+        raise SystemExit(1)
+
+    print(f'results are identical ({len(batched_rows)} work record diaries)')
+
+
+if __name__ == '__main__':
+    main()
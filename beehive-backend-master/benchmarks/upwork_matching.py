@@ -0,0 +1,150 @@
+"""
+Compare matching upwork diaries to work records with a query per diary against
+the in-memory interval index used by update_work_records_net_duration, for a
+week of diaries of a contributor with a long work record history.
+
+Run from the backend directory against an empty testing database:
+    PYTHONPATH="$(pwd)/src:$PYTHONPATH" python -m benchmarks.upwork_matching
+"""
+import argparse
+from datetime import datetime
+import random
+import time
+
+from sqlalchemy import and_, insert
+
+from src import app as flask_app
+from src.logic.upwork_matching import MATCH_WINDOW_SECONDS, match_upwork_diaries
+from src.models.task import Task, TaskStatus, TaskType
+from src.models.upwork import UpworkDiary
+from src.models.work import Work, WorkStatus, WorkType
+from src.models.work_record import WorkRecord
+from src.utils.db import db
+
+from .common import BENCHMARK_REPOSITORY_ID, count_queries, seeded_dataset, timed
+
+
+DAY_MS = 24 * 60 * 60 * 1000
+
+
+def seed_history(user, work_id, records, days, seed=0):
+    """
+    Bulk insert a history of work records spread over a number of days
+    """
+    rand = random.Random(seed)
+    now_epoch_ms = int(time.time() * 1000)
+
+    rows = []
+    for _ in range(records):
+        rows.append({
+            'user_id': user.id,
+            'work_id': work_id,
+            'active': False,
+            'start_time_epoch_ms': now_epoch_ms - rand.randint(0, days * DAY_MS),
+            'tz_name': 'UTC',
+            'duration_seconds': rand.choice([None, rand.randint(60, 4 * 60 * 60)])
+        })
+
+    for i in range(0, len(rows), 5000):
+        db.session.execute(insert(WorkRecord), rows[i:i + 5000])
+    db.session.commit()
+
+
+def synthetic_week(user, diaries_per_day, seed=0):
+    rand = random.Random(seed)
+    now_epoch_ms = int(time.time() * 1000)
+
+    diaries = []
+    for day in range(1, 8):
+        for _ in range(diaries_per_day):
+            start_time_epoch_ms = now_epoch_ms - day * DAY_MS + rand.randint(0, DAY_MS)
+            diary = UpworkDiary(user.id, user.upwork_user, user.name, start_time_epoch_ms, start_time_epoch_ms + 600 * 1000, 10, None)
+            diary.id = len(diaries)
+            diaries.append(diary)
+
+    return diaries
+
+
+def per_diary_matching(user, diaries):
+    """
+    The previous matching implementation, running a query per diary
+    """
+    matches = []
+    for diary in diaries:
+        work_records = db.session.query(WorkRecord) \
+            .filter(
+                WorkRecord.user_id == user.id,
+                and_(
+                    WorkRecord.start_time_diff_sec(diary.utc_start_time) < MATCH_WINDOW_SECONDS,
+                    WorkRecord.end_time_diff_sec(diary.utc_end_time) < MATCH_WINDOW_SECONDS
+                )
+            ) \
+            .all()
+
+        for work_record in work_records:
+            net_duration_seconds = int((min(work_record.utc_end_time or datetime.utcnow(), diary.utc_end_time) - max(work_record.utc_start_time, diary.utc_start_time)).total_seconds())
+            if net_duration_seconds > 0:
+                matches.append((diary.id, work_record.id, net_duration_seconds))
+
+    return sorted(matches)
+
+
+def interval_index_matching(user, diaries):
+    window_ms = MATCH_WINDOW_SECONDS * 1000
+    work_records = WorkRecord.query \
+        .filter(WorkRecord.user_id == user.id) \
+        .filter(WorkRecord.start_time_epoch_ms > min(d.start_time_epoch_ms for d in diaries) - window_ms) \
+        .filter(WorkRecord.start_time_epoch_ms < max(d.start_time_epoch_ms for d in diaries) + window_ms) \
+        .filter(WorkRecord.duration_seconds.isnot(None)) \
+        .all()
+
+    return sorted((diary.id, work_record.id, net) for diary, work_record, net, _ in match_upwork_diaries(diaries, work_records))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--records', type=int, default=100000, help='number of work records in the contributor history')
+    parser.add_argument('--days', type=int, default=3 * 365, help='number of days the history spans')
+    parser.add_argument('--diaries', type=int, default=30, help='number of upwork diaries per day')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    app = flask_app.create_app('testing')
+    with app.app_context():
+        with seeded_dataset(1, 0) as users:
+            user = users[0]
+            task = Task.from_cuckoo(user.id, 'benchmark task', TaskStatus.ACCEPTED, 1, TaskType.CUCKOO_CODING, repository_id=BENCHMARK_REPOSITORY_ID)
+            db.session.add(task)
+            db.session.flush()
+            work = Work.from_cuckoo(task.id, WorkStatus.COMPLETE, WorkType.CUCKOO_CODING, 'benchmark work')
+            db.session.add(work)
+            db.session.commit()
+
+            try:
+                seed_history(user, work.id, args.records, args.days)
+                diaries = synthetic_week(user, args.diaries)
+
+                with count_queries() as per_diary_queries:
+                    per_diary_matches, per_diary_duration = timed(lambda: per_diary_matching(user, diaries), args.repeat)
+
+                with count_queries() as index_queries:
+                    index_matches, index_duration = timed(lambda: interval_index_matching(user, diaries), args.repeat)
+            finally:
+                # remove the history without loading it through the orm cascade
+                db.session.rollback()
+                WorkRecord.query.filter_by(work_id=work.id).delete(synchronize_session=False)
+                db.session.commit()
+
+    print(f'{len(diaries)} upwork diaries against a history of {args.records} work records over {args.days} days')
+    print(f'per-diary queries: {per_diary_duration * 1000:.1f}ms, {per_diary_queries.count // args.repeat} queries')
+    print(f'interval index:    {index_duration * 1000:.1f}ms, {index_queries.count // args.repeat} queries')
+
+    if per_diary_matches != index_matches:
+        print(f'mismatch: per-diary matched {len(per_diary_matches)} pairs, interval index matched {len(index_matches)} pairs')
+        raise SystemExit(1)
+
+    print(f'results are identical ({len(index_matches)} matches)')
+
+
+if __name__ == '__main__':
+    main()
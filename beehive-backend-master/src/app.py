@@ -3,9 +3,11 @@ import os
 from flask import Flask
 from flask_cors import CORS
 
+from .commands import init_app as commands_init_app
 from .config import config_map
 from .log import init_app_logging
 from .utils.auth import test_after_response_add_cors_headers
+from .utils.catalogue_cache import catalogue_cache
 from .utils.db import db, migrate
 from .utils.errors import init_app as errors_init_app
 from .utils.jwt import jwt_manager
@@ -13,6 +15,10 @@ from .utils.marshmallow import ma
 from .utils.metrics import init_app as metrics_init_app
 from .utils.rq import rq
 from .utils.grpc_client import grpc_client
+from .utils.http_client import http_client
+from .utils.sql_instrumentation import sql_instrumentation
+from .utils.tracing import tracer
+from .utils.user_cache import user_cache
 
 
 def create_app(env=None):
@@ -33,6 +39,12 @@ def create_app(env=None):
     errors_init_app(app)
     rq.init_app(app)
     grpc_client.init_app(app)
+    http_client.init_app(app)
+    sql_instrumentation.init_app(app)
+    tracer.init_app(app)
+    catalogue_cache.init_app(app)
+    user_cache.init_app(app)
+    commands_init_app(app)
 
     CORS(app)
 
@@ -44,7 +56,7 @@ def create_app(env=None):
 
     # import views
     from .resources.health import Live, Ready
-    from .resources.task import NotifyContributors, CuckooTaskCRUD, TaskCRUD
+    from .resources.task import NotifyContributors, CuckooTaskBulk, CuckooTaskCRUD, TaskCRUD
     from .resources.quest import QuestCRUD
     from .resources.task_context import TaskContextCRUD
 
@@ -97,6 +109,7 @@ def create_app(env=None):
     )
     from .resources.upwork import (
         UpworkWorkDiary,
+        UpworkBackfill,
         UpworkCallback,
         UpworkCostReport
     )
@@ -112,6 +125,7 @@ def create_app(env=None):
     ready_view = Ready.as_view('ready')
     task_view = TaskCRUD.as_view('task')
     cuckoo_task_view = CuckooTaskCRUD.as_view('cuckoo_task')
+    cuckoo_task_bulk_view = CuckooTaskBulk.as_view('cuckoo_task_bulk')
     quest_view = QuestCRUD.as_view('quest')
     task_context_view = TaskContextCRUD.as_view('task_context')
     available_work_view = AvailableWork.as_view('available_work')
@@ -145,6 +159,7 @@ def create_app(env=None):
     backoffice_diary_log_view = ManualDiaryLog.as_view('backoffice_diary_log_view')
     upwork_callback_view = UpworkCallback.as_view('upwork_callback')
     upwork_work_diary_view = UpworkWorkDiary.as_view('upwork_work_diary_view')
+    upwork_backfill_view = UpworkBackfill.as_view('upwork_backfill_view')
     upwork_cost_report_view = UpworkCostReport.as_view('upwork_cost_report_view')
     stats_active_work_view = ActiveWork.as_view('stats_active_work_view')
     stats_pending_work_view = PendingWork.as_view('stats_pending_work_view')
@@ -183,6 +198,7 @@ def create_app(env=None):
     app.add_url_rule('/api/v1/task/<string:task_id>', view_func=task_view, methods=['GET', 'DELETE'])
     app.add_url_rule('/api/v1/task/notify', view_func=task_notify_view, methods=['POST'])
     app.add_url_rule('/api/v1/task/cuckoo', view_func=cuckoo_task_view, methods=['POST', 'PUT'])
+    app.add_url_rule('/api/v1/task/cuckoo/bulk', view_func=cuckoo_task_bulk_view, methods=['POST'])
     app.add_url_rule('/api/v1/quest', view_func=quest_view, methods=['POST', 'PUT'])
     app.add_url_rule('/api/v1/quest/<string:quest_id>', view_func=quest_view, methods=['GET', 'DELETE'])
     app.add_url_rule('/api/v1/quest/delegate', view_func=delegate_quest_view, methods=['POST'])
@@ -218,6 +234,7 @@ def create_app(env=None):
     app.add_url_rule('/api/v1/backoffice/tag', view_func=backoffice_tag_view, methods=['GET', 'POST', 'DELETE'])
     app.add_url_rule('/api/v1/backoffice/skill', view_func=backoffice_skill_view, methods=['GET', 'POST', 'DELETE'])
     app.add_url_rule('/api/v1/backoffice/upwork-diary', view_func=upwork_work_diary_view, methods=['GET'])
+    app.add_url_rule('/api/v1/backoffice/upwork-diary/<string:backfill_id>', view_func=upwork_backfill_view, methods=['GET', 'POST'])
     app.add_url_rule('/api/v1/backoffice/cost-report', view_func=upwork_cost_report_view, methods=['GET'])
     app.add_url_rule('/api/v1/backoffice/diary-log', view_func=backoffice_diary_log_view, methods=['POST'])
     app.add_url_rule('/api/v1/upwork-callback', view_func=upwork_callback_view, methods=['GET'])
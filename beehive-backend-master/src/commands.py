@@ -0,0 +1,42 @@
+import click
+from flask.cli import AppGroup
+
+
+backfill_cli = AppGroup('backfill', help='Build the precomputed tables from the existing data.')
+
+
+def init_app(app):
+    app.cli.add_command(backfill_cli)
+
+
+@backfill_cli.command('work-match-index')
+def backfill_work_match_index():
+    """Index all available work for drawing work."""
+    from .jobs.work import rebuild_work_match_index_job
+    rebuild_work_match_index_job()
+    click.echo('work match index backfilled')
+
+
+@backfill_cli.command('contributor-stats')
+def backfill_contributor_stats():
+    """Refresh the contributor stats of all contributors."""
+    from .jobs.stats import refresh_changed_contributor_stats
+    refresh_changed_contributor_stats(full=True)
+    click.echo('contributor stats backfilled')
+
+
+@backfill_cli.command('project-activity')
+def backfill_project_activity():
+    """Refresh the daily activity of all projects."""
+    from .jobs.stats import refresh_changed_project_activity
+    refresh_changed_project_activity(full=True)
+    click.echo('project activity backfilled')
+
+
+@backfill_cli.command('all')
+@click.pass_context
+def backfill_all(ctx):
+    """Run all backfills, to be run on deploy after the migrations."""
+    ctx.invoke(backfill_work_match_index)
+    ctx.invoke(backfill_contributor_stats)
+    ctx.invoke(backfill_project_activity)
@@ -13,14 +13,34 @@ class Config(object):
 
     JWT_BLACKLIST_ENABLED = True
     JWT_BLACKLIST_TOKEN_CHECKS = ['access', 'refresh']
+    # tokens found not revoked are cached in-process, a token revoked by another
+    # worker can be used for up to this long
+    JWT_UNREVOKED_TOKEN_CACHE_SECONDS = 5
+    JWT_UNREVOKED_TOKEN_CACHE_SIZE = 10000
+    # the current user of requests is cached in-process, user changes made
+    # through the profile endpoints are published over redis to drop the user
+    # from every process' cache
+    USER_CACHE_TTL_SECONDS = 30
+    USER_CACHE_SIZE = 1000
+    # tag and skill ids by name are cached in-process, catalogue changes made
+    # through the backoffice are published over redis to clear every process' cache
+    CATALOGUE_CACHE_TTL_SECONDS = 10 * 60
+    CATALOGUE_CACHE_SIZE = 10000
     CORS_ORIGINS = []
 
     RQ_QUEUES = ['high', 'low']
 
+    # admin dashboard responses are cached in the rq redis and invalidated when
+    # work, tasks or upwork diaries change, the ttl covers other changes
+    RESPONSE_CACHE_ENABLED = True
+    RESPONSE_CACHE_TTL_SECONDS = 5 * 60
+
     # no trailing slash
     FRONTEND_BASE_URL = 'http://localhost:3000'
 
     PROMETHEUS_ENABLED = False
+    # the path label holds route templates, the cap guards against unexpected values
+    PROMETHEUS_MAX_PATH_LABEL_VALUES = 200
 
     INTER_SERVICE_AUTH_KEYS = []
     METRICS_AUTH_KEYS = []
@@ -28,16 +48,65 @@ class Config(object):
     OUTGOING_AUTH_TOKEN = 'abcdefghijklmnopqrstuvwxyz'
 
     SLACK_BOT_BASE_URL = None
+    SLACK_BOT_TIMEOUT_SECONDS = 5
 
     CUCKOO_BASE_URL = 'http://localhost:8000'
     CUCKOO_AUTH_TOKEN = 'abcdefghijklmnopqrstuvwxyz'
+    CUCKOO_TIMEOUT_SECONDS = 10
+    # max concurrent requests when fanning out cuckoo lookups
+    CUCKOO_FAN_OUT_MAX_WORKERS = 8
+    # task ids per cuckoo trello link request
+    TRELLO_LINK_CHUNK_SIZE = 100
+    TRELLO_LINK_CACHE_TTL_SECONDS = 10 * 60
+
+    # cuckoo events are delivered from the outbox by a worker of the cuckoo queue
+    CUCKOO_OUTBOX_BATCH_SIZE = 100
+    CUCKOO_OUTBOX_DRAIN_SECONDS = 50
+    CUCKOO_OUTBOX_POLL_INTERVAL_SECONDS = 1
+    CUCKOO_OUTBOX_MAX_ATTEMPTS = 10
+    CUCKOO_OUTBOX_RETRY_BASE_SECONDS = 5
+    CUCKOO_OUTBOX_RETRY_MAX_SECONDS = 60 * 60
+    CUCKOO_OUTBOX_RETENTION_DAYS = 7
 
     PRAESEPE_BASE_URL = 'http://localhost:5002'
     PRAESEPE_AUTH_TOKEN = 'abcdefghijklmnopqrstuvwxyz'
+    PRAESEPE_TIMEOUT_SECONDS = 5
+    # seconds a target user's ratings are served from memory before praesepe is asked again
+    PRAESEPE_RATINGS_CACHE_TTL_SECONDS = 60
 
     POLLINATOR_TASK_TYPE_BASE_URL = 'http://localhost:5055'
     POLLINATOR_BEEHAVE_BASE_URL = 'http://localhost:5056'
     POLLINATOR_BEEHAVE_PR_FEEDBACK_URL = 'http://localhost:5057'
+    # model predictions may take a while
+    POLLINATOR_TIMEOUT_SECONDS = 60
+    # coding tasks are classified in micro-batches of up to this many tasks, at
+    # most this long after the first of them was queued. classifications are
+    # cached by description and skills
+    TASK_CLASSIFICATION_BATCH_SIZE = 20
+    TASK_CLASSIFICATION_WINDOW_SECONDS = 10
+    TASK_CLASSIFICATION_CACHE_TTL_SECONDS = 30 * 24 * 60 * 60
+    # tasks that could not be classified are queued again up to this many times
+    TASK_CLASSIFICATION_MAX_ATTEMPTS = 3
+
+    # outbound http calls, read timeouts are set per service above
+    HTTP_CLIENT_CONNECT_TIMEOUT_SECONDS = 3.05
+    HTTP_CLIENT_POOL_MAXSIZE = 10
+    # retries only apply to idempotent requests
+    HTTP_CLIENT_MAX_RETRIES = 2
+    HTTP_CLIENT_RETRY_BACKOFF_FACTOR = 0.3
+
+    # requests running more sql statements than their budget are logged
+    SQL_INSTRUMENTATION_ENABLED = True
+    SQL_QUERY_BUDGET = 50
+    # endpoint name to its own query budget
+    SQL_ENDPOINT_QUERY_BUDGETS = {}
+    SQL_SLOWEST_STATEMENTS_COUNT = 3
+
+    # adds a Server-Timing header to responses to admins, sampled requests' spans are logged as json
+    TRACING_ENABLED = True
+    TRACE_SAMPLE_RATE = 0.0
+    # adds the Server-Timing header to all responses, for debugging
+    SERVER_TIMING_ENABLED = False
 
     # this should only be used for testing
     USER_REGISTRATION_OVERRIDE_CODE = None
@@ -58,6 +127,12 @@ class Config(object):
     UPWORK_CONSUMER_SECRET = None
     UPWORK_BEEHIVE_COMPANY_ID = None
     UPWORK_CALLBACK_URL = None
+    # the upwork access token is refreshed when it expires within this time
+    UPWORK_TOKEN_REFRESH_MARGIN_SECONDS = 5 * 60
+    UPWORK_ORGANIZATION_ID_TTL_SECONDS = 24 * 60 * 60
+    UPWORK_API_RATE_LIMIT_PER_SECOND = 0.5
+    UPWORK_API_RATE_LIMIT_BURST = 5
+    UPWORK_BACKFILL_STATE_TTL_SECONDS = 7 * 24 * 60 * 60
 
     CUCKOO_START_DATE = datetime.date(2023, 1, 1)
 
@@ -96,6 +171,7 @@ class DevelopmentConfig(Config):
     INTER_SERVICE_AUTH_KEYS = ['abcdefghijklmnopqrstuvwxyz']
 
     UPWORK_LOCAL_MODE = True
+    SERVER_TIMING_ENABLED = True
     ROBOBEE_GRPC_SERVER_ADDRESS = 'localhost:50080'
     ROBOBEE_GRPC_OUTGOING_AUTH_KEY = 'fake-testing-robobee-key'
 
@@ -123,6 +199,16 @@ class TestingConfig(Config):
 
     MAX_MODIFICATION_REQUESTS_FOR_REVIEW_CHAIN = 1
 
+    PRAESEPE_RATINGS_CACHE_TTL_SECONDS = 0
+
+    USER_CACHE_TTL_SECONDS = 0
+
+    CATALOGUE_CACHE_TTL_SECONDS = 0
+
+    TASK_CLASSIFICATION_WINDOW_SECONDS = 0
+
+    RESPONSE_CACHE_ENABLED = False
+
     AWS_REGION_NAME = 'us-east-1'
 
     ROBOBEE_GRPC_SERVER_ADDRESS = 'localhost:50080'
@@ -0,0 +1,24 @@
+"""
+Gunicorn server hooks, loaded with `gunicorn --config app/gunicorn_config.py`
+"""
+import glob
+import os
+
+from prometheus_client import multiprocess
+
+
+def on_starting(server):
+    # metric files of workers from a previous run of the server are never cleaned
+    # up otherwise, and every scrape would keep reading them
+    multiproc_dir = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if not multiproc_dir:
+        return
+
+    for path in glob.glob(os.path.join(multiproc_dir, '*.db')):
+        os.remove(path)
+
+
+def child_exit(server, worker):
+    # remove the live gauge files of exited workers
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(worker.pid)
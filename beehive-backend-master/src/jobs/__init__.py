@@ -1,10 +1,22 @@
 from .task import *
 from .work import *
 from .upwork import *
+from .stats import *
+from .cuckoo import *
+from .user import *
+from .pollinator import *
 
 
 # schedule cron jobs
 find_deserted_work.cron('0 * * * *', 'beehive-find-deserted-work')
 find_past_reserved_work.cron('0 * * * *', 'beehive-find-past-reserved-work')
+rebuild_work_match_index_job.cron('30 * * * *', 'beehive-rebuild-work-match-index')
 find_net_duration_work_records.cron('0 1,13 * * *', 'beehive-find-net-duration-work-records')
+refresh_changed_contributor_stats.cron('45 1,13 * * *', 'beehive-refresh-changed-contributor-stats')
+refresh_changed_project_activity.cron('*/15 * * * *', 'beehive-refresh-changed-project-activity')
+deliver_cuckoo_outbox.cron('* * * * *', 'beehive-deliver-cuckoo-outbox')
+purge_cuckoo_outbox.cron('15 3 * * *', 'beehive-purge-cuckoo-outbox')
+purge_revoked_tokens.cron('45 3 * * *', 'beehive-purge-revoked-tokens')
+mirror_revoked_tokens_job.cron('*/10 * * * *', 'beehive-mirror-revoked-tokens')
+classify_pending_tasks.cron('*/5 * * * *', 'beehive-classify-pending-tasks')
 find_net_duration_cuckoo_accepted_tasks.cron('30 1 * * *', 'beehive-find-net-duration-cuckoo-accepted-tasks')
@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta
+import time
+
+from flask import current_app
+
+from ..logic.cuckoo_outbox import CUCKOO_OUTBOX_LOCK_KEY, deliver_cuckoo_outbox_batch, purge_delivered_cuckoo_events
+from ..utils.db import db
+from ..utils.metrics import deliver_cuckoo_outbox_exception, purge_cuckoo_outbox_exception
+from ..utils.rq import rq
+
+
+# runs on its own queue so a dedicated worker keeps delivering cuckoo events
+# while the other queues are busy
+@rq.job('cuckoo', timeout=300, result_ttl=3600)
+@deliver_cuckoo_outbox_exception.count_exceptions()
+def deliver_cuckoo_outbox():
+    # a single deliverer keeps the per-task event order
+    lock = rq.connection.lock(CUCKOO_OUTBOX_LOCK_KEY, timeout=300)
+    if not lock.acquire(blocking=False):
+        current_app.logger.info('cuckoo outbox is already being delivered')
+        return
+
+    try:
+        # keep polling the outbox until the next scheduled run
+        batch_size = current_app.config['CUCKOO_OUTBOX_BATCH_SIZE']
+        deadline = time.monotonic() + current_app.config['CUCKOO_OUTBOX_DRAIN_SECONDS']
+        while time.monotonic() < deadline:
+            fetched = deliver_cuckoo_outbox_batch(batch_size, deadline)
+            if fetched < batch_size:
+                time.sleep(current_app.config['CUCKOO_OUTBOX_POLL_INTERVAL_SECONDS'])
+    finally:
+        lock.release()
+
+
+@rq.job('low', timeout=900, result_ttl=3600)
+@purge_cuckoo_outbox_exception.count_exceptions()
+def purge_cuckoo_outbox():
+    before = datetime.utcnow() - timedelta(days=current_app.config['CUCKOO_OUTBOX_RETENTION_DAYS'])
+    purged_count = purge_delivered_cuckoo_events(before)
+    db.session.commit()
+
+    current_app.logger.info(f'purged {purged_count} cuckoo events delivered before {before}')
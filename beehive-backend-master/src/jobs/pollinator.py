@@ -1,8 +1,16 @@
 from flask import current_app
 
-import requests
-
-from ..utils.metrics import trigger_pollinator_exception
+from ..logic.pollinator import (
+    TASK_CLASSIFICATION_LOCK_KEY,
+    TASK_CLASSIFICATION_PENDING_KEY,
+    TASK_CLASSIFICATION_SCHEDULED_KEY,
+    classify_tasks,
+    finish_pending_task_classifications,
+    get_pending_task_classifications
+)
+from ..utils.db import db
+from ..utils.http_client import http_client
+from ..utils.metrics import classify_pending_tasks_exception, trigger_pollinator_exception
 from ..utils.rq import rq
 
 
@@ -14,7 +22,8 @@ def trigger_pollinator(url, payload):
     # send http request to pollinator url
     ALLOWED_STATUS_CODES = [200, 429]
     try:
-        res = requests.post(
+        res = http_client.post(
+            'pollinator',
             url=url,
             headers={'X-POLLINATOR-AUTH': current_app.config['OUTGOING_AUTH_TOKEN']},
             json=payload
@@ -22,4 +31,41 @@ def trigger_pollinator(url, payload):
         if res.status_code not in ALLOWED_STATUS_CODES:
             raise Exception(f'Error ({res.status_code}) {res.text} while trying to trigger polinator url {url} with param {payload} ')
     except Exception as e: 
-        current_app.logger.error(f'failed to trigger pollinator: {str(e)}')
\ No newline at end of file
+        current_app.logger.error(f'failed to trigger pollinator: {str(e)}')
+
+
+@rq.job('low', timeout=300, result_ttl=3600)
+@classify_pending_tasks_exception.count_exceptions()
+def classify_pending_tasks():
+    # a single classifier takes the pending tasks, a run that finds the lock
+    # taken leaves its tasks to the running classifier or the next scheduled run
+    lock = rq.connection.lock(TASK_CLASSIFICATION_LOCK_KEY, timeout=300)
+    if not lock.acquire(blocking=False):
+        current_app.logger.info('pending tasks are already being classified')
+        return
+
+    try:
+        # tasks queued from now on schedule a new run
+        rq.connection.delete(TASK_CLASSIFICATION_SCHEDULED_KEY)
+
+        # tasks queued again after failing are left to the next run
+        pending_count = rq.connection.llen(TASK_CLASSIFICATION_PENDING_KEY)
+        batch_size = current_app.config['TASK_CLASSIFICATION_BATCH_SIZE']
+        while pending_count > 0:
+            task_ids = get_pending_task_classifications(min(batch_size, pending_count))
+            if not task_ids:
+                break
+            pending_count -= len(task_ids)
+
+            try:
+                classified = classify_tasks(task_ids)
+            except Exception:
+                db.session.rollback()
+                finish_pending_task_classifications(task_ids, task_ids)
+                raise
+
+            unclassified_task_ids = [task_id for task_id in task_ids if task_id not in classified]
+            retried_task_ids = finish_pending_task_classifications(task_ids, unclassified_task_ids)
+            current_app.logger.info(f'classified {len(classified)} of {len(task_ids)} pending tasks, {len(retried_task_ids)} queued again')
+    finally:
+        lock.release()
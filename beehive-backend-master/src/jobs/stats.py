@@ -0,0 +1,116 @@
+from datetime import datetime
+
+from flask import current_app
+
+from ..logic.contributor_stats import (
+    clear_queued_contributor_stats_refresh,
+    find_changed_contributors,
+    get_contributor_stats_refreshed_until,
+    refresh_contributor_stats,
+    set_contributor_stats_refreshed_until
+)
+from ..logic.project_activity import (
+    clear_queued_project_activity_refresh,
+    find_changed_project_days,
+    get_project_activity_refreshed_until,
+    refresh_project_activity,
+    set_project_activity_refreshed_until
+)
+from ..utils.db import db
+from ..utils.metrics import (
+    refresh_contributor_stats_duration,
+    refresh_contributor_stats_exception,
+    refresh_contributor_stats_success,
+    refresh_contributors_stats_exception,
+    refresh_project_activity_exception,
+    refresh_projects_activity_exception
+)
+from ..utils.response_cache import invalidate_cached_responses
+from ..utils.rq import rq
+
+
+# number of contributors refreshed per transaction
+REFRESH_CONTRIBUTOR_STATS_CHUNK_SIZE = 100
+
+
+@rq.job('low', timeout=900, result_ttl=3600)
+@refresh_contributor_stats_exception.count_exceptions()
+@refresh_contributor_stats_duration.time()
+def refresh_changed_contributor_stats(full=False):
+    # take the new watermark before looking for changes so changes made while
+    # the job runs are picked up by the next run
+    refresh_started = datetime.utcnow()
+    # a full refresh rebuilds the stats of every contributor
+    refreshed_until = None if full else get_contributor_stats_refreshed_until()
+
+    user_ids = sorted(find_changed_contributors(refreshed_until))
+    current_app.logger.info(f'refreshing contributor stats of {len(user_ids)} contributors changed since {refreshed_until}')
+
+    for i in range(0, len(user_ids), REFRESH_CONTRIBUTOR_STATS_CHUNK_SIZE):
+        chunk_user_ids = user_ids[i:i + REFRESH_CONTRIBUTOR_STATS_CHUNK_SIZE]
+        project_ids = refresh_contributor_stats(chunk_user_ids)
+        db.session.commit()
+
+        # responses cached before the refresh hold the old stats
+        invalidate_cached_responses(project_ids, chunk_user_ids)
+
+    set_contributor_stats_refreshed_until(refresh_started)
+
+    # increase refresh contributor stats success counter
+    refresh_contributor_stats_success.inc()
+
+
+@rq.job('low', timeout=300, result_ttl=3600)
+@refresh_contributors_stats_exception.count_exceptions()
+def refresh_contributors_stats(user_ids):
+    """
+    Refresh the contributor stats of users whose work changed, queued by the
+    work endpoints through queue_work_contributor_stats_refresh
+    """
+    clear_queued_contributor_stats_refresh(user_ids)
+
+    project_ids = refresh_contributor_stats(user_ids)
+    db.session.commit()
+
+    # responses cached by the endpoint that queued the refresh may hold old stats
+    invalidate_cached_responses(project_ids, user_ids)
+
+
+@rq.job('low', timeout=900, result_ttl=3600)
+@refresh_project_activity_exception.count_exceptions()
+def refresh_changed_project_activity(full=False):
+    # take the new watermark before looking for changes so changes made while
+    # the job runs are picked up by the next run
+    refresh_started = datetime.utcnow()
+    # a full refresh rebuilds the activity of every project
+    refreshed_until = None if full else get_project_activity_refreshed_until()
+
+    # only the days changes may have affected are recomputed
+    project_days = find_changed_project_days(refreshed_until)
+    current_app.logger.info(f'refreshing activity of {len(project_days)} projects changed since {refreshed_until}')
+
+    for project_id, (start_date, end_date) in sorted(project_days.items()):
+        refresh_project_activity([project_id], start_date, end_date)
+        db.session.commit()
+
+        # responses cached before the refresh hold the old activity, including older days
+        invalidate_cached_responses([project_id])
+
+    set_project_activity_refreshed_until(refresh_started)
+
+
+@rq.job('low', timeout=300, result_ttl=3600)
+@refresh_projects_activity_exception.count_exceptions()
+def refresh_projects_activity(project_ids):
+    """
+    Refresh today's activity of projects whose tasks changed, queued by the task
+    and work endpoints through queue_task_project_activity_refresh
+    """
+    clear_queued_project_activity_refresh(project_ids)
+
+    today = datetime.utcnow().date()
+    refresh_project_activity(project_ids, today, today)
+    db.session.commit()
+
+    # responses cached by the endpoint that queued the refresh may hold old activity
+    invalidate_cached_responses(project_ids)
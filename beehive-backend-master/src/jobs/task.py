@@ -1,30 +1,28 @@
 from flask import current_app
+from sqlalchemy.orm import selectinload
 
 from ..logic.work_mappers.code_qa import CodeQAMapper
-from ..logic.pollinator import get_task_type_classification
+from ..logic.pollinator import queue_task_classification
+from ..logic.work_matching import index_work
 from ..models.task import Task, TaskStatus, TaskType
 from ..models.work import Work, WorkStatus
 from ..utils.db import db
 from ..utils.metrics import (
+    task_prepare_cuckoo_batch_duration,
+    task_prepare_cuckoo_batch_exception,
     task_prepare_cuckoo_duration,
     task_prepare_cuckoo_exception,
     task_prepare_cuckoo_success
 )
 from ..utils.rq import rq
+from ..utils.slack_bot import notify_new_task_descriptions
 
 
-@rq.job('high', timeout=900, result_ttl=3600)
-@task_prepare_cuckoo_exception.count_exceptions()
-@task_prepare_cuckoo_duration.time()
-def prepare_cuckoo_task(task_id):
-    current_app.logger.info(f'preparing cuckoo task {task_id}')
-
-    # find task
-    task = Task.query.filter_by(id=task_id, status=TaskStatus.NEW).first()
-    if not task:
-        raise Exception('task not found')
-
-    # task is ready to be worked on
+def _create_cuckoo_work(task):
+    """
+    Make a new cuckoo task ready to be worked on and add its work item. Caller
+    must index the work item and commit
+    """
     task.status = TaskStatus.PENDING
 
     chain = []
@@ -48,15 +46,64 @@ def prepare_cuckoo_task(task_id):
     )
     db.session.add(work)
 
-    # get task type classification label (exclude follow up tasks)
-    if task.task_type == TaskType.CUCKOO_CODING:
-        try:
-            get_task_type_classification(task.id, task.description, task.skills)
-        except Exception as e:
-            current_app.logger.error(f'error while trying to get task type classification: {str(e)}')
+    return work
+
 
+def _classified_task_ids(tasks):
+    # task type classification labels are only for coding tasks (exclude follow up tasks)
+    return [task.id for task in tasks if task.task_type == TaskType.CUCKOO_CODING]
 
+
+@rq.job('high', timeout=900, result_ttl=3600)
+@task_prepare_cuckoo_exception.count_exceptions()
+@task_prepare_cuckoo_duration.time()
+def prepare_cuckoo_task(task_id):
+    current_app.logger.info(f'preparing cuckoo task {task_id}')
+
+    # find task
+    task = Task.query.filter_by(id=task_id, status=TaskStatus.NEW).first()
+    if not task:
+        raise Exception('task not found')
+
+    work = _create_cuckoo_work(task)
+    index_work(work)
     db.session.commit()
 
+    # the task is classified later, in a micro-batch with other new tasks
+    queue_task_classification(_classified_task_ids([task]))
+
     # increase task prepare cuckoo success counter
     task_prepare_cuckoo_success.inc()
+
+
+@rq.job('high', timeout=900, result_ttl=3600)
+@task_prepare_cuckoo_batch_exception.count_exceptions()
+@task_prepare_cuckoo_batch_duration.time()
+def prepare_cuckoo_tasks(task_ids):
+    """
+    Prepare a batch of cuckoo tasks created together, and notify their new
+    descriptions in a single slack message
+    """
+    current_app.logger.info(f'preparing {len(task_ids)} cuckoo tasks')
+
+    tasks = Task.query \
+        .filter(Task.id.in_(task_ids), Task.status == TaskStatus.NEW) \
+        .options(selectinload(Task.tags), selectinload(Task.skills)) \
+        .all()
+    tasks.sort(key=lambda task: task_ids.index(task.id))
+
+    missing_task_ids = set(task_ids) - {task.id for task in tasks}
+    if missing_task_ids:
+        current_app.logger.error(f'cuckoo tasks not found: {", ".join(sorted(missing_task_ids))}')
+
+    works = [_create_cuckoo_work(task) for task in tasks]
+    db.session.flush()
+    for work in works:
+        index_work(work)
+    db.session.commit()
+
+    queue_task_classification(_classified_task_ids(tasks))
+    notify_new_task_descriptions(tasks)
+
+    # increase task prepare cuckoo success counter
+    task_prepare_cuckoo_success.inc(len(tasks))
@@ -3,7 +3,7 @@ from datetime import datetime, timedelta
 from sqlalchemy.sql import label
 
 from ..utils.db import db
-from ..utils.metrics import find_net_duration_work_records_exception, find_net_duration_work_records_success, find_net_duration_work_records_duration, find_net_duration_cuckoo_accepted_tasks_exception, find_net_duration_cuckoo_accepted_tasks_success, find_net_duration_cuckoo_accepted_tasks_duration
+from ..utils.metrics import backfill_upwork_diaries_exception, find_net_duration_work_records_exception, find_net_duration_work_records_success, find_net_duration_work_records_duration, find_net_duration_cuckoo_accepted_tasks_exception, find_net_duration_cuckoo_accepted_tasks_success, find_net_duration_cuckoo_accepted_tasks_duration
 from ..utils.rq import rq
 from ..utils.upwork import save_upwork_diaries, update_work_records_net_duration
 
@@ -13,6 +13,12 @@ from ..models.work_record import WorkRecord
 from ..models.upwork import WorkRecordUpworkDiary
 
 from ..logic.cuckoo import CuckooEvent, dispatch_cuckoo_event
+from ..logic.upwork_backfill import UpworkBackfillStatus, get_pending_backfill_days, set_upwork_backfill_day, set_upwork_backfill_status, upwork_backfill_lock
+
+
+# a backfill runs for up to an hour, after which it may be resumed
+BACKFILL_UPWORK_DIARIES_TIMEOUT_SECONDS = 3600
+
 
 @rq.job('low', timeout=900, result_ttl=3600)
 @find_net_duration_work_records_exception.count_exceptions()
@@ -32,6 +38,56 @@ def find_net_duration_work_records():
     find_net_duration_work_records_success.inc()
 
 
+@rq.job('low', timeout=BACKFILL_UPWORK_DIARIES_TIMEOUT_SECONDS, result_ttl=3600)
+@backfill_upwork_diaries_exception.count_exceptions()
+def backfill_upwork_diaries(backfill_id):
+    lock = upwork_backfill_lock(backfill_id, timeout=BACKFILL_UPWORK_DIARIES_TIMEOUT_SECONDS)
+    if not lock.acquire(blocking=False):
+        current_app.logger.info(f'upwork backfill {backfill_id} is already running')
+        return
+
+    try:
+        _backfill_upwork_diaries(backfill_id)
+    finally:
+        lock.release()
+
+
+def _backfill_upwork_diaries(backfill_id):
+    # days completed by a previous run are skipped, so a failed or timed out backfill can be queued again
+    days = get_pending_backfill_days(backfill_id)
+    set_upwork_backfill_status(backfill_id, UpworkBackfillStatus.RUNNING)
+
+    failed_days = 0
+    for day in days:
+        set_upwork_backfill_day(backfill_id, day, UpworkBackfillStatus.RUNNING)
+        try:
+            upwork_diaries = save_upwork_diaries(day)
+            if upwork_diaries:
+                update_work_records_net_duration(upwork_diaries)
+        except Exception as ex:
+            db.session.rollback()
+            current_app.logger.exception(f'failed backfilling upwork diaries of {day} in backfill {backfill_id}')
+            set_upwork_backfill_day(backfill_id, day, UpworkBackfillStatus.FAILED, error=str(ex))
+            failed_days += 1
+            continue
+
+        if upwork_diaries is None:
+            set_upwork_backfill_day(backfill_id, day, UpworkBackfillStatus.FAILED, error='fetching upwork diaries failed')
+            failed_days += 1
+        else:
+            set_upwork_backfill_day(backfill_id, day, UpworkBackfillStatus.COMPLETE, diaries=len(upwork_diaries))
+
+        # the diaries of past days are not needed anymore
+        db.session.expunge_all()
+
+    if failed_days:
+        set_upwork_backfill_status(backfill_id, UpworkBackfillStatus.FAILED, error=f'{failed_days} days failed')
+    else:
+        set_upwork_backfill_status(backfill_id, UpworkBackfillStatus.COMPLETE)
+
+    current_app.logger.info(f'upwork backfill {backfill_id} processed {len(days)} days, {failed_days} failed')
+
+
 @rq.job('low', timeout=900, result_ttl=3600)
 @find_net_duration_cuckoo_accepted_tasks_exception.count_exceptions()
 @find_net_duration_cuckoo_accepted_tasks_duration.time()
@@ -0,0 +1,28 @@
+from flask import current_app
+
+from ..utils.db import db
+from ..utils.jwt import mirror_revoked_tokens, purge_expired_revoked_tokens
+from ..utils.metrics import mirror_revoked_tokens_exception, purge_revoked_tokens_exception
+from ..utils.rq import rq
+
+
+@rq.job('low', timeout=900, result_ttl=3600)
+@purge_revoked_tokens_exception.count_exceptions()
+def purge_revoked_tokens():
+    purged_count = purge_expired_revoked_tokens()
+    db.session.commit()
+
+    # re-mirror the remaining tokens in case redis lost them
+    mirrored_count = mirror_revoked_tokens()
+
+    current_app.logger.info(f'purged {purged_count} expired revoked tokens, mirrored {mirrored_count} revoked tokens to redis')
+
+
+@rq.job('low', timeout=300, result_ttl=3600)
+@mirror_revoked_tokens_exception.count_exceptions()
+def mirror_revoked_tokens_job():
+    # renews the mirrored flag before it expires, and restores revoked tokens
+    # redis lost since the last run
+    mirrored_count = mirror_revoked_tokens()
+
+    current_app.logger.info(f'mirrored {mirrored_count} revoked tokens to redis')
@@ -4,13 +4,15 @@ from flask import current_app
 from sqlalchemy.orm import joinedload
 
 
-from ..logic.cuckoo import CuckooEvent, dispatch_cuckoo_event
+from ..logic.cuckoo import CuckooEvent
+from ..logic.cuckoo_outbox import queue_cuckoo_event
+from ..logic.work_matching import index_work, rebuild_work_match_index
 from ..models.user import User
 from ..models.task import Task, TaskStatus, TaskType
 from ..models.work import Work, WorkStatus
 from ..models.work_record import WorkRecord
 from ..utils.db import db
-from ..utils.metrics import find_deserted_work_exception, find_past_reserved_work_exception, find_pre_deserted_work_exception
+from ..utils.metrics import find_deserted_work_exception, find_past_reserved_work_exception, find_pre_deserted_work_exception, rebuild_work_match_index_exception
 from ..utils.rq import rq
 from ..utils.email import send_contributor_work_deserted_email, send_work_deserted_email, send_contributor_work_pre_deserted_email
 
@@ -42,6 +44,7 @@ def find_deserted_work():
         deserted.active = False
         deserted.duration_seconds = deserted_seconds
         deserted.work.status = WorkStatus.AVAILABLE
+        index_work(deserted.work)
 
         # if the task has no completed work set its status back to pending
         task_completed_work = Work.query \
@@ -50,15 +53,14 @@ def find_deserted_work():
         if not task_completed_work:
             deserted.work.task.status = TaskStatus.PENDING
 
-        success = True
         contributor = deserted.user
 
         if deserted.work.task.task_type in (TaskType.CUCKOO_CODING, ):
             current_app.logger.info('notifying cuckoo service about deserted work')
-            
+
             github_user = contributor.github_user
 
-            res = dispatch_cuckoo_event(
+            queue_cuckoo_event(
                 deserted.work.task.id, 
                 {
                     'eventType': CuckooEvent.WORK_DESERTED.name,
@@ -67,16 +69,11 @@ def find_deserted_work():
                     'githubUser': github_user
                 }
             )
-            if not res:
-                success = False
-                db.session.rollback()
-                current_app.logger.error(f'error while notifying cuckoo about deserted work {deserted.work.id} deserted by user {deserted.user_id}')
 
-        if success:
-            send_work_deserted_email(deserted.work.task.delegating_user_id, deserted)
-            send_contributor_work_deserted_email(contributor, deserted.work)
+        send_work_deserted_email(deserted.work.task.delegating_user_id, deserted)
+        send_contributor_work_deserted_email(contributor, deserted.work)
 
-            db.session.commit()
+        db.session.commit()
 
 
 @rq.job('low', timeout=900, result_ttl=3600)
@@ -119,20 +116,26 @@ def find_past_reserved_work():
         current_app.logger.info(f'found work {past_reserved.id} reserved to user {past_reserved.reserved_worker_id} overdue {past_reservation_minutes} minutes')
 
         # cancel reservation
+        reserved_worker_id = past_reserved.reserved_worker_id
         past_reserved.reserved_worker_id = None
         past_reserved.reserved_until_epoch_ms = None
 
         if past_reserved.task.task_type in (TaskType.CUCKOO_CODING, ):
             current_app.logger.info('notifying cuckoo service about dismissed work')
-            
-            res = dispatch_cuckoo_event(
+
+            queue_cuckoo_event(
                 past_reserved.task.id, 
                 {
                     'eventType': CuckooEvent.WORK_DISMISSED.name,
-                    'user': past_reserved.reserved_worker_id
+                    'user': reserved_worker_id
                 }
             )
-            if not res:
-                current_app.logger.error(f'error while notifying cuckoo about dismissed work {past_reserved.id} from user {past_reserved.reserved_worker_id}')
 
-        db.session.commit()
\ No newline at end of file
+        db.session.commit()
+
+
+@rq.job('low', timeout=900, result_ttl=3600)
+@rebuild_work_match_index_exception.count_exceptions()
+def rebuild_work_match_index_job():
+    indexed_count, dropped_count = rebuild_work_match_index()
+    current_app.logger.info(f'work match index rebuilt, indexed {indexed_count} and dropped {dropped_count} entries')
@@ -2,6 +2,8 @@ import requests
 
 from flask import current_app
 
+from ..utils.http_client import http_client
+
 def beehave_review_pr(pr_url: str, work_description: str, previous_pr_sha: str = None):
     ALLOWED_STATUS_CODES = [200, 429]
     payload = {
@@ -12,11 +14,17 @@ def beehave_review_pr(pr_url: str, work_description: str, previous_pr_sha: str =
         }
     }
 
-    res = requests.post(
-        url=f'{current_app.config["POLLINATOR_BEEHAVE_BASE_URL"]}/api/v1/predict',
-        headers={'X-POLLINATOR-AUTH': current_app.config['OUTGOING_AUTH_TOKEN']},
-        json=payload
-    )
+    try:
+        res = http_client.post(
+            'pollinator',
+            url=f'{current_app.config["POLLINATOR_BEEHAVE_BASE_URL"]}/api/v1/predict',
+            headers={'X-POLLINATOR-AUTH': current_app.config['OUTGOING_AUTH_TOKEN']},
+            json=payload
+        )
+    except requests.RequestException as ex:
+        current_app.logger.error(f'Error in requesting review from Beehave: {str(ex)}')
+        return 500, ''
+
     if res.status_code != 200:
         current_app.logger.error(f'Error in requesting review from Beehave: {res.text}')
         return res.status_code if res.status_code in ALLOWED_STATUS_CODES else 500, ''
@@ -0,0 +1,386 @@
+from datetime import datetime
+
+from flask import current_app
+from redis import RedisError
+from sqlalchemy.dialects.mysql import insert
+from sqlalchemy.sql import and_, case, label, or_
+
+from ..models.contributor_stats import ContributorStats
+from ..models.tag import Tag, TaskTag
+from ..models.task import Task, TaskStatus
+from ..models.upwork import UpworkDiary, WorkRecordUpworkDiary
+from ..models.work import Work, WorkStatus, WorkType
+from ..models.work_record import WorkOutcome, WorkRecord
+from ..utils.db import db
+from ..utils.rq import rq
+
+
+# redis key holding the time up to which the refresh job processed changes
+CONTRIBUTOR_STATS_REFRESHED_UNTIL_KEY = 'beehive:contributor-stats:refreshed-until'
+# set while a refresh of a contributor's stats is queued and not started yet
+CONTRIBUTOR_STATS_QUEUED_KEY_PREFIX = 'beehive:contributor-stats:queued:'
+# a queued refresh that was lost stops blocking new ones once its flag expires
+CONTRIBUTOR_STATS_QUEUED_TTL_SECONDS = 60
+
+# work records with durations above this value are considered corrupt
+MAX_VALID_DURATION_SECONDS = 999999999
+
+# aggregated columns of the contributor stats rows
+STATS_COLUMNS = [
+    column for column in ContributorStats.__table__.columns.keys()
+    if column not in ('id', 'user_id', 'project_id', 'project_key', 'created', 'updated')
+]
+
+
+def _filter_project(query, project_id):
+    if project_id is None:
+        return query
+
+    return query.filter(Task.tags.any(TaskTag.tag_id == project_id))
+
+
+def _aggregate_contributor_stats(user_ids, project_id=None):
+    """
+    Aggregate the statistics of a set of users, optionally limited to the tasks
+    of a single project, using a constant number of grouped queries
+    Returns:
+        Dictionary of user id to a dictionary of contributor stats column values,
+        only for users with any work records or reserved work
+    """
+    aggregates = {}
+
+    def user_aggregates(user_id):
+        return aggregates.setdefault(user_id, {})
+
+    # latest active work record of each user
+    active_work_records = _filter_project(
+        db.session.query(WorkRecord.user_id, WorkRecord.work_id) \
+            .join(Work, Work.id == WorkRecord.work_id) \
+            .join(Task, Work.task_id == Task.id) \
+            .filter(WorkRecord.active == True) \
+            .filter(WorkRecord.user_id.in_(user_ids)),
+        project_id
+    ) \
+        .order_by(WorkRecord.id.desc()) \
+        .all()
+    for user_id, work_id in active_work_records:
+        user_aggregates(user_id).setdefault('active_work_id', work_id)
+
+    # work record counts per outcome, work status and task status
+    work_record_counts = _filter_project(
+        db.session.query(
+            WorkRecord.user_id,
+            label('total', db.func.count()),
+            label('distinct_works', db.func.count(db.func.distinct(WorkRecord.work_id))),
+            label('completed', db.func.sum(case((Work.status == WorkStatus.COMPLETE, 1), else_=0))),
+            label('skipped', db.func.sum(case((WorkRecord.outcome == WorkOutcome.SKIPPED, 1), else_=0))),
+            label('in_review', db.func.sum(case((and_(
+                Work.work_type.in_([WorkType.REVIEW_TASK, WorkType.CUCKOO_ITERATION]),
+                Task.status == TaskStatus.IN_PROCESS
+            ), 1), else_=0)))
+        ) \
+            .join(Work, Work.id == WorkRecord.work_id) \
+            .join(Task, Work.task_id == Task.id) \
+            .filter(WorkRecord.user_id.in_(user_ids)),
+        project_id
+    ) \
+        .group_by(WorkRecord.user_id) \
+        .all()
+    for r in work_record_counts:
+        user_aggregates(r.user_id).update({
+            'total_works': r.total,
+            'distinct_works': r.distinct_works,
+            'completed_works': int(r.completed),
+            'skipped_works': int(r.skipped),
+            'works_in_review': int(r.in_review)
+        })
+
+    # reserved work counts. this is how we look at cancelled records currently
+    reserved_work_counts = _filter_project(
+        db.session.query(
+            Work.reserved_worker_id,
+            label('available', db.func.sum(case((Work.status == WorkStatus.AVAILABLE, 1), else_=0))),
+            label('open', db.func.sum(case((and_(
+                Work.status == WorkStatus.AVAILABLE,
+                Task.status.in_([TaskStatus.PENDING, TaskStatus.MODIFICATIONS_REQUESTED, TaskStatus.IN_PROCESS])
+            ), 1), else_=0))),
+            label('in_review', db.func.sum(case((and_(
+                Task.status.in_([TaskStatus.SOLVED, TaskStatus.INVALID]),
+                Task.created > current_app.config['CUCKOO_START_DATE']
+            ), 1), else_=0))),
+            label('cancelled', db.func.sum(case((Task.status == TaskStatus.CANCELLED, 1), else_=0)))
+        ) \
+            .join(Task, Work.task_id == Task.id) \
+            .filter(Work.reserved_worker_id.in_(user_ids)),
+        project_id
+    ) \
+        .group_by(Work.reserved_worker_id) \
+        .all()
+    for r in reserved_work_counts:
+        user_aggregates(r.reserved_worker_id).update({
+            'reserved_works': int(r.available),
+            'reserved_open_works': int(r.open),
+            'reserved_works_in_review': int(r.in_review),
+            'cancelled_works': int(r.cancelled)
+        })
+
+    # first, last and last non-skipped work records of each user
+    boundary_ids = _filter_project(
+        db.session.query(
+            WorkRecord.user_id,
+            label('first_id', db.func.min(WorkRecord.id)),
+            label('last_id', db.func.max(WorkRecord.id)),
+            label('last_work_id', db.func.max(case(
+                (or_(WorkRecord.outcome.notin_([WorkOutcome.SKIPPED]), WorkRecord.outcome.is_(None)), WorkRecord.id),
+                else_=None
+            )))
+        ) \
+            .join(Work, Work.id == WorkRecord.work_id) \
+            .join(Task, Work.task_id == Task.id) \
+            .filter(WorkRecord.user_id.in_(user_ids)),
+        project_id
+    ) \
+        .group_by(WorkRecord.user_id) \
+        .all()
+    boundary_record_ids = set(i for r in boundary_ids for i in (r.first_id, r.last_id, r.last_work_id) if i is not None)
+    boundary_records = {}
+    if boundary_record_ids:
+        boundary_records = {
+            r.id: r for r in db.session.query(WorkRecord.id, WorkRecord.start_time_epoch_ms, WorkRecord.duration_seconds) \
+                .filter(WorkRecord.id.in_(boundary_record_ids)) \
+                .all()
+        }
+    for r in boundary_ids:
+        first_record = boundary_records.get(r.first_id)
+        last_record = boundary_records.get(r.last_id)
+        last_work_record = boundary_records.get(r.last_work_id)
+        user_aggregates(r.user_id).update({
+            'first_work_start_time_epoch_ms': first_record and first_record.start_time_epoch_ms,
+            'last_engagement_start_time_epoch_ms': last_record and last_record.start_time_epoch_ms,
+            'last_engagement_duration_seconds': last_record and last_record.duration_seconds,
+            'last_work_start_time_epoch_ms': last_work_record and last_work_record.start_time_epoch_ms,
+            'last_work_duration_seconds': last_work_record and last_work_record.duration_seconds
+        })
+
+    # gross duration sum and number of worked on work items
+    gross_stats = _filter_project(
+        db.session.query(
+            WorkRecord.user_id,
+            label('work_count', db.func.count(db.func.distinct(WorkRecord.work_id))),
+            label('duration_seconds', db.func.sum(WorkRecord.duration_seconds))
+        ) \
+            .join(Work, Work.id == WorkRecord.work_id) \
+            .join(Task, Work.task_id == Task.id) \
+            .filter(WorkRecord.user_id.in_(user_ids)) \
+            .filter(and_(WorkRecord.duration_seconds != None, WorkRecord.duration_seconds < MAX_VALID_DURATION_SECONDS)),
+        project_id
+    ) \
+        .group_by(WorkRecord.user_id) \
+        .all()
+    for r in gross_stats:
+        user_aggregates(r.user_id).update({
+            'gross_duration_works': r.work_count,
+            'gross_duration_seconds': int(r.duration_seconds)
+        })
+
+    # upwork net duration and cost sums
+    upwork_stats = _filter_project(
+        db.session.query(
+            WorkRecord.user_id,
+            label('diary_count', db.func.count()),
+            label('net_duration_seconds', db.func.sum(WorkRecordUpworkDiary.net_duration_seconds)),
+            label('cost', db.func.sum(db.func.coalesce(WorkRecordUpworkDiary.cost, 0)))
+        ) \
+            .join(WorkRecord, WorkRecordUpworkDiary.work_record_id == WorkRecord.id) \
+            .join(Work, Work.id == WorkRecord.work_id) \
+            .join(Task, Work.task_id == Task.id) \
+            .filter(WorkRecord.user_id.in_(user_ids)) \
+            .filter(WorkRecordUpworkDiary.net_duration_seconds != None),
+        project_id
+    ) \
+        .group_by(WorkRecord.user_id) \
+        .all()
+    for r in upwork_stats:
+        user_aggregates(r.user_id).update({
+            'upwork_diary_count': r.diary_count,
+            'net_duration_seconds': int(r.net_duration_seconds),
+            'cost': r.cost
+        })
+
+    return aggregates
+
+
+def _get_user_project_ids(user_ids):
+    """
+    Get the ids of the projects each of the users worked on or has work reserved in
+    """
+    worked_on = db.session.query(WorkRecord.user_id, TaskTag.tag_id) \
+        .join(Work, Work.id == WorkRecord.work_id) \
+        .join(TaskTag, TaskTag.task_id == Work.task_id) \
+        .join(Tag, Tag.id == TaskTag.tag_id) \
+        .filter(WorkRecord.user_id.in_(user_ids)) \
+        .filter(Tag.name.startswith('project:')) \
+        .distinct()
+
+    reserved = db.session.query(Work.reserved_worker_id, TaskTag.tag_id) \
+        .join(TaskTag, TaskTag.task_id == Work.task_id) \
+        .join(Tag, Tag.id == TaskTag.tag_id) \
+        .filter(Work.reserved_worker_id.in_(user_ids)) \
+        .filter(Tag.name.startswith('project:')) \
+        .distinct()
+
+    project_ids = {}
+    for user_id, project_id in worked_on.union(reserved).all():
+        project_ids.setdefault(project_id, set()).add(user_id)
+
+    return project_ids
+
+
+def _save_contributor_stats(user_ids, project_id, aggregates, keep_empty):
+    """
+    Upsert the contributor stats rows of users with a single statement, so
+    concurrent refreshes of a user update the same row
+    """
+    project_key = ContributorStats.project_key_of(project_id)
+
+    if not keep_empty:
+        empty_user_ids = [user_id for user_id in user_ids if not aggregates.get(user_id)]
+        if empty_user_ids:
+            ContributorStats.query \
+                .filter(ContributorStats.user_id.in_(empty_user_ids)) \
+                .filter(ContributorStats.project_key == project_key) \
+                .delete(synchronize_session=False)
+
+    now = datetime.utcnow()
+    rows = []
+    for user_id in user_ids:
+        values = aggregates.get(user_id)
+        if not values and not keep_empty:
+            continue
+
+        # reset all values so stale aggregates are not kept around
+        fresh_stats = ContributorStats(user_id, project_id)
+        row = {column: (values or {}).get(column, getattr(fresh_stats, column)) for column in STATS_COLUMNS}
+        # make sure the updated timestamp changes even if no values did
+        row.update(user_id=user_id, project_id=project_id, created=now, updated=now)
+        rows.append(row)
+
+    if not rows:
+        return
+
+    stmt = insert(ContributorStats).values(rows)
+    stmt = stmt.on_duplicate_key_update({column: stmt.inserted[column] for column in STATS_COLUMNS + ['updated']})
+    db.session.execute(stmt)
+
+
+def refresh_contributor_stats(user_ids):
+    """
+    Recompute the contributor stats rollup rows of the given users, across all
+    projects and for each project they worked on. Caller of the method must
+    call db.session.commit() for the changes to be saved to database
+    Arguments:
+        user_ids - ids of the users to refresh
+    Returns:
+        Set of the ids of the projects whose contributor stats were refreshed
+    """
+    user_ids = list(set(user_ids))
+    if not user_ids:
+        return set()
+
+    _save_contributor_stats(user_ids, None, _aggregate_contributor_stats(user_ids), keep_empty=True)
+
+    # drop project rows of projects users are no longer related to
+    project_user_ids = _get_user_project_ids(user_ids)
+    ContributorStats.query \
+        .filter(ContributorStats.user_id.in_(user_ids)) \
+        .filter(ContributorStats.project_key != ContributorStats.project_key_of(None)) \
+        .filter(ContributorStats.project_id.notin_(list(project_user_ids.keys()) or [-1])) \
+        .delete(synchronize_session=False)
+
+    for project_id, project_users in project_user_ids.items():
+        project_users = list(project_users)
+        _save_contributor_stats(
+            project_users,
+            project_id,
+            _aggregate_contributor_stats(project_users, project_id),
+            keep_empty=False
+        )
+
+    return set(project_user_ids.keys())
+
+
+def queue_work_contributor_stats_refresh(work, *user_ids):
+    """
+    Queue a refresh of the contributor stats of the users involved in a work
+    item. Users whose refresh is already queued and not started yet are not
+    queued again. Never raises so a stats failure does not fail the calling
+    request, stats missed this way are refreshed by refresh_changed_contributor_stats
+    """
+    user_ids = sorted(set(u for u in user_ids + (work.reserved_worker_id, ) if u))
+    if not user_ids:
+        return
+
+    try:
+        pipeline = rq.connection.pipeline(transaction=False)
+        for user_id in user_ids:
+            pipeline.set(f'{CONTRIBUTOR_STATS_QUEUED_KEY_PREFIX}{user_id}', 1, nx=True, ex=CONTRIBUTOR_STATS_QUEUED_TTL_SECONDS)
+        user_ids = [user_id for user_id, queued in zip(user_ids, pipeline.execute()) if queued]
+
+        if user_ids:
+            from ..jobs.stats import refresh_contributors_stats
+            refresh_contributors_stats.queue(user_ids)
+    except RedisError as e:
+        current_app.logger.error(f'failed to queue contributor stats refresh of work {work.id}: {str(e)}')
+
+
+def clear_queued_contributor_stats_refresh(user_ids):
+    """
+    Let refreshes of the users' contributor stats be queued again, called when
+    a queued refresh starts so changes made while it runs are not missed
+    """
+    rq.connection.delete(*[f'{CONTRIBUTOR_STATS_QUEUED_KEY_PREFIX}{user_id}' for user_id in user_ids])
+
+
+def find_changed_contributors(since):
+    """
+    Find the users whose work records, reserved work, related tasks or upwork
+    diaries changed since a given time
+    Arguments:
+        since - datetime to look for changes from. when None all users with any
+        work records or reserved work are returned
+    Returns:
+        Set of user ids
+    """
+    def changed(model):
+        if since is None:
+            return True
+        return db.func.coalesce(model.updated, model.created) >= since
+
+    work_record_users = db.session.query(WorkRecord.user_id) \
+        .join(Work, Work.id == WorkRecord.work_id) \
+        .join(Task, Work.task_id == Task.id) \
+        .filter(or_(changed(WorkRecord), changed(Work), changed(Task))) \
+        .distinct()
+
+    reserved_work_users = db.session.query(Work.reserved_worker_id) \
+        .join(Task, Work.task_id == Task.id) \
+        .filter(Work.reserved_worker_id != None) \
+        .filter(or_(changed(Work), changed(Task))) \
+        .distinct()
+
+    upwork_diary_users = db.session.query(WorkRecord.user_id) \
+        .join(WorkRecordUpworkDiary, WorkRecordUpworkDiary.work_record_id == WorkRecord.id) \
+        .join(UpworkDiary, UpworkDiary.id == WorkRecordUpworkDiary.upwork_diary_id) \
+        .filter(changed(UpworkDiary)) \
+        .distinct()
+
+    return set(r[0] for r in work_record_users.union(reserved_work_users, upwork_diary_users).all())
+
+
+def get_contributor_stats_refreshed_until():
+    value = rq.connection.get(CONTRIBUTOR_STATS_REFRESHED_UNTIL_KEY)
+    return datetime.fromisoformat(value.decode()) if value else None
+
+
+def set_contributor_stats_refreshed_until(until):
+    rq.connection.set(CONTRIBUTOR_STATS_REFRESHED_UNTIL_KEY, until.isoformat())
@@ -3,6 +3,8 @@ import requests
 
 from flask import current_app
 
+from ..utils.http_client import http_client
+
 class CuckooEvent(int, enum.Enum):
     WORK_ACCEPTED = 1
     WORK_SOLVED = 2
@@ -18,14 +20,19 @@ class CuckooEvent(int, enum.Enum):
     QUEST_DELEGATED = 14
 
 def dispatch_cuckoo_event(task_id, event):
-    res = requests.post(
-        url=f'{current_app.config["CUCKOO_BASE_URL"]}/api/notification',
-        headers={'X-CUCKOO-AUTH': current_app.config['CUCKOO_AUTH_TOKEN']},
-        json={
-            'taskId': task_id,
-            'event': event
-        }
-    )
+    try:
+        res = http_client.post(
+            'cuckoo',
+            url=f'{current_app.config["CUCKOO_BASE_URL"]}/api/notification',
+            headers={'X-CUCKOO-AUTH': current_app.config['CUCKOO_AUTH_TOKEN']},
+            json={
+                'taskId': task_id,
+                'event': event
+            }
+        )
+    except requests.RequestException as ex:
+        current_app.logger.error(f'Error while notifying cuckoo service {str(ex)}')
+        return False
 
     if res.status_code != 200:
         current_app.logger.error(f'Error while notifying cuckoo service {res.text}')
@@ -33,13 +40,18 @@ def dispatch_cuckoo_event(task_id, event):
     return True
 
 def get_trello_card_link(task_ids):
-    res = requests.post(
-        url=f'{current_app.config["CUCKOO_BASE_URL"]}/api/v1/task',
-        headers={'X-CUCKOO-AUTH': current_app.config['CUCKOO_AUTH_TOKEN']},
-        json={
-            'task_ids': task_ids
-        }
-    )
+    try:
+        res = http_client.post(
+            'cuckoo',
+            url=f'{current_app.config["CUCKOO_BASE_URL"]}/api/v1/task',
+            headers={'X-CUCKOO-AUTH': current_app.config['CUCKOO_AUTH_TOKEN']},
+            json={
+                'task_ids': task_ids
+            }
+        )
+    except requests.RequestException as ex:
+        current_app.logger.error(f'Error while fetching data from cuckoo service {str(ex)}')
+        return []
 
     if res.status_code != 200:
         current_app.logger.error(f'Error while fetching data from cuckoo service {res.text}')
@@ -47,10 +59,15 @@ def get_trello_card_link(task_ids):
     return res.json()['data']['links']
 
 def get_card(beehive_id):
-    res = requests.get(
-        url=f'{current_app.config["CUCKOO_BASE_URL"]}/api/inner/v1/card/{beehive_id}',
-        headers={'X-CUCKOO-AUTH': current_app.config['CUCKOO_AUTH_TOKEN']},
-    )
+    try:
+        res = http_client.get(
+            'cuckoo',
+            url=f'{current_app.config["CUCKOO_BASE_URL"]}/api/inner/v1/card/{beehive_id}',
+            headers={'X-CUCKOO-AUTH': current_app.config['CUCKOO_AUTH_TOKEN']},
+        )
+    except requests.RequestException as ex:
+        current_app.logger.error(f'Error while fetching data from cuckoo service {str(ex)}')
+        return None
 
     if res.status_code != 200:
         current_app.logger.error(f'Error while fetching data from cuckoo service {res.text}')
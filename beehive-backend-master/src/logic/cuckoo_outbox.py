@@ -0,0 +1,111 @@
+from datetime import datetime, timedelta
+import time
+
+from flask import current_app
+from sqlalchemy.orm import aliased
+from sqlalchemy.sql import and_
+
+from .cuckoo import dispatch_cuckoo_event
+from ..models.cuckoo_outbox_event import CuckooOutboxEvent, CuckooOutboxEventStatus
+from ..utils.db import db
+from ..utils.metrics import cuckoo_outbox_dead_lettered, cuckoo_outbox_delivered
+
+
+CUCKOO_OUTBOX_LOCK_KEY = 'beehive-cuckoo-outbox-lock'
+
+
+def queue_cuckoo_event(task_id, payload):
+    """
+    Add a cuckoo event to the outbox as part of the current transaction, it is
+    delivered by the cuckoo outbox job once the caller commits
+    Arguments:
+        task_id - id of the task the event is about
+        payload - the event payload sent to cuckoo
+    Returns:
+        The added outbox event
+    """
+    event = CuckooOutboxEvent(task_id, payload)
+    db.session.add(event)
+    return event
+
+
+def retry_delay_seconds(attempts):
+    """
+    Exponential backoff delay before the next delivery attempt of an event that
+    failed a number of attempts
+    """
+    delay = current_app.config['CUCKOO_OUTBOX_RETRY_BASE_SECONDS'] * 2 ** (attempts - 1)
+    return min(delay, current_app.config['CUCKOO_OUTBOX_RETRY_MAX_SECONDS'])
+
+
+def deliver_cuckoo_outbox_batch(batch_size, deadline=None):
+    """
+    Deliver a batch of due outbox events in id order. an event is not delivered
+    while an earlier event of the same task is pending, so each task's events
+    reach cuckoo in the order they were added. events failing too many attempts
+    are dead-lettered so they stop holding back the rest of their task's events
+    Arguments:
+        batch_size - max number of events to fetch
+        deadline - optional time.monotonic() value to stop delivering at
+    Returns:
+        Number of events fetched
+    """
+    now = datetime.utcnow()
+
+    # skip events queued behind an earlier event of the same task that is
+    # waiting for a retry
+    waiting = aliased(CuckooOutboxEvent)
+    events = CuckooOutboxEvent.query \
+        .filter(CuckooOutboxEvent.status == CuckooOutboxEventStatus.PENDING) \
+        .filter(CuckooOutboxEvent.next_attempt <= now) \
+        .filter(~db.exists().where(and_(
+            waiting.task_id == CuckooOutboxEvent.task_id,
+            waiting.status == CuckooOutboxEventStatus.PENDING,
+            waiting.id < CuckooOutboxEvent.id,
+            waiting.next_attempt > now
+        ))) \
+        .order_by(CuckooOutboxEvent.id) \
+        .limit(batch_size) \
+        .all()
+
+    failed_task_ids = set()
+    for event in events:
+        if deadline is not None and time.monotonic() >= deadline:
+            break
+
+        if event.task_id in failed_task_ids:
+            continue
+
+        event.attempts += 1
+        if dispatch_cuckoo_event(event.task_id, event.payload):
+            event.status = CuckooOutboxEventStatus.DELIVERED
+            event.delivered = datetime.utcnow()
+            cuckoo_outbox_delivered.inc()
+        else:
+            failed_task_ids.add(event.task_id)
+
+            if event.attempts >= current_app.config['CUCKOO_OUTBOX_MAX_ATTEMPTS']:
+                current_app.logger.error(f'dead-lettering cuckoo event {event.id} of task {event.task_id} after {event.attempts} attempts')
+                event.status = CuckooOutboxEventStatus.DEAD
+                cuckoo_outbox_dead_lettered.inc()
+            else:
+                event.next_attempt = datetime.utcnow() + timedelta(seconds=retry_delay_seconds(event.attempts))
+
+        # commit each event so a crash does not redeliver the whole batch
+        db.session.commit()
+
+    return len(events)
+
+
+def purge_delivered_cuckoo_events(before):
+    """
+    Delete events delivered before a given time, dead-lettered events are kept
+    Arguments:
+        before - utc datetime to delete delivered events before
+    Returns:
+        Number of deleted events
+    """
+    return CuckooOutboxEvent.query \
+        .filter(CuckooOutboxEvent.status == CuckooOutboxEventStatus.DELIVERED) \
+        .filter(CuckooOutboxEvent.delivered < before) \
+        .delete(synchronize_session=False)
@@ -1,43 +1,258 @@
+from datetime import timedelta
+import hashlib
+import json
+
 import requests
 
 from flask import current_app
+from redis import RedisError
+from sqlalchemy.orm import selectinload
 
+from ..models.task import Task
 from ..models.task_classification import TaskClassification, TaskTypeClassification
 from ..utils.db import db
+from ..utils.http_client import http_client
+from ..utils.metrics import task_classifications
+from ..utils.rq import rq
+
+
+# ids of tasks waiting to be classified by classify_pending_tasks
+TASK_CLASSIFICATION_PENDING_KEY = 'beehive-task-classification-pending'
+# set while a classify_pending_tasks run is scheduled for the pending tasks
+TASK_CLASSIFICATION_SCHEDULED_KEY = 'beehive-task-classification-scheduled'
+TASK_CLASSIFICATION_LOCK_KEY = 'beehive-task-classification-lock'
+# number of failed classification attempts of pending tasks
+TASK_CLASSIFICATION_ATTEMPTS_KEY = 'beehive-task-classification-attempts'
+TASK_CLASSIFICATION_CACHE_KEY_PREFIX = 'beehive-task-classification:'
+
 
-def get_task_type_classification(task_id, description, skills):
+def queue_task_classification(task_ids):
     """
-    Get a task type classification based on description and skills, updates database task_classification table with result
+    Add tasks to the pending task type classifications. Pending tasks are
+    classified in micro-batches once TASK_CLASSIFICATION_BATCH_SIZE tasks are
+    pending or TASK_CLASSIFICATION_WINDOW_SECONDS after the first of them
     Arguments:
-        task_id - the id of task
-        description - the description of task
-        skills - list of a task skills
+        task_ids - ids of the tasks to classify
+    """
+    if not task_ids:
+        return
+
+    batch_size = current_app.config['TASK_CLASSIFICATION_BATCH_SIZE']
+    window_seconds = current_app.config['TASK_CLASSIFICATION_WINDOW_SECONDS']
+
+    try:
+        pipeline = rq.connection.pipeline()
+        pipeline.rpush(TASK_CLASSIFICATION_PENDING_KEY, *task_ids)
+        # scheduled runs that were lost are replaced once the flag expires
+        pipeline.set(TASK_CLASSIFICATION_SCHEDULED_KEY, 1, nx=True, ex=2 * window_seconds + 1)
+        pending_count, schedule = pipeline.execute()
+    except RedisError as e:
+        current_app.logger.error(f'failed to queue classification of tasks {", ".join(task_ids)}: {str(e)}')
+        return
+
+    from ..jobs.pollinator import classify_pending_tasks
+    if window_seconds <= 0 or pending_count - len(task_ids) < batch_size <= pending_count:
+        classify_pending_tasks.queue()
+    elif schedule:
+        classify_pending_tasks.schedule(timedelta(seconds=window_seconds))
+
+
+def get_pending_task_classifications(count):
+    """
+    Get up to a number of tasks off the head of the pending task type
+    classifications, without removing them until finish_pending_task_classifications
+    is called so they are not lost if classifying them fails
     Returns:
-        None if there's no classification. Otherwise returns a TaskTypeClassification string value.
+        List of task ids in the order they were queued
     """
-    
-    payload = {
-        'input': {
-            'task_description': description,
-            'task_skills': [s.name for s in skills]
-        }
-    }
+    task_ids = rq.connection.lrange(TASK_CLASSIFICATION_PENDING_KEY, 0, count - 1)
+
+    return [task_id.decode() for task_id in task_ids]
+
+
+def finish_pending_task_classifications(task_ids, unclassified_task_ids):
+    """
+    Remove tasks got by get_pending_task_classifications off the pending task
+    type classifications, queueing the tasks that could not be classified again
+    unless they failed TASK_CLASSIFICATION_MAX_ATTEMPTS times
+    Arguments:
+        task_ids - the pending task ids, in the order they were got
+        unclassified_task_ids - ids of the tasks that could not be classified
+    Returns:
+        List of the ids of the tasks that were queued again
+    """
+    max_attempts = current_app.config['TASK_CLASSIFICATION_MAX_ATTEMPTS']
+
+    attempts = []
+    if unclassified_task_ids:
+        pipeline = rq.connection.pipeline(transaction=False)
+        for task_id in unclassified_task_ids:
+            pipeline.hincrby(TASK_CLASSIFICATION_ATTEMPTS_KEY, task_id, 1)
+        attempts = pipeline.execute()
+
+    retried_task_ids = [task_id for task_id, attempt in zip(unclassified_task_ids, attempts) if attempt < max_attempts]
+    dropped_task_ids = [task_id for task_id, attempt in zip(unclassified_task_ids, attempts) if attempt >= max_attempts]
+    if dropped_task_ids:
+        current_app.logger.error(f'giving up classifying tasks {", ".join(dropped_task_ids)} after {max_attempts} attempts')
+
+    window_seconds = current_app.config['TASK_CLASSIFICATION_WINDOW_SECONDS']
+    finished_task_ids = [task_id for task_id in task_ids if task_id not in retried_task_ids]
+
+    pipeline = rq.connection.pipeline()
+    pipeline.ltrim(TASK_CLASSIFICATION_PENDING_KEY, len(task_ids), -1)
+    if finished_task_ids:
+        pipeline.hdel(TASK_CLASSIFICATION_ATTEMPTS_KEY, *finished_task_ids)
+    if retried_task_ids:
+        pipeline.rpush(TASK_CLASSIFICATION_PENDING_KEY, *retried_task_ids)
+        pipeline.set(TASK_CLASSIFICATION_SCHEDULED_KEY, 1, nx=True, ex=2 * window_seconds + 1)
+    results = pipeline.execute()
+
+    # retried tasks are classified by the next scheduled run
+    if retried_task_ids and results[-1]:
+        from ..jobs.pollinator import classify_pending_tasks
+        classify_pending_tasks.schedule(timedelta(seconds=max(window_seconds, 1)))
+
+    return retried_task_ids
+
+
+def _classification_cache_key(task_input):
+    digest = hashlib.sha256(json.dumps(task_input, sort_keys=True).encode()).hexdigest()
+    return f'{TASK_CLASSIFICATION_CACHE_KEY_PREFIX}{digest}'
+
+
+def _parse_task_type(data):
+    try:
+        return TaskTypeClassification(data.get('label'))
+    except (AttributeError, ValueError):
+        current_app.logger.error(f'Invalid task classification {data}')
+        return None
+
+
+def _predict_task_type(task_input):
+    try:
+        res = http_client.post(
+            'pollinator',
+            url=f'{current_app.config["POLLINATOR_TASK_TYPE_BASE_URL"]}/api/v1/predict',
+            headers={'X-POLLINATOR-AUTH': current_app.config['OUTGOING_AUTH_TOKEN']},
+            json={'input': task_input}
+        )
+    except requests.RequestException as ex:
+        current_app.logger.error(f'Error while trying to classify task {str(ex)}')
+        return None
 
-    res = requests.post(
-        url=f'{current_app.config["POLLINATOR_TASK_TYPE_BASE_URL"]}/api/v1/predict',
-        headers={'X-POLLINATOR-AUTH': current_app.config['OUTGOING_AUTH_TOKEN']},
-        json=payload
-    )
     if res.status_code != 200:
         current_app.logger.error(f'Error while trying to classify task {res.text}')
         return None
 
-    data = res.json().get('data')
-    task_type_label = data.get('label')
-    task_type_code = TaskTypeClassification(task_type_label)
+    return _parse_task_type(res.json().get('data'))
+
+
+def _predict_task_types(task_inputs):
+    """
+    Classify a number of task inputs with a single pollinator request
+    Returns:
+        List of the TaskTypeClassification of each input, None for inputs
+        that could not be classified
+    """
+    if len(task_inputs) == 1:
+        return [_predict_task_type(task_inputs[0])]
+
+    try:
+        res = http_client.post(
+            'pollinator',
+            url=f'{current_app.config["POLLINATOR_TASK_TYPE_BASE_URL"]}/api/v1/predict/batch',
+            headers={'X-POLLINATOR-AUTH': current_app.config['OUTGOING_AUTH_TOKEN']},
+            json={'inputs': task_inputs}
+        )
+    except requests.RequestException as ex:
+        current_app.logger.error(f'Error while trying to classify {len(task_inputs)} tasks {str(ex)}')
+        return [None] * len(task_inputs)
+
+    if res.status_code == 404:
+        # pollinator without batch predictions
+        current_app.logger.warning('batch task classification not supported, classifying each task')
+        return [_predict_task_type(task_input) for task_input in task_inputs]
+
+    if res.status_code != 200:
+        current_app.logger.error(f'Error while trying to classify {len(task_inputs)} tasks {res.text}')
+        return [None] * len(task_inputs)
+
+    data = res.json().get('data') or []
+    if len(data) != len(task_inputs):
+        current_app.logger.error(f'Got {len(data)} task classifications for {len(task_inputs)} tasks')
+        return [None] * len(task_inputs)
+
+    return [_parse_task_type(item) for item in data]
+
+
+def classify_tasks(task_ids):
+    """
+    Classify the task type of a batch of tasks and save the classifications.
+    Classifications are cached by a hash of the task description and skills,
+    so only tasks whose description and skills were not classified before are
+    sent to pollinator, in a single request
+    Arguments:
+        task_ids - ids of the tasks to classify
+    Returns:
+        Dictionary of task id to its TaskTypeClassification, only for tasks that
+        were classified
+    """
+    tasks = Task.query.filter(Task.id.in_(task_ids)).options(selectinload(Task.skills)).all()
+    # inputs are sent in the order the tasks were given
+    positions = {task_id: i for i, task_id in enumerate(task_ids)}
+    tasks.sort(key=lambda task: positions[task.id])
+
+    task_keys = {}
+    task_inputs = {}
+    for task in tasks:
+        task_input = {
+            'task_description': task.description,
+            'task_skills': sorted(s.name for s in task.skills)
+        }
+        key = _classification_cache_key(task_input)
+        task_keys[task.id] = key
+        task_inputs.setdefault(key, task_input)
+
+    task_types = {}
+    if task_inputs:
+        try:
+            cached = rq.connection.mget(list(task_inputs))
+            # classifications cached under names that no longer exist are classified again
+            task_types = {
+                key: TaskTypeClassification.__members__[value.decode()]
+                for key, value in zip(task_inputs, cached)
+                if value and value.decode() in TaskTypeClassification.__members__
+            }
+        except RedisError as e:
+            current_app.logger.error(f'failed to get cached task classifications: {str(e)}')
+
+    uncached_keys = [key for key in task_inputs if key not in task_types]
+    task_classifications.labels(source='cache').inc(len(task_inputs) - len(uncached_keys))
+
+    if uncached_keys:
+        predicted = {
+            key: task_type
+            for key, task_type in zip(uncached_keys, _predict_task_types([task_inputs[key] for key in uncached_keys]))
+            if task_type is not None
+        }
+        task_classifications.labels(source='pollinator').inc(len(predicted))
+        task_types.update(predicted)
+
+        try:
+            pipeline = rq.connection.pipeline(transaction=False)
+            for key, task_type in predicted.items():
+                pipeline.setex(key, current_app.config['TASK_CLASSIFICATION_CACHE_TTL_SECONDS'], task_type.name)
+            pipeline.execute()
+        except RedisError as e:
+            current_app.logger.error(f'failed to cache task classifications: {str(e)}')
+
+    classified = {}
+    for task in tasks:
+        task_type = task_types.get(task_keys[task.id])
+        if task_type is not None:
+            db.session.add(TaskClassification(task.id, task_type))
+            classified[task.id] = task_type
 
-    task_classification = TaskClassification(task_id, task_type_code)
-    db.session.add(task_classification)
     db.session.commit()
 
-    return task_classification.task_type.value
\ No newline at end of file
+    return classified
@@ -5,6 +5,12 @@ import requests
 
 from ..models.task import TaskStatus
 from ..models.work import WorkStatus, WorkType
+from ..utils.http_client import http_client
+from ..utils.ttl_cache import TTLCache
+
+
+# ratings by (target user, object key), where None means the object has no ratings
+ratings_cache = TTLCache()
 
 
 class RatingSubject(enum.Enum):
@@ -24,11 +30,16 @@ def get_praesepe_authorization_code(target_user_id, object_key, subjects, user_i
     if user_id:
         params['user'] = user_id
 
-    res = requests.post(
-        url=f'{current_app.config["PRAESEPE_BASE_URL"]}/api/v1/auth',
-        headers={'X-PRAESEPE-AUTH': current_app.config['PRAESEPE_AUTH_TOKEN']},
-        json=params
-    )
+    try:
+        res = http_client.post(
+            'praesepe',
+            url=f'{current_app.config["PRAESEPE_BASE_URL"]}/api/v1/auth',
+            headers={'X-PRAESEPE-AUTH': current_app.config['PRAESEPE_AUTH_TOKEN']},
+            json=params
+        )
+    except requests.RequestException as ex:
+        current_app.logger.error(f'Error while retrieving praesepe authorization key {str(ex)}')
+        return None
 
     if res.status_code != 200:
         current_app.logger.error(f'Error while retrieving praesepe authorization key {res.text}')
@@ -68,11 +79,16 @@ def get_rating_items(target_user, object_keys, user=None):
     if user:
         params['user'] = user
 
-    res = requests.get(
-        url=f'{current_app.config["PRAESEPE_BASE_URL"]}/api/v1/rating',
-        headers={'X-PRAESEPE-AUTH': current_app.config['PRAESEPE_AUTH_TOKEN']},
-        params=params
-    )
+    try:
+        res = http_client.get(
+            'praesepe',
+            url=f'{current_app.config["PRAESEPE_BASE_URL"]}/api/v1/rating',
+            headers={'X-PRAESEPE-AUTH': current_app.config['PRAESEPE_AUTH_TOKEN']},
+            params=params
+        )
+    except requests.RequestException as ex:
+        current_app.logger.error(f'Error while retrieveing rating for object [{object_keys}] by user [{user}] for user [{target_user}]: {str(ex)}')
+        return None
 
     if res.status_code == 400:
         current_app.logger.info(f'No ratings found for object [{object_keys}] by user [{user}] for user [{target_user}].')
@@ -83,3 +99,60 @@ def get_rating_items(target_user, object_keys, user=None):
 
     ratings = res.json()['data']
     return ratings
+
+
+def get_rating_items_by_object_key(target_user, object_keys):
+    """
+    Get the ratings of a number of objects of a target user with a single
+    praesepe request, serving recently fetched objects from the ratings cache
+    Arguments:
+        target_user - id of the user the ratings are for
+        object_keys - the rating object keys to get ratings for
+    Returns:
+        Dictionary of object key to its list of ratings, or None if the object
+        has no ratings or they could not be retrieved
+    """
+    object_keys = list(dict.fromkeys(object_keys))
+    cached = ratings_cache.get_many((target_user, key) for key in object_keys)
+    ratings_by_object_key = {key: cached[(target_user, key)] for key in object_keys if (target_user, key) in cached}
+
+    missing_object_keys = [key for key in object_keys if key not in ratings_by_object_key]
+    if not missing_object_keys:
+        return ratings_by_object_key
+
+    try:
+        res = http_client.get(
+            'praesepe',
+            url=f'{current_app.config["PRAESEPE_BASE_URL"]}/api/v1/rating',
+            headers={'X-PRAESEPE-AUTH': current_app.config['PRAESEPE_AUTH_TOKEN']},
+            params={
+                'targetUser': target_user,
+                'objectKeys': missing_object_keys
+            }
+        )
+    except requests.RequestException as ex:
+        current_app.logger.error(f'Error while retrieveing rating for objects [{missing_object_keys}] for user [{target_user}]: {str(ex)}')
+        ratings_by_object_key.update({key: None for key in missing_object_keys})
+        return ratings_by_object_key
+
+    if res.status_code == 400:
+        current_app.logger.info(f'No ratings found for objects [{missing_object_keys}] for user [{target_user}].')
+        fetched = {key: None for key in missing_object_keys}
+    elif res.status_code != 200:
+        # do not cache failures so the next request retries them
+        current_app.logger.error(f'Error {res.status_code} while retrieveing rating for objects [{missing_object_keys}] for user [{target_user}]: {res.text}')
+        ratings_by_object_key.update({key: None for key in missing_object_keys})
+        return ratings_by_object_key
+    else:
+        fetched = {key: None for key in missing_object_keys}
+        for rating in res.json()['data']:
+            if rating['objectKey'] in fetched:
+                fetched[rating['objectKey']] = (fetched[rating['objectKey']] or []) + [rating]
+
+    ratings_cache.set_many(
+        {(target_user, key): ratings for key, ratings in fetched.items()},
+        current_app.config['PRAESEPE_RATINGS_CACHE_TTL_SECONDS']
+    )
+
+    ratings_by_object_key.update(fetched)
+    return ratings_by_object_key
@@ -0,0 +1,273 @@
+from datetime import datetime, timedelta
+import json
+
+from flask import current_app
+from redis import RedisError
+from sqlalchemy.sql import or_
+
+from ..models.project_daily_activity import ProjectDailyActivity
+from ..models.tag import Tag, TaskTag
+from ..models.task import Task, TaskStatus
+from ..models.work import Work, WorkStatus, WorkType
+from ..utils.db import db
+from ..utils.rq import rq
+
+
+# redis key holding the time up to which the refresh job processed changes
+PROJECT_ACTIVITY_REFRESHED_UNTIL_KEY = 'beehive:project-activity:refreshed-until'
+
+# redis key prefix marking projects whose activity refresh is queued and not started yet
+PROJECT_ACTIVITY_QUEUED_KEY_PREFIX = 'beehive:project-activity:queued:'
+
+# time after which a project's activity refresh can be queued again even if the
+# queued one never started
+PROJECT_ACTIVITY_QUEUED_TTL_SECONDS = 60
+
+# rollup columns and the task id columns holding their contributing tasks
+ACTIVITY_COLUMNS = {
+    'tasks_delegated': 'tasks_delegated_task_ids',
+    'tasks_accepted': 'tasks_accepted_task_ids',
+    'works_completed': 'works_completed_task_ids',
+    'works_reviewed': 'works_reviewed_task_ids'
+}
+
+
+def _filter_days(query, column, start_date, end_date):
+    if start_date is not None:
+        query = query.filter(column >= datetime.combine(start_date, datetime.min.time()))
+    if end_date is not None:
+        query = query.filter(column < datetime.combine(end_date + timedelta(days=1), datetime.min.time()))
+
+    return query
+
+
+def _aggregate_project_activity(project_id, start_date, end_date):
+    """
+    Aggregate the daily activity of a project between two dates
+    Returns:
+        Dictionary of date to a dictionary of project daily activity column
+        values, only for days with any activity
+    """
+    # tasks are counted on the day they were created
+    tasks_delegated = _filter_days(
+        db.session.query(db.func.date(Task.created), Task.id) \
+            .filter(Task.tags.any(TaskTag.tag_id == project_id)),
+        Task.created, start_date, end_date
+    ).all()
+
+    # accepted tasks are counted on the day they were last updated
+    tasks_accepted = _filter_days(
+        db.session.query(db.func.date(Task.updated), Task.id) \
+            .filter(Task.tags.any(TaskTag.tag_id == project_id)) \
+            .filter(Task.status == TaskStatus.ACCEPTED),
+        Task.updated, start_date, end_date
+    ).all()
+
+    # completed work items are counted on the day they were updated to completed
+    works_completed = _filter_days(
+        db.session.query(db.func.date(Work.updated), Work.task_id) \
+            .join(Work.task) \
+            .filter(Work.status == WorkStatus.COMPLETE) \
+            .filter(Task.tags.any(TaskTag.tag_id == project_id)),
+        Work.updated, start_date, end_date
+    ).all()
+
+    # work items created when a tech lead drags back from in review to beehive tasks
+    works_reviewed = _filter_days(
+        db.session.query(db.func.date(Work.updated), Work.task_id) \
+            .join(Work.task) \
+            .filter(Work.work_type.in_([WorkType.REVIEW_TASK, WorkType.CUCKOO_ITERATION])) \
+            .filter(Work.status == WorkStatus.COMPLETE) \
+            .filter(Task.tags.any(TaskTag.tag_id == project_id)),
+        Work.updated, start_date, end_date
+    ).all()
+
+    aggregates = {}
+    for column, rows in (
+        ('tasks_delegated', tasks_delegated),
+        ('tasks_accepted', tasks_accepted),
+        ('works_completed', works_completed),
+        ('works_reviewed', works_reviewed)
+    ):
+        for day, task_id in rows:
+            day_aggregates = aggregates.setdefault(day, {})
+            day_aggregates[column] = day_aggregates.get(column, 0) + 1
+            day_aggregates.setdefault(ACTIVITY_COLUMNS[column], []).append(task_id)
+
+    return aggregates
+
+
+def refresh_project_activity(project_ids, start_date=None, end_date=None):
+    """
+    Recompute the daily activity rollup rows of the given projects between two
+    dates. Caller of the method must call db.session.commit() for the changes
+    to be saved to database
+    Arguments:
+        project_ids - ids of the projects ("project:" tags) to refresh
+        start_date - first date to refresh, or None to refresh from the first
+        activity of each project
+        end_date - last date to refresh, or None to refresh until the latest
+        activity of each project
+    """
+    for project_id in set(project_ids):
+        aggregates = _aggregate_project_activity(project_id, start_date, end_date)
+
+        existing_query = ProjectDailyActivity.query.filter(ProjectDailyActivity.project_id == project_id)
+        if start_date is not None:
+            existing_query = existing_query.filter(ProjectDailyActivity.date >= start_date)
+        if end_date is not None:
+            existing_query = existing_query.filter(ProjectDailyActivity.date <= end_date)
+        existing = {a.date: a for a in existing_query.all()}
+
+        # drop days that no longer have any activity
+        for day, activity in existing.items():
+            if day not in aggregates:
+                db.session.delete(activity)
+
+        for day, values in aggregates.items():
+            activity = existing.get(day)
+            if not activity:
+                activity = ProjectDailyActivity(project_id, day)
+                db.session.add(activity)
+
+            # reset all values so stale aggregates are not kept around
+            for column, task_ids_column in ACTIVITY_COLUMNS.items():
+                setattr(activity, column, values.get(column, 0))
+                setattr(activity, task_ids_column, values.get(task_ids_column, []))
+
+
+def queue_task_project_activity_refresh(task):
+    """
+    Queue a refresh of today's activity of the projects of a task. Projects
+    whose refresh is already queued and not started yet are not queued again.
+    days the task was previously counted in are reconciled by the refresh job.
+    never raises so an activity failure does not fail the calling request
+    """
+    queue_tasks_project_activity_refresh([task])
+
+
+def queue_tasks_project_activity_refresh(tasks):
+    """
+    Queue a refresh of today's activity of the projects of a number of tasks at
+    once, see queue_task_project_activity_refresh
+    """
+    project_ids = sorted({t.id for task in tasks for t in task.tags if t.name.startswith('project:')})
+    if not project_ids:
+        return
+
+    try:
+        pipeline = rq.connection.pipeline(transaction=False)
+        for project_id in project_ids:
+            pipeline.set(f'{PROJECT_ACTIVITY_QUEUED_KEY_PREFIX}{project_id}', 1, nx=True, ex=PROJECT_ACTIVITY_QUEUED_TTL_SECONDS)
+        project_ids = [project_id for project_id, queued in zip(project_ids, pipeline.execute()) if queued]
+
+        if project_ids:
+            from ..jobs.stats import refresh_projects_activity
+            refresh_projects_activity.queue(project_ids)
+    except RedisError as e:
+        task_ids = ', '.join(task.id for task in tasks)
+        current_app.logger.error(f'failed to queue project activity refresh of tasks {task_ids}: {str(e)}')
+
+
+def clear_queued_project_activity_refresh(project_ids):
+    """
+    Let refreshes of the projects' activity be queued again, called when a
+    queued refresh starts so changes made while it runs are not missed
+    """
+    rq.connection.delete(*[f'{PROJECT_ACTIVITY_QUEUED_KEY_PREFIX}{project_id}' for project_id in project_ids])
+
+
+def get_project_activity(project_id, start_date, end_date):
+    """
+    Get the daily activity rollup rows of a project between two dates
+    Returns:
+        Dictionary of date to its project daily activity, only for days with
+        any activity
+    """
+    activities = ProjectDailyActivity.query \
+        .filter(ProjectDailyActivity.project_id == project_id) \
+        .filter(ProjectDailyActivity.date >= start_date) \
+        .filter(ProjectDailyActivity.date <= end_date) \
+        .all()
+
+    return {a.date: a for a in activities}
+
+
+def find_changed_project_days(since):
+    """
+    Find the projects whose tasks or work changed since a given time, and the
+    days of their activity the changes may have affected: the days changed
+    tasks and work items are counted in now, and the days they were counted in
+    before according to the rollup rows
+    Arguments:
+        since - datetime to look for changes from. when None all projects are
+        returned without a date range
+    Returns:
+        Dictionary of project id to the first and last date to refresh, both
+        None to refresh the whole activity of the project
+    """
+    if since is None:
+        return {r[0]: (None, None) for r in db.session.query(Tag.id).filter(Tag.name.startswith('project:')).all()}
+
+    def changed(model):
+        return db.func.coalesce(model.updated, model.created) >= since
+
+    changed_tasks = db.session.query(TaskTag.tag_id, Task.id, Task.created, Task.updated) \
+        .join(Task, Task.id == TaskTag.task_id) \
+        .join(Tag, Tag.id == TaskTag.tag_id) \
+        .filter(Tag.name.startswith('project:')) \
+        .filter(changed(Task)) \
+        .all()
+
+    changed_works = db.session.query(TaskTag.tag_id, Work.task_id, Work.updated) \
+        .join(Work, Work.task_id == TaskTag.task_id) \
+        .join(Tag, Tag.id == TaskTag.tag_id) \
+        .filter(Tag.name.startswith('project:')) \
+        .filter(changed(Work)) \
+        .all()
+
+    project_days = {}
+    task_ids = set()
+    # tasks are counted on the day they were created and on the day they were
+    # last updated, work items on the day they were last updated
+    for project_id, task_id, created, updated in changed_tasks:
+        days = project_days.setdefault(project_id, set())
+        if created >= since:
+            days.add(created.date())
+        if updated is not None:
+            days.add(updated.date())
+        task_ids.add(task_id)
+    for project_id, task_id, updated in changed_works:
+        days = project_days.setdefault(project_id, set())
+        if updated is not None:
+            days.add(updated.date())
+        task_ids.add(task_id)
+
+    if not project_days:
+        return {}
+
+    # days the changed tasks were counted in before, e.g. a task accepted on an
+    # earlier day that was updated since
+    task_ids_json = json.dumps(sorted(task_ids))
+    previous_days = db.session.query(ProjectDailyActivity.project_id, ProjectDailyActivity.date) \
+        .filter(ProjectDailyActivity.project_id.in_(list(project_days.keys()))) \
+        .filter(or_(*[
+            db.func.json_overlaps(getattr(ProjectDailyActivity, task_ids_column), task_ids_json)
+            for task_ids_column in ACTIVITY_COLUMNS.values()
+        ])) \
+        .all()
+    for project_id, day in previous_days:
+        project_days[project_id].add(day)
+
+    # changes that are not counted on any day, e.g. new work items, do not
+    # affect the activity
+    return {project_id: (min(days), max(days)) for project_id, days in project_days.items() if days}
+
+
+def get_project_activity_refreshed_until():
+    value = rq.connection.get(PROJECT_ACTIVITY_REFRESHED_UNTIL_KEY)
+    return datetime.fromisoformat(value.decode()) if value else None
+
+
+def set_project_activity_refreshed_until(until):
+    rq.connection.set(PROJECT_ACTIVITY_REFRESHED_UNTIL_KEY, until.isoformat())
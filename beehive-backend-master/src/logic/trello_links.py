@@ -0,0 +1,103 @@
+from concurrent.futures import ThreadPoolExecutor
+import json
+
+from flask import current_app
+from redis import RedisError
+
+from .cuckoo import get_card, get_trello_card_link
+from ..utils.rq import rq
+
+
+TRELLO_LINK_CACHE_KEY_PREFIX = 'beehive-trello-link:'
+
+
+def _run_in_app_context(app, func, *args):
+    with app.app_context():
+        return func(*args)
+
+
+def _map_concurrently(func, items):
+    """
+    Call a function on each item using the cuckoo fan-out thread pool, each call
+    runs inside its own app context
+    Returns:
+        List of results in the order of the given items
+    """
+    if not items:
+        return []
+
+    # a single item does not need a thread
+    if len(items) == 1:
+        return [func(items[0])]
+
+    app = current_app._get_current_object()
+    max_workers = min(current_app.config['CUCKOO_FAN_OUT_MAX_WORKERS'], len(items))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(lambda item: _run_in_app_context(app, func, item), items))
+
+
+def _get_cached_links(task_ids):
+    try:
+        values = rq.connection.mget([f'{TRELLO_LINK_CACHE_KEY_PREFIX}{task_id}' for task_id in task_ids])
+    except RedisError as ex:
+        current_app.logger.error(f'failed to read cached trello links: {str(ex)}')
+        return {}
+
+    return {task_id: json.loads(value) for task_id, value in zip(task_ids, values) if value is not None}
+
+
+def _cache_links(links):
+    try:
+        pipeline = rq.connection.pipeline(transaction=False)
+        for link in links:
+            pipeline.setex(
+                f'{TRELLO_LINK_CACHE_KEY_PREFIX}{link["task_id"]}',
+                current_app.config['TRELLO_LINK_CACHE_TTL_SECONDS'],
+                json.dumps(link)
+            )
+        pipeline.execute()
+    except RedisError as ex:
+        current_app.logger.error(f'failed to cache trello links: {str(ex)}')
+
+
+def get_task_card_links(task_ids):
+    """
+    Get the trello card links of a number of tasks. links are served from the
+    redis cache when possible, and the rest are fetched from cuckoo in bounded
+    chunks sent concurrently
+    Arguments:
+        task_ids - ids of the tasks to get links of
+    Returns:
+        List of cuckoo link items (each with a task_id key) of the tasks that
+        have a card
+    """
+    task_ids = list(dict.fromkeys(task_ids))
+    if not task_ids:
+        return []
+
+    links = _get_cached_links(task_ids)
+
+    missing_task_ids = [task_id for task_id in task_ids if task_id not in links]
+    if missing_task_ids:
+        chunk_size = current_app.config['TRELLO_LINK_CHUNK_SIZE']
+        chunks = [missing_task_ids[i:i + chunk_size] for i in range(0, len(missing_task_ids), chunk_size)]
+
+        # tasks without a card yet are not cached so their link shows up once created
+        fetched_links = [link for chunk_links in _map_concurrently(get_trello_card_link, chunks) for link in chunk_links]
+        _cache_links(fetched_links)
+
+        links.update({link['task_id']: link for link in fetched_links})
+
+    return [links[task_id] for task_id in task_ids if task_id in links]
+
+
+def get_quest_cards(quest_ids):
+    """
+    Get the trello cards of a number of quests from cuckoo concurrently
+    Arguments:
+        quest_ids - ids of the quests to get cards of
+    Returns:
+        Dictionary of quest id to its card, or None if it could not be retrieved
+    """
+    quest_ids = list(dict.fromkeys(quest_ids))
+    return dict(zip(quest_ids, _map_concurrently(get_card, quest_ids)))
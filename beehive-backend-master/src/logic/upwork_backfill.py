@@ -0,0 +1,159 @@
+from datetime import datetime, timedelta
+import enum
+import json
+import uuid
+
+from flask import current_app
+
+from ..utils.rq import rq
+
+
+# redis key prefix of the backfill state hashes, with the per-day progress in a
+# separate hash under the same prefix
+UPWORK_BACKFILL_KEY_PREFIX = 'beehive:upwork-backfill:'
+
+UPWORK_BACKFILL_DAY_FORMAT = '%Y%m%d'
+
+
+class UpworkBackfillStatus(str, enum.Enum):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    COMPLETE = 'complete'
+    FAILED = 'failed'
+
+
+def _backfill_key(backfill_id):
+    return f'{UPWORK_BACKFILL_KEY_PREFIX}{backfill_id}'
+
+
+def _backfill_days_key(backfill_id):
+    return f'{UPWORK_BACKFILL_KEY_PREFIX}{backfill_id}:days'
+
+
+def _backfill_lock_key(backfill_id):
+    return f'{UPWORK_BACKFILL_KEY_PREFIX}{backfill_id}:lock'
+
+
+def _set_state(backfill_id, state=None, days=None):
+    ttl = current_app.config['UPWORK_BACKFILL_STATE_TTL_SECONDS']
+    updated = datetime.utcnow().isoformat()
+
+    pipeline = rq.connection.pipeline()
+    pipeline.hset(_backfill_key(backfill_id), mapping={**(state or {}), 'updated': updated})
+    if days:
+        pipeline.hset(_backfill_days_key(backfill_id), mapping={
+            day: json.dumps({**day_state, 'updated': updated}) for day, day_state in days.items()
+        })
+    pipeline.expire(_backfill_key(backfill_id), ttl)
+    pipeline.expire(_backfill_days_key(backfill_id), ttl)
+    pipeline.execute()
+
+
+def create_upwork_backfill(start_date, end_date):
+    """
+    Create the state of a backfill of the upwork diaries of a date range, with
+    every day pending
+    Arguments:
+        start_date - first day of the range
+        end_date - last day of the range, inclusive
+    Returns:
+        The backfill id
+    """
+    backfill_id = uuid.uuid4().hex
+
+    days = {}
+    day = start_date
+    while day <= end_date:
+        days[day.strftime(UPWORK_BACKFILL_DAY_FORMAT)] = {'status': UpworkBackfillStatus.QUEUED.value}
+        day += timedelta(days=1)
+
+    _set_state(
+        backfill_id,
+        state={
+            'status': UpworkBackfillStatus.QUEUED.value,
+            'start_date': start_date.strftime(UPWORK_BACKFILL_DAY_FORMAT),
+            'end_date': end_date.strftime(UPWORK_BACKFILL_DAY_FORMAT),
+            'created': datetime.utcnow().isoformat()
+        },
+        days=days
+    )
+
+    return backfill_id
+
+
+def get_upwork_backfill(backfill_id):
+    """
+    Get the state of a backfill
+    Returns:
+        Dictionary of the backfill state with a sorted list of its days, or None
+        if the backfill does not exist or expired
+    """
+    state = rq.connection.hgetall(_backfill_key(backfill_id))
+    if not state:
+        return None
+
+    state = {k.decode(): v.decode() for k, v in state.items()}
+    days = rq.connection.hgetall(_backfill_days_key(backfill_id))
+    state['days'] = sorted(
+        ({'date': day.decode(), **json.loads(day_state)} for day, day_state in days.items()),
+        key=lambda d: d['date']
+    )
+    state['id'] = backfill_id
+
+    return state
+
+
+def get_pending_backfill_days(backfill_id):
+    """
+    Get the days of a backfill that were not completed yet, i.e. not started or
+    failed in a previous run
+    Returns:
+        Sorted list of dates
+    """
+    state = get_upwork_backfill(backfill_id)
+    if not state:
+        return []
+
+    return [
+        datetime.strptime(day['date'], UPWORK_BACKFILL_DAY_FORMAT)
+        for day in state['days']
+        if day['status'] != UpworkBackfillStatus.COMPLETE.value
+    ]
+
+
+def upwork_backfill_lock(backfill_id, timeout):
+    """
+    Lock held by the job running a backfill, so that a backfill that was queued
+    more than once is only run by one job at a time. the lock expires after the
+    timeout in case the job was killed
+    """
+    return rq.connection.lock(_backfill_lock_key(backfill_id), timeout=timeout)
+
+
+def is_upwork_backfill_running(backfill_id):
+    return bool(rq.connection.exists(_backfill_lock_key(backfill_id)))
+
+
+def set_upwork_backfill_status(backfill_id, status, error=None):
+    state = {'status': UpworkBackfillStatus(status).value}
+    if error is not None:
+        state['error'] = error
+    else:
+        # an error of a previous run does not apply to a resumed backfill
+        rq.connection.hdel(_backfill_key(backfill_id), 'error')
+
+    _set_state(backfill_id, state=state)
+
+
+def set_upwork_backfill_job(backfill_id, job_id):
+    _set_state(backfill_id, state={'job_id': job_id})
+
+
+def set_upwork_backfill_day(backfill_id, day, status, diaries=None, error=None):
+    day_state = {'status': UpworkBackfillStatus(status).value}
+    if diaries is not None:
+        day_state['diaries'] = diaries
+    if error is not None:
+        day_state['error'] = error
+
+    _set_state(backfill_id, days={day.strftime(UPWORK_BACKFILL_DAY_FORMAT): day_state})
@@ -0,0 +1,199 @@
+from datetime import timedelta
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.sql import and_
+
+from ..models.diary_log import DiaryLog
+from ..models.skill import Skill, WorkSkill
+from ..models.tag import Tag, WorkTag
+from ..models.task import Task
+from ..models.upwork import UpworkDiary, WorkRecordUpworkDiary
+from ..models.user import User
+from ..models.work import Work
+from ..models.work_record import WorkRecord
+from ..utils.db import db
+
+
+# number of diaries read from the database cursor and preloaded together
+COST_REPORT_BATCH_SIZE = 500
+
+COST_REPORT_HEADER = [
+    'ID',
+    'Upwork user id',
+    'Upwork user name',
+    'Upwork interval',
+    'Upwork duration',
+    'Upwork cost',
+    'Net duration',
+    'Work Record id',
+    'Work id',
+    'Task id',
+    'Task name',
+    'User id',
+    'User name',
+    'Project',
+    'Skills',
+    'Work Record interval',
+    'Work Record duration',
+]
+
+
+def _names_by_work(association, entity, association_entity_id, work_ids):
+    names = {}
+    rows = db.session.query(association.work_id, entity.name) \
+        .join(entity, association_entity_id == entity.id) \
+        .filter(association.work_id.in_(work_ids)) \
+        .order_by(association.id.asc()) \
+        .all()
+    for work_id, name in rows:
+        names.setdefault(work_id, []).append(name)
+
+    return names
+
+
+def _upwork_diary_rows(upwork_diaries):
+    """
+    Build the report rows of a batch of upwork diaries, preloading their work
+    records, tasks, users, tags and skills with a fixed number of queries
+    """
+    upwork_diary_ids = [d.id for d in upwork_diaries]
+
+    work_record_upwork_diaries = {}
+    for wrud in WorkRecordUpworkDiary.query \
+            .filter(WorkRecordUpworkDiary.upwork_diary_id.in_(upwork_diary_ids)) \
+            .order_by(WorkRecordUpworkDiary.id.asc()) \
+            .all():
+        work_record_upwork_diaries.setdefault(wrud.upwork_diary_id, []).append(wrud)
+
+    work_records = {}
+    work_record_ids = set(wrud.work_record_id for wruds in work_record_upwork_diaries.values() for wrud in wruds)
+    if work_record_ids:
+        work_records = {
+            work_record.id: (work_record, task_id, task_name, user_name)
+            for work_record, task_id, task_name, user_name in db.session.query(WorkRecord, Task.id, Task.name, User.name) \
+                .join(Work, WorkRecord.work_id == Work.id) \
+                .join(Task, Work.task_id == Task.id) \
+                .join(User, WorkRecord.user_id == User.id) \
+                .filter(WorkRecord.id.in_(work_record_ids)) \
+                .all()
+        }
+
+    work_ids = set(work_record.work_id for work_record, _, _, _ in work_records.values())
+    tags = _names_by_work(WorkTag, Tag, WorkTag.tag_id, work_ids) if work_ids else {}
+    skills = _names_by_work(WorkSkill, Skill, WorkSkill.skill_id, work_ids) if work_ids else {}
+
+    # users of diaries that were not matched to work records, if we recognize them
+    users = {}
+    unmatched_upwork_user_ids = set(d.upwork_user_id for d in upwork_diaries if d.id not in work_record_upwork_diaries)
+    if unmatched_upwork_user_ids:
+        for upwork_user, user_id, user_name in db.session.query(User.upwork_user, User.id, User.name) \
+                .filter(User.upwork_user.in_(unmatched_upwork_user_ids)) \
+                .order_by(User.id.asc()) \
+                .all():
+            users.setdefault(upwork_user, (user_id, user_name))
+
+    rows = []
+    for upwork_diary in upwork_diaries:
+        diary_columns = [
+            upwork_diary.id,
+            upwork_diary.upwork_user_id,
+            upwork_diary.upwork_user_name,
+            upwork_diary.duration_string,
+            str(timedelta(minutes=upwork_diary.duration_min))
+        ]
+
+        wruds = work_record_upwork_diaries.get(upwork_diary.id)
+        if not wruds:
+            user_id, user_name = users.get(upwork_diary.upwork_user_id, (None, None))
+            rows.append(diary_columns + [None, None, None, None, None, None, user_id, user_name, None, None, None, None])
+            continue
+
+        for wrud in wruds:
+            work_record, task_id, task_name, user_name = work_records[wrud.work_record_id]
+            rows.append(diary_columns + [
+                str(wrud.upwork_cost),
+                str(timedelta(seconds=wrud.upwork_duration_seconds)),
+                work_record.id,
+                work_record.work_id,
+                task_id,
+                task_name,
+                work_record.user_id,
+                user_name,
+                ';'.join(tags.get(work_record.work_id, [])),
+                ';'.join(skills.get(work_record.work_id, [])),
+                f'{work_record.utc_start_time.strftime("%Y/%m/%d %H:%M")} - {work_record.utc_end_time.strftime("%Y/%m/%d %H:%M")}',
+                str(timedelta(seconds=work_record.duration_seconds))
+            ])
+
+    return rows
+
+
+def _diary_log_row(manual_diary):
+    return [
+        manual_diary.id,
+        None,
+        None,
+        None,
+        manual_diary.date,
+        manual_diary.cost,
+        str(timedelta(minutes=int(manual_diary.duration_hours*60))),
+        None,
+        None,
+        None,
+        manual_diary.text,
+        manual_diary.user_role.email,
+        None,
+        manual_diary.project,
+        None,
+        None,
+        None
+    ]
+
+
+def iter_cost_report_rows(start_date, end_date, batch_size=COST_REPORT_BATCH_SIZE):
+    """
+    Generate the rows of the cost report of a date range in batches, without
+    loading the whole range into memory. Diaries are read through a server side
+    cursor on a separate connection, since the connection of a streamed result
+    cannot run the queries preloading each batch
+    Arguments:
+        start_date - first day of the report
+        end_date - last day of the report, inclusive
+        batch_size - number of diaries read and preloaded together
+    Returns:
+        Generator of lists of report rows, not including the header
+    """
+    with Session(db.engine) as stream_session:
+        # upwork diaries in date range
+        upwork_diaries = stream_session.execute(
+            select(UpworkDiary)
+                .filter(
+                    and_(
+                        UpworkDiary.rounded_utc_start_time < end_date + timedelta(days=1),
+                        UpworkDiary.rounded_utc_end_time >= start_date
+                    )
+                )
+                .order_by(UpworkDiary.id.asc())
+                .execution_options(yield_per=batch_size)
+        ).scalars()
+
+        for batch in upwork_diaries.partitions():
+            yield _upwork_diary_rows(batch)
+
+        # external manual diary logs that originate elsewhere than upwork
+        manual_diaries = stream_session.execute(
+            select(DiaryLog)
+                .options(joinedload(DiaryLog.user_role, innerjoin=True))
+                .filter(
+                    and_(
+                        DiaryLog.date <= end_date,
+                        DiaryLog.date >= start_date
+                    )
+                )
+                .order_by(DiaryLog.id.asc())
+                .execution_options(yield_per=batch_size)
+        ).scalars()
+
+        for batch in manual_diaries.partitions():
+            yield [_diary_log_row(manual_diary) for manual_diary in batch]
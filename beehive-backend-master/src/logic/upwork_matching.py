@@ -0,0 +1,75 @@
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+
+
+# upwork diaries are matched to work records that start and end within this time of them
+MATCH_WINDOW_SECONDS = 172800
+
+
+class WorkRecordIntervalIndex(object):
+    """
+    In-memory index of a user's finished work records sorted by start time, used
+    to match upwork diaries to work records without a query per diary
+    """
+    def __init__(self, work_records):
+        # work records in progress do not have end time and are not matched
+        self.work_records = sorted(
+            (wr for wr in work_records if wr.duration_seconds is not None),
+            key=lambda wr: wr.start_time_epoch_ms
+        )
+        self.starts = [wr.start_time_epoch_ms for wr in self.work_records]
+
+    def candidates(self, upwork_diary):
+        """
+        Get the work records that started and ended within the match window of
+        an upwork diary
+        Returns:
+            List of work records ordered by the distance between their start
+            time and the diary's start time
+        """
+        window_ms = MATCH_WINDOW_SECONDS * 1000
+        first = bisect_right(self.starts, upwork_diary.start_time_epoch_ms - window_ms)
+        last = bisect_left(self.starts, upwork_diary.start_time_epoch_ms + window_ms)
+
+        matches = []
+        for work_record in self.work_records[first:last]:
+            # time differences are compared in whole seconds like mysql's timestampdiff
+            start_diff_seconds = (work_record.start_time_epoch_ms - upwork_diary.start_time_epoch_ms) / 1000
+            end_diff_seconds = work_record.start_time_epoch_ms / 1000 + work_record.duration_seconds - upwork_diary.end_time_epoch_ms / 1000
+            if abs(int(start_diff_seconds)) < MATCH_WINDOW_SECONDS and abs(int(end_diff_seconds)) < MATCH_WINDOW_SECONDS:
+                matches.append((abs(start_diff_seconds), work_record))
+
+        return [work_record for _, work_record in sorted(matches, key=lambda m: m[0])]
+
+
+def match_upwork_diaries(upwork_diaries, work_records):
+    """
+    Match a user's upwork diaries to their work records and compute the time
+    each diary overlaps each matched work record
+    Arguments:
+        upwork_diaries - upwork diaries of a single user
+        work_records - work records of the same user around the diaries
+    Returns:
+        List of (upwork diary, work record, net duration seconds, upwork
+        duration seconds) tuples of the overlapping pairs, where the upwork
+        duration uses the diary bounds rounded to 10 minute segments
+    """
+    index = WorkRecordIntervalIndex(work_records)
+
+    matches = []
+    for upwork_diary in upwork_diaries:
+        for work_record in index.candidates(upwork_diary):
+            # work records in progress do not have end time
+            work_record_end_time_utc = work_record.utc_end_time or datetime.utcnow()
+
+            # calculate intersection between the upwork diary and work record time ranges
+            net_duration_seconds = int((min(work_record_end_time_utc, upwork_diary.utc_end_time) - max(work_record.utc_start_time, upwork_diary.utc_start_time)).total_seconds())
+            if net_duration_seconds <= 0:
+                continue
+
+            # calculate upwork time, as they calculate to the closest 10-minute segment
+            upwork_duration_seconds = int((min(work_record_end_time_utc, upwork_diary.rounded_utc_end_time) - max(work_record.utc_start_time, upwork_diary.rounded_utc_start_time)).total_seconds())
+
+            matches.append((upwork_diary, work_record, net_duration_seconds, upwork_duration_seconds))
+
+    return matches
@@ -0,0 +1,158 @@
+import json
+
+from sqlalchemy.sql import and_, case, literal, or_
+
+from ..models.task import Task, TaskStatus
+from ..models.work import Work, WorkStatus
+from ..models.work_match_index import WorkMatchIndex
+from ..models.work_record import WorkRecord
+from ..utils.db import db
+
+
+# task statuses in which the task's available work may be handed to contributors
+MATCHABLE_TASK_STATUSES = (TaskStatus.PENDING, TaskStatus.IN_PROCESS, TaskStatus.MODIFICATIONS_REQUESTED)
+
+# number of matched skills beyond which a work item is not favoured any further
+MAX_MATCHED_SKILLS = 5
+
+
+def index_work(work):
+    """
+    Create or refresh the matching index entry of a work item. Complete work
+    items are removed from the index since they can never become available again
+    Arguments:
+        work - the work item to index. its task must be loaded or loadable
+    Returns:
+        The index entry or None if the work item was removed from the index
+    """
+    if work.status == WorkStatus.COMPLETE:
+        unindex_work(work)
+        return None
+
+    # new work items need an id before they can be referenced
+    if work.id is None:
+        db.session.flush()
+
+    total_duration_seconds = db.session.query(db.func.sum(WorkRecord.duration_seconds)) \
+        .filter(WorkRecord.work_id == work.id) \
+        .scalar()
+
+    # this is a sort-of normalized sum of work time already invested in the
+    # work item in minutes, or 0.1 if it has never been worked on
+    normalized_duration = min(total_duration_seconds / 60, 10) if total_duration_seconds else 0.1
+
+    entry = WorkMatchIndex.query.filter_by(work_id=work.id).first()
+    if not entry:
+        entry = WorkMatchIndex(work.id, work.task.priority, [], [], normalized_duration)
+        db.session.add(entry)
+
+    entry.priority = work.task.priority
+    entry.tag_ids = sorted(t.id for t in work.tags or [])
+    entry.skill_ids = sorted(s.id for s in work.skills or [])
+    entry.normalized_duration = normalized_duration
+
+    return entry
+
+
+def unindex_work(work):
+    WorkMatchIndex.query.filter_by(work_id=work.id).delete()
+
+
+def match_score(user_skill_ids):
+    """
+    SQL expression of the score of a work item in the random draw of available
+    work for a user, the lower the score the likelier the work is drawn. deduct
+    the matched skills count from 6 so that its order is reversed and so the
+    result is never 0, raise it to a power of 1.5 to increase the distance
+    between the different match amounts and multiply by the task priority
+    distance and the normalized duration. this favours higher priority, more
+    skills matched and less time previously worked
+    """
+    matched_skills = sum(
+        (case((db.func.json_contains(WorkMatchIndex.skill_ids, str(skill_id)), 1), else_=0) for skill_id in sorted(user_skill_ids)),
+        literal(0)
+    )
+
+    return db.func.power(101 - WorkMatchIndex.priority, 2) * \
+        db.func.power(MAX_MATCHED_SKILLS + 1 - db.func.least(matched_skills, MAX_MATCHED_SKILLS), 1.5) * \
+        WorkMatchIndex.normalized_duration
+
+
+def draw_available_work(user, current_work_id=None):
+    """
+    Draw a random available work item for a user out of the matching index,
+    weighted by priority, skill match and time previously worked. the draw
+    happens in the database, so only the drawn work item is loaded
+    Arguments:
+        user - the user to draw work for
+        current_work_id - optional id of work item that should not be drawn
+    Returns:
+        The drawn work item or None if there is no available work for the user
+    """
+    # availability is always checked against the work and task rows themselves
+    # so stale index entries may only affect weights and never eligibility
+    query = Work.query \
+        .join(WorkMatchIndex, Work.id == WorkMatchIndex.work_id) \
+        .join(Task, and_(
+            Work.task_id == Task.id,
+            Task.status.in_(MATCHABLE_TASK_STATUSES)
+        )) \
+        .filter(Work.status == WorkStatus.AVAILABLE) \
+        .filter(Work.reserved_until_epoch_ms == None) \
+        .filter(or_(
+            Work.prohibited_worker_id == None,
+            Work.prohibited_worker_id != user.id
+        ))
+
+    # make sure work is not the current one
+    if current_work_id:
+        query = query.filter(Work.id != current_work_id)
+
+    # filter work by tags if work is tagged
+    untagged = db.func.json_length(WorkMatchIndex.tag_ids) == 0
+    user_tag_ids = sorted(t.id for t in user.tags)
+    if user_tag_ids:
+        query = query.filter(or_(untagged, db.func.json_overlaps(WorkMatchIndex.tag_ids, json.dumps(user_tag_ids))))
+    else:
+        query = query.filter(untagged)
+
+    # weighted random sampling - every candidate gets an exponentially
+    # distributed key with a rate of its weight, the inverse of its score, and
+    # the candidate with the lowest key is drawn with a probability
+    # proportional to its weight
+    draw_key = -db.func.ln(1 - db.func.rand()) * match_score(set(s.id for s in user.skills))
+
+    return query.order_by(draw_key).limit(1).first()
+
+
+def rebuild_work_match_index():
+    """
+    Index all available work items that are missing from the matching index
+    and drop index entries of work that was completed. used to recover from
+    work status changes made outside of the maintained code paths
+    Returns:
+        Tuple of indexed and dropped entry counts
+    """
+    missing_work = Work.query \
+        .outerjoin(WorkMatchIndex, Work.id == WorkMatchIndex.work_id) \
+        .filter(Work.status == WorkStatus.AVAILABLE) \
+        .filter(WorkMatchIndex.work_id == None) \
+        .all()
+
+    for work in missing_work:
+        index_work(work)
+
+    completed_work_ids = db.session.query(WorkMatchIndex.work_id) \
+        .join(Work, Work.id == WorkMatchIndex.work_id) \
+        .filter(Work.status == WorkStatus.COMPLETE) \
+        .all()
+
+    dropped_count = 0
+    if completed_work_ids:
+        dropped_count = WorkMatchIndex.query \
+            .filter(WorkMatchIndex.work_id.in_([w[0] for w in completed_work_ids])) \
+            .delete(synchronize_session=False)
+
+    db.session.commit()
+
+    return len(missing_work), dropped_count
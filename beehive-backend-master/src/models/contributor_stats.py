@@ -0,0 +1,88 @@
+from ..utils.db import db, TimestampMixin
+
+
+class ContributorStats(TimestampMixin, db.Model):
+    """
+    Rollup of a contributor's work statistics, either across all projects (no
+    project id) or for a single project. Refreshed by the contributor stats
+    logic when the contributor's work changes and periodically by a job, so
+    stats endpoints do not need to aggregate raw work records on each request.
+    Time dependent values (eg. time since last work) are derived on read from
+    the stored boundary work record times.
+    """
+    __tablename__ = 'contributor_stats'
+    __table_args__ = (db.UniqueConstraint('user_id', 'project_key', name='_contributor_stats_uc'),)
+
+    id = db.Column(db.Integer(), primary_key=True)
+    user_id = db.Column(db.String(8), db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False, index=True)
+    # projects are identified by their "project:" tag
+    project_id = db.Column(db.Integer(), db.ForeignKey('tag.id', ondelete='CASCADE'), nullable=True, index=True)
+    # non-null project id for the unique key, mysql does not consider rows with
+    # null project ids (rows across all projects) duplicates of each other
+    project_key = db.Column(db.Integer(), db.Computed('coalesce(project_id, 0)', persisted=True), nullable=False)
+
+    active_work_id = db.Column(db.Integer())
+
+    # work record counts
+    total_works = db.Column(db.Integer(), nullable=False)
+    distinct_works = db.Column(db.Integer(), nullable=False)
+    completed_works = db.Column(db.Integer(), nullable=False)
+    skipped_works = db.Column(db.Integer(), nullable=False)
+    works_in_review = db.Column(db.Integer(), nullable=False)
+
+    # reserved work counts
+    reserved_works = db.Column(db.Integer(), nullable=False)
+    reserved_open_works = db.Column(db.Integer(), nullable=False)
+    reserved_works_in_review = db.Column(db.Integer(), nullable=False)
+    cancelled_works = db.Column(db.Integer(), nullable=False)
+
+    # durations and costs
+    gross_duration_works = db.Column(db.Integer(), nullable=False)
+    gross_duration_seconds = db.Column(db.BigInteger(), nullable=False)
+    upwork_diary_count = db.Column(db.Integer(), nullable=False)
+    net_duration_seconds = db.Column(db.BigInteger(), nullable=False)
+    cost = db.Column(db.DECIMAL(precision=14, scale=2), nullable=False)
+
+    # boundary work records
+    first_work_start_time_epoch_ms = db.Column(db.BigInteger())
+    last_engagement_start_time_epoch_ms = db.Column(db.BigInteger())
+    last_engagement_duration_seconds = db.Column(db.Integer())
+    last_work_start_time_epoch_ms = db.Column(db.BigInteger())
+    last_work_duration_seconds = db.Column(db.Integer())
+
+    user = db.relationship('User', backref=db.backref('contributor_stats', lazy='select', cascade='all,delete'), innerjoin=True)
+
+    def __init__(self, user_id, project_id=None):
+        self.user_id = user_id
+        self.project_id = project_id
+        self.active_work_id = None
+        self.total_works = 0
+        self.distinct_works = 0
+        self.completed_works = 0
+        self.skipped_works = 0
+        self.works_in_review = 0
+        self.reserved_works = 0
+        self.reserved_open_works = 0
+        self.reserved_works_in_review = 0
+        self.cancelled_works = 0
+        self.gross_duration_works = 0
+        self.gross_duration_seconds = 0
+        self.upwork_diary_count = 0
+        self.net_duration_seconds = 0
+        self.cost = 0
+        self.first_work_start_time_epoch_ms = None
+        self.last_engagement_start_time_epoch_ms = None
+        self.last_engagement_duration_seconds = None
+        self.last_work_start_time_epoch_ms = None
+        self.last_work_duration_seconds = None
+
+    @staticmethod
+    def project_key_of(project_id):
+        """
+        The project key of the rows of a project, or of the rows across all
+        projects when project_id is None
+        """
+        return project_id or 0
+
+    def __repr__(self):
+        return f'<ContributorStats user {self.user_id} project {self.project_id}>'
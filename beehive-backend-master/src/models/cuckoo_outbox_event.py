@@ -0,0 +1,40 @@
+from datetime import datetime
+import enum
+
+from ..utils.db import db, TimestampMixin
+
+
+class CuckooOutboxEventStatus(int, enum.Enum):
+    PENDING = 1
+    DELIVERED = 2
+    DEAD = 3
+
+
+class CuckooOutboxEvent(TimestampMixin, db.Model):
+    """
+    Cuckoo event waiting to be delivered. events are added in the same
+    transaction as the state change they describe and delivered by the cuckoo
+    outbox job in id order per task
+    """
+    __tablename__ = 'cuckoo_outbox_event'
+    __table_args__ = (db.Index('ix_cuckoo_outbox_event_status_id', 'status', 'id'),)
+
+    id = db.Column(db.Integer(), primary_key=True)
+    # no foreign key so events outlive the task they describe
+    task_id = db.Column(db.String(8), nullable=False, index=True)
+    payload = db.Column(db.JSON(), nullable=False)
+    status = db.Column(db.Enum(CuckooOutboxEventStatus), nullable=False)
+    attempts = db.Column(db.Integer(), nullable=False)
+    next_attempt = db.Column(db.DateTime, nullable=False)
+    delivered = db.Column(db.DateTime)
+
+    def __init__(self, task_id, payload):
+        self.task_id = task_id
+        self.payload = payload
+        self.status = CuckooOutboxEventStatus.PENDING
+        self.attempts = 0
+        self.next_attempt = datetime.utcnow()
+        self.delivered = None
+
+    def __repr__(self):
+        return f'<CuckooOutboxEvent {self.id} task {self.task_id} {self.status.name}>'
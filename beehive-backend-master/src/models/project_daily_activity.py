@@ -0,0 +1,44 @@
+from ..utils.db import db, TimestampMixin
+
+
+class ProjectDailyActivity(TimestampMixin, db.Model):
+    """
+    Rollup of a project's activity on a single day. Rows are recomputed from
+    tasks and work by the project activity logic when a project's tasks or work
+    change and periodically by a job, so the project activity endpoint reads
+    any date range without aggregating raw tasks and work on each request.
+    Days without any activity have no row.
+    """
+    __tablename__ = 'project_daily_activity'
+    __table_args__ = (db.UniqueConstraint('project_id', 'date', name='_project_daily_activity_uc'),)
+
+    id = db.Column(db.Integer(), primary_key=True)
+    # projects are identified by their "project:" tag
+    project_id = db.Column(db.Integer(), db.ForeignKey('tag.id', ondelete='CASCADE'), nullable=False)
+    date = db.Column(db.Date(), nullable=False)
+
+    tasks_delegated = db.Column(db.Integer(), nullable=False)
+    tasks_accepted = db.Column(db.Integer(), nullable=False)
+    works_completed = db.Column(db.Integer(), nullable=False)
+    works_reviewed = db.Column(db.Integer(), nullable=False)
+
+    # ids of the tasks contributing to each count
+    tasks_delegated_task_ids = db.Column(db.JSON(), nullable=False)
+    tasks_accepted_task_ids = db.Column(db.JSON(), nullable=False)
+    works_completed_task_ids = db.Column(db.JSON(), nullable=False)
+    works_reviewed_task_ids = db.Column(db.JSON(), nullable=False)
+
+    def __init__(self, project_id, date):
+        self.project_id = project_id
+        self.date = date
+        self.tasks_delegated = 0
+        self.tasks_accepted = 0
+        self.works_completed = 0
+        self.works_reviewed = 0
+        self.tasks_delegated_task_ids = []
+        self.tasks_accepted_task_ids = []
+        self.works_completed_task_ids = []
+        self.works_reviewed_task_ids = []
+
+    def __repr__(self):
+        return f'<ProjectDailyActivity project {self.project_id} date {self.date}>'
@@ -1,6 +1,4 @@
-from sqlalchemy.orm.exc import NoResultFound
-
-from ..utils.db import db
+from ..utils.db import CatalogueMixin, db
 
 
 class UserSkill(db.Model):
@@ -66,7 +64,7 @@ class TaskTemplateSkill(db.Model):
         return f'<TaskTemplateSkill template {self.task_template_id} skill {self.skill_id}>'
 
 
-class Skill(db.Model):
+class Skill(CatalogueMixin, db.Model):
     id = db.Column(db.Integer(), primary_key=True) 
     name = db.Column(db.String(64), nullable=False, index=True)
 
@@ -80,12 +78,3 @@ class Skill(db.Model):
     def __repr__(self):
         return self.name
 
-    @staticmethod
-    def get_or_create(name):
-        try:
-            obj = Skill.query.filter_by(name=name).one()
-        except NoResultFound:
-            obj = Skill(name=name)
-            db.session.add(obj)
-
-        return obj
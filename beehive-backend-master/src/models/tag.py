@@ -1,6 +1,4 @@
-from sqlalchemy.orm.exc import NoResultFound
-
-from ..utils.db import db
+from ..utils.db import CatalogueMixin, db
 
 
 class UserTag(db.Model):
@@ -51,7 +49,7 @@ class TaskTag(db.Model):
         return f'<TaskTag task {self.task_id} tag {self.tag_id}>'
 
 
-class Tag(db.Model):
+class Tag(CatalogueMixin, db.Model):
     id = db.Column(db.Integer(), primary_key=True)
     name = db.Column(db.String(64), nullable=False, index=True)
 
@@ -65,12 +63,3 @@ class Tag(db.Model):
     def __repr__(self):
         return self.name
 
-    @staticmethod
-    def get_or_create(name):
-        try:
-            obj = Tag.query.filter_by(name=name).one()
-        except NoResultFound:
-            obj = Tag(name=name)
-            db.session.add(obj)
-
-        return obj
@@ -1,11 +1,16 @@
 from datetime import datetime, timedelta
 import json
 
-from sqlalchemy import ColumnElement
+from sqlalchemy import ColumnElement, and_, case
+from sqlalchemy.dialects.mysql import insert
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm.exc import NoResultFound
 
-from ..utils.db import db, TimestampMixin
+from ..utils.db import db, TimestampMixin, utc_from_epoch_seconds
+
+
+# number of rows sent in a single bulk upsert statement
+UPSERT_CHUNK_SIZE = 500
 
 
 class WorkRecordUpworkDiary(db.Model):
@@ -59,9 +64,34 @@ class WorkRecordUpworkDiary(db.Model):
 
         return obj
 
+    @staticmethod
+    def upsert_many(values):
+        """
+        Inserts new WorkRecordUpworkDiary rows or updates existing ones (according to the unique index)
+        with bulk INSERT ... ON DUPLICATE KEY UPDATE statements
+        Caller of the method must call db.session.commit() for the changes in this method to be saved to database
+        Arguments:
+            values - list of dictionaries of work_record_id, upwork_diary_id, net_duration_seconds, cost,
+            upwork_duration_seconds and upwork_cost
+        """
+        for i in range(0, len(values), UPSERT_CHUNK_SIZE):
+            stmt = insert(WorkRecordUpworkDiary).values(values[i:i + UPSERT_CHUNK_SIZE])
+            stmt = stmt.on_duplicate_key_update(
+                net_duration_seconds=stmt.inserted.net_duration_seconds,
+                cost=stmt.inserted.cost,
+                upwork_duration_seconds=stmt.inserted.upwork_duration_seconds,
+                upwork_cost=stmt.inserted.upwork_cost
+            )
+            db.session.execute(stmt)
+
 
 class UpworkDiary(TimestampMixin, db.Model):
-    __table_args__ = (db.UniqueConstraint('upwork_user_id', 'start_time_epoch_ms', name='_upwork_diary_uc'),)
+    __table_args__ = (
+        db.UniqueConstraint('upwork_user_id', 'start_time_epoch_ms', name='_upwork_diary_uc'),
+        db.Index('ix_upwork_diary_user_id_start_time_utc', 'user_id', 'start_time_utc'),
+        db.Index('ix_upwork_diary_start_time_utc_end_time_utc', 'start_time_utc', 'end_time_utc'),
+        db.Index('ix_upwork_diary_rounded_start_time_utc_rounded_end_time_utc', 'rounded_start_time_utc', 'rounded_end_time_utc'),
+    )
 
     id = db.Column(db.Integer(), primary_key=True, autoincrement=True)
     user_id = db.Column(db.String(8), db.ForeignKey('user.id', ondelete='CASCADE'), nullable=True, index=True)
@@ -72,6 +102,13 @@ class UpworkDiary(TimestampMixin, db.Model):
     duration_min = db.Column(db.Integer)
     description = db.Column(db.Text)
 
+    # stored utc times generated from the epoch fields so time range filters can use indexes. the
+    # rounded times are the bounds of the 10 minute upwork segments the diary covers
+    start_time_utc = db.Column(db.DateTime(), db.Computed(utc_from_epoch_seconds('start_time_epoch_ms div 1000'), persisted=True))
+    end_time_utc = db.Column(db.DateTime(), db.Computed(utc_from_epoch_seconds('end_time_epoch_ms div 1000'), persisted=True))
+    rounded_start_time_utc = db.Column(db.DateTime(), db.Computed(utc_from_epoch_seconds('start_time_epoch_ms div 600000 * 600'), persisted=True))
+    rounded_end_time_utc = db.Column(db.DateTime(), db.Computed(utc_from_epoch_seconds('ceil(end_time_epoch_ms / 600000) * 600'), persisted=True))
+
     user = db.relationship('User', backref=db.backref('upwork_records', lazy='select', cascade='all,delete'), innerjoin=True, foreign_keys=[user_id])
 
     def __init__(self, user_id, upwork_user_id, upwork_user_name, start_time_epoch_ms, end_time_epoch_ms, duration_min, description):
@@ -112,6 +149,53 @@ class UpworkDiary(TimestampMixin, db.Model):
 
         return obj
 
+    @staticmethod
+    def upsert_many(values):
+        """
+        Inserts new UpworkDiary rows or updates existing ones (according to the unique index) with bulk
+        INSERT ... ON DUPLICATE KEY UPDATE statements. like insert_or_update the upwork user name of
+        existing rows is kept, and their updated time only changes when any value did
+        Caller of the method must call db.session.commit() for the changes in this method to be saved to database
+        Arguments:
+            values - list of dictionaries of user_id, upwork_user_id, upwork_user_name, start_time_epoch_ms,
+            end_time_epoch_ms, duration_min and description
+        Returns:
+            List of the upserted UpworkDiary objects, in no particular order
+        """
+        if not values:
+            return []
+
+        now = datetime.utcnow()
+        for i in range(0, len(values), UPSERT_CHUNK_SIZE):
+            stmt = insert(UpworkDiary).values([dict(v, created=now) for v in values[i:i + UPSERT_CHUNK_SIZE]])
+            # mysql assigns in order, so updated is compared against the existing values before they change
+            stmt = stmt.on_duplicate_key_update([
+                ('updated', case(
+                    (and_(
+                        UpworkDiary.user_id.is_not_distinct_from(stmt.inserted.user_id),
+                        UpworkDiary.end_time_epoch_ms == stmt.inserted.end_time_epoch_ms,
+                        UpworkDiary.duration_min.is_not_distinct_from(stmt.inserted.duration_min),
+                        UpworkDiary.description.is_not_distinct_from(stmt.inserted.description)
+                    ), UpworkDiary.updated),
+                    else_=now
+                )),
+                ('user_id', stmt.inserted.user_id),
+                ('end_time_epoch_ms', stmt.inserted.end_time_epoch_ms),
+                ('duration_min', stmt.inserted.duration_min),
+                ('description', stmt.inserted.description)
+            ])
+            db.session.execute(stmt)
+
+        # read the rows back by their unique key to get their ids
+        keys = set((v['upwork_user_id'], v['start_time_epoch_ms']) for v in values)
+        diaries = UpworkDiary.query \
+            .filter(UpworkDiary.upwork_user_id.in_(set(k[0] for k in keys))) \
+            .filter(UpworkDiary.start_time_epoch_ms.in_(set(k[1] for k in keys))) \
+            .execution_options(populate_existing=True) \
+            .all()
+
+        return [d for d in diaries if (d.upwork_user_id, d.start_time_epoch_ms) in keys]
+
     @hybrid_property
     def utc_start_time(self) -> datetime:
         return datetime.utcfromtimestamp(self.start_time_epoch_ms / 1000)
@@ -119,7 +203,7 @@ class UpworkDiary(TimestampMixin, db.Model):
     @utc_start_time.inplace.expression
     @classmethod
     def _utc_start_time(cls) -> ColumnElement[datetime]:
-        return db.func.from_unixtime(cls.start_time_epoch_ms / 1000)
+        return cls.start_time_utc
 
     @hybrid_property
     def utc_end_time(self) -> datetime:
@@ -128,7 +212,7 @@ class UpworkDiary(TimestampMixin, db.Model):
     @utc_end_time.inplace.expression
     @classmethod
     def _utc_end_time(cls) -> ColumnElement[datetime]:
-        return db.func.from_unixtime(cls.end_time_epoch_ms / 1000)
+        return cls.end_time_utc
 
     ## upwork round start time to past 10-minute time
     @hybrid_property
@@ -138,9 +222,7 @@ class UpworkDiary(TimestampMixin, db.Model):
     @rounded_utc_start_time.inplace.expression
     @classmethod
     def _rounded_utc_start_time(cls) -> ColumnElement[datetime]:
-        return db.func.from_unixtime(
-            db.func.truncate(cls.start_time_epoch_ms / 1000 / 600, 0) * 600
-        )
+        return cls.rounded_start_time_utc
 
     ## upwork round end time to next 10-minute time
     @hybrid_property
@@ -150,9 +232,7 @@ class UpworkDiary(TimestampMixin, db.Model):
     @rounded_utc_end_time.inplace.expression
     @classmethod
     def _rounded_utc_end_time(cls) -> ColumnElement[datetime]:
-        return db.func.from_unixtime(
-            db.func.ceil(cls.end_time_epoch_ms / 1000 / 600) * 600
-        )
+        return cls.rounded_end_time_utc
 
     @hybrid_property
     def duration_string(self) -> str:
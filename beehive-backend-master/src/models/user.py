@@ -5,7 +5,8 @@ from flask import current_app
 from sqlalchemy import ColumnElement
 from sqlalchemy.ext.hybrid import hybrid_property
 
-from ..utils.db import db, RandomStringIdMixin, TimestampMixin
+from ..utils.db import db, add_with_random_ids, RandomStringIdMixin, TimestampMixin
+from .project import ProjectDelegator
 from .tag import UserTag
 from .skill import UserSkill
 
@@ -29,6 +30,7 @@ class User(TimestampMixin, RandomStringIdMixin, db.Model):
 
     tags = db.relationship('Tag', secondary=UserTag.__table__, lazy='select', back_populates='users')
     skills = db.relationship('Skill', secondary=UserSkill.__table__, lazy='select', back_populates='users')
+    project_delegators = db.relationship(ProjectDelegator, lazy='select', viewonly=True)
 
     def __init__(
         self, email, hashed_password, first_name, last_name, github_user, trello_user,
@@ -73,7 +75,7 @@ class User(TimestampMixin, RandomStringIdMixin, db.Model):
         )
 
         # add and commit here since hashed_password should only be available inside this class
-        db.session.add(new_user)
+        add_with_random_ids([new_user])
         db.session.commit()
 
         # success
@@ -0,0 +1,31 @@
+from ..utils.db import db
+
+
+class WorkMatchIndex(db.Model):
+    """
+    Precomputed matching features of a work item, used to draw available work
+    for contributors without joining and sorting the whole work table.
+    Conceptually an extension of the work model, maintained by the work matching
+    logic whenever work is created, finished or re-prioritized.
+    """
+    __tablename__ = 'work_match_index'
+
+    work_id = db.Column(db.Integer(), db.ForeignKey('work.id', ondelete='CASCADE'), primary_key=True)
+    priority = db.Column(db.SmallInteger(), nullable=False)
+    tag_ids = db.Column(db.JSON, nullable=False)
+    skill_ids = db.Column(db.JSON, nullable=False)
+    # sum of work time already invested in the work in minutes, capped at 10
+    # minutes, or 0.1 if the work has never been worked on
+    normalized_duration = db.Column(db.Float(), nullable=False)
+
+    work = db.relationship('Work', backref=db.backref('match_index', lazy='select', uselist=False, cascade='all,delete'), innerjoin=True)
+
+    def __init__(self, work_id, priority, tag_ids, skill_ids, normalized_duration):
+        self.work_id = work_id
+        self.priority = priority
+        self.tag_ids = tag_ids
+        self.skill_ids = skill_ids
+        self.normalized_duration = normalized_duration
+
+    def __repr__(self):
+        return f'<WorkMatchIndex work {self.work_id}>'
@@ -7,9 +7,9 @@ from sqlalchemy import ColumnElement
 from sqlalchemy.ext.hybrid import hybrid_property, hybrid_method
 
 from .user import User
-from ..utils.db import db, TimestampMixin
+from ..utils.db import db, TimestampMixin, utc_from_epoch_seconds
 
-from ..logic.praesepe import get_rating_items
+from ..logic.praesepe import get_rating_items, get_rating_items_by_object_key
 
 
 class SolutionRating(int, enum.Enum):
@@ -28,6 +28,11 @@ class WorkOutcome(int, enum.Enum):
 
 
 class WorkRecord(TimestampMixin, db.Model):
+    __table_args__ = (
+        db.Index('ix_work_record_user_id_start_time_utc', 'user_id', 'start_time_utc'),
+        db.Index('ix_work_record_start_time_utc_end_time_utc', 'start_time_utc', 'end_time_utc'),
+    )
+
     id = db.Column(db.Integer(), primary_key=True)  # sqlalchemy sets only-primary-key-integer field to auto increments
     user_id = db.Column(db.String(8), db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False, index=True)
     work_id = db.Column(db.Integer, db.ForeignKey('work.id'), nullable=False, index=True)
@@ -46,6 +51,10 @@ class WorkRecord(TimestampMixin, db.Model):
     review_duration_seconds = db.Column(db.Integer, nullable=True)
     review_user_id = db.Column(db.String(8), db.ForeignKey('user.id', ondelete='CASCADE'), nullable=True, index=True)
 
+    # stored utc times generated from the epoch fields so time range filters can use indexes
+    start_time_utc = db.Column(db.DateTime(), db.Computed(utc_from_epoch_seconds('start_time_epoch_ms div 1000'), persisted=True))
+    end_time_utc = db.Column(db.DateTime(), db.Computed(utc_from_epoch_seconds('start_time_epoch_ms div 1000 + duration_seconds'), persisted=True))
+
     work = db.relationship('Work', backref=db.backref('work_records', lazy='select', cascade='all,delete'), innerjoin=True)
     user = db.relationship('User', backref=db.backref('work_records', lazy='select', cascade='all,delete'), innerjoin=True, foreign_keys=[user_id])
 
@@ -68,7 +77,7 @@ class WorkRecord(TimestampMixin, db.Model):
     @utc_start_time.inplace.expression
     @classmethod
     def _utc_start_time(cls) -> ColumnElement[datetime]:
-        return db.func.from_unixtime(cls.start_time_epoch_ms / 1000)
+        return cls.start_time_utc
 
     @hybrid_property
     def utc_end_time(self) -> Optional[datetime]:
@@ -79,11 +88,8 @@ class WorkRecord(TimestampMixin, db.Model):
 
     @utc_end_time.inplace.expression
     @classmethod
-    def utc_end_time(cls) -> ColumnElement[Optional[str]]:
-        if (cls.duration_seconds is None) is True:
-            return None
-
-        return db.func.from_unixtime(cls.start_time_epoch_ms / 1000 + cls.duration_seconds)
+    def utc_end_time(cls) -> ColumnElement[Optional[datetime]]:
+        return cls.end_time_utc
 
     @hybrid_method
     def start_time_diff_sec(self, other) -> int:
@@ -138,3 +144,22 @@ class WorkRecord(TimestampMixin, db.Model):
 
         ratings = get_rating_items(target_user, [object_key])
         return ratings
+
+    @staticmethod
+    def load_ratings(work_records):
+        """
+        Set the ratings of a number of work records for display, fetching the
+        ratings of each target user with a single praesepe request. ratings may be
+        served from the ratings cache, so get_ratings should be used when checking
+        whether a work record was just rated
+        Arguments:
+            work_records - the work records to set the ratings attribute of
+        """
+        work_records_by_user = {}
+        for work_record in work_records:
+            work_records_by_user.setdefault(work_record.user_id, []).append(work_record)
+
+        for user_id, user_work_records in work_records_by_user.items():
+            ratings = get_rating_items_by_object_key(user_id, [wr.rating_object_key for wr in user_work_records])
+            for work_record in user_work_records:
+                work_record.ratings = ratings[work_record.rating_object_key]
@@ -5,6 +5,7 @@ from flask import current_app
 from flask.views import MethodView
 from sqlalchemy.orm import joinedload
 
+from ..logic.work_matching import index_work
 from ..models.task import Task, TaskStatus
 from ..models.work import Work, WorkStatus
 from ..models.work_record import WorkRecord
@@ -30,8 +31,10 @@ from ..schemas.backoffice import (
     DiaryLogRequestSchema
 )
 from ..utils.auth import inner_auth
-from ..utils.db import db
+from ..utils.catalogue_cache import catalogue_cache
+from ..utils.db import add_with_random_ids, db
 from ..utils.errors import abort
+from ..utils.jwt import invalidate_cached_user
 from ..utils.marshmallow import parser
 
 
@@ -67,6 +70,11 @@ class WorkUpdatePriority(MethodView):
         task = Task.query.filter_by(id=work.task_id).first()
         task.priority = priority
         work.priority = priority
+
+        # work is matched by its task's priority so refresh all of the task's work
+        for task_work in task.works:
+            index_work(task_work)
+
         db.session.commit()
 
         return EmptyResponseSchema().jsonify()
@@ -83,7 +91,7 @@ class UserCodeCreate(MethodView):
 
         # create user code
         new_user_code = UserCode(code_type=UserCodeType.REGISTRATION, expires=expires_at)
-        db.session.add(new_user_code)
+        add_with_random_ids([new_user_code])
         db.session.commit()
 
         return CreateUserCodeResponseSchema().jsonify({'code': new_user_code.id})
@@ -159,6 +167,7 @@ class BackofficeUserProfile(MethodView):
         
         db.session.commit()
         db.session.refresh(user)
+        invalidate_cached_user(user_id)
         return BackofficeUserProfileResponseSchema().jsonify({
             'id': user.id,
             'email': user.email,
@@ -205,6 +214,7 @@ class BackofficeUserProfile(MethodView):
 
         db.session.commit()
         db.session.refresh(user)
+        invalidate_cached_user(user_id)
         return BackofficeUserProfileResponseSchema().jsonify({
             'id': user.id,
             'email': user.email,
@@ -250,6 +260,7 @@ class TagCRUD(MethodView):
         new_tag = Tag(tag_name)
         db.session.add(new_tag)
         db.session.commit()
+        catalogue_cache.invalidate(Tag)
 
         return EmptyResponseSchema().jsonify()
 
@@ -268,6 +279,7 @@ class TagCRUD(MethodView):
 
         db.session.delete(tag)
         db.session.commit()
+        catalogue_cache.invalidate(Tag)
 
         return EmptyResponseSchema().jsonify()
 
@@ -290,6 +302,7 @@ class SkillCRUD(MethodView):
         new_skill = Skill(skill_name)
         db.session.add(new_skill)
         db.session.commit()
+        catalogue_cache.invalidate(Skill)
 
         return EmptyResponseSchema().jsonify()
 
@@ -308,6 +321,7 @@ class SkillCRUD(MethodView):
 
         db.session.delete(skill)
         db.session.commit()
+        catalogue_cache.invalidate(Skill)
 
         return EmptyResponseSchema().jsonify()
 
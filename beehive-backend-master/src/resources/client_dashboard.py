@@ -1,13 +1,12 @@
 from flask.views import MethodView
 from flask import current_app
-from flask_jwt_extended import get_jwt_identity
+from flask_jwt_extended import current_user, get_jwt_identity
 from sqlalchemy.sql import label
 import json
 import ast
 
-from ..models.user import User
 from ..utils.errors import abort
-from ..logic.cuckoo import get_card, get_trello_card_link
+from ..logic.trello_links import get_quest_cards
 from ..models.diary_log import DiaryLog, ExternalUserRole, UserRole
 from ..models.project import Project, ProjectDelegator
 from ..models.quest import Quest
@@ -31,12 +30,9 @@ class ListClientRepositories(MethodView):
     @activated_jwt_required
     def get(self):
         user_id = get_jwt_identity()
-        user = User.query.filter_by(id=user_id).first()
-        if not user:
-            raise Exception('user not found')
         
         repos = None
-        if user.admin:
+        if current_user.admin:
             repos = Repository.query \
                 .join(Project, Repository.project_id == Project.id ) \
                 .all()
@@ -55,18 +51,8 @@ class ProjectWorkTimeReview(MethodView):
     @parser.use_args(ProjectRequestSchema(), as_kwargs=True, location='querystring')
     def get(self, project_id):
         
-        user_id = get_jwt_identity()
-        user = User.query.filter_by(id=user_id).first()
-        if not user:
-            raise Exception('user not found')
-        
-        if not user.admin:
-            project = ProjectDelegator.query \
-                .filter(ProjectDelegator.user_id == user_id) \
-                .filter(ProjectDelegator.project_id == project_id) \
-                .first()
-            if not project:
-                abort(401)
+        if not current_user.admin and project_id not in [d.project_id for d in current_user.project_delegators]:
+            abort(401)
         
         
         
@@ -126,37 +112,35 @@ class ProjectQuests(MethodView):
     @parser.use_args(ProjectRequestSchema(), as_kwargs=True, location='querystring')
     def get(self, project_id, page, results_per_page):
         
-        user_id = get_jwt_identity()
-        user = User.query.filter_by(id=user_id).first()
-        if not user:
-            raise Exception('user not found')
-        
-        if not user.admin:
-            project = ProjectDelegator.query \
-                .filter(ProjectDelegator.user_id == user_id) \
-                .filter(ProjectDelegator.project_id == project_id) \
-                .first()
-            if not project:
-                abort(401)
+        if not current_user.admin and project_id not in [d.project_id for d in current_user.project_delegators]:
+            abort(401)
         
         quests = Quest.query \
             .filter(Quest.project_id == project_id) \
             .order_by(Quest.created.desc()) \
             .paginate(page=page, per_page=results_per_page, error_out=False)
                     
-        client_quests = []
-        for quest in quests:
-            net_time = db.session.query(db.func.sum(WorkRecordUpworkDiary.net_duration_seconds)) \
+        quest_ids = [quest.id for quest in quests]
+
+        quests_net_time = dict(db.session.query(Task.quest_id, db.func.sum(WorkRecordUpworkDiary.net_duration_seconds)) \
             .join(WorkRecord, WorkRecordUpworkDiary.work_record_id == WorkRecord.id) \
             .join(WorkRecord.work) \
             .join(Work.task) \
-            .filter(Task.quest_id == quest.id) \
-            .scalar()
+            .filter(Task.quest_id.in_(quest_ids)) \
+            .group_by(Task.quest_id) \
+            .all()) if quest_ids else {}
+
+        # fetch the quests' trello cards concurrently
+        trello_cards = get_quest_cards(quest_ids)
+
+        client_quests = []
+        for quest in quests:
+            net_time = quests_net_time.get(quest.id)
 
             iteration = None
             progress = None
             trello_link = None
-            trello_card = get_card(quest.id)
+            trello_card = trello_cards.get(quest.id)
             
             # the following extracts the checklists json from the card object then 
             # assigns the iteration as the length of lists
@@ -4,12 +4,11 @@ from flask.views import MethodView
 from sqlalchemy import and_
 from sqlalchemy.sql import label
 from sqlalchemy.orm import aliased
-from flask_jwt_extended import get_jwt_identity
+from flask_jwt_extended import current_user, get_jwt_identity
 
 
 from ..jobs.task import prepare_cuckoo_task
 from ..models.project import Project, ProjectDelegator
-from ..models.user import User
 from ..models.repository import Repository
 from ..models.skill import Skill, TaskTemplateSkill
 from ..models.task_template import TaskTemplate
@@ -35,7 +34,7 @@ from ..schemas.delegation import (
     UpsertTemplateRequestSchema,
 )
 from ..utils.auth import activated_jwt_required
-from ..utils.db import db
+from ..utils.db import add_with_random_ids, db
 from ..utils.marshmallow import parser
 
 class DelegationTemplateCRUD(MethodView):
@@ -48,7 +47,7 @@ class DelegationTemplateCRUD(MethodView):
             repository_id=repository_id, 
             task_type=task_type,
             task_classification=task_classification,
-            skills=[Skill.get_or_create(s) for s in skills or []],
+            skills=Skill.get_or_create_many(skills or []),
         )
         db.session.add(template)
         db.session.commit()
@@ -74,7 +73,7 @@ class DelegationTemplateCRUD(MethodView):
             template_skills = TaskTemplateSkill.query.filter_by(task_template_id=template_id).all()
             for ts in template_skills:
                 db.session.delete(ts)
-            sk =  [Skill.get_or_create(s) for s in skills or []]
+            sk = Skill.get_or_create_many(skills or [])
             db.session.commit()
             for s in sk:
                 template_skill = TaskTemplateSkill(task_template_id=template_id, skill_id=s.id)
@@ -131,9 +130,7 @@ class DelegateTask(MethodView):
     @parser.use_args(DelegateTaskRequestSchema(), as_kwargs=True)
     def post(self, description, title, repository_id, task_classification=None, type=TaskType.CUCKOO_CODING, priority=2, tags=None, skills=None, feature=None, chain_review=False, max_chain_iterations=None, chain_description=None, delegation_time_seconds=None, context=None):
         user_id = get_jwt_identity()
-        user = User.query.filter_by(id=user_id).first()
-        if not user:
-            abort(404)
+        user = current_user
 
         repository = Repository.query \
             .filter(Repository.id == repository_id) \
@@ -175,14 +172,13 @@ class DelegateTask(MethodView):
                 task_type=type,
                 priority=priority,
                 delegation_time_seconds=delegation_time_seconds,
-                tags=[Tag.get_or_create(t) for t in task_tags or []],
-                skills=[Skill.get_or_create(s) for s in skills or []],
+                tags=Tag.get_or_create_many(task_tags or []),
+                skills=Skill.get_or_create_many(skills or []),
                 advanced_options=advanced_options,
                 repository_id=repository_id
                 
             )
-            db.session.add(task)
-            db.session.flush()
+            add_with_random_ids([task])
             if task_classification != None:
                 task_classification_enum = TaskTypeClassification(task_classification)
                 task_classification = TaskClassification(task.id, task_classification_enum)
@@ -190,8 +186,7 @@ class DelegateTask(MethodView):
                 db.session.flush()
 
             if context != None:
-                [TaskContext.create(c['file'], c['entity'], c['potential_use'], task.id) for c in context or []]
-                db.session.flush()
+                add_with_random_ids([TaskContext(c['file'], c['entity'], c['potential_use'], task.id) for c in context or []])
 
             # schedule job to prepare the work item
             prepare_cuckoo_task.queue(
@@ -231,9 +226,7 @@ class DelegateQuest(MethodView):
     @parser.use_args(DelegateQuestRequestSchema(), as_kwargs=True)
     def post(self, description, title, project_id, quest_type=QuestType.FEATURE, success_criteria=None, links=None, delegation_time_seconds=None):
         user_id = get_jwt_identity()
-        user = User.query.filter_by(id=user_id).first()
-        if not user:
-            abort(404)
+        user = current_user
 
         project = Project.query \
             .filter(Project.id == project_id) \
@@ -256,14 +249,13 @@ class DelegateQuest(MethodView):
                 project_id=project_id,
                 delegation_time_seconds=delegation_time_seconds
             )
-            db.session.add(quest)
-            db.session.flush()   # Flush to get the quest.id
+            add_with_random_ids([quest])   # Flush to get the quest.id
 
             if success_criteria and len(success_criteria) > 0:
-                for sc in success_criteria:
-                    criter = SuccessCriteria(quest.id, sc.get('description'), sc.get('title'), sc.get('explanation', None))
-                    db.session.add(criter)
-            db.session.flush()
+                add_with_random_ids([
+                    SuccessCriteria(quest.id, sc.get('description'), sc.get('title'), sc.get('explanation', None))
+                    for sc in success_criteria
+                ])
 
             # notify cuckoo that a quest was created to create the corresponding trello card
             payload = {
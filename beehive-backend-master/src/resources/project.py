@@ -1,14 +1,17 @@
-from datetime import date, timedelta, datetime
+from datetime import timedelta, datetime
 from flask import current_app
 from flask.views import MethodView
 
+from sqlalchemy.orm import selectinload
 from sqlalchemy.sql import label
 
 
-from ..logic.cuckoo import get_trello_card_link
-from ..logic.project import parse_links
+from ..logic.project_activity import ACTIVITY_COLUMNS, get_project_activity
+from ..logic.trello_links import get_task_card_links
+from ..models.contributor_stats import ContributorStats
 from ..models.diary_log import DiaryLog, ExternalUserRole, UserRole
 from ..models.project import Project
+from ..models.project_daily_activity import ProjectDailyActivity
 from ..models.tag import Tag, TaskTag
 from ..models.task import Task, TaskStatus, TaskType
 from ..models.upwork import WorkRecordUpworkDiary
@@ -18,6 +21,7 @@ from ..models.work_record import WorkRecord
 from ..resources.shared_queries import get_contributor_stats_specific_project
 from ..schemas.project import (
     ListProjectsResponseSchema,
+    ProjectActivityRequestSchema,
     ProjectActivityResponseSchema,
     ProjectBudgetReviewSchema,
     ProjectContributorsResponseSchema,
@@ -29,10 +33,12 @@ from ..schemas.project import (
 from ..utils.auth import admin_jwt_required
 from ..utils.db import db
 from ..utils.marshmallow import parser
+from ..utils.response_cache import STATS_TAG, cached_response, project_tag
 
 
 class ListProjects(MethodView):
     @admin_jwt_required
+    @cached_response(STATS_TAG)
     def get(self):
         current_app.logger.info('Listing Projects')
 
@@ -53,6 +59,7 @@ class ListProjects(MethodView):
 
 class ProjectQueue(MethodView):
     @admin_jwt_required
+    @cached_response(lambda project_id: project_tag(project_id))
     @parser.use_args(ProjectQueueRequestSchema(), as_kwargs=True, location='querystring')
     def get(self, project_id):
         current_app.logger.info('Fetching ProjectQueue')
@@ -75,7 +82,7 @@ class ProjectQueue(MethodView):
         in_review = [t for t in tasks if (t[0] in [TaskStatus.SOLVED] and t[1] != WorkStatus.UNAVAILABLE) or (t[0] in [TaskStatus.INVALID])]
         in_progress = [t for t in tasks if t[0] in ([TaskStatus.IN_PROCESS])]
 
-        trello_links = get_trello_card_link([t[2] for t in tasks])
+        trello_links = get_task_card_links([t[2] for t in tasks])
         pending_trello_links = [l for l in trello_links if l['task_id'] in [t[2] for t in pending]]
         in_progress_trello_links = [l for l in trello_links if l['task_id'] in [t[2] for t in in_progress]]
         in_review_trello_links = [l for l in trello_links if l['task_id'] in [t[2] for t in in_review]]
@@ -91,75 +98,41 @@ class ProjectQueue(MethodView):
 
 class ProjectActivity(MethodView):
     @admin_jwt_required
-    @parser.use_args(ProjectRequestSchema(), as_kwargs=True, location='querystring')
-    def get(self, project_id):
-        current_app.logger.info('Fetching ProjectActivity') 
-        n = 100
-        n_days_ago = date.today() - timedelta(days=n)
+    @cached_response(lambda project_id: project_tag(project_id))
+    @parser.use_args(ProjectActivityRequestSchema(), as_kwargs=True, location='querystring')
+    def get(self, project_id, start_date=None, end_date=None, days=100):
+        current_app.logger.info('Fetching ProjectActivity')
 
-        tasks_delegated = db.session.query(db.func.date_format(Task.created, '%Y-%m-%d'), db.func.count(), db.func.group_concat(Task.id)) \
-            .filter(Task.tags.any(TaskTag.tag_id == project_id)) \
-            .filter(Task.created > n_days_ago) \
-            .group_by(db.func.date_format(Task.created, '%Y-%m-%d')) \
-            .all()
+        # the window ends today unless given and spans the given number of days
+        # unless a start date is given
+        end_date = end_date or datetime.utcnow().date()
+        start_date = start_date or end_date - timedelta(days=days - 1)
 
-        tasks_solved = db.session.query(db.func.date_format(Task.updated, '%Y-%m-%d'), db.func.count(), db.func.group_concat(Task.id)) \
-            .filter(Task.tags.any(TaskTag.tag_id == project_id)) \
-            .filter(Task.status.in_([TaskStatus.ACCEPTED])) \
-            .filter(Task.updated > n_days_ago) \
-            .group_by(db.func.date_format(Task.updated, '%Y-%m-%d')) \
-            .all()
-        
-        # work items that their status were updated to completed. the work.updated represents the time that it was solved
-        work_completed = db.session.query(db.func.date_format(Work.updated, '%Y-%m-%d'), db.func.count(), db.func.group_concat(Work.task_id)) \
-            .join(Work.task) \
-            .filter(Work.status == WorkStatus.COMPLETE) \
-            .filter(Task.tags.any(TaskTag.tag_id == project_id)) \
-            .filter(Work.updated > n_days_ago) \
-            .group_by(db.func.date_format(Work.updated, '%Y-%m-%d')) \
-            .all()
-        
-        # work items the were created when a tech lead drags back from in review to beehive tasks
-        work_reviewed = db.session.query(db.func.date_format(Work.updated, '%Y-%m-%d'), db.func.count(), db.func.group_concat(Work.task_id)) \
-            .join(Work.task) \
-            .filter(Work.work_type.in_([WorkType.REVIEW_TASK, WorkType.CUCKOO_ITERATION])) \
-            .filter(Work.status == WorkStatus.COMPLETE) \
-            .filter(Task.tags.any(TaskTag.tag_id == project_id)) \
-            .filter(Work.updated > n_days_ago) \
-            .group_by(db.func.date_format(Work.updated, '%Y-%m-%d')) \
-            .all()
-        
-        tasks_delegated_task_ids = [(t[0], t[2]) for t in tasks_delegated]
-        tasks_solved_task_ids = [(t[0], t[2]) for t in tasks_solved]
-        work_completed_task_ids = [(t[0], t[2]) for t in work_completed]
-        work_reviewed_task_ids = [(t[0], t[2]) for t in work_reviewed]
-        
-        flatten_links = map(lambda result: (result[0], result[1].split(',')), tasks_delegated_task_ids + tasks_solved_task_ids + work_completed_task_ids + work_reviewed_task_ids)
-        all_ids = [item for sublist in [r[1] for r in flatten_links] for item in sublist]
-        all_links = get_trello_card_link(all_ids)
+        daily_activity = get_project_activity(project_id, start_date, end_date)
 
-        tasks_delegated_task_links_parsed = parse_links(tasks_delegated_task_ids, all_links)
-        tasks_solved_task_links_parsed = parse_links(tasks_solved_task_ids, all_links)
-        work_completed_task_links_parsed = parse_links(work_completed_task_ids, all_links)
-        work_reviewed_task_links_parsed = parse_links(work_reviewed_task_ids, all_links)
+        all_ids = [
+            task_id for activity in daily_activity.values()
+            for task_ids_column in ACTIVITY_COLUMNS.values()
+            for task_id in getattr(activity, task_ids_column)
+        ]
+        all_links_map = {l['task_id']: l for l in get_task_card_links(all_ids)}
 
-        tasks_delegated_count = [(t[0], t[1]) for t in tasks_delegated]
-        tasks_solved_count = [(t[0], t[1]) for t in tasks_solved]
-        work_reviewed_count = [(t[0], t[1]) for t in work_reviewed]
-        work_completed_count = [(t[0], t[1]) for t in work_completed]
+        def links(task_ids):
+            return [all_links_map[task_id] for task_id in task_ids if task_id in all_links_map]
 
         activities = []
-        for day in [str(date.today() - timedelta(days = day)) for day in range(n)]:
+        for day in [end_date - timedelta(days=day) for day in range((end_date - start_date).days + 1)]:
+            activity = daily_activity.get(day) or ProjectDailyActivity(project_id, day)
             activities.append({
-                "date": day,
-                "tasks_delegated": dict(tasks_delegated_count).get(day, 0),
-                "tasks_completed": dict(tasks_solved_count).get(day, 0),
-                "work_items_solved": dict(work_completed_count).get(day, 0),
-                "work_items_reviewed": dict(work_reviewed_count).get(day, 0) + dict(tasks_solved_count).get(day, 0),
-                "tasks_delegated_links": dict(tasks_delegated_task_links_parsed).get(day, []),
-                "tasks_completed_links": dict(tasks_solved_task_links_parsed).get(day, []),
-                "work_items_solved_links": dict(work_completed_task_links_parsed).get(day, []),
-                "work_items_reviewed_links": dict(work_reviewed_task_links_parsed).get(day, []) + dict(tasks_solved_task_links_parsed).get(day, [])
+                "date": str(day),
+                "tasks_delegated": activity.tasks_delegated,
+                "tasks_completed": activity.tasks_accepted,
+                "work_items_solved": activity.works_completed,
+                "work_items_reviewed": activity.works_reviewed + activity.tasks_accepted,
+                "tasks_delegated_links": links(activity.tasks_delegated_task_ids),
+                "tasks_completed_links": links(activity.tasks_accepted_task_ids),
+                "work_items_solved_links": links(activity.works_completed_task_ids),
+                "work_items_reviewed_links": links(activity.works_reviewed_task_ids) + links(activity.tasks_accepted_task_ids)
             })
 
         return ProjectActivityResponseSchema().jsonify({
@@ -168,19 +141,20 @@ class ProjectActivity(MethodView):
 
 class ProjectContributors(MethodView):
     @admin_jwt_required
+    @cached_response(lambda project_id: project_tag(project_id))
     @parser.use_args(ProjectRequestSchema(), as_kwargs=True, location='querystring')
     def get(self, project_id):
 
         current_app.logger.info('Fetching ProjectContributors')
         contributors = []
-        users = db.session.query(User) \
-                .outerjoin(WorkRecord, User.id == WorkRecord.user_id) \
-                .join(WorkRecord.work) \
-                .join(Work.task) \
-                .filter(Task.tags.any(TaskTag.tag_id == project_id)) \
+        users = db.session.query(User, ContributorStats) \
+                .join(ContributorStats, ContributorStats.user_id == User.id) \
+                .filter(ContributorStats.project_id == project_id) \
+                .filter(ContributorStats.total_works > 0) \
+                .options(selectinload(User.skills)) \
                 .all()
-        for user in users:
-            contributors.append(get_contributor_stats_specific_project(user, project_id))
+        for user, stats in users:
+            contributors.append(get_contributor_stats_specific_project(user, stats))
 
         return ProjectContributorsResponseSchema().jsonify({
             'contributors': contributors
@@ -188,6 +162,7 @@ class ProjectContributors(MethodView):
 
 class ProjectBudgetReview(MethodView):
     @admin_jwt_required
+    @cached_response(lambda project_id: project_tag(project_id))
     @parser.use_args(ProjectQueueRequestSchema(), as_kwargs=True, location='querystring')
     def get(self, project_id):
         current_app.logger.info('Fetching ProjectBudget')
@@ -245,6 +220,7 @@ class ProjectBudgetReview(MethodView):
 
 class ProjectDelayedTasks(MethodView):
     @admin_jwt_required
+    @cached_response(lambda project_id: project_tag(project_id))
     @parser.use_args(ProjectRequestSchema(), as_kwargs=True, location='querystring')
     def get(self, project_id):
 
@@ -282,7 +258,7 @@ class ProjectDelayedTasks(MethodView):
         backlog = [t for t in results if t[0].status in ([TaskStatus.NEW]) and t[1] == WorkStatus.AVAILABLE and t[0].created < datetime.utcnow() - timedelta(hours=48)]
         tasks.extend(backlog)
 
-        trello_links = get_trello_card_link([t[0].id for t in tasks])
+        trello_links = get_task_card_links([t[0].id for t in tasks])
         delayedTasks = [{
                 'id': t[0].id,
                 'created_at': t[0].created,
@@ -17,7 +17,7 @@ from ..schemas.quest import (
 )
 
 from ..utils.auth import activated_jwt_required, inner_auth
-from ..utils.db import db
+from ..utils.db import add_with_random_ids, db
 from ..utils.errors import abort
 from ..utils.marshmallow import parser
 
@@ -95,7 +95,7 @@ class QuestCRUD(MethodView):
             links=links,
             project_id=project_id
         )
-        db.session.add(quest)
+        add_with_random_ids([quest])
         db.session.commit()
 
         if task_ids:
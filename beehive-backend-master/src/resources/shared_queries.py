@@ -1,49 +1,54 @@
-from datetime import date, timedelta, datetime, timezone
-from operator import or_
-
-from sqlalchemy import and_
-from flask import current_app
-
-from ..models.tag import TaskTag
-from ..models.task import Task, TaskStatus
-from ..models.work import Work, WorkStatus
-from ..models.work_record import WorkOutcome, WorkRecord
-from ..utils.db import db
-
-
-def get_contributor_stats_specific_project(user, project_id):
-    id = user.id
-    last_work_record = WorkRecord.query \
-        .join(WorkRecord.work) \
-        .join(Work.task) \
-        .filter(Task.tags.any(TaskTag.tag_id == project_id)) \
-        .filter(WorkRecord.user_id == id) \
-        .filter(or_(WorkRecord.outcome.notin_([WorkOutcome.SKIPPED]), WorkRecord.outcome.is_(None))) \
-        .order_by(WorkRecord.id.desc()).first()
-    last_work_record_ts = None if not last_work_record else last_work_record.utc_end_time if last_work_record.utc_end_time else last_work_record.utc_start_time
-
-    last_engagement = WorkRecord.query \
-        .join(WorkRecord.work) \
-        .join(Work.task) \
-        .filter(Task.tags.any(TaskTag.tag_id == project_id)) \
-        .filter(WorkRecord.user_id == id) \
-        .order_by(WorkRecord.id.desc()).first()
-    last_engagement_ts = None if not last_engagement else last_engagement.utc_end_time if last_engagement.utc_end_time else last_engagement.utc_start_time
-
-    reserved_works = Work.query \
-        .join(Work.task) \
-        .filter(Task.tags.any(TaskTag.tag_id == project_id)) \
-        .filter(Work.reserved_worker_id == id) \
-        .filter(Work.status == WorkStatus.AVAILABLE) \
-        .count()
-    
-    works_in_review = db.session.query(Work) \
-        .join(Work.task) \
-        .filter(Task.tags.any(TaskTag.tag_id == project_id)) \
-        .filter(Work.reserved_worker_id == id) \
-        .filter(or_(Task.status == TaskStatus.SOLVED, Task.status == TaskStatus.INVALID)) \
-        .filter(Task.created > current_app.config['CUCKOO_START_DATE']) \
-        .count()
+from datetime import timedelta, datetime, timezone
+import decimal
+import time
+
+from ..logic.contributor_stats import MAX_VALID_DURATION_SECONDS
+from ..models.contributor_stats import ContributorStats
+
+
+def _utc_start_time(start_time_epoch_ms):
+    return datetime.utcfromtimestamp(start_time_epoch_ms / 1000)
+
+
+def _utc_end_time(start_time_epoch_ms, duration_seconds):
+    if not duration_seconds:
+        return None
+
+    return datetime.utcfromtimestamp(start_time_epoch_ms / 1000 + duration_seconds)
+
+
+def _last_record_time(start_time_epoch_ms, duration_seconds):
+    if start_time_epoch_ms is None:
+        return None
+
+    return _utc_end_time(start_time_epoch_ms, duration_seconds) or _utc_start_time(start_time_epoch_ms)
+
+
+def _seconds_since(start_time_epoch_ms, duration_seconds, now_in_millisec):
+    if start_time_epoch_ms is None:
+        return 0
+
+    duration_seconds = duration_seconds if (duration_seconds != None and duration_seconds < MAX_VALID_DURATION_SECONDS) else 0
+    return (now_in_millisec - start_time_epoch_ms - duration_seconds * 1000) / 1000
+
+
+def _average_billable_per_week_hours(stats):
+    """
+    Average weekly billable hours between the first and last work records, or None
+    if there are no boundary work records
+    """
+    if stats.first_work_start_time_epoch_ms is None or stats.last_work_start_time_epoch_ms is None:
+        return None
+
+    last_work_time = _last_record_time(stats.last_work_start_time_epoch_ms, stats.last_work_duration_seconds)
+    weeks = (last_work_time - _utc_start_time(stats.first_work_start_time_epoch_ms)).days / 7
+    average_billable_per_week = stats.net_duration_seconds / max(decimal.Decimal(weeks), 1)
+    return average_billable_per_week / 60 / 60
+
+
+def _community_stats(user, stats):
+    last_work_record_ts = _last_record_time(stats.last_work_start_time_epoch_ms, stats.last_work_duration_seconds) if stats else None
+    last_engagement_ts = _last_record_time(stats.last_engagement_start_time_epoch_ms, stats.last_engagement_duration_seconds) if stats else None
 
     seven_days_ago = datetime.now(timezone.utc) - timedelta(days=7)
     thirty_days_ago = datetime.now(timezone.utc) - timedelta(days=30)
@@ -55,51 +60,106 @@ def get_contributor_stats_specific_project(user, project_id):
         'active': active,
         'last_work': last_work_record_ts,
         'last_engagement': last_engagement_ts,
-        'reserved_works': reserved_works,
-        'works_in_review': works_in_review,
+        'reserved_works': stats.reserved_works if stats else 0,
+        'works_in_review': stats.reserved_works_in_review if stats else 0,
         'hourly_rate': user.price_per_hour,
         'skills': [s.name for s in user.skills],
         'projects': [],
     }
 
-def get_contributor_stats(user):
-    id = user.id
-    last_work_record = WorkRecord.query \
-        .filter(WorkRecord.user_id == id) \
-        .filter(or_(WorkRecord.outcome.notin_([WorkOutcome.SKIPPED]), WorkRecord.outcome.is_(None))) \
-        .order_by(WorkRecord.id.desc()).first()
-    last_work_record_ts = None if not last_work_record else last_work_record.utc_end_time if last_work_record.utc_end_time else last_work_record.utc_start_time
-
-    last_engagement = WorkRecord.query \
-        .filter(WorkRecord.user_id == id) \
-        .order_by(WorkRecord.id.desc()).first()
-    last_engagement_ts = None if not last_engagement else last_engagement.utc_end_time if last_engagement.utc_end_time else last_engagement.utc_start_time
-
-    reserved_works = Work.query \
-        .filter(Work.reserved_worker_id == id) \
-        .filter(Work.status == WorkStatus.AVAILABLE) \
-        .count()
-    
-    works_in_review = db.session.query(Work) \
-        .join(Work.task) \
-        .filter(Work.reserved_worker_id == id) \
-        .filter(or_(Task.status == TaskStatus.SOLVED, Task.status == TaskStatus.INVALID)) \
-        .filter(Task.created > current_app.config['CUCKOO_START_DATE']) \
-        .count()
 
-    seven_days_ago = datetime.now(timezone.utc) - timedelta(days=7)
-    thirty_days_ago = datetime.now(timezone.utc) - timedelta(days=30)
-    last_active = last_engagement_ts and datetime.fromtimestamp(last_engagement_ts.timestamp(), timezone.utc)
-    active = None if not last_engagement_ts or last_active < thirty_days_ago else False if last_active < seven_days_ago else True
-    return {
-        'name': user.name,
-        'country': '',
-        'active': active,
-        'last_work': last_work_record_ts,
-        'last_engagement': last_engagement_ts,
-        'reserved_works': reserved_works,
-        'works_in_review': works_in_review,
-        'hourly_rate': user.price_per_hour,
-        'skills': [s.name for s in user.skills],
-        'projects': [],
+def get_contributor_stats_specific_project(user, stats):
+    # stats are loaded by the caller along with the users, None if the user has none
+    return _community_stats(user, stats)
+
+
+def get_contributor_stats(user, stats):
+    # stats are loaded by the caller along with the users, None if the user has none
+    user_stats = _community_stats(user, stats)
+
+    billable_hours_availabilty_ratio = 0
+    if stats and stats.upwork_diary_count > 0:
+        average_billable_per_week_hours = _average_billable_per_week_hours(stats)
+        if average_billable_per_week_hours is not None and user.availability_weekly_hours:
+            billable_hours_availabilty_ratio = average_billable_per_week_hours / user.availability_weekly_hours * 100
+
+    user_stats['weekly_availability'] = user.availability_weekly_hours
+    user_stats['billable_hours_ratio'] = billable_hours_availabilty_ratio
+
+    return user_stats
+
+
+def get_contributors_work_stats(users):
+    """
+    Build the admin contributors page statistics of a page of users out of their
+    contributor stats rollup rows
+    Arguments:
+        users - the users to build statistics for
+    Returns:
+        List of contributor records in the order of the given users
+    """
+    user_ids = [u.id for u in users]
+    if not user_ids:
+        return []
+
+    user_stats = {
+        s.user_id: s for s in ContributorStats.query \
+            .filter(ContributorStats.user_id.in_(user_ids)) \
+            .filter(ContributorStats.project_key == ContributorStats.project_key_of(None)) \
+            .all()
     }
+
+    now_in_millisec = time.time() * 1000
+
+    records = []
+    for user in users:
+        stats = user_stats.get(user.id) or ContributorStats(user.id)
+
+        average_gross_work_duration_seconds = None
+        if stats.gross_duration_works:
+            average_gross_work_duration_seconds = stats.gross_duration_seconds / stats.gross_duration_works
+
+        average_work_price = None
+        average_net_work_duration_seconds = None
+        if stats.upwork_diary_count:
+            average_net_work_duration_seconds = stats.net_duration_seconds / stats.upwork_diary_count
+            average_work_price = decimal.Decimal(stats.cost) / stats.upwork_diary_count
+
+        average_billable = 'none'
+        billable_hours_availability_ratio = '0.00'
+        average_billable_per_week_hours = _average_billable_per_week_hours(stats)
+        if stats.gross_duration_works and average_billable_per_week_hours is not None:
+            average_billable = f"{average_billable_per_week_hours:.2f}"
+            if user.availability_weekly_hours:
+                billable_hours_availability_ratio = f"{(average_billable_per_week_hours / user.availability_weekly_hours * 100):.2f}"
+
+        # mysql averages are returned with 4 decimal places
+        average_iterations_per_work = None
+        if stats.distinct_works:
+            average_iterations_per_work = (decimal.Decimal(stats.total_works) / stats.distinct_works) \
+                .quantize(decimal.Decimal('0.0001'), rounding=decimal.ROUND_HALF_UP)
+
+        records.append({
+            'id': user.id,
+            'name': user.name,
+            'active_work': stats.active_work_id if stats.active_work_id is not None else 'none',
+            'number_of_reserved_works': stats.reserved_open_works,
+            'number_of_works_in_review': stats.works_in_review,
+            'number_of_completed_works': stats.completed_works,
+            'number_of_total_works': stats.total_works,
+            'number_of_cancelled_works': stats.cancelled_works,
+            'number_of_skipped_works': stats.skipped_works,
+            'skipped_total_works_ratio': f"{(stats.skipped_works / stats.total_works):.2f}" if stats.total_works > 0 else '-',
+            'time_since_last_engagement': _seconds_since(stats.last_engagement_start_time_epoch_ms, stats.last_engagement_duration_seconds, now_in_millisec),
+            'time_since_last_work': _seconds_since(stats.last_work_start_time_epoch_ms, stats.last_work_duration_seconds, now_in_millisec),
+            'billable_hours_availability_ratio': billable_hours_availability_ratio,
+            'average_billable': average_billable,
+            'weekly_availability': user.availability_weekly_hours,
+            'average_gross_work_duration': average_gross_work_duration_seconds,
+            'average_net_work_duration': average_net_work_duration_seconds,
+            'average_work_price': average_work_price,
+            'average_iterations_per_work': average_iterations_per_work,
+            'hourly_rate': f"${user.price_per_hour}" if user.price_per_hour != None else 'none',
+        })
+
+    return records
@@ -6,10 +6,12 @@ from flask import current_app
 from flask.views import MethodView
 
 from sqlalchemy import and_, or_
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import joinedload, selectinload
 from sqlalchemy.sql import label
 
-from ..logic.cuckoo import CuckooEvent, dispatch_cuckoo_event
+from ..logic.contributor_stats import queue_work_contributor_stats_refresh
+from ..logic.cuckoo import CuckooEvent
+from ..logic.cuckoo_outbox import queue_cuckoo_event
 
 from ..models.honeycomb import Honeycomb
 from ..models.task import Task, TaskStatus, TaskType
@@ -17,6 +19,7 @@ from ..models.work import Work, WorkStatus, WorkType
 from ..models.user import User
 from ..models.work_record import WorkOutcome, WorkRecord
 from ..models.upwork import UpworkDiary, WorkRecordUpworkDiary
+from ..resources.shared_queries import get_contributors_work_stats
 from ..schemas.stats import (
     ContributorHistoryResponseSchema,
     GetActiveWorkResponseSchema,
@@ -37,10 +40,12 @@ from ..utils.db import db
 from ..utils.errors import abort
 from ..utils.marshmallow import parser
 from ..utils.misc import camel_case_to_snake_case
+from ..utils.response_cache import STATS_TAG, cached_response, invalidate_task_cached_responses, user_tag
 
 
 class ActiveWork(MethodView):
     @admin_jwt_required
+    @cached_response(STATS_TAG)
     @parser.use_args(GetStatsRequestSchema(), as_kwargs=True, location='querystring')
     def get(self, page, results_per_page):
         current_app.logger.info('Fetching list of active work records')
@@ -73,6 +78,7 @@ class ActiveWork(MethodView):
 
 class PendingWork(MethodView):
     @admin_jwt_required
+    @cached_response(STATS_TAG)
     @parser.use_args(GetStatsRequestSchema(), as_kwargs=True, location='querystring')
     def get(self, page, results_per_page):
         current_app.logger.info('Fetching list of pending work items')
@@ -122,6 +128,7 @@ class PendingWork(MethodView):
 
 class CompletedWork(MethodView):
     @admin_jwt_required
+    @cached_response(STATS_TAG)
     @parser.use_args(GetStatsRequestSchema(), as_kwargs=True, location='querystring')
     def get(self, page, results_per_page, filter_list=None):
         current_app.logger.info('Fetching list of pending work items')
@@ -263,6 +270,7 @@ class CompletedWork(MethodView):
 
 class InvalidTasks(MethodView):
     @admin_jwt_required
+    @cached_response(STATS_TAG)
     @parser.use_args(GetStatsRequestSchema(), as_kwargs=True, location='querystring')
     def get(self, page, results_per_page):
         current_app.logger.info('Fetching list of invalid tasks')
@@ -282,11 +290,13 @@ class InvalidTasks(MethodView):
 
 class ActiveUsers(MethodView):
     @admin_jwt_required
+    @cached_response(STATS_TAG)
     @parser.use_args(GetStatsRequestSchema(), as_kwargs=True, location='querystring')
     def get(self, page, results_per_page):     
         current_app.logger.info('Fetching list of active users')
 
         users = User.query.filter_by(activated=True) \
+            .options(selectinload(User.tags), selectinload(User.skills)) \
             .order_by(User.email.desc()) \
             .paginate(page=page, per_page=results_per_page, error_out=False)
 
@@ -316,6 +326,7 @@ class ActiveUsers(MethodView):
 
 class Honeycombs(MethodView):
     @admin_jwt_required
+    @cached_response(STATS_TAG)
     @parser.use_args(GetStatsRequestSchema(), as_kwargs=True, location='querystring')
     def get(self, page, results_per_page):
         current_app.logger.info('Fetching list of honeycombs')
@@ -374,12 +385,10 @@ class WorkReservation(MethodView):
         work.reserved_worker_id = user_id
         work.reserved_until_epoch_ms = int(time.time() * 1000) + hours_reserved * 60 * 60 * 1000
 
-        db.session.commit()
-
         if work.task.task_type in (TaskType.CUCKOO_CODING, ):
             current_app.logger.info('notifying cuckoo service about reserved work')
-            
-            res = dispatch_cuckoo_event(
+
+            queue_cuckoo_event(
                 work.task.id, 
                 {
                     'eventType': CuckooEvent.WORK_RESERVED.name,
@@ -387,8 +396,11 @@ class WorkReservation(MethodView):
                     'user': user_id
                 }
             )
-            if not res:
-                current_app.logger.error(f'error while notifying cuckoo about reserved work {work_id} for user {user_id}')
+
+        db.session.commit()
+
+        queue_work_contributor_stats_refresh(work)
+        invalidate_task_cached_responses(work.task, user_id)
 
         return ReserveWorkResponseSchema().jsonify(work)
 
@@ -414,25 +426,27 @@ class WorkReservation(MethodView):
         work.reserved_worker_id = None
         work.reserved_until_epoch_ms = None
 
-        db.session.commit()
-
         if work.task.task_type in (TaskType.CUCKOO_CODING, ):
             current_app.logger.info('notifying cuckoo service about dismissed work')
-            
-            res = dispatch_cuckoo_event(
+
+            queue_cuckoo_event(
                 work.task.id, 
                 {
                     'eventType': CuckooEvent.WORK_DISMISSED.name,
                     'user': user_id
                 }
             )
-            if not res:
-                current_app.logger.error(f'error while notifying cuckoo about dismissed work {work_id} from user {user_id}')
+
+        db.session.commit()
+
+        queue_work_contributor_stats_refresh(work, user_id)
+        invalidate_task_cached_responses(work.task, user_id)
 
         return ReserveWorkResponseSchema().jsonify(work)
 
 class Contributors(MethodView):
     @admin_jwt_required
+    @cached_response(STATS_TAG)
     @parser.use_args(GetContributorsRequestSchema(), as_kwargs=True, location='querystring')
     def get(self, page, results_per_page, filter_list=None):
         current_app.logger.info('Fetching list of pending work items')
@@ -441,166 +455,7 @@ class Contributors(MethodView):
             .order_by(User.utc_last_engagement.desc()) \
             .paginate(page=page, per_page=results_per_page, error_out=False)
 
-        records = []
-        for user in users.items:
-
-            active_work = 'none'
-            active_work_record = WorkRecord.query.filter_by(active=True) \
-                .filter(WorkRecord.user_id == user.id) \
-                .order_by(WorkRecord.id.desc()).first()
-
-            if active_work_record != None:
-                active_work = active_work_record.work_id
-
-            number_of_reserved_works = Work.query \
-                .with_entities(Work.task_id) \
-                .filter(Work.reserved_worker_id == user.id) \
-                .filter(Work.status == WorkStatus.AVAILABLE) \
-                .join(Task, and_(
-                    Work.task_id == Task.id,
-                    Task.status.in_([TaskStatus.PENDING, TaskStatus.MODIFICATIONS_REQUESTED, TaskStatus.IN_PROCESS]))
-                ).count()
-
-            number_of_works_in_review = WorkRecord.query \
-                .with_entities(WorkRecord.work_id) \
-                .filter(WorkRecord.user_id == user.id) \
-                .join(Work, Work.id == WorkRecord.work_id,) \
-                .filter(Work.work_type.in_([WorkType.REVIEW_TASK, WorkType.CUCKOO_ITERATION])) \
-                .with_entities(Work.task_id) \
-                .join(Task, and_(
-                    Work.task_id == Task.id,
-                    Task.status.in_([TaskStatus.IN_PROCESS]))
-                ).count()
-
-            number_of_completed_works = WorkRecord.query \
-                .with_entities(WorkRecord.work_id) \
-                .filter(WorkRecord.user_id == user.id) \
-                .join(Work, Work.id == WorkRecord.work_id,) \
-                .filter(Work.status == WorkStatus.COMPLETE) \
-                .count()
-
-            number_of_total_works = WorkRecord.query \
-                .with_entities(WorkRecord.work_id) \
-                .join(Work, Work.id == WorkRecord.work_id,) \
-                .filter(WorkRecord.user_id == user.id) \
-                .count()
-                
-
-            # this is how we look at cancelled records currently
-            number_of_cancelled_works = Work.query \
-                .with_entities(Work.task_id) \
-                .filter(Work.reserved_worker_id == user.id) \
-                .join(Task, and_(
-                    Work.task_id == Task.id,
-                    Task.status.in_([TaskStatus.CANCELLED]))
-                ).count()
-            
-            number_of_skipped_works = WorkRecord.query \
-                .filter(and_(WorkRecord.user_id == user.id, WorkRecord.outcome == WorkOutcome.SKIPPED)) \
-                .count()
-
-            
-            skipped_total_works_ratio = f"{(number_of_skipped_works / number_of_total_works):.2f}" if number_of_total_works > 0 else '-'
-            
-            time_since_last_engagement = 0
-            last_engagement = WorkRecord.query \
-                .filter(WorkRecord.user_id == user.id) \
-                .order_by(WorkRecord.id.desc()).first()
-            now_in_millisec = time.time() * 1000
-            if last_engagement != None:
-                time_since_last_engagement = (now_in_millisec - last_engagement.start_time_epoch_ms - (last_engagement.duration_seconds if (last_engagement.duration_seconds != None and last_engagement.duration_seconds < 999999999) else 0)*1000)
-                time_since_last_engagement = time_since_last_engagement / 1000
-
-            time_since_last_work = 0
-            last_work_record = WorkRecord.query \
-                .filter(WorkRecord.user_id == user.id) \
-                .filter(or_(WorkRecord.outcome.notin_([WorkOutcome.SKIPPED]), WorkRecord.outcome.is_(None))) \
-                .order_by(WorkRecord.id.desc()).first()
-
-            work_record_stats = WorkRecord.query \
-                .with_entities(WorkRecord.work_id) \
-                .join(Work, WorkRecord.work_id == Work.id) \
-                .filter(WorkRecord.user_id == user.id) \
-                .filter(and_(WorkRecord.duration_seconds != None, WorkRecord.duration_seconds < 999999999)) \
-                .add_columns(
-                    label(
-                        'work_records_total_duration_seconds',
-                        db.func.sum(WorkRecord.duration_seconds)
-                    )
-                ) \
-                .group_by(WorkRecord.work_id).all()
-
-            work_record_upwork_diary_stats = WorkRecordUpworkDiary.query \
-                .join(WorkRecord, WorkRecordUpworkDiary.work_record_id == WorkRecord.id) \
-                .filter(WorkRecord.user_id == user.id) \
-                .filter(WorkRecordUpworkDiary.net_duration_seconds != None) \
-                .add_columns(
-                    label(
-                        'work_records_net_duration_seconds',
-                        db.func.sum(WorkRecordUpworkDiary.net_duration_seconds)
-                    ),
-                    label(
-                        'work_records_cost',
-                        db.func.sum(WorkRecordUpworkDiary.cost)
-                    )
-                ) \
-                .group_by(WorkRecordUpworkDiary.id, WorkRecord.work_id).all()
-
-            average_work_price = None
-            average_gross_work_duration_seconds = None
-            average_net_work_duration_seconds = None
-            if work_record_stats:
-                average_gross_work_duration_seconds = sum(x.work_records_total_duration_seconds for x in work_record_stats) / len(work_record_stats)
-            if work_record_upwork_diary_stats:
-                average_net_work_duration_seconds = sum(x.work_records_net_duration_seconds or 0 for x in work_record_upwork_diary_stats) / len(work_record_upwork_diary_stats)
-                average_work_price = sum(x.work_records_cost or 0 for x in work_record_upwork_diary_stats)  / len(work_record_upwork_diary_stats)
-
-            if last_work_record != None:
-                time_since_last_work = (now_in_millisec - last_work_record.start_time_epoch_ms - (last_work_record.duration_seconds if (last_work_record.duration_seconds != None and last_work_record.duration_seconds < 999999999) else 0)*1000)
-                time_since_last_work = time_since_last_work / 1000
-
-            first_work_record = WorkRecord.query \
-                .filter(WorkRecord.user_id == user.id) \
-                .order_by(WorkRecord.id.asc()).first()
-            average_billable = 'none'
-            billable_hours_availability_ratio = '0.00'
-            if len(work_record_stats) > 0 and first_work_record != None and last_work_record != None:
-                weeks = ((last_work_record.utc_end_time or last_work_record.utc_start_time) - first_work_record.utc_start_time).days / 7 
-                average_billable_per_week = sum(x.work_records_net_duration_seconds or 0 for x in work_record_upwork_diary_stats) / max(decimal.Decimal(weeks), 1)
-                average_billable_per_week_hours = average_billable_per_week / 60 / 60
-                average_billable = f"{average_billable_per_week_hours:.2f}"
-                if user.availability_weekly_hours:
-                    billable_hours_availability_ratio = f"{(average_billable_per_week_hours / user.availability_weekly_hours * 100):.2f}"
-
-
-            average_iterations_per_work = 0
-            iterations = WorkRecord.query.with_entities(WorkRecord.work_id).filter(WorkRecord.user_id == user.id).add_columns(label('correspondences',db.func.count())).group_by(WorkRecord.work_id)
-            average_iterations_per_work = WorkRecord.query.with_entities(label('avg', db.func.avg(iterations.subquery().columns.correspondences))).scalar()
-
-            records.append({
-                'id': user.id,
-                'name': user.name,
-                'active_work': active_work,
-                'number_of_reserved_works': number_of_reserved_works,
-                'number_of_works_in_review': number_of_works_in_review,
-                'number_of_completed_works': number_of_completed_works,
-                'number_of_total_works': number_of_total_works,
-                'number_of_cancelled_works': number_of_cancelled_works,
-                'number_of_skipped_works': number_of_skipped_works,
-                'skipped_total_works_ratio': skipped_total_works_ratio,
-                'time_since_last_engagement': time_since_last_engagement,
-                'time_since_last_work': time_since_last_work,
-                'billable_hours_availability_ratio': billable_hours_availability_ratio,
-                'average_billable': average_billable,
-                'weekly_availability': user.availability_weekly_hours,
-                'average_gross_work_duration': average_gross_work_duration_seconds,
-                'average_net_work_duration': average_net_work_duration_seconds,
-                'average_work_price': average_work_price,
-                'average_iterations_per_work': average_iterations_per_work,
-                'hourly_rate': f"${user.price_per_hour}" if user.price_per_hour != None else 'none',
-                  
-            })
-
+        records = get_contributors_work_stats(users.items)
 
         return GetContributorsResponseSchema().jsonify({
             'data': records,
@@ -631,20 +486,20 @@ class WorkProhibition(MethodView):
 
         # prohibit work for this worker
         work.prohibited_worker_id = user_id
-        db.session.commit()
 
         if work.task.task_type in (TaskType.CUCKOO_CODING, ):
             current_app.logger.info('notifying cuckoo service about prohibited work')
-            
-            res = dispatch_cuckoo_event(
+
+            queue_cuckoo_event(
                 work.task.id, 
                 {
                     'eventType': CuckooEvent.WORK_PROHIBITED.name,
                     'user': user_id
                 }
             )
-            if not res:
-                current_app.logger.error(f'error while notifying cuckoo about prohibited work {work_id} for user {user_id}')
+
+        db.session.commit()
+        invalidate_task_cached_responses(work.task, user_id)
 
         return ProhibitWorkResponseSchema().jsonify(work)
 
@@ -667,25 +522,25 @@ class WorkProhibition(MethodView):
 
         work.prohibited_worker_id = None
 
-        db.session.commit()
-
         if work.task.task_type in (TaskType.CUCKOO_CODING, ):
             current_app.logger.info('notifying cuckoo service about unprohibited work')
-            
-            res = dispatch_cuckoo_event(
+
+            queue_cuckoo_event(
                 work.task.id, 
                 {
                     'eventType': CuckooEvent.WORK_UNPROHIBITED.name,
                     'user': user_id
                 }
             )
-            if not res:
-                current_app.logger.error(f'error while notifying cuckoo about unprohibited work {work_id} from user {user_id}')
+
+        db.session.commit()
+        invalidate_task_cached_responses(work.task, user_id)
 
         return ProhibitWorkResponseSchema().jsonify(work)
 
 class ContributorHistory(MethodView):
     @admin_jwt_required
+    @cached_response(lambda user_id: user_tag(user_id))
     @parser.use_args(GetStatsRequestSchema(), as_kwargs=True, location='querystring')
     def get(self, user_id, page, results_per_page):
         """
@@ -723,10 +578,11 @@ class ContributorHistory(MethodView):
         work = []
         for item in user_work_records.items:
             w = item[0]
-            w.ratings = w.get_ratings()
             w.iterations_per_task = item[1]
             work.append(w)
 
+        WorkRecord.load_ratings(work)
+
         # compute averages
         ratings = [w.ratings for w in work if w is not None and w.ratings is not None]
         scores = [decimal.Decimal(r.get('score')) for wr in ratings for r in wr]
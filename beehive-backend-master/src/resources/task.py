@@ -3,12 +3,16 @@ import time
 from flask import current_app
 from flask.views import MethodView
 from flask_jwt_extended import get_jwt_identity
+from marshmallow import ValidationError
 from sqlalchemy import and_, or_
 
 
 
-from ..jobs.task import prepare_cuckoo_task
+from ..jobs.task import prepare_cuckoo_task, prepare_cuckoo_tasks
+from ..logic.project_activity import queue_task_project_activity_refresh, queue_tasks_project_activity_refresh
 from ..logic.work_mappers import code_qa
+from ..logic.work_matching import index_work, unindex_work
+from ..models.quest import Quest
 from ..models.task import Task, TaskStatus, TaskType
 from ..models.user import User
 from ..models.work import Work, WorkStatus, WorkType
@@ -19,16 +23,19 @@ from ..models.skill import Skill
 from ..schemas import EmptyResponseSchema
 from ..schemas.task import (
     CreateCuckooTaskRequestSchema,
+    CreateCuckooTasksRequestSchema,
+    CreateCuckooTasksResponseSchema,
     PartialUpdateCuckooTaskRequestSchema,
     TaskResponseSchema,
     NotifyContributorsRequestSchema
 )
 
 from ..utils.auth import activated_jwt_required, admin_jwt_required, inner_auth
-from ..utils.db import db
+from ..utils.db import add_with_random_ids, db
 from ..utils.email import send_contributor_task_modifications_email, send_contributors_notification_email, send_contributor_task_cancelled_email, send_contributors_task_update_email
 from ..utils.errors import abort
 from ..utils.marshmallow import parser
+from ..utils.response_cache import invalidate_cached_responses, invalidate_task_cached_responses, invalidate_tasks_cached_responses
 from ..utils.slack_bot import notify_new_task_description
 
 
@@ -65,14 +72,30 @@ class TaskCRUD(MethodView):
         if not task:
             abort(404)
 
+        # the tags of a deleted task can't be loaded once it is committed
+        project_ids = [t.id for t in task.tags if t.name.startswith('project:')]
+
         db.session.delete(task)
         db.session.commit()
+        invalidate_cached_responses(project_ids)
 
         current_app.logger.info(f'Deleted task ID {task_id}\n')
 
         return EmptyResponseSchema().jsonify()
 
 
+def _cuckoo_advanced_options(feature=None, chain_review=False, max_chain_iterations=None, chain_description=None):
+    advanced_options = {}
+    if chain_review:
+        advanced_options['chainReview'] = chain_review
+        advanced_options['maxChainIterations'] = max_chain_iterations or code_qa.DEFAULT_QA_ITERATIONS
+        advanced_options['chainDescription'] = chain_description or code_qa.DEFAULT_QA_DESCRIPTION_PREFIX
+    if feature:
+        advanced_options['feature'] = feature
+
+    return advanced_options
+
+
 class CuckooTaskCRUD(MethodView):
     # create (delegate) new task from cuckoo service
     @inner_auth
@@ -84,13 +107,7 @@ class CuckooTaskCRUD(MethodView):
 
         current_app.logger.info(f'Delegating cuckoo task {description}')
 
-        advanced_options = {}
-        if chain_review:
-            advanced_options['chainReview'] = chain_review
-            advanced_options['maxChainIterations'] = max_chain_iterations or code_qa.DEFAULT_QA_ITERATIONS
-            advanced_options['chainDescription'] = chain_description or code_qa.DEFAULT_QA_DESCRIPTION_PREFIX
-        if feature:
-            advanced_options['feature'] = feature
+        advanced_options = _cuckoo_advanced_options(feature, chain_review, max_chain_iterations, chain_description)
 
         # get repoid and add to task
         repo = Repository.query.filter_by(name=repository_name).first()
@@ -106,15 +123,17 @@ class CuckooTaskCRUD(MethodView):
             status=TaskStatus.NEW,
             task_type=TaskType.CUCKOO_CODING,
             priority=priority,
-            tags=[Tag.get_or_create(t) for t in tags or []],
-            skills=[Skill.get_or_create(s) for s in skills or []],
+            tags=Tag.get_or_create_many(tags or []),
+            skills=Skill.get_or_create_many(skills or []),
             advanced_options=advanced_options,
             repository_id=repo_id,
             quest_id=quest_id
         )
-        db.session.add(task)
+        add_with_random_ids([task])
 
         db.session.commit()
+        queue_task_project_activity_refresh(task)
+        invalidate_task_cached_responses(task)
 
         # schedule job to prepare the work item
         prepare_cuckoo_task.queue(
@@ -173,15 +192,19 @@ class CuckooTaskCRUD(MethodView):
                 send_contributors_task_update_email(work_record_last_feedback.user_id, available_work_for_task)
 
         if tags:
-            task.tags = [Tag.get_or_create(t) for t in tags]
+            task.tags = Tag.get_or_create_many(tags)
             for work in task.works:
                 work.tags = task.tags
 
         if skills:
-            task.skills = [Skill.get_or_create(s) for s in skills]
+            task.skills = Skill.get_or_create_many(skills)
             for work in task.works:
                 work.skills = task.skills
 
+        if tags or skills:
+            for work in task.works:
+                index_work(work)
+
         if repository_name:
             repo = Repository.query.filter_by(name=repository_name).first()
             if repo:
@@ -276,6 +299,7 @@ class CuckooTaskCRUD(MethodView):
                 subsequent_work.reserved_worker_id = subsequent_reserved_worker_id
                 subsequent_work.reserved_until_epoch_ms = int(time.time() * 1000) + 4 * 60 * 60 * 1000
                 db.session.add(subsequent_work)
+                index_work(subsequent_work)
                 
                 db.session.commit() # for updating work relationships
                 send_contributor_task_modifications_email(subsequent_work.reserved_worker_id, subsequent_work)
@@ -300,9 +324,11 @@ class CuckooTaskCRUD(MethodView):
                         latest_work_record.outcome = WorkOutcome.TASK_CANCELLED
                         send_contributor_task_cancelled_email(latest_work_record.user_id, task)
 
+                # work of cancelled tasks is never drawn again
                 for work in task.works:
                     if work.status == WorkStatus.AVAILABLE:
                         work.status = WorkStatus.UNAVAILABLE
+                        unindex_work(work)
 
             elif status == TaskStatus.ACCEPTED:
 
@@ -363,10 +389,111 @@ class CuckooTaskCRUD(MethodView):
             task.status = status
 
         db.session.commit()
+        if status:
+            queue_task_project_activity_refresh(task)
+        invalidate_task_cached_responses(task)
 
         return TaskResponseSchema().jsonify(task)
 
 
+class CuckooTaskBulk(MethodView):
+    # create (delegate) a batch of new tasks from cuckoo service
+    @inner_auth
+    @parser.use_args(CreateCuckooTasksRequestSchema(), as_kwargs=True)
+    def post(self, tasks):
+        """
+        Create a batch of tasks in a single transaction and prepare them in a
+        single job. Each task is validated on its own, and the response has the
+        id or the error of each task in the order of the request
+        """
+        current_app.logger.info(f'Delegating {len(tasks)} cuckoo tasks')
+
+        results = [{} for _ in tasks]
+
+        item_schema = CreateCuckooTaskRequestSchema()
+        items = {}
+        for index, item in enumerate(tasks):
+            try:
+                items[index] = item_schema.load(item)
+            except ValidationError as e:
+                results[index] = {'error': 'malformed_request', 'description': e.messages}
+
+        # resolve users, repositories, tags and skills of all tasks at once
+        user_names = {item['user_name'] for item in items.values()}
+        users = {
+            u.trello_user.lower(): u
+            for u in User.query.filter(User.trello_user.in_(user_names))
+        } if user_names else {}
+
+        for index, item in list(items.items()):
+            if item['user_name'].lower() not in users:
+                results[index] = {'error': 'user_not_found'}
+                del items[index]
+
+        repository_names = {item['repository_name'] for item in items.values() if item.get('repository_name')}
+        repositories = {
+            r.name.lower(): r
+            for r in Repository.query.filter(Repository.name.in_(repository_names))
+        } if repository_names else {}
+
+        # an unknown repository fails its task instead of the whole batch
+        for index, item in list(items.items()):
+            if item.get('repository_name') and item['repository_name'].lower() not in repositories:
+                results[index] = {'error': 'repository_not_found'}
+                del items[index]
+
+        quest_ids = {item['quest_id'] for item in items.values() if item.get('quest_id')}
+        found_quest_ids = {
+            q.id for q in db.session.query(Quest.id).filter(Quest.id.in_(quest_ids))
+        } if quest_ids else set()
+
+        # an unknown quest fails its task instead of the whole batch
+        for index, item in list(items.items()):
+            if item.get('quest_id') and item['quest_id'] not in found_quest_ids:
+                results[index] = {'error': 'quest_not_found'}
+                del items[index]
+
+        tags = Tag.get_or_create_by_name([t for item in items.values() for t in item.get('tags') or []])
+        skills = Skill.get_or_create_by_name([s for item in items.values() for s in item.get('skills') or []])
+
+        created = {}
+        for index, item in items.items():
+            created[index] = Task.from_cuckoo(
+                delegating_user_id=users[item['user_name'].lower()].id,
+                description=item['description'],
+                title=item.get('title'),
+                status=TaskStatus.NEW,
+                task_type=TaskType.CUCKOO_CODING,
+                priority=item.get('priority', 2),
+                tags=list(dict.fromkeys(tags[t] for t in item.get('tags') or [])),
+                skills=list(dict.fromkeys(skills[s] for s in item.get('skills') or [])),
+                advanced_options=_cuckoo_advanced_options(
+                    item.get('feature'),
+                    item['chain_review'],
+                    item.get('max_chain_iterations'),
+                    item.get('chain_description')
+                ),
+                repository_id=repositories[item['repository_name'].lower()].id if item.get('repository_name') else None,
+                quest_id=item.get('quest_id') or None
+            )
+
+        new_tasks = list(created.values())
+        add_with_random_ids(new_tasks)
+
+        db.session.commit()
+        queue_tasks_project_activity_refresh(new_tasks)
+        invalidate_tasks_cached_responses(new_tasks)
+
+        # schedule a single job to prepare the work items and notify the new descriptions
+        if new_tasks:
+            prepare_cuckoo_tasks.queue([task.id for task in new_tasks])
+
+        for index, task in created.items():
+            results[index] = {'id': task.id}
+
+        return CreateCuckooTasksResponseSchema().jsonify({'tasks': results})
+
+
 class NotifyContributors(MethodView):
     @admin_jwt_required
     @parser.use_args(NotifyContributorsRequestSchema(), as_kwargs=True)
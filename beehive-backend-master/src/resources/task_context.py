@@ -10,7 +10,7 @@ from ..schemas import EmptyResponseSchema
 from ..utils.auth import activated_jwt_required
 from ..utils.marshmallow import parser
 from ..utils.errors import abort
-from ..utils.db import db
+from ..utils.db import add_with_random_ids, db
 
 
 class TaskContextCRUD(MethodView):
@@ -49,7 +49,7 @@ class TaskContextCRUD(MethodView):
             potential_use=potential_use,
             task_id=task_id
         )
-        db.session.add(context)
+        add_with_random_ids([context])
         db.session.commit()
 
         return TaskContextResponseSchema(many=False).jsonify(context)
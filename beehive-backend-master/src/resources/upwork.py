@@ -1,56 +1,77 @@
 import io
 import json
-from datetime import timedelta
-import time
 import csv
+import zlib
 
 from flask import current_app, request, Response, stream_with_context
 from flask.views import MethodView
-from sqlalchemy.sql import and_
 
-from ..models.user import User
-from ..models.upwork import UpworkAuthToken, UpworkDiary
-from ..models.diary_log import DiaryLog
+from ..models.upwork import UpworkAuthToken
 
 from ..utils.db import db
 from ..utils.auth import inner_auth, admin_jwt_required
-from ..utils.upwork import UpworkClient, save_upwork_diaries, update_work_records_net_duration
+from ..utils.upwork import UpworkClient, upwork_client_manager
 from ..utils.marshmallow import parser
 from ..utils.errors import abort
 
-from ..schemas.upwork import UpworkWorkdiaryRequestSchema, UpworkDiaryResponseSchema, UpworkCallbackRequestSchema, UpworkCallbackResponseSchema, UpworkCostReportRequestSchema
+from ..logic.upwork_cost_report import COST_REPORT_HEADER, iter_cost_report_rows
+from ..logic.upwork_backfill import UpworkBackfillStatus, create_upwork_backfill, get_upwork_backfill, is_upwork_backfill_running, set_upwork_backfill_job
+
+from ..jobs.upwork import backfill_upwork_diaries
+
+from ..schemas.upwork import UpworkWorkdiaryRequestSchema, UpworkBackfillResponseSchema, UpworkCallbackRequestSchema, UpworkCallbackResponseSchema, UpworkCostReportRequestSchema
 
 class UpworkWorkDiary(MethodView):
     @inner_auth
     @parser.use_args(UpworkWorkdiaryRequestSchema(), as_kwargs=True, location='querystring')
-    def get(self, start_date, end_date):
+    def get(self, start_date=None, end_date=None):
         """
         Utility endpoint for querying upwork diaries and calculating corresponding work recods net duration
-        used for past data to seed the db
+        used for past data to seed the db. The days are backfilled by a background job, use the returned
+        backfill id to follow its progress
         """
-        # fetch diary for specific date from upwork api
-        delta = timedelta(days=1)
-        all_upwork_diaries = []
-        while start_date <= end_date:
-            upwork_diaries = save_upwork_diaries(start_date)
-            if upwork_diaries:
-                update_work_records_net_duration(upwork_diaries)
-                # to update session with related objects
-                for d in upwork_diaries:
-                    db.session.refresh(d)
-                
-                all_upwork_diaries.extend(upwork_diaries)
-
-            start_date += delta
-            time.sleep(5)               ## without this delay we get a 'token expired' error fromupwork client
-
-            db.session.expunge_all()    # otherwise tests raise sqlalchemy.orm.exc.DetachedInstanceError
-        
-        if not all_upwork_diaries:
-            current_app.logger.error('fetching upwork diaries failed for all given dates')
-            abort(500)
+        if not start_date or not end_date or start_date > end_date:
+            abort(400, description='startDate and endDate are required and startDate must not be after endDate')
+
+        backfill_id = create_upwork_backfill(start_date, end_date)
+        job = backfill_upwork_diaries.queue(backfill_id)
+        set_upwork_backfill_job(backfill_id, job.id)
+
+        return UpworkBackfillResponseSchema().jsonify(get_upwork_backfill(backfill_id))
+
+
+class UpworkBackfill(MethodView):
+    @inner_auth
+    def get(self, backfill_id):
+        """
+        Get the per-day progress of an upwork diaries backfill
+        """
+        backfill = get_upwork_backfill(backfill_id)
+        if not backfill:
+            abort(404)
+
+        return UpworkBackfillResponseSchema().jsonify(backfill)
+
+    @inner_auth
+    def post(self, backfill_id):
+        """
+        Resume a backfill, processing only the days that were not completed
+        """
+        backfill = get_upwork_backfill(backfill_id)
+        if not backfill:
+            abort(404)
+
+        if backfill['status'] == UpworkBackfillStatus.COMPLETE.value:
+            abort(400, code='backfill_complete')
+
+        # a running backfill would be run again by a second job once it is done
+        if is_upwork_backfill_running(backfill_id):
+            abort(409, code='backfill_running')
 
-        return UpworkDiaryResponseSchema(many=True).jsonify(all_upwork_diaries)
+        job = backfill_upwork_diaries.queue(backfill_id)
+        set_upwork_backfill_job(backfill_id, job.id)
+
+        return UpworkBackfillResponseSchema().jsonify(get_upwork_backfill(backfill_id))
 
 
 class UpworkCallback(MethodView):
@@ -96,173 +117,60 @@ class UpworkCallback(MethodView):
             token['expires_at']
         )
         db.session.commit()
+
+        # the long-lived client must pick up the new authorization
+        upwork_client_manager.reset()
+
         return UpworkCallbackResponseSchema().jsonify(token)
 
 class UpworkCostReport(MethodView):
     @admin_jwt_required
     @parser.use_args(UpworkCostReportRequestSchema(), as_kwargs=True, location='querystring')
-    def get(self, start_date, end_date):
+    def get(self, start_date, end_date, gzip=False):
         """
         endpoint for creating a CSV that generates the cost per work record for a given date range 
         (with work ID, name, contributor ID & name, project name, skills, and time). 
+        The report is streamed while it is generated, optionally gzip compressed.
         """
 
         def generate_cost_report(start_date, end_date):
 
             current_app.logger.info(f'getting upwork report for dates {start_date.strftime("%Y%m%d")}-{end_date.strftime("%Y%m%d")}')
 
-            header = [
-                'ID',
-                'Upwork user id',
-                'Upwork user name',
-                'Upwork interval',
-                'Upwork duration',
-                'Upwork cost',
-                'Net duration',
-                'Work Record id', 
-                'Work id', 
-                'Task id', 
-                'Task name', 
-                'User id', 
-                'User name', 
-                'Project', 
-                'Skills',
-                'Work Record interval',
-                'Work Record duration',
-            ]
             output = io.StringIO()
             writer = csv.writer(output, quoting=csv.QUOTE_ALL)
-            writer.writerow(header)
-
-            # main query for all upwork diaries in date range
-            upwork_diary_items = UpworkDiary.query \
-                .filter(
-                    and_(
-                        db.func.date(UpworkDiary.rounded_utc_start_time) <= end_date,
-                        db.func.date(UpworkDiary.rounded_utc_end_time) >= start_date
-                    ) \
-                ) \
-                .group_by(UpworkDiary.id) \
-                .order_by(UpworkDiary.id.asc()) \
-                .all()
-
-            for upwork_diary in upwork_diary_items:
-            
-                upwork_diary_id = upwork_diary.id
-                upwork_user_id = upwork_diary.upwork_user_id
-                upwork_user_name = upwork_diary.upwork_user_name
-                upwork_interval = upwork_diary.duration_string
-                upwork_diary_duration = str(timedelta(minutes=upwork_diary.duration_min))
-
-                upwork_diary_work_records = [wrud.work_record for wrud in upwork_diary.work_record_upwork_diaries]
-                if not upwork_diary_work_records:
-                    # try the user details if we recognize it
-                    try:
-                        user = User.query.filter(User.upwork_user == upwork_user_id).first()
-                        user_id = user.id if user else None
-                        user_name = user.name if user else None
-                    except:
-                        user_id = None
-                        user_name = None
-
-                    row = [
-                        upwork_diary_id,
-                        upwork_user_id,
-                        upwork_user_name,
-                        upwork_interval,
-                        upwork_diary_duration,
-                        None,
-                        None,
-                        None,
-                        None,
-                        None,
-                        None,
-                        user_id,
-                        user_name,
-                        None,
-                        None,
-                        None,
-                        None
-                    ]
-                    writer.writerow(row)
-                    continue
-
-                for work_record in upwork_diary_work_records:
-                    work_record_id = work_record.id
-                    work_id = work_record.work_id
-                    task_id = work_record.work.task_id
-                    task_name = work_record.work.task.name
-
-                    user_id = work_record.user_id
-                    user_name = work_record.user.name
-                    
-                    project = ';'.join([t.name for t in work_record.work.tags])
-                    skills = ';'.join([s.name for s in work_record.work.skills])
-
-                    work_record_interval = f'{work_record.utc_start_time.strftime("%Y/%m/%d %H:%M")} - {work_record.utc_end_time.strftime("%Y/%m/%d %H:%M")}'
-                    work_record_duration = str(timedelta(seconds=work_record.duration_seconds))
-                    
-                    upwork_cost = str([wrud.upwork_cost for wrud in upwork_diary.work_record_upwork_diaries if wrud.work_record_id == work_record_id][0])
-                    net_duration = [str(timedelta(seconds=wrud.upwork_duration_seconds)) for wrud in upwork_diary.work_record_upwork_diaries if wrud.work_record_id == work_record_id][0]
-
-                    row = [
-                        upwork_diary_id,
-                        upwork_user_id,
-                        upwork_user_name,
-                        upwork_interval,
-                        upwork_diary_duration,
-                        upwork_cost,
-                        net_duration,
-                        work_record_id,
-                        work_id,
-                        task_id,
-                        task_name,
-                        user_id,
-                        user_name,
-                        project,
-                        skills,
-                        work_record_interval,
-                        work_record_duration
-                    ]
-                    writer.writerow(row)
-            
-            # extra query for all external manual diary logs that originate elsewhere than upwork
-            manual_diary_items = DiaryLog.query \
-                .filter(
-                    and_(
-                        db.func.date(DiaryLog.date) <= end_date,
-                        db.func.date(DiaryLog.date) >= start_date
-                    ) \
-                ) \
-                .order_by(DiaryLog.id.asc()) \
-                .all()
-
-            for manual_diary in manual_diary_items:
-                row = [
-                    manual_diary.id,
-                    None,
-                    None,
-                    None,
-                    manual_diary.date,
-                    manual_diary.cost,
-                    str(timedelta(minutes=int(manual_diary.duration_hours*60))),
-                    None,
-                    None,
-                    None,
-                    manual_diary.text,
-                    manual_diary.user_role.email,
-                    None,
-                    manual_diary.project,
-                    None,
-                    None,
-                    None
-                ]
-                writer.writerow(row)
-
-            return output.getvalue()
+            writer.writerow(COST_REPORT_HEADER)
+
+            for rows in iter_cost_report_rows(start_date, end_date):
+                writer.writerows(rows)
+                yield output.getvalue()
+
+                output.seek(0)
+                output.truncate()
+
+            if output.tell():
+                yield output.getvalue()
+
+        def compress(chunks):
+            # gzip container, flushed at the end of the stream only
+            compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+            for chunk in chunks:
+                compressed = compressor.compress(chunk.encode('utf-8'))
+                if compressed:
+                    yield compressed
+
+            yield compressor.flush()
+
+        filename = f'cost_{start_date.strftime("%Y%m%d")}-{end_date.strftime("%Y%m%d")}.csv'
+        if gzip:
+            return Response(
+                stream_with_context(compress(generate_cost_report(start_date, end_date))),
+                mimetype='application/gzip',
+                headers={'Content-Disposition': f'attachment; filename={filename}.gz'}
+            )
 
         return Response(
             stream_with_context(generate_cost_report(start_date, end_date)),
             mimetype='text/csv',
-            headers={'Content-Disposition': f'attachment; filename=cost_{start_date.strftime("%Y%m%d")}-{end_date.strftime("%Y%m%d")}.csv'}
+            headers={'Content-Disposition': f'attachment; filename={filename}'}
         )
@@ -5,6 +5,7 @@ from flask.views import MethodView
 from flask_jwt_extended import (
     create_access_token,
     create_refresh_token,
+    current_user,
     get_jwt,
     get_jwt_identity,
     jwt_required
@@ -29,9 +30,9 @@ from ..schemas.user import (
     UserTokenRefreshResponseSchema
 )
 from ..utils.auth import JWT_ADDITIONAL_CLAIM_PREFIX, unactivated_jwt_required
-from ..utils.db import db
+from ..utils.db import add_with_random_ids, db
 from ..utils.errors import abort
-from ..utils.jwt import add_revoked_token
+from ..utils.jwt import add_revoked_token, invalidate_cached_user
 from ..utils.marshmallow import parser
 from ..utils.slack_bot import notify_user_profile_change
 
@@ -164,11 +165,11 @@ class UserSignout(MethodView):
     # usable anyhow
     @jwt_required()
     def post(self):
-        jti = get_jwt()['jti']
+        jwt_data = get_jwt()
         user_id = get_jwt_identity()
 
         try:
-            add_revoked_token(jti, user_id)
+            add_revoked_token(jwt_data['jti'], user_id, jwt_data['exp'])
         except Exception as ex:
             current_app.logger.error(f'error occurred when attempting to add revoked token: {ex}')
 
@@ -238,7 +239,7 @@ class UserResetPassword(MethodView):
             reset_code = UserCode(
                 UserCodeType.RESET_PASSWORD, expires=expires_at, user_id=user.id
             )
-            db.session.add(reset_code)
+            add_with_random_ids([reset_code])
             db.session.commit()
 
             # too-many-requests error will be implemented when a separate email service
@@ -285,11 +286,7 @@ class UserResetPasswordChange(MethodView):
 class UserProfile(MethodView):
     @jwt_required()
     def get(self):
-        user_id = get_jwt_identity()
-
-        user = User.query.filter_by(id=user_id).first()
-        if not user:
-            abort(401)
+        user = current_user
 
         # list specific fields to prevent accidentaly leaking sensitive data
         return UserProfileSchema().jsonify({
@@ -316,10 +313,7 @@ class UserProfile(MethodView):
         Update an existing user profile by user
         """
         user_id = get_jwt_identity()
-
-        user = User.query.filter_by(id=user_id).first()
-        if not user:
-            abort(401)
+        user = current_user
         
         if first_name:
             user.first_name = None if first_name == 'null' else first_name
@@ -344,10 +338,11 @@ class UserProfile(MethodView):
         if skills is not None:
             current_user_skills = UserSkill.query.filter_by(user_id=user_id).all()
             updated_user_skill_ids = []
+            existing_skills = Skill.get_many(skills)
 
             for skill in skills:
                 # pass on non-existing skills
-                existing_skill = Skill.query.filter_by(name=skill).first()
+                existing_skill = existing_skills.get(skill)
                 if not existing_skill:
                     current_app.logger.warning(f'User profile update skill "{skill}" does not exist')
                     continue
@@ -371,5 +366,6 @@ class UserProfile(MethodView):
 
         db.session.commit()
         db.session.refresh(user)
+        invalidate_cached_user(user_id)
 
         return EmptyResponseSchema().jsonify()
@@ -3,14 +3,18 @@ import time
 
 from flask import current_app, redirect
 from flask.views import MethodView
-from flask_jwt_extended import get_jwt_identity
-from sqlalchemy.orm import joinedload, contains_eager
-from sqlalchemy.sql import label, or_, and_
+from flask_jwt_extended import current_user, get_jwt_identity
+from sqlalchemy.orm import joinedload
+from sqlalchemy.sql import and_
 
+from ..logic.contributor_stats import queue_work_contributor_stats_refresh
+from ..logic.project_activity import queue_task_project_activity_refresh
 from ..logic.robobee import get_pr_info
 from ..logic.beehave import beehave_review_pr, run_beehave_pr_github_bot
 from ..logic.work_mappers.base import inflate_mapper
-from ..logic.cuckoo import CuckooEvent, dispatch_cuckoo_event
+from ..logic.work_matching import draw_available_work, index_work
+from ..logic.cuckoo import CuckooEvent
+from ..logic.cuckoo_outbox import queue_cuckoo_event
 from ..logic.praesepe import RatingSubject, get_rating_items, get_rating_subjects, get_praesepe_authorization_code
 from ..models.task import ReviewStatus, Task, TaskStatus
 from ..models.task_context import TaskContext
@@ -18,9 +22,6 @@ from ..models.quest import QuestStatus
 from ..models.work import Work, WorkStatus, WorkType
 from ..models.work_record import WorkOutcome, WorkRecord
 from ..models.beehave_review import BeehaveReview
-from ..models.skill import UserSkill, WorkSkill
-from ..models.tag import Tag, WorkTag
-from ..models.user import User
 from ..models.repository import Repository
 from ..models.project import Project, ProjectDelegator
 from ..schemas import EmptyResponseSchema
@@ -45,6 +46,8 @@ from ..utils.email import send_task_feedback_email, send_task_solved_email
 from ..utils.errors import abort
 from ..utils.marshmallow import parser
 from ..utils.metrics import work_finish_summary
+from ..utils.response_cache import invalidate_task_cached_responses
+from ..utils.tracing import span
 from ..utils.grpc_client import grpc_client
 
 
@@ -73,7 +76,7 @@ class WorkHistory(MethodView):
         
         work_records_query = WorkRecord.query \
             .filter_by(user_id=user_id) \
-            .options(joinedload(WorkRecord.work).joinedload(Work.task)) \
+            .options(joinedload(WorkRecord.work).joinedload(Work.task).selectinload(Task.tags)) \
             .filter(Work.id == WorkRecord.work_id, Task.id == Work.task_id) \
             .filter(Work.status == WorkStatus.COMPLETE) \
             .filter(Task.status == TaskStatus.ACCEPTED) \
@@ -104,11 +107,8 @@ class AvailableWork(MethodView):
     @parser.use_args(GetAvailableWorkRequestSchema(), as_kwargs=True, location='querystring')
     def get(self, specific_work_id=None, current_work_id=None):
         user_id = get_jwt_identity()
-        user = User.query.filter_by(id=user_id).first()
+        user = current_user
 
-        if not user:
-            current_app.logger.error('User not found')
-            abort(404)
         current_app.logger.info('Getting a new task')
         work = None
         in_process_work = WorkRecord.query.filter_by(user_id=user_id, active=True) \
@@ -168,110 +168,14 @@ class AvailableWork(MethodView):
                 current_app.logger.info('Found worker reserved work item')
                 work = reserved_work
 
-        # if a reserved work item was not found either look for any availbale
-        # work item
+        # if a reserved work item was not found either draw any available work
+        # item out of the work matching index
         if not work:
-            # this is a sort-of normalized column of the sum of work time already
-            # invested in a task by the worker in minutes, or 0.1 if the worker
-            # has never worked on this task. this does encourage tasks on which
-            # the worker has worked for less than 6 seconds to appear more, but
-            # once the worker works on a task for a longer period its chance
-            # of being selected declines up to a maximum of 10 minutes
-            normalized_duration_col = label(
-                'work_duration_seconds',
-                db.func.coalesce(
-                    db.func.least(
-                        db.func.sum(WorkRecord.duration_seconds) / 60,
-                        10
-                    ),
-                    0.1
-                )
-            )
-
-            # using contains_eager to trick sqlalchemy
-            # to think we loaded all items for the relationship Work.task
-            available_work_query = Work.query \
-                .outerjoin(WorkRecord, Work.id == WorkRecord.work_id) \
-                .join(Task, and_(
-                    Work.task_id == Task.id,
-                    Task.status.in_([TaskStatus.PENDING, TaskStatus.IN_PROCESS, TaskStatus.MODIFICATIONS_REQUESTED]))
-                ) \
-                .join(Work.tags, isouter=True) \
-                .options(contains_eager(Work.task)) \
-                .add_columns(normalized_duration_col) \
-                .filter(Work.status == WorkStatus.AVAILABLE) \
-                .filter(or_(
-                    Work.reserved_until_epoch_ms == None,
-                )) \
-
-            # make sure work is not the current one
-            if current_work_id:
-                available_work_query = available_work_query \
-                    .filter(Work.id != current_work_id)
-
-            # filter work by tags if user is tagged
-            available_work_query = available_work_query \
-                .filter(or_(
-                    ~Work.tags.any(),
-                    Work.tags.any(WorkTag.tag_id.in_(t.id for t in user.tags))
-                ))
-
-            # filter work if it's prohibited for this worker
-            available_work_query = available_work_query \
-                .filter(or_(
-                    Work.prohibited_worker_id == None,
-                    Work.prohibited_worker_id != user_id
-                )
-            )
-
-            # columns and subquery to count matching work-user skills
-            work_skill_matches_col = label(
-                'matching_skills_count',
-                db.func.count()
-            )
-            skill_matches = WorkSkill.query \
-                .join(
-                    UserSkill, WorkSkill.skill_id == UserSkill.skill_id
-                ) \
-                .filter(UserSkill.user_id == user_id) \
-                .with_entities(WorkSkill.work_id) \
-                .add_columns(work_skill_matches_col) \
-                .group_by(WorkSkill.work_id) \
-                .subquery()
-
-            # max out at 5 matched skills
-            work_skill_matches_coalesced_col = label(
-                'matching_skills_coalesced_count',
-                db.func.least(
-                    db.func.coalesce(skill_matches.c.matching_skills_count, 0),
-                    5
-                )
-            )
-
-            available_work_query = available_work_query \
-                .outerjoin(skill_matches, Work.id == skill_matches.c.work_id) \
-                .add_columns(work_skill_matches_coalesced_col)
-
-            available_work_query = available_work_query \
-                .group_by(Work.id, Task.id, Tag.id) \
-                .order_by(
-                    # deduct the matched skills count from 6 so that its order is reversed and
-                    # so the result is never 0 (which would mean max-matched-skill work items
-                    # will always "win" since they will have a multiplication by 0). raise the
-                    # result to a power of 1.5 to increase the distance between the different
-                    # match amounts. multiply by the normalized duration col and a random
-                    # value to produce a random order which favours more skills matched and
-                    # less time previously worked
-                    db.func.power((101 - Task.priority), 2) * \
-                    db.func.power(6 - work_skill_matches_coalesced_col, 1.5) * \
-                    normalized_duration_col * \
-                    db.func.random()
-                )
-            work = available_work_query.first()
+            with span('draw_available_work', 'db'):
+                work = draw_available_work(user, current_work_id)
 
             if work:
                 current_app.logger.info('Found new work item for worker')
-                work = work.Work  # multiple results since we added columns to the query
 
         if not work:
             current_app.logger.info('No work found')
@@ -320,10 +224,11 @@ class AvailableWork(MethodView):
                 .all()
         work.context = context_items
 
-        if in_process_work:
-            return GetAvailableWorkResponseSchema().jsonify({'work': work, 'work_record': in_process_work})
-        else:
-            return GetAvailableWorkResponseSchema().jsonify({'work': work})
+        with span('serialize', 'serialization'):
+            if in_process_work:
+                return GetAvailableWorkResponseSchema().jsonify({'work': work, 'work_record': in_process_work})
+            else:
+                return GetAvailableWorkResponseSchema().jsonify({'work': work})
 
 
 class WorkStart(MethodView):
@@ -351,10 +256,7 @@ class WorkStart(MethodView):
         # notify cuckoo service that work has started
         if work.work_type in (WorkType.CUCKOO_CODING, WorkType.CUCKOO_ITERATION, WorkType.CUCKOO_QA):
 
-            github_user = None
-            user = User.query.filter_by(id=user_id).first()
-            if user:
-                github_user = user.github_user
+            github_user = current_user.github_user
 
             # first work in task
             first_chain_work = True if work.task.status in (TaskStatus.PENDING, TaskStatus.NEW, TaskStatus.MODIFICATIONS_REQUESTED) else False
@@ -367,12 +269,10 @@ class WorkStart(MethodView):
                 'firstChainWork': first_chain_work
             }
 
-            res = dispatch_cuckoo_event(
+            queue_cuckoo_event(
                 work.task_id,
                 payload
             )
-            if not res:
-                abort(500, code='cuckoo_notification_failed')
 
             if work.task.quest_id:
                 work.task.quest.status = QuestStatus.IN_PROCESS
@@ -383,6 +283,9 @@ class WorkStart(MethodView):
 
         db.session.commit()
 
+        queue_work_contributor_stats_refresh(work, user_id)
+        invalidate_task_cached_responses(work.task, user_id)
+
         # on chain link start, rating should happen on frontend instead of cuckoo
         if work.work_type in [WorkType.CUCKOO_QA]:
             # rated object derived from work input and not current work record
@@ -399,7 +302,8 @@ class WorkStart(MethodView):
                 # user_id=work_record.user_id
             )
 
-        return WorkStartResponseSchema().jsonify({'work_record': work_record})
+        with span('serialize', 'serialization'):
+            return WorkStartResponseSchema().jsonify({'work_record': work_record})
 
 class WorkSkipped(MethodView):
     # start working on a task (accept task)
@@ -418,6 +322,9 @@ class WorkSkipped(MethodView):
         db.session.add(work_record)
         db.session.commit()
 
+        queue_work_contributor_stats_refresh(work, user_id)
+        invalidate_task_cached_responses(work.task, user_id)
+
         return EmptyResponseSchema().jsonify()
 
 
@@ -460,6 +367,8 @@ class WorkFinish(MethodView):
         review_status=None, review_feedback=None, force_submit_reason=None, solution_url=None):
         
         user_id = get_jwt_identity()
+        # sent to cuckoo with the work events below
+        github_user = current_user.github_user
 
         work = Work.query \
             .filter_by(id=work_id) \
@@ -540,12 +449,17 @@ class WorkFinish(MethodView):
                 # save new work items to db
                 for w in new_work:
                     db.session.add(w)
+                    index_work(w)
             else:
                 work.task.status = TaskStatus.SOLVED
 
                 # email delegating user
                 send_task_solved_email(work.task)
 
+        # refresh the work's matching features with the time just invested in it,
+        # or drop it from the matching index if it was completed
+        index_work(work)
+
         # record metric with output
         work_finish_summary.labels(output=work_output).observe(duration_seconds)
 
@@ -557,11 +471,6 @@ class WorkFinish(MethodView):
 
             payload = None
 
-            github_user = None
-            user = User.query.filter_by(id=user_id).first()
-            if user:
-                github_user = user.github_user
-
             match work_output:
                 case 'feedback':
                     payload = {
@@ -691,13 +600,15 @@ class WorkFinish(MethodView):
                     }
 
             if payload:
-                res = dispatch_cuckoo_event(
+                queue_cuckoo_event(
                     work.task_id, payload)
-                if not res:
-                    abort(500, code='cuckoo_notification_failed')
 
         db.session.commit()
 
+        queue_task_project_activity_refresh(work.task)
+        queue_work_contributor_stats_refresh(work, user_id)
+        invalidate_task_cached_responses(work.task, user_id)
+
         # trigger task for pollinator to add review in github
         if work_output in ['solve', 'solve_chain_link_code'] and solution_url:
             run_beehave_pr_github_bot(solution_url, work_record.work.description)
@@ -777,8 +688,7 @@ class WorkSolutionReview(MethodView):
         # so also need to cross check project via tags
         if not completed_work_repo:
             user_permitted_projects = [r.project.name for r in user_permitted_repos]
-            user = User.query.filter_by(id=user_id).first()
-            user_project_tags = [t.name.replace('project:','') for t in user.tags]
+            user_project_tags = [t.name.replace('project:','') for t in current_user.tags]
 
             work_project_tags = [t.name.replace('project:','') for t in completed_work_record.work.tags]
             
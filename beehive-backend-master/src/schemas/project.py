@@ -1,13 +1,35 @@
+from datetime import datetime
+
 from marshmallow import validates_schema
 from marshmallow.validate import Range, ValidationError
 
 from ..utils.marshmallow import ma
 
+
+# longest window of days the project activity endpoint returns
+PROJECT_ACTIVITY_MAX_DAYS = 366
+
 class ProjectRequestSchema(ma.Schema):
     project_id = ma.Integer()
     page = ma.Integer(required=False, validate=Range(min=0))
     results_per_page = ma.Integer(required=False, data_key='resultsPerPage', validate=Range(min=0))
 
+class ProjectActivityRequestSchema(ma.Schema):
+    project_id = ma.Integer()
+    start_date = ma.Date(required=False, data_key='startDate')
+    end_date = ma.Date(required=False, data_key='endDate')
+    days = ma.Integer(required=False, validate=Range(min=1, max=PROJECT_ACTIVITY_MAX_DAYS))
+
+    @validates_schema
+    def validate_date_range(self, data, **kwargs):
+        if data.get('start_date') and data.get('end_date') and data['start_date'] > data['end_date']:
+            raise ValidationError('startDate must not be after endDate')
+
+        # the window ends today unless an end date is given
+        end_date = data.get('end_date') or datetime.utcnow().date()
+        if data.get('start_date') and (end_date - data['start_date']).days >= PROJECT_ACTIVITY_MAX_DAYS:
+            raise ValidationError(f'startDate must be less than {PROJECT_ACTIVITY_MAX_DAYS} days before endDate', 'startDate')
+
 class ProjectResponseSchema(ma.Schema):
     project_id = ma.String(data_key='id')
     project_name = ma.String(data_key='projectName')
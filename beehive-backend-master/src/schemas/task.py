@@ -1,3 +1,5 @@
+from marshmallow.validate import Length
+
 from ..models.task import Task, TaskStatus, TaskType
 from ..utils.marshmallow import BeehiveSchemaMixin, ma
 from ..models.work_record import SolutionRating
@@ -54,6 +56,25 @@ class CreateCuckooTaskRequestSchema(ma.Schema):
     quest_id = ma.String(required=False, data_key='questId', allow_none=True)
 
 
+# maximum number of tasks created by a single bulk request
+CUCKOO_TASK_BULK_MAX_SIZE = 200
+
+
+class CreateCuckooTasksRequestSchema(ma.Schema):
+    # items are validated one by one so that an invalid task fails only itself
+    tasks = ma.List(ma.Dict(), required=True, validate=Length(min=1, max=CUCKOO_TASK_BULK_MAX_SIZE))
+
+
+class CreateCuckooTaskResultSchema(ma.Schema):
+    id = ma.String(allow_none=True)
+    error = ma.String(allow_none=True)
+    description = ma.Raw(allow_none=True)
+
+
+class CreateCuckooTasksResponseSchema(ma.Schema, BeehiveSchemaMixin):
+    tasks = ma.List(ma.Nested(CreateCuckooTaskResultSchema))
+
+
 class PartialUpdateCuckooTaskRequestSchema(ma.Schema):
     task_id = ma.String(required=True, data_key='taskId')
     user_name = ma.String(required=True, data_key='userName')
@@ -22,6 +22,24 @@ class UpworkWorkdiaryRequestSchema(ma.Schema):
     start_date = ma.Date(format='%Y%m%d', data_key='startDate')
     end_date = ma.Date(format='%Y%m%d', data_key='endDate')
 
+class UpworkBackfillDaySchema(ma.Schema):
+    date = ma.String(data_key='date')
+    status = ma.String(data_key='status')
+    diaries = ma.Integer(data_key='diaries')
+    error = ma.String(data_key='error')
+    updated = ma.String(data_key='updated')
+
+class UpworkBackfillResponseSchema(ma.Schema, BeehiveSchemaMixin):
+    id = ma.String(data_key='id')
+    job_id = ma.String(data_key='jobId')
+    status = ma.String(data_key='status')
+    start_date = ma.String(data_key='startDate')
+    end_date = ma.String(data_key='endDate')
+    error = ma.String(data_key='error')
+    created = ma.String(data_key='created')
+    updated = ma.String(data_key='updated')
+    days = ma.List(ma.Nested(UpworkBackfillDaySchema), data_key='days')
+
 class UpworkDiaryResponseSchema(ma.Schema, BeehiveSchemaMixin):
     id = ma.Integer(data_key='id')
     user_id = ma.String(data_key='userId')
@@ -106,4 +124,5 @@ class UpworkDiarySchema(ma.Schema):
 
 class UpworkCostReportRequestSchema(ma.Schema):
     start_date = ma.Date(format='%Y%m%d', data_key='startDate', required=True)
-    end_date = ma.Date(format='%Y%m%d', data_key='endDate', required=True)
\ No newline at end of file
+    end_date = ma.Date(format='%Y%m%d', data_key='endDate', required=True)
+    gzip = ma.Boolean(data_key='gzip', load_default=False)
\ No newline at end of file
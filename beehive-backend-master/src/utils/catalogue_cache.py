@@ -0,0 +1,69 @@
+from flask import Flask
+
+from .subscribed_cache import SubscribedCache
+
+
+CATALOGUE_CHANGED_CHANNEL = 'beehive:catalogue-changed'
+
+
+class CatalogueCache(SubscribedCache):
+    """
+    Per-process cache of catalogue items (tags and skills) by name, cleared
+    whenever catalogue items are created or deleted by any process
+    """
+    channel = CATALOGUE_CHANGED_CHANNEL
+    name = 'catalogue'
+
+    def init_app(self, app: Flask):
+        self.ttl_seconds = app.config.setdefault('CATALOGUE_CACHE_TTL_SECONDS', self.ttl_seconds)
+        self.max_size = app.config.setdefault('CATALOGUE_CACHE_SIZE', self.max_size)
+        super().init_app(app)
+
+    @staticmethod
+    def _key(model, name: str):
+        # names are matched case-insensitively, like the database collation does
+        return (model.__tablename__, name.lower())
+
+    def get_many(self, model, names: list[str]) -> dict[str, tuple[int, str]]:
+        """
+        Get cached catalogue items
+        Arguments:
+            model - the catalogue model, e.g. Tag
+            names - the names to look up
+        Returns:
+            Dictionary of looked up name to the id and stored name of the item,
+            only for names that are cached
+        """
+        if not self._subscribed():
+            return {}
+
+        cached = self._items.get_many([self._key(model, name) for name in names])
+        return {name: cached[self._key(model, name)] for name in names if self._key(model, name) in cached}
+
+    def set_many(self, model, items: list[tuple[int, str]], generation: int):
+        """
+        Cache catalogue items read from the database
+        Arguments:
+            model - the catalogue model, e.g. Tag
+            items - list of the id and name of each item
+            generation - the cache generation from before the items were read
+        """
+        if not items or not self._subscribed():
+            return
+
+        with self._lock:
+            if generation != self.generation:
+                return
+
+            self._items.set_many({self._key(model, name): (i, name) for i, name in items}, self.ttl_seconds)
+
+    def invalidate(self, model):
+        """
+        Clear the cache of every process after catalogue items were created or
+        deleted. Must be called after the change is committed
+        """
+        self._clear()
+        self._publish(model.__tablename__)
+
+
+catalogue_cache = CatalogueCache()
@@ -1,9 +1,14 @@
+from collections import defaultdict
 from datetime import datetime
 import string
 
 from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import make_transient_to_detached
 
+from .catalogue_cache import catalogue_cache
 from .misc import generate_random_string
 
 
@@ -11,34 +16,195 @@ db = SQLAlchemy(session_options={'expire_on_commit': False})
 migrate = Migrate()
 
 
+def utc_from_epoch_seconds(seconds_sql):
+    """
+    SQL of the utc datetime of a number of seconds since the epoch. unlike
+    from_unixtime it does not depend on the session time zone, so it can be
+    used by stored generated columns
+    """
+    return f"cast('1970-01-01' as datetime) + interval ({seconds_sql}) second"
+
+
 class TimestampMixin(object):
     created = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     updated = db.Column(db.DateTime, onupdate=datetime.utcnow)
 
 
+RANDOM_ID_CHARS = string.ascii_lowercase + string.ascii_uppercase + string.digits
+
+
 class RandomStringIdMixin(object):
-    GET_RANDOM_ID_ATTEMPTS = 5
+    """
+    Models with a random string primary key. Ids are drawn from a CSPRNG without
+    checking whether they are taken, a taken id fails the insert on its primary
+    key and add_with_random_ids gives such objects new ids
+    """
+    ADD_WITH_RANDOM_IDS_ATTEMPTS = 5
 
-    def _get_random_id(self):
-        model_class = type(self)
-        if not model_class or \
-            not hasattr(model_class, 'id') or \
-            not hasattr(model_class.id, 'property') or \
-            not isinstance(model_class.id.property, db.ColumnProperty) or \
-            not isinstance(model_class.id.property.columns[0].type, db.String):
+    @classmethod
+    def _random_id_length(cls):
+        if not hasattr(cls, 'id') or \
+            not hasattr(cls.id, 'property') or \
+            not isinstance(cls.id.property, db.ColumnProperty) or \
+            not isinstance(cls.id.property.columns[0].type, db.String):
             raise Exception('no string id column available')
 
-        # generate an available random id
-        chars = string.ascii_lowercase + string.ascii_uppercase + string.digits
-        result = None
-        attempt = 0
-        while not result and attempt < RandomStringIdMixin.GET_RANDOM_ID_ATTEMPTS:
-            attempt += 1
-            random_id = generate_random_string(chars, model_class.id.property.columns[0].type.length)
-            if model_class.query.filter_by(id=random_id).first() is None:
-                result = random_id
+        return cls.id.property.columns[0].type.length
+
+    @classmethod
+    def allocate_ids(cls, count):
+        """
+        Allocate ids for inserting a number of rows in bulk
+        Arguments:
+            count - number of ids to allocate
+        Returns:
+            List of distinct random ids
+        """
+        length = cls._random_id_length()
+        ids = set()
+        while len(ids) < count:
+            ids.add(generate_random_string(RANDOM_ID_CHARS, length))
+
+        return list(ids)
+
+    def _get_random_id(self):
+        return generate_random_string(RANDOM_ID_CHARS, type(self)._random_id_length())
+
+
+def _reassign_taken_random_ids(instances):
+    """
+    Give new ids to objects whose id is already taken or shared with another of
+    the objects
+    Returns:
+        Whether any id was reassigned
+    """
+    instances_by_model = defaultdict(list)
+    for instance in instances:
+        instances_by_model[type(instance)].append(instance)
+
+    reassigned = False
+    for model, model_instances in instances_by_model.items():
+        ids = list({instance.id for instance in model_instances})
+        taken_ids = {i for (i,) in db.session.query(model.id).filter(model.id.in_(ids))}
+
+        seen_ids = set()
+        for instance in model_instances:
+            if instance.id in taken_ids or instance.id in seen_ids:
+                instance.id = instance._get_random_id()
+                reassigned = True
+            seen_ids.add(instance.id)
+
+    return reassigned
+
+
+def add_with_random_ids(instances):
+    """
+    Add and flush new objects with random string ids. When an id is already
+    taken the objects are given new ids and flushed again. Objects are flushed
+    in a savepoint so that a taken id does not roll back the rest of the
+    transaction, and their ids must not have been copied to other objects yet
+    Arguments:
+        instances - new objects of RandomStringIdMixin models
+    """
+    if not instances:
+        return
+
+    for attempt in range(1, RandomStringIdMixin.ADD_WITH_RANDOM_IDS_ATTEMPTS + 1):
+        try:
+            with db.session.begin_nested():
+                db.session.add_all(instances)
+
+            return
+        except IntegrityError:
+            # only inserts failing on a taken id are retried
+            if attempt == RandomStringIdMixin.ADD_WITH_RANDOM_IDS_ATTEMPTS or not _reassign_taken_random_ids(instances):
+                raise
+
+
+class CatalogueMixin(object):
+    """
+    Models of catalogue items identified by name, such as tags. Items are looked
+    up in bulk and through the per-process catalogue cache, which holds items
+    committed to the database only
+    """
+    # session info key of the catalogue models the session created items of
+    CREATED_CATALOGUES_SESSION_KEY = 'created_catalogues'
+
+    @classmethod
+    def _from_cached(cls, item_id, name):
+        # attach the item to the session by its identity without loading it
+        item = cls(name)
+        item.id = item_id
+        make_transient_to_detached(item)
+
+        return db.session.merge(item, load=False)
+
+    @classmethod
+    def get_many(cls, names):
+        """
+        Get existing catalogue items by name, names are matched case-insensitively
+        Arguments:
+            names - the names of the items
+        Returns:
+            Dictionary of name to item, only for names of existing items
+        """
+        if not names:
+            return {}
+
+        generation = catalogue_cache.generation
+        items = {name: cls._from_cached(*cached) for name, cached in catalogue_cache.get_many(cls, names).items()}
+
+        missing = [name for name in dict.fromkeys(names) if name not in items]
+        if missing:
+            found = {}
+            for item in cls.query.filter(cls.name.in_(missing)).order_by(cls.id):
+                found.setdefault(item.name.lower(), item)
+
+            items.update({name: found[name.lower()] for name in missing if name.lower() in found})
+
+            # items this session created may still be rolled back
+            if cls not in db.session.info.get(cls.CREATED_CATALOGUES_SESSION_KEY, ()):
+                catalogue_cache.set_many(cls, [(item.id, item.name) for item in found.values()], generation)
+
+        return items
+
+    @classmethod
+    def get_or_create_by_name(cls, names):
+        """
+        Get catalogue items by name, creating the missing items with a single
+        multi-row insert
+        Arguments:
+            names - the names of the items
+        Returns:
+            Dictionary of name to item
+        """
+        items = cls.get_many(names)
+
+        new_names = {}
+        for name in names:
+            if name not in items:
+                new_names.setdefault(name.lower(), name)
+
+        if new_names:
+            db.session.execute(insert(cls), [{'name': name} for name in new_names.values()])
+            db.session.info.setdefault(cls.CREATED_CATALOGUES_SESSION_KEY, set()).add(cls)
+            items.update(cls.get_many([name for name in names if name not in items]))
+
+        return items
+
+    @classmethod
+    def get_or_create_many(cls, names):
+        """
+        Get catalogue items by name, creating the missing items
+        Arguments:
+            names - the names of the items
+        Returns:
+            List of the items in the order of the names, without duplicates
+        """
+        items = cls.get_or_create_by_name(names)
 
-        if not result:
-            raise Exception(f'failed to find an available id over {RandomStringIdMixin.GET_RANDOM_ID_ATTEMPTS} attempts')
+        return list({id(items[name]): items[name] for name in names}.values())
 
-        return result
+    @classmethod
+    def get_or_create(cls, name):
+        return cls.get_or_create_many([name])[0]
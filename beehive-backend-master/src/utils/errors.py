@@ -7,6 +7,7 @@ def init_app(app):
     app.register_error_handler(401, handle_unauthorized)
     app.register_error_handler(404, handle_not_found)
     app.register_error_handler(405, handle_method_not_allowed)
+    app.register_error_handler(409, handle_conflict)
     app.register_error_handler(422, handle_unprocessable_entity)
     app.register_error_handler(500, handle_server_error)
 
@@ -50,6 +51,19 @@ def handle_method_not_allowed(err=None):
     return jsonify({'status': 'error', 'error': 'not_allowed'}), 405
 
 
+def handle_conflict(err=None):
+    response = {'status': 'error', 'error': 'conflict'}
+
+    if err and hasattr(err, 'data'):
+        # not using dict.update here to make sure we only deal with specific fields
+        if 'code' in err.data:
+            response['error'] = err.data['code']
+        if 'description' in err.data:
+            response['description'] = err.data['description']
+
+    return jsonify(response), 409
+
+
 def handle_server_error(err=None):
     return jsonify({'status': 'error', 'error': 'server_error'}), 500
 
@@ -7,6 +7,8 @@ from bh_grpc.interceptors.client.outbound_auth import OutboundAuthInterceptor
 from flask import Flask
 import grpc
 
+from .tracing import span
+
 
 class GRPCClient:
     server_address: str = 'localhost:50080'
@@ -59,7 +61,8 @@ class GRPCClient:
         response status codes, and instead return None for those cases.
         """
         try:
-            return rpc_func(*rpc_func_args)
+            with span('grpc.robobee', 'grpc'):
+                return rpc_func(*rpc_func_args)
         except grpc.RpcError as ex:
             if ex.code() not in valid_status_codes:
                 raise ex
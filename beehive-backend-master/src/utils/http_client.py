@@ -0,0 +1,120 @@
+import os
+import time
+
+from flask import Flask
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .metrics import http_client_request_duration
+from .tracing import span
+
+
+class HTTPClient:
+    """
+    Shared client for outbound http calls to other services. Each service gets
+    its own pooled keep-alive session with the service's timeout, and idempotent
+    requests are retried with backoff on connection errors and gateway errors
+    """
+    # service name to the config key of its read timeout in seconds
+    SERVICE_TIMEOUT_CONFIG_KEYS = {
+        'cuckoo': 'CUCKOO_TIMEOUT_SECONDS',
+        'praesepe': 'PRAESEPE_TIMEOUT_SECONDS',
+        'pollinator': 'POLLINATOR_TIMEOUT_SECONDS',
+        'slack_bot': 'SLACK_BOT_TIMEOUT_SECONDS',
+    }
+
+    RETRY_STATUS_CODES = [502, 503, 504]
+
+    connect_timeout_seconds: float = 3.05
+    pool_maxsize: int = 10
+    max_retries: int = 2
+    retry_backoff_factor: float = 0.3
+
+    def __init__(self, app: Flask | None = None):
+        self._initialized = False
+        self._timeouts = {}
+        self._sessions = {}
+        self._sessions_pid = None
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask):
+        self.connect_timeout_seconds = app.config.setdefault(
+            'HTTP_CLIENT_CONNECT_TIMEOUT_SECONDS',
+            self.connect_timeout_seconds,
+        )
+        self.pool_maxsize = app.config.setdefault('HTTP_CLIENT_POOL_MAXSIZE', self.pool_maxsize)
+        self.max_retries = app.config.setdefault('HTTP_CLIENT_MAX_RETRIES', self.max_retries)
+        self.retry_backoff_factor = app.config.setdefault(
+            'HTTP_CLIENT_RETRY_BACKOFF_FACTOR',
+            self.retry_backoff_factor,
+        )
+
+        self._timeouts = {
+            service: (self.connect_timeout_seconds, app.config[config_key])
+            for service, config_key in self.SERVICE_TIMEOUT_CONFIG_KEYS.items()
+        }
+
+        self._close_sessions()
+        self._initialized = True
+
+    def get(self, service: str, url: str, **kwargs) -> requests.Response:
+        return self.request(service, 'GET', url, **kwargs)
+
+    def post(self, service: str, url: str, **kwargs) -> requests.Response:
+        return self.request(service, 'POST', url, **kwargs)
+
+    def request(self, service: str, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        Send a request to a service using the service's session, timing it in
+        the service's latency histogram. timeouts and connection errors are
+        raised as requests exceptions
+        """
+        if not self._initialized:
+            raise RuntimeError('HTTPClient not initialized')
+
+        kwargs.setdefault('timeout', self._timeouts[service])
+
+        start = time.perf_counter()
+        try:
+            with span(f'http.{service}', 'http'):
+                return self._session(service).request(method, url, **kwargs)
+        finally:
+            http_client_request_duration.labels(service=service, method=method).observe(time.perf_counter() - start)
+
+    def _session(self, service: str) -> requests.Session:
+        # pooled connections must not be shared with forked worker processes
+        if self._sessions_pid != os.getpid():
+            self._sessions = {}
+            self._sessions_pid = os.getpid()
+
+        session = self._sessions.get(service)
+        if session is None:
+            retry = Retry(
+                total=self.max_retries,
+                backoff_factor=self.retry_backoff_factor,
+                status_forcelist=self.RETRY_STATUS_CODES,
+                allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+                raise_on_status=False,
+            )
+            adapter = HTTPAdapter(pool_maxsize=self.pool_maxsize, max_retries=retry)
+
+            session = requests.Session()
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self._sessions[service] = session
+
+        return session
+
+    def _close_sessions(self):
+        if self._sessions_pid == os.getpid():
+            for session in self._sessions.values():
+                session.close()
+
+        self._sessions = {}
+        self._sessions_pid = None
+
+
+http_client = HTTPClient()
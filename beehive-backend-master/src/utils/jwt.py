@@ -1,13 +1,38 @@
+from datetime import datetime, timedelta
+import time
+
+from flask import current_app, g
 from flask_jwt_extended import JWTManager
+from redis import RedisError
+from sqlalchemy.orm import Session, joinedload
 
 from .db import db
 from .errors import handle_unauthorized
+from .rq import rq
+from .ttl_cache import TTLCache
+from .user_cache import user_cache
 from ..models.revoked_token import RevokedToken
+from ..models.user import User
+
+
+REVOKED_TOKEN_KEY_PREFIX = 'beehive:revoked-token:'
+# set while the revoked tokens in the database are mirrored to redis, otherwise
+# tokens missing from redis are looked up in the database. it expires unless the
+# mirror job renews it, so revocations redis lost (e.g. evicted) are only
+# trusted missing until the next mirroring at the latest
+REVOKED_TOKENS_MIRRORED_KEY = 'beehive:revoked-tokens-mirrored'
+REVOKED_TOKENS_MIRRORED_TTL_SECONDS = 30 * 60
 
 
 jwt_manager = JWTManager()
 
 
+# token ids recently found not to be revoked, so that most requests skip both
+# redis and the database. a token revoked by another process is accepted here
+# until its cache entry expires
+unrevoked_token_cache = TTLCache()
+
+
 @jwt_manager.token_verification_failed_loader
 def claims_verification_failed_loader():
     # TODO: log?
@@ -38,17 +63,182 @@ def unauthorized_loader(cause):
     return handle_unauthorized()
 
 
+@jwt_manager.user_lookup_error_loader
+def user_lookup_error_loader(_jwt_header: dict, _jwt_data: dict):
+    # TODO: log?
+    return handle_unauthorized()
+
+
+def _query_current_user(session, user_id):
+    # users have a handful of each, so joining all three in a single query is
+    # cheaper than a query per collection
+    return session.query(User) \
+        .filter(User.id == user_id) \
+        .options(
+            joinedload(User.tags),
+            joinedload(User.skills),
+            joinedload(User.project_delegators)
+        ) \
+        .first()
+
+
+# Load the user of the request's token, available as flask_jwt_extended's current_user
+@jwt_manager.user_lookup_loader
+def load_current_user(_jwt_header: dict, jwt_data: dict) -> User | None:
+    """
+    Load the user of the request's token with its tags, skills and delegator
+    project memberships once per request. Users are cached in-process for
+    USER_CACHE_TTL_SECONDS, and cached users are merged into the request's
+    session without querying the database
+    """
+    user_id = jwt_data[current_app.config['JWT_IDENTITY_CLAIM']]
+
+    # the token may be verified more than once in a request
+    if g.get('current_user_id') == user_id:
+        return g.current_user
+
+    if user_cache.ttl_seconds > 0:
+        generation = user_cache.generation
+        cached_user = user_cache.get(user_id)
+        if cached_user is None:
+            # load the cached user in its own session so that it stays fully
+            # loaded once detached
+            with Session(db.engine, expire_on_commit=False) as session:
+                cached_user = _query_current_user(session, user_id)
+
+            if cached_user is not None:
+                user_cache.set(user_id, cached_user, generation)
+
+        user = db.session.merge(cached_user, load=False) if cached_user is not None else None
+    else:
+        user = _query_current_user(db.session, user_id)
+
+    g.current_user_id = user_id
+    g.current_user = user
+
+    return user
+
+
+def invalidate_cached_user(user_id):
+    """
+    Drop a user from the user cache of every process after it was changed
+    """
+    user_cache.invalidate(user_id)
+
+
+def _max_token_lifetime() -> timedelta:
+    return max(current_app.config['JWT_ACCESS_TOKEN_EXPIRES'], current_app.config['JWT_REFRESH_TOKEN_EXPIRES'])
+
+
+def _is_token_revoked_in_redis(jti: str) -> bool | None:
+    """
+    Returns:
+        Whether the token is revoked, or None if redis can't tell
+    """
+    try:
+        pipeline = rq.connection.pipeline(transaction=False)
+        pipeline.exists(REVOKED_TOKENS_MIRRORED_KEY)
+        pipeline.exists(f'{REVOKED_TOKEN_KEY_PREFIX}{jti}')
+        mirrored, revoked = pipeline.execute()
+    except RedisError as ex:
+        current_app.logger.error(f'failed to look up revoked token: {str(ex)}')
+        return None
+
+    if revoked:
+        return True
+
+    return False if mirrored else None
+
+
 # Check if the token jti is revoked
 @jwt_manager.token_in_blocklist_loader
 def is_token_revoked(_jwt_headers: dict, jwt_data: dict) -> bool:
     jti = jwt_data['jti']
 
-    token = RevokedToken.query.filter_by(token_id=jti).first()
-    return token is not None
+    if unrevoked_token_cache.get_many([jti]):
+        return False
+
+    revoked = _is_token_revoked_in_redis(jti)
+    if revoked is None:
+        revoked = RevokedToken.query.filter_by(token_id=jti).first() is not None
+
+    if not revoked:
+        unrevoked_token_cache.max_size = current_app.config['JWT_UNREVOKED_TOKEN_CACHE_SIZE']
+        unrevoked_token_cache.set_many({jti: True}, current_app.config['JWT_UNREVOKED_TOKEN_CACHE_SECONDS'])
+
+    return revoked
 
 
 # Mark a token as revoked (i.e. blacklisted)
-def add_revoked_token(jti, user_id):
+def add_revoked_token(jti, user_id, expires=None):
+    """
+    Arguments:
+        jti - id of the revoked token
+        user_id - id of the token's user
+        expires - expiration of the token in seconds since the epoch, the token's
+                  revocation is kept in redis until then
+    """
     token = RevokedToken(jti, user_id)
     db.session.add(token)
     db.session.commit()
+
+    unrevoked_token_cache.delete_many([jti])
+
+    ttl = int(expires - time.time()) if expires is not None else int(_max_token_lifetime().total_seconds())
+    if ttl <= 0:
+        return
+
+    try:
+        rq.connection.setex(f'{REVOKED_TOKEN_KEY_PREFIX}{jti}', ttl, 1)
+    except RedisError as ex:
+        current_app.logger.error(f'failed to mirror revoked token {jti}: {str(ex)}')
+
+        # redis no longer mirrors every revoked token, so look tokens up in the
+        # database until the next mirroring. if redis can't be reached at all the
+        # lookups fall back to the database anyway
+        try:
+            rq.connection.delete(REVOKED_TOKENS_MIRRORED_KEY)
+        except RedisError as ex:
+            current_app.logger.error(f'failed to clear revoked tokens mirrored flag: {str(ex)}')
+
+
+def purge_expired_revoked_tokens() -> int:
+    """
+    Delete revoked tokens that have expired since, tokens revoked longer than the
+    longest token lifetime ago are expired
+    Returns:
+        Number of deleted tokens
+    """
+    before = datetime.utcnow() - _max_token_lifetime()
+
+    return RevokedToken.query \
+        .filter(RevokedToken.revoked < before) \
+        .delete(synchronize_session=False)
+
+
+def mirror_revoked_tokens() -> int:
+    """
+    Mirror the revoked tokens in the database that may not have expired yet to
+    redis, after which tokens missing from redis are known not to be revoked for
+    REVOKED_TOKENS_MIRRORED_TTL_SECONDS. Must run more often than that for
+    token checks to skip the database
+    Returns:
+        Number of mirrored tokens
+    """
+    now = datetime.utcnow()
+    max_lifetime = _max_token_lifetime()
+
+    pipeline = rq.connection.pipeline(transaction=False)
+    tokens = db.session.query(RevokedToken.token_id, RevokedToken.revoked) \
+        .filter(RevokedToken.revoked >= now - max_lifetime) \
+        .all()
+    for token_id, revoked in tokens:
+        # the token expired at the latest the longest token lifetime after it was revoked
+        ttl = int((revoked + max_lifetime - now).total_seconds())
+        if ttl > 0:
+            pipeline.setex(f'{REVOKED_TOKEN_KEY_PREFIX}{token_id}', ttl, 1)
+
+    pipeline.setex(REVOKED_TOKENS_MIRRORED_KEY, REVOKED_TOKENS_MIRRORED_TTL_SECONDS, now.isoformat())
+    pipeline.execute()
+
+    return len(tokens)
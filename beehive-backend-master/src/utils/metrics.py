@@ -1,5 +1,7 @@
-from flask import request
-from prometheus_client import Counter, Summary
+import threading
+
+from flask import current_app, request
+from prometheus_client import Counter, Histogram, Summary
 from prometheus_flask_exporter import _to_status_code
 from prometheus_flask_exporter.multiprocess import GunicornInternalPrometheusMetrics
 
@@ -7,14 +9,60 @@ from .auth import metrics_auth
 from ..__version__ import __major__, __micro__, __minor__, __title__, __version__
 
 
+class LabelCardinalityGuard(object):
+    """
+    Caps the number of distinct values a metric label gets in this process, new
+    values past the cap are reported as a single overflow value
+    """
+    def __init__(self, label: str, max_values: int, overflow_value: str = 'other'):
+        self.label = label
+        self.max_values = max_values
+        self.overflow_value = overflow_value
+        self._values = set()
+        self._lock = threading.Lock()
+
+    def __call__(self, value: str) -> str:
+        if value in self._values:
+            return value
+
+        with self._lock:
+            if len(self._values) >= self.max_values:
+                return self.overflow_value
+
+            self._values.add(value)
+            if len(self._values) == self.max_values:
+                current_app.logger.warning(
+                    f'metric label {self.label} reached {self.max_values} values, '
+                    f'new values are reported as {self.overflow_value}'
+                )
+
+        return value
+
+
+path_label_guard = LabelCardinalityGuard('path', 200)
+
+
+def route_template_label() -> str:
+    """
+    The matched url rule of the current request (e.g. /api/v1/work/<int:work_id>)
+    rather than its path, so that ids in urls don't create a series each
+    """
+    if request.url_rule is None:
+        return 'none'
+
+    return path_label_guard(request.url_rule.rule)
+
+
 def init_app(app):
+    path_label_guard.max_values = app.config.setdefault('PROMETHEUS_MAX_PATH_LABEL_VALUES', path_label_guard.max_values)
+
     # init prometheus_flask_exporter here so that the prometheus multiprocess
     # object doesn't initialize and look for its env vars
     metrics = GunicornInternalPrometheusMetrics(
         app=app,
         group_by='endpoint',
         default_labels={
-            'path': lambda: request.path
+            'path': route_template_label
         },
         #path=None
         metrics_decorator=metrics_auth
@@ -43,11 +91,33 @@ def init_app(app):
     metrics.registry.register(task_prepare_derived_duration)
     metrics.registry.register(task_prepare_derived_exception)
     metrics.registry.register(task_prepare_derived_success)
+    metrics.registry.register(task_prepare_cuckoo_batch_duration)
+    metrics.registry.register(task_prepare_cuckoo_batch_exception)
     metrics.registry.register(find_deserted_work_exception)
     metrics.registry.register(find_pre_deserted_work_exception)
     metrics.registry.register(user_send_email_exception)
     metrics.registry.register(admin_send_email_exception)
     metrics.registry.register(trigger_pollinator_exception)
+    metrics.registry.register(rebuild_work_match_index_exception)
+    metrics.registry.register(refresh_contributor_stats_duration)
+    metrics.registry.register(refresh_contributor_stats_exception)
+    metrics.registry.register(refresh_contributor_stats_success)
+    metrics.registry.register(refresh_contributors_stats_exception)
+    metrics.registry.register(refresh_project_activity_exception)
+    metrics.registry.register(refresh_projects_activity_exception)
+    metrics.registry.register(backfill_upwork_diaries_exception)
+    metrics.registry.register(http_client_request_duration)
+    metrics.registry.register(sql_request_queries)
+    metrics.registry.register(sql_request_duration)
+    metrics.registry.register(span_duration)
+    metrics.registry.register(deliver_cuckoo_outbox_exception)
+    metrics.registry.register(purge_cuckoo_outbox_exception)
+    metrics.registry.register(purge_revoked_tokens_exception)
+    metrics.registry.register(mirror_revoked_tokens_exception)
+    metrics.registry.register(cuckoo_outbox_delivered)
+    metrics.registry.register(cuckoo_outbox_dead_lettered)
+    metrics.registry.register(classify_pending_tasks_exception)
+    metrics.registry.register(task_classifications)
 
 # work-finish metric which records work output
 work_finish_summary = Summary(
@@ -124,6 +194,20 @@ task_prepare_cuckoo_success = Counter(
     registry=None
 )
 
+# task-prepare-cuckoo-batch job duration metric
+task_prepare_cuckoo_batch_duration = Summary(
+    'beehive_task_prepare_cuckoo_batch_duration_seconds',
+    'Task prepare cuckoo batch duration seconds summary',
+    registry=None
+)
+
+# task-prepare-cuckoo-batch job exception metric
+task_prepare_cuckoo_batch_exception = Counter(
+    'beehive_task_prepare_cuckoo_batch_exception',
+    'Task prepare cuckoo batch exception counter',
+    registry=None
+)
+
 # find-deserted-work job exception metric
 find_deserted_work_exception = Counter(
     'beehive_find_deserted_work_exception',
@@ -145,6 +229,13 @@ find_past_reserved_work_exception = Counter(
     registry=None
 )
 
+# rebuild-work-match-index job exception metric
+rebuild_work_match_index_exception = Counter(
+    'beehive_rebuild_work_match_index_exception',
+    'Rebuild work match index exception counter',
+    registry=None
+)
+
 # user_send_email job exception metric
 user_send_email_exception = Counter(
     'beehive_user_send_email_exception',
@@ -207,3 +298,142 @@ find_net_duration_cuckoo_accepted_tasks_success = Counter(
     'Find net duration cuckoo accepted tasks success counter',
     registry=None
 )
+
+# refresh_changed_contributor_stats job duration metric
+refresh_contributor_stats_duration = Summary(
+    'beehive_refresh_contributor_stats_duration_seconds',
+    'Refresh contributor stats duration seconds summary',
+    registry=None
+)
+
+# refresh_changed_contributor_stats job exception metric
+refresh_contributor_stats_exception = Counter(
+    'beehive_refresh_contributor_stats_exception',
+    'Refresh contributor stats exception counter',
+    registry=None
+)
+
+# refresh_changed_contributor_stats job success metric
+refresh_contributor_stats_success = Counter(
+    'beehive_refresh_contributor_stats_success',
+    'Refresh contributor stats success counter',
+    registry=None
+)
+
+# refresh_contributors_stats job exception metric
+refresh_contributors_stats_exception = Counter(
+    'beehive_refresh_contributors_stats_exception',
+    'Refresh queued contributors stats exception counter',
+    registry=None
+)
+
+# refresh_changed_project_activity job exception metric
+refresh_project_activity_exception = Counter(
+    'beehive_refresh_project_activity_exception',
+    'Refresh project activity exception counter',
+    registry=None
+)
+
+# refresh_projects_activity job exception metric
+refresh_projects_activity_exception = Counter(
+    'beehive_refresh_projects_activity_exception',
+    'Refresh queued projects activity exception counter',
+    registry=None
+)
+
+# backfill_upwork_diaries job exception metric
+backfill_upwork_diaries_exception = Counter(
+    'beehive_backfill_upwork_diaries_exception',
+    'Backfill upwork diaries exception counter',
+    registry=None
+)
+
+# outbound http request duration metric per target service
+http_client_request_duration = Histogram(
+    'beehive_http_client_request_duration_seconds',
+    'Outbound http request duration seconds histogram',
+    ['service', 'method'],
+    registry=None
+)
+
+# sql statements per request metric
+sql_request_queries = Histogram(
+    'beehive_sql_request_queries',
+    'SQL statements per request histogram',
+    ['endpoint'],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200, 500, float('inf')),
+    registry=None
+)
+
+# sql statements total duration per request metric
+sql_request_duration = Histogram(
+    'beehive_sql_request_duration_seconds',
+    'SQL statements duration seconds per request histogram',
+    ['endpoint'],
+    registry=None
+)
+
+# traced span duration metric
+span_duration = Histogram(
+    'beehive_span_duration_seconds',
+    'Traced span duration seconds histogram',
+    ['span', 'kind'],
+    registry=None
+)
+
+# deliver-cuckoo-outbox job exception metric
+deliver_cuckoo_outbox_exception = Counter(
+    'beehive_deliver_cuckoo_outbox_exception',
+    'Deliver cuckoo outbox exception counter',
+    registry=None
+)
+
+# purge-cuckoo-outbox job exception metric
+purge_cuckoo_outbox_exception = Counter(
+    'beehive_purge_cuckoo_outbox_exception',
+    'Purge cuckoo outbox exception counter',
+    registry=None
+)
+
+# purge-revoked-tokens job exception metric
+purge_revoked_tokens_exception = Counter(
+    'beehive_purge_revoked_tokens_exception',
+    'Purge revoked tokens exception counter',
+    registry=None
+)
+
+# mirror-revoked-tokens job exception metric
+mirror_revoked_tokens_exception = Counter(
+    'beehive_mirror_revoked_tokens_exception',
+    'Mirror revoked tokens exception counter',
+    registry=None
+)
+
+# cuckoo outbox delivered events metric
+cuckoo_outbox_delivered = Counter(
+    'beehive_cuckoo_outbox_delivered',
+    'Cuckoo outbox delivered events counter',
+    registry=None
+)
+
+# cuckoo outbox dead-lettered events metric
+cuckoo_outbox_dead_lettered = Counter(
+    'beehive_cuckoo_outbox_dead_lettered',
+    'Cuckoo outbox dead-lettered events counter',
+    registry=None
+)
+
+# classify-pending-tasks job exception metric
+classify_pending_tasks_exception = Counter(
+    'beehive_classify_pending_tasks_exception',
+    'Classify pending tasks exception counter',
+    registry=None
+)
+
+# task type classifications metric, by whether they were cached or predicted by pollinator
+task_classifications = Counter(
+    'beehive_task_classifications',
+    'Task type classifications counter',
+    ['source'],
+    registry=None
+)
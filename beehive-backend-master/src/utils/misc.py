@@ -1,6 +1,6 @@
 import os
-import random
 import re
+import secrets
 import string
 
 
@@ -8,8 +8,7 @@ NEWLINE_RE = re.compile(r'\r\n|[\r\n]')
 
 
 def generate_random_string(chars, length):
-    random.seed()
-    return ''.join(random.choice(chars) for i in range(length))
+    return ''.join(secrets.choice(chars) for i in range(length))
 
 
 def splitlines_keep_final(s):
@@ -0,0 +1,72 @@
+import time
+
+from flask import current_app
+from redis import RedisError
+
+from .rq import rq
+
+
+# refills the bucket by the elapsed time and takes a token if one is available,
+# returning the number of seconds to wait for the next token otherwise
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+
+local bucket = redis.call('hmget', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+
+redis.call('hset', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('expire', KEYS[1], math.ceil(capacity / rate) + 1)
+
+return tostring(wait)
+"""
+
+
+class TokenBucket(object):
+    """
+    Token bucket rate limiter shared by all processes through redis
+    Arguments:
+        key - redis key of the bucket
+        rate - tokens added per second
+        capacity - maximal number of tokens, i.e. the allowed burst
+    """
+    def __init__(self, key, rate, capacity):
+        self.key = key
+        self.rate = rate
+        self.capacity = capacity
+
+    def acquire(self, timeout=None):
+        """
+        Take a token from the bucket, waiting for one to be added if it is empty.
+        The limiter fails open when redis is unavailable
+        Arguments:
+            timeout - maximal number of seconds to wait, None to wait as needed
+        Returns:
+            True if a token was taken, False if it was not available in time
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            try:
+                wait = float(rq.connection.eval(TOKEN_BUCKET_SCRIPT, 1, self.key, self.capacity, self.rate, time.time()))
+            except RedisError as ex:
+                current_app.logger.warning(f'rate limiter {self.key} is unavailable: {ex}')
+                return True
+
+            if wait <= 0:
+                return True
+
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+
+            time.sleep(wait)
@@ -0,0 +1,161 @@
+from functools import wraps
+import hashlib
+import json
+
+from flask import current_app, request
+from flask_jwt_extended import get_jwt, get_jwt_identity
+from redis import RedisError
+
+from .auth import JWT_ADDITIONAL_CLAIM_PREFIX
+from .rq import rq
+
+
+RESPONSE_CACHE_KEY_PREFIX = 'beehive-response-cache:'
+RESPONSE_CACHE_VERSION_KEY_PREFIX = 'beehive-response-cache-version:'
+
+# aggregates across all users and projects
+STATS_TAG = 'stats'
+# included in every cached response so everything can be invalidated at once
+EPOCH_TAG = 'epoch'
+
+
+def project_tag(project_id):
+    return f'project:{project_id}'
+
+
+def user_tag(user_id):
+    return f'user:{user_id}'
+
+
+def _auth_scope():
+    # all admins see the same data so they share cached responses
+    if get_jwt().get(f'{JWT_ADDITIONAL_CLAIM_PREFIX}admin'):
+        return 'admin'
+
+    return f'user:{get_jwt_identity()}'
+
+
+def _cache_key(tags):
+    """
+    Build the cache key of the current request out of its endpoint, args, auth
+    scope and the current versions of the given tags, so bumping a tag's version
+    makes its cached responses unreachable
+    """
+    tags = [EPOCH_TAG] + tags
+    versions = rq.connection.mget([f'{RESPONSE_CACHE_VERSION_KEY_PREFIX}{tag}' for tag in tags])
+
+    key_parts = {
+        'endpoint': request.endpoint,
+        'view_args': request.view_args,
+        'args': sorted(request.args.items(multi=True)),
+        'scope': _auth_scope(),
+        'versions': dict(zip(tags, [v.decode() if v else '0' for v in versions])),
+    }
+    key_hash = hashlib.sha256(json.dumps(key_parts, sort_keys=True, default=str).encode()).hexdigest()
+    return f'{RESPONSE_CACHE_KEY_PREFIX}{request.endpoint}:{key_hash}'
+
+
+def _not_modified_or(response, etag):
+    response.set_etag(etag)
+    if request.if_none_match.contains(etag):
+        response.status_code = 304
+        response.set_data(b'')
+
+    return response
+
+
+def cached_response(*tags):
+    """
+    Cache a view's successful responses in redis until one of the given tags is
+    invalidated or the response cache ttl passes. tags may be strings or
+    functions of the view's kwargs returning a string. responses carry an etag
+    and requests with a matching If-None-Match get an empty 304 response. must
+    be used after (below) the authentication decorator
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not current_app.config['RESPONSE_CACHE_ENABLED']:
+                return fn(*args, **kwargs)
+
+            resolved_tags = [tag(**request.view_args) if callable(tag) else tag for tag in tags]
+
+            try:
+                key = _cache_key(resolved_tags)
+                cached = rq.connection.get(key)
+            except RedisError as ex:
+                current_app.logger.error(f'failed to read response cache: {str(ex)}')
+                return fn(*args, **kwargs)
+
+            if cached is not None:
+                entry = json.loads(cached)
+                response = current_app.response_class(entry['body'], mimetype=entry['mimetype'])
+                return _not_modified_or(response, entry['etag'])
+
+            response = current_app.make_response(fn(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+
+            body = response.get_data(as_text=True)
+            etag = hashlib.sha1(body.encode()).hexdigest()
+            try:
+                rq.connection.setex(
+                    key,
+                    current_app.config['RESPONSE_CACHE_TTL_SECONDS'],
+                    json.dumps({'body': body, 'mimetype': response.mimetype, 'etag': etag})
+                )
+            except RedisError as ex:
+                current_app.logger.error(f'failed to write response cache: {str(ex)}')
+
+            return _not_modified_or(response, etag)
+        return wrapper
+    return decorator
+
+
+def invalidate_cached_responses(project_ids=(), user_ids=()):
+    """
+    Invalidate the cached responses of cross-project stats and of the given
+    projects and users
+    Arguments:
+        project_ids - ids of the projects ("project:" tags) whose data changed
+        user_ids - ids of the users whose data changed
+    """
+    if not current_app.config['RESPONSE_CACHE_ENABLED']:
+        return
+
+    tags = [STATS_TAG] + [project_tag(p) for p in set(project_ids)] + [user_tag(u) for u in set(user_ids) if u]
+    _bump_versions(tags)
+
+
+def invalidate_task_cached_responses(task, *user_ids):
+    """
+    Invalidate the cached responses affected by a change to a task and the work
+    of the given users
+    """
+    invalidate_tasks_cached_responses([task], user_ids)
+
+
+def invalidate_tasks_cached_responses(tasks, user_ids=()):
+    """
+    Invalidate the cached responses affected by changes to a number of tasks
+    and the work of the given users
+    """
+    project_ids = [t.id for task in tasks for t in task.tags if t.name.startswith('project:')]
+    invalidate_cached_responses(project_ids, user_ids)
+
+
+def invalidate_all_cached_responses():
+    if not current_app.config['RESPONSE_CACHE_ENABLED']:
+        return
+
+    _bump_versions([EPOCH_TAG])
+
+
+def _bump_versions(tags):
+    try:
+        pipeline = rq.connection.pipeline(transaction=False)
+        for tag in tags:
+            pipeline.incr(f'{RESPONSE_CACHE_VERSION_KEY_PREFIX}{tag}')
+        pipeline.execute()
+    except RedisError as ex:
+        current_app.logger.error(f'failed to invalidate response cache: {str(ex)}')
@@ -1,20 +1,26 @@
 from flask import current_app
-from requests import post as requests_post
+
+from .http_client import http_client
+
+
+def _task_description_payload(task):
+    return {
+        'taskId': task.id,
+        'description': task.description,
+        'funcName': task.func_name,
+        'taskType': task.task_type.name,
+        'delegatorId': task.delegating_user_id,
+    }
 
 
 def notify_new_task_description(task):
     # notify new description if base url is set
     if current_app.config.get('SLACK_BOT_BASE_URL'):
         try:
-            res = requests_post(
+            res = http_client.post(
+                'slack_bot',
                 f'{current_app.config["SLACK_BOT_BASE_URL"]}/notify/description',
-                json={
-                    'taskId': task.id,
-                    'description': task.description,
-                    'funcName': task.func_name,
-                    'taskType': task.task_type.name,
-                    'delegatorId': task.delegating_user_id,
-                }
+                json=_task_description_payload(task)
             )
 
             if res.status_code == 200:
@@ -25,11 +31,39 @@ def notify_new_task_description(task):
             current_app.logger.error('failed to notify new description with exception: %s', str(ex))
 
 
+def notify_new_task_descriptions(tasks):
+    # notify the new descriptions of a batch of tasks in a single message if base url is set
+    if len(tasks) == 1:
+        notify_new_task_description(tasks[0])
+        return
+
+    if tasks and current_app.config.get('SLACK_BOT_BASE_URL'):
+        try:
+            res = http_client.post(
+                'slack_bot',
+                f'{current_app.config["SLACK_BOT_BASE_URL"]}/notify/descriptions',
+                json={'tasks': [_task_description_payload(task) for task in tasks]}
+            )
+
+            if res.status_code == 200:
+                current_app.logger.info(f'notified {len(tasks)} new descriptions')
+            elif res.status_code == 404:
+                # slack bot without batch notifications
+                current_app.logger.warning('batch description notification not supported, notifying each description')
+                for task in tasks:
+                    notify_new_task_description(task)
+            else:
+                current_app.logger.warning(f'failed to notify {len(tasks)} new descriptions')
+        except Exception as ex:
+            current_app.logger.error('failed to notify new descriptions with exception: %s', str(ex))
+
+
 def notify_bug_report(user_id, task_id, details, source):
     # notify bug report if base url is set
     if current_app.config.get('SLACK_BOT_BASE_URL'):
         try:
-            res = requests_post(
+            res = http_client.post(
+                'slack_bot',
                 f'{current_app.config["SLACK_BOT_BASE_URL"]}/notify/bug',
                 json={
                     'userId': user_id,
@@ -51,7 +85,8 @@ def notify_user_profile_change(user_id, column, previous_value, new_value):
     # notify hourly rate change
     if current_app.config.get('SLACK_BOT_BASE_URL'):
         try:
-            res = requests_post(
+            res = http_client.post(
+                'slack_bot',
                 f'{current_app.config["SLACK_BOT_BASE_URL"]}/notify/user_profile',
                 json={
                     'column': column,
@@ -0,0 +1,122 @@
+import heapq
+import time
+
+from flask import Flask, current_app, g, has_request_context, request
+from sqlalchemy import event
+
+from .db import db
+from .metrics import sql_request_duration, sql_request_queries
+
+
+class SQLRequestStats:
+    """
+    Statements executed while handling a single request
+    """
+    def __init__(self, slowest_count: int):
+        self.count = 0
+        self.duration = 0.0
+        self._slowest_count = slowest_count
+        self._slowest = []
+
+    def record(self, statement: str, duration: float):
+        self.count += 1
+        self.duration += duration
+
+        # keep a min-heap of the slowest statements, the counter breaks duration ties
+        item = (duration, self.count, statement)
+        if len(self._slowest) < self._slowest_count:
+            heapq.heappush(self._slowest, item)
+        elif self._slowest and duration > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, item)
+
+    @property
+    def slowest(self) -> list[tuple[float, str]]:
+        return [(duration, statement) for duration, _, statement in sorted(self._slowest, reverse=True)]
+
+
+class SQLInstrumentation:
+    """
+    Records the number of sql statements, their total duration and the slowest
+    statements of each request using sqlalchemy engine events. Requests running
+    more statements than their query budget are logged, and listeners can be
+    added to inspect the statements of every request
+    """
+    enabled: bool = True
+    query_budget: int = 50
+    slowest_count: int = 3
+
+    def __init__(self, app: Flask | None = None):
+        self._listeners = []
+        self._endpoint_query_budgets = {}
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask):
+        self.enabled = app.config.setdefault('SQL_INSTRUMENTATION_ENABLED', self.enabled)
+        self.query_budget = app.config.setdefault('SQL_QUERY_BUDGET', self.query_budget)
+        self.slowest_count = app.config.setdefault('SQL_SLOWEST_STATEMENTS_COUNT', self.slowest_count)
+        self._endpoint_query_budgets = app.config.setdefault('SQL_ENDPOINT_QUERY_BUDGETS', {})
+
+        if not self.enabled:
+            return
+
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(db.engine, 'after_cursor_execute', self._after_cursor_execute)
+            event.listen(db.engine, 'handle_error', self._handle_error)
+
+        app.before_request(self._start_request)
+        # teardown runs after streamed responses were consumed as well
+        app.teardown_request(self._finish_request)
+
+    def add_listener(self, listener):
+        """
+        Add a function called with the endpoint and SQLRequestStats of every request
+        """
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        self._listeners.remove(listener)
+
+    def endpoint_query_budget(self, endpoint: str) -> int:
+        return self._endpoint_query_budgets.get(endpoint, self.query_budget)
+
+    def _start_request(self):
+        g.sql_stats = SQLRequestStats(self.slowest_count)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('sql_instrumentation_start', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        start = conn.info['sql_instrumentation_start'].pop()
+        if has_request_context() and 'sql_stats' in g:
+            g.sql_stats.record(statement, time.perf_counter() - start)
+
+    def _handle_error(self, exception_context):
+        # failed statements are not timed
+        if exception_context.connection is not None and exception_context.connection.info.get('sql_instrumentation_start'):
+            exception_context.connection.info['sql_instrumentation_start'].pop()
+
+    def _finish_request(self, exc=None):
+        stats = g.pop('sql_stats', None)
+        if stats is None:
+            return
+
+        endpoint = request.endpoint or 'none'
+        sql_request_queries.labels(endpoint=endpoint).observe(stats.count)
+        sql_request_duration.labels(endpoint=endpoint).observe(stats.duration)
+
+        budget = self.endpoint_query_budget(endpoint)
+        if stats.count > budget:
+            slowest = '; '.join(f'{duration * 1000:.1f}ms {statement}' for duration, statement in stats.slowest)
+            current_app.logger.warning(
+                f'{request.method} {request.path} ran {stats.count} sql statements over its budget of {budget} '
+                f'in {stats.duration * 1000:.1f}ms, slowest: {slowest}'
+            )
+
+        for listener in self._listeners:
+            listener(endpoint, stats)
+
+
+sql_instrumentation = SQLInstrumentation()
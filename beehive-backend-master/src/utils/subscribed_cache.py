@@ -0,0 +1,110 @@
+import os
+import threading
+import time
+
+from flask import Flask
+from redis import RedisError
+
+from .rq import rq
+from .ttl_cache import TTLCache
+
+
+class SubscribedCache:
+    """
+    Per-process cache kept in sync with the other processes through a redis
+    channel. Every process subscribes to the channel on which changes are
+    published and invalidates its cache on each message. The cache is only used
+    while the subscription is up, so a process that may have missed a change
+    reads the database instead
+    """
+    channel: str
+    name: str
+    ttl_seconds: float = 10 * 60
+    max_size: int = 10000
+    resubscribe_seconds: float = 30
+
+    def __init__(self, app: Flask | None = None):
+        self._items = TTLCache()
+        self._lock = threading.Lock()
+        self._logger = None
+        self._subscription = None
+        self._subscription_pid = None
+        self._subscribe_after = 0.0
+        # bumped whenever cached items are invalidated, so items read from the
+        # database before a change are not cached after it
+        self.generation = 0
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask):
+        self._items.max_size = self.max_size
+        self._logger = app.logger
+
+    def _publish(self, message: str):
+        try:
+            rq.connection.publish(self.channel, message)
+        except RedisError as e:
+            self._logger.error(f'Failed to publish {self.name} change {message}: {e}')
+
+    def _changed(self, message: dict):
+        """
+        Handle a change published by any process, by default clearing the cache
+        """
+        self._clear()
+
+    def _clear(self, *_args):
+        with self._lock:
+            self._items.clear()
+            self.generation += 1
+
+    def _subscribed(self) -> bool:
+        """
+        Whether changes published by other processes are being received,
+        subscribing if not subscribed yet in this process
+        """
+        if self.ttl_seconds <= 0:
+            return False
+
+        with self._lock:
+            if self._subscription_pid != os.getpid():
+                # the subscription thread does not survive forks, e.g. of rq work horses
+                self._subscription = None
+                self._subscription_pid = os.getpid()
+                self._subscribe_after = 0.0
+
+            if self._subscription is None and time.monotonic() >= self._subscribe_after:
+                self._subscribe()
+
+            return self._subscription is not None
+
+    def _subscribe(self):
+        try:
+            pubsub = rq.connection.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{self.channel: self._changed})
+        except RedisError as e:
+            self._logger.error(f'Failed to subscribe to {self.name} changes: {e}')
+            self._subscribe_after = time.monotonic() + self.resubscribe_seconds
+            return
+
+        # changes published before subscribing were missed
+        self._items.clear()
+        self.generation += 1
+        self._subscription = pubsub.run_in_thread(
+            sleep_time=1,
+            daemon=True,
+            exception_handler=self._subscription_failed
+        )
+
+    def _subscription_failed(self, error, _pubsub, thread):
+        # changes published until resubscribing would be missed, so stop using
+        # the cache until then
+        self._logger.error(f'{self.name.capitalize()} changes subscription failed: {error}')
+        thread.stop()
+
+        with self._lock:
+            if self._subscription is thread:
+                self._subscription = None
+                self._subscribe_after = time.monotonic() + self.resubscribe_seconds
+
+        self._clear()
@@ -0,0 +1,141 @@
+from contextlib import contextmanager
+from functools import wraps
+import json
+import random
+import time
+
+from flask import Flask, current_app, g, has_request_context, request
+from flask_jwt_extended import get_jwt
+
+from .auth import JWT_ADDITIONAL_CLAIM_PREFIX
+from .metrics import span_duration
+
+
+class RequestTrace:
+    """
+    Spans recorded while handling a single request
+    """
+    def __init__(self, sampled: bool):
+        self.start = time.perf_counter()
+        self.sampled = sampled
+        self.spans = []
+
+    def add(self, name: str, kind: str, start: float, duration: float):
+        self.spans.append((name, kind, start - self.start, duration))
+
+    def durations(self) -> dict[str, float]:
+        """
+        Total duration of the spans of each name, nested spans are not subtracted
+        """
+        durations = {}
+        for name, _, _, duration in self.spans:
+            durations[name] = durations.get(name, 0.0) + duration
+
+        return durations
+
+
+@contextmanager
+def span(name: str, kind: str = 'app'):
+    """
+    Time a block as a span of the current request and in the span histogram.
+    Outside of requests (e.g. in jobs) only the histogram is updated
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        span_duration.labels(span=name, kind=kind).observe(duration)
+        if has_request_context() and 'trace' in g:
+            g.trace.add(name, kind, start, duration)
+
+
+def traced(name: str, kind: str = 'app'):
+    """
+    Decorator timing every call of a function as a span
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name, kind):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _is_admin_request() -> bool:
+    # only the jwt verified by the request's view is checked, it is not verified again here
+    try:
+        return bool(get_jwt().get(f'{JWT_ADDITIONAL_CLAIM_PREFIX}admin'))
+    except RuntimeError:
+        return False
+
+
+class Tracer:
+    """
+    Collects the spans of each request and logs sampled requests' spans as json.
+    Responses to admins, or to everyone when SERVER_TIMING_ENABLED is set, get a
+    Server-Timing header with the total duration of each span name, the
+    request's sql statements and the request
+    """
+    enabled: bool = True
+    sample_rate: float = 0.0
+    server_timing: bool = False
+
+    def __init__(self, app: Flask | None = None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask):
+        self.enabled = app.config.setdefault('TRACING_ENABLED', self.enabled)
+        self.sample_rate = app.config.setdefault('TRACE_SAMPLE_RATE', self.sample_rate)
+        self.server_timing = app.config.setdefault('SERVER_TIMING_ENABLED', self.server_timing)
+
+        if not self.enabled:
+            return
+
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+
+    def _start_request(self):
+        g.trace = RequestTrace(sampled=random.random() < self.sample_rate)
+
+    def _finish_request(self, response):
+        trace = g.pop('trace', None)
+        if trace is None:
+            return response
+
+        total = time.perf_counter() - trace.start
+        timings = [f'{name};dur={duration * 1000:.1f}' for name, duration in trace.durations().items()]
+
+        # statements of streamed responses that were not consumed yet are not included
+        sql_stats = g.get('sql_stats')
+        if sql_stats is not None:
+            timings.append(f'db;dur={sql_stats.duration * 1000:.1f};desc="{sql_stats.count} statements"')
+
+        timings.append(f'total;dur={total * 1000:.1f}')
+        # timings reveal the internals of requests so they are not sent to everyone
+        if self.server_timing or _is_admin_request():
+            response.headers['Server-Timing'] = ', '.join(timings)
+
+        if trace.sampled:
+            current_app.logger.info('trace ' + json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'endpoint': request.endpoint,
+                'status': response.status_code,
+                'duration_ms': round(total * 1000, 1),
+                'db': {
+                    'statements': sql_stats.count,
+                    'duration_ms': round(sql_stats.duration * 1000, 1)
+                } if sql_stats is not None else None,
+                'spans': [
+                    {'name': name, 'kind': kind, 'start_ms': round(start * 1000, 1), 'duration_ms': round(duration * 1000, 1)}
+                    for name, kind, start, duration in trace.spans
+                ]
+            }))
+
+        return response
+
+
+tracer = Tracer()
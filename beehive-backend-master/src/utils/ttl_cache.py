@@ -0,0 +1,86 @@
+import threading
+import time
+
+
+class TTLCache(object):
+    """
+    Small in-process cache whose entries expire a given number of seconds after
+    being set. When the cache is full, expired entries are evicted first and then
+    the oldest entries
+    """
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_many(self, keys):
+        """
+        Get the cached values of the given keys
+        Arguments:
+            keys - the keys to look up
+        Returns:
+            Dictionary of key to cached value, only for keys that are cached and
+            have not expired
+        """
+        now = time.monotonic()
+        found = {}
+
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+
+                expires_at, value = entry
+                if expires_at <= now:
+                    del self._entries[key]
+                    continue
+
+                found[key] = value
+
+        return found
+
+    def set_many(self, values, ttl_seconds):
+        """
+        Cache values for a number of seconds
+        Arguments:
+            values - dictionary of key to value to cache
+            ttl_seconds - seconds until the values expire, values are not cached if
+                          this is not positive
+        """
+        if ttl_seconds <= 0 or not values:
+            return
+
+        now = time.monotonic()
+        expires_at = now + ttl_seconds
+
+        with self._lock:
+            for key, value in values.items():
+                # re-insert so the dictionary order stays oldest first
+                self._entries.pop(key, None)
+                self._entries[key] = (expires_at, value)
+
+            if len(self._entries) > self.max_size:
+                self._evict(now)
+
+    def delete_many(self, keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _evict(self, now):
+        for key in [k for k, (expires_at, _) in self._entries.items() if expires_at <= now]:
+            del self._entries[key]
+
+        overflow = len(self._entries) - self.max_size
+        if overflow > 0:
+            for key in list(self._entries)[:overflow]:
+                del self._entries[key]
@@ -1,24 +1,144 @@
 from datetime import datetime, timedelta
+import os
+import threading
+import time
 import requests
-from sqlalchemy import and_
 
 from flask import current_app
+from redis import RedisError
+from redis.exceptions import LockError
 
 from upwork import Config, Client
 from upwork.routers import graphql
 from oauthlib.oauth2.rfc6749.errors import InvalidGrantError
 
 from ..utils.db import db
+from ..utils.rate_limit import TokenBucket
 from ..utils.email import send_admin_unrecognized_users_email
+from ..utils.response_cache import invalidate_all_cached_responses
+from ..utils.rq import rq
 
 from ..schemas.upwork import UpworkDiarySchema
 
+from ..logic.upwork_matching import MATCH_WINDOW_SECONDS, match_upwork_diaries
+
 from ..models.upwork import UpworkAuthToken, UpworkDiary, WorkRecordUpworkDiary
 from ..models.user import User
 from ..models.work_record import WorkRecord
 
 UPWORK_MARKETPLACE_HOURLY_FEE = 0.05
 
+UPWORK_TOKEN_REFRESH_LOCK_KEY = 'beehive:upwork:token-refresh-lock'
+UPWORK_ORGANIZATION_ID_KEY = 'beehive:upwork:organization-id'
+UPWORK_API_RATE_LIMIT_KEY = 'beehive:upwork:api-rate-limit'
+
+# every snapshot field of the work diary, including screenshot and webcam urls
+WORK_DIARY_FULL_QUERY = """
+    query workDiaryCompany($workDiaryCompanyInput: WorkDiaryCompanyInput!) {
+        workDiaryCompany(workDiaryCompanyInput: $workDiaryCompanyInput) {
+            total
+            snapshots {
+                contract {
+                    id
+                    contractTitle
+                }
+                user {
+                    id
+                    name
+                }
+                duration
+                durationInt
+                task {
+                    id
+                    code
+                    description
+                    memo
+                }
+                time {
+                    trackedTime
+                    manualTime
+                    overtime
+                    firstWorked
+                    lastWorked
+                    firstWorkedInt
+                    lastWorkedInt
+                    lastScreenshot
+                }
+                screenshots {
+                    activity
+                    screenshotUrl
+                    screenshotImage
+                    screenshotImageLarge
+                    screenshotImageMedium
+                    screenshotImageThumbnail
+                    hasScreenshot
+                    hasWebcam
+                    webcamUrl
+                    webcamImage
+                    webcamImageThumbnail
+                    flags {
+                        hideScreenshot
+                        downSampleScreenshots
+                    }
+                }
+            }
+        }
+    }
+"""
+
+# only the snapshot fields read by save_upwork_diaries
+WORK_DIARY_LEAN_QUERY = """
+    query workDiaryCompany($workDiaryCompanyInput: WorkDiaryCompanyInput!) {
+        workDiaryCompany(workDiaryCompanyInput: $workDiaryCompanyInput) {
+            total
+            snapshots {
+                user {
+                    id
+                    name
+                }
+                durationInt
+                task {
+                    memo
+                }
+                time {
+                    firstWorkedInt
+                    lastWorkedInt
+                }
+            }
+        }
+    }
+"""
+
+
+def parse_work_diary(work_diary):
+    """
+    Lightweight parser of a lean work diary response, producing the same structure
+    UpworkDiarySchema loads for the fields requested by the lean query
+    Arguments:
+        work_diary - the workDiaryCompany object of the graphql response
+    Returns:
+        dict with total and list of snapshots
+    """
+    snapshots = []
+    for snapshot in work_diary.get('snapshots') or []:
+        user = snapshot.get('user')
+        task = snapshot.get('task')
+        snapshot_time = snapshot.get('time') or {}
+        duration_int = snapshot.get('durationInt')
+
+        snapshots.append({
+            'user': {'id': user.get('id'), 'name': user.get('name')} if user else None,
+            'duration_int': int(duration_int) if duration_int is not None else None,
+            'task': {'memo': task.get('memo')} if task else None,
+            'time': {
+                'first_worked_int': int(snapshot_time['firstWorkedInt']) if snapshot_time.get('firstWorkedInt') is not None else None,
+                'last_worked_int': int(snapshot_time['lastWorkedInt']) if snapshot_time.get('lastWorkedInt') is not None else None
+            }
+        })
+
+    return {'total': work_diary.get('total'), 'snapshots': snapshots}
+
+
 class UpworkClient():
 
     config = None
@@ -27,7 +147,7 @@ class UpworkClient():
 
     UPWORK_ACCESS_TOKEN_REQUEST_URL = 'https://www.upwork.com/api/v3/oauth2/token'
 
-    def __init__(self, consumer_key, consumer_secret, redirect_url, token=None):
+    def __init__(self, consumer_key, consumer_secret, redirect_url, token=None, organization_id=None):
         if token:
             self.config = Config({
                 'client_id': consumer_key,
@@ -44,22 +164,7 @@ class UpworkClient():
 
         self.client = Client(self.config)
         self.config = self.client.get_actual_config() ## used to make sure token is refreshed
-        if hasattr(self.config, 'token') and self.config.token:
-            token = UpworkAuthToken.insert_or_update(
-                self.config.token['access_token'],
-                self.config.token['refresh_token'],
-                self.config.token['token_type'],
-                self.config.token['expires_in'],
-                self.config.token['expires_at']
-            )
-            db.session.commit()
-            self.config.token = self.refresh_token(token=self.config.token)
-
-        # organization id is optional, flow should not break if this is unavailable
-        try:
-            self.organization_id = self.get_organization_id()
-        except InvalidGrantError as e:
-            current_app.logger.warn(f'Upwork invalid grant error while fetching organization id: {str(e)}')
+        self.organization_id = organization_id
 
     def refresh_token(self, token=None, code=None):
         """
@@ -69,7 +174,8 @@ class UpworkClient():
             token (dict or None): invalid token to refresh or None if this doesn't exist
             code (str or None): code for authorization or none
         Returns:
-            token (dict or None): result of refresh token or None on error
+            token (dict or None): the saved token, with expires_at computed from expires_in if upwork
+            did not return it, or None on error
         """
         if token and token.get('refresh_token', None):
             payload = {
@@ -113,7 +219,7 @@ class UpworkClient():
         )
         db.session.commit()
 
-        return token_json
+        return token.toJSON()
 
 
     def get_access_token(self, redirect_url):
@@ -167,19 +273,30 @@ class UpworkClient():
         """
         if self.organization_id:
             self.client.set_org_uid_header(self.organization_id)
+
+        # all workers share the upwork api rate limit
+        TokenBucket(
+            UPWORK_API_RATE_LIMIT_KEY,
+            current_app.config['UPWORK_API_RATE_LIMIT_PER_SECOND'],
+            current_app.config['UPWORK_API_RATE_LIMIT_BURST']
+        ).acquire()
+
         res = graphql.Api(self.client).execute({'query': query, 'variables': variables})
         if not res.get('data', None):
             current_app.logger.error(f'Error querying graphql: {res}')
             return None
         return res.get('data', None)
 
-    def get_work_diary(self, date=None, company_id=None):
+    def get_work_diary(self, date=None, company_id=None, full=False):
         """
         Get upwork work diaries from upwork client for a specific date for given company. 
         If organization_id is present as class property it will update the X-Upwork-API-TenantId header.
+        By default only the snapshot fields used by the ingestion are requested and parsed without
+        marshmallow, the full profile with screenshots and contract details is kept for debugging.
         Args:
             date (str): string representing date in '%Y%m%d' format, if not present defaults to yesterday.
             company_id (str): string identifier of upwork company id, if not present will be taken from app configuration.
+            full (bool): request and validate every snapshot field instead of the lean profile.
         Returns:
             data (UpworkDiarySchema) | None: parsed response of work diaries or None if there was a client error.
         """
@@ -194,59 +311,6 @@ class UpworkClient():
 
         current_app.logger.info(f'Getting work diaries for company {company_id} for date {date}')
 
-        query = """
-            query workDiaryCompany($workDiaryCompanyInput: WorkDiaryCompanyInput!) {
-                workDiaryCompany(workDiaryCompanyInput: $workDiaryCompanyInput) {
-                    total
-                    snapshots {
-                        contract {
-                            id
-                            contractTitle
-                        }
-                        user {
-                            id
-                            name
-                        }
-                        duration
-                        durationInt
-                        task {
-                            id
-                            code
-                            description
-                            memo
-                        }
-                        time {
-                            trackedTime
-                            manualTime
-                            overtime
-                            firstWorked
-                            lastWorked
-                            firstWorkedInt
-                            lastWorkedInt
-                            lastScreenshot
-                        }
-                        screenshots {
-                            activity
-                            screenshotUrl
-                            screenshotImage
-                            screenshotImageLarge
-                            screenshotImageMedium
-                            screenshotImageThumbnail
-                            hasScreenshot
-                            hasWebcam
-                            webcamUrl
-                            webcamImage
-                            webcamImageThumbnail
-                            flags {
-                                hideScreenshot
-                                downSampleScreenshots
-                            }
-                        }
-                    }
-                }
-            }
-        """
-
         variables = {
             "workDiaryCompanyInput": {
                 "companyId": company_id,
@@ -254,14 +318,132 @@ class UpworkClient():
             }
         }
 
-        work_diary = self.execute_graphql_query(query, variables)
+        work_diary = self.execute_graphql_query(WORK_DIARY_FULL_QUERY if full else WORK_DIARY_LEAN_QUERY, variables)
         if not work_diary or not work_diary.get('workDiaryCompany', None):
             current_app.logger.error(f'unrecognized work diary response: {work_diary}')
             return None
 
+        if full:
+            return UpworkDiarySchema().load(work_diary.get('workDiaryCompany'))
+
+        return parse_work_diary(work_diary.get('workDiaryCompany'))
+
+
+class UpworkClientManager(object):
+    """
+    Process-wide holder of a long-lived UpworkClient. The access token is kept in
+    memory and only refreshed when it is about to expire, with refreshes
+    serialized across rq workers by a redis lock, and the organization id is
+    shared between workers through redis for a configured time to live
+    """
+    def __init__(self):
+        self._client = None
+        self._client_pid = None
+        self._token = None
+        self._organization_id_expires_at = 0
+        self._lock = threading.Lock()
+
+    def get_client(self):
+        """
+        Get the upwork client of this process, creating it or refreshing its
+        token and organization id when needed
+        Returns:
+            UpworkClient with a valid access token
+        """
+        with self._lock:
+            # the client's http session must not be shared with forked worker processes
+            if self._client is None or self._client_pid != os.getpid():
+                self._token = UpworkAuthToken.get_recent_token()
+                self._client = self._create_client(self._token)
+                self._client_pid = os.getpid()
+                self._organization_id_expires_at = 0
+
+            if self._token_expiring(self._token):
+                self._refresh_token()
+
+            if time.monotonic() >= self._organization_id_expires_at:
+                self._client.organization_id = self._get_organization_id()
+                self._organization_id_expires_at = time.monotonic() + current_app.config['UPWORK_ORGANIZATION_ID_TTL_SECONDS']
+
+            return self._client
+
+    def reset(self):
+        """
+        Drop the client of this process so the next one is created with the most
+        recent token, e.g. after the application was authorized again
+        """
+        with self._lock:
+            self._client = None
+            self._client_pid = None
+            self._token = None
+            self._organization_id_expires_at = 0
+
+        try:
+            rq.connection.delete(UPWORK_ORGANIZATION_ID_KEY)
+        except RedisError as ex:
+            current_app.logger.warning(f'failed clearing cached upwork organization id: {ex}')
+
+    def _token_expiring(self, token):
+        if not token:
+            return False
+        # a token of unknown expiry is refreshed rather than used until it fails
+        if not token.get('expires_at'):
+            return True
+        return float(token['expires_at']) - time.time() < current_app.config['UPWORK_TOKEN_REFRESH_MARGIN_SECONDS']
+
+    def _refresh_token(self):
+        try:
+            with rq.connection.lock(UPWORK_TOKEN_REFRESH_LOCK_KEY, timeout=60, blocking_timeout=30):
+                # another worker may have refreshed the token while this one waited for the lock
+                token = UpworkAuthToken.get_recent_token()
+                if self._token_expiring(token):
+                    token = self._client.refresh_token(token=token) or token
+        except (LockError, RedisError) as ex:
+            current_app.logger.error(f'failed refreshing upwork token: {ex}')
+            return
+
+        if token != self._token:
+            # the sdk copies the token into its oauth session when the client is created
+            self._client = self._create_client(token, self._client.organization_id)
+        self._token = token
+
+    def _create_client(self, token, organization_id=None):
+        return UpworkClient(
+            current_app.config['UPWORK_CONSUMER_KEY'],
+            current_app.config['UPWORK_CONSUMER_SECRET'],
+            current_app.config['UPWORK_CALLBACK_URL'],
+            token,
+            organization_id
+        )
+
+    def _get_organization_id(self):
+        try:
+            organization_id = rq.connection.get(UPWORK_ORGANIZATION_ID_KEY)
+        except RedisError as ex:
+            current_app.logger.warning(f'failed reading cached upwork organization id: {ex}')
+            organization_id = None
+
+        if organization_id:
+            return organization_id.decode()
+
+        # organization id is optional, flow should not break if this is unavailable
+        try:
+            organization_id = self._client.get_organization_id()
+        except InvalidGrantError as e:
+            current_app.logger.warn(f'Upwork invalid grant error while fetching organization id: {str(e)}')
+            return None
+
+        if organization_id:
+            try:
+                rq.connection.setex(UPWORK_ORGANIZATION_ID_KEY, current_app.config['UPWORK_ORGANIZATION_ID_TTL_SECONDS'], organization_id)
+            except RedisError as ex:
+                current_app.logger.warning(f'failed caching upwork organization id: {ex}')
+
+        return organization_id
+
+
+upwork_client_manager = UpworkClientManager()
 
-        return UpworkDiarySchema().load(work_diary.get('workDiaryCompany'))
-        
 
 def save_upwork_diaries(date):
     """
@@ -272,36 +454,37 @@ def save_upwork_diaries(date):
     Returns:
         upwork_diaries (UpworkDiary[]) | None: array of upwork diaries data model or None if there was an error.
     """
-    token = UpworkAuthToken.get_recent_token()
-    client = UpworkClient(
-        current_app.config['UPWORK_CONSUMER_KEY'],
-        current_app.config['UPWORK_CONSUMER_SECRET'],
-        current_app.config['UPWORK_CALLBACK_URL'],
-        token
-    )
+    client = upwork_client_manager.get_client()
     # fetch diary for specific date from upwork api
     work_diary = client.get_work_diary(date)
     if not work_diary:
         current_app.logger.error(f'error retrieveing work diary for {date}')
         return None
     
-    upwork_diaries = []
+    snapshots = work_diary.get('snapshots', [])
+
+    # match upwork users to beehive users in a single query
+    upwork_user_ids = set(snapshot.get('user').get('id') for snapshot in snapshots if snapshot.get('user', None) and snapshot.get('user').get('id'))
+    user_ids = {}
+    if upwork_user_ids:
+        user_ids = dict(
+            db.session.query(User.upwork_user, User.id) \
+                .filter(User.upwork_user.in_(upwork_user_ids)) \
+                .all()
+        )
+
+    diary_values = []
     unrecognized_users = []
-    for snapshot in work_diary.get('snapshots', []):
+    for snapshot in snapshots:
         upwork_user_id = snapshot.get('user').get('id') if snapshot.get('user', None) else None
         upwork_user_name = snapshot.get('user').get('name') if snapshot.get('user', None) else None
         start_time_epoch_ms = int(snapshot.get('time').get('first_worked_int')) * 1000
         end_time_epoch_ms = int(snapshot.get('time').get('last_worked_int')) * 1000
         duration_min = snapshot.get('duration_int', None)
         description = snapshot.get('task', None).get('memo', None) if snapshot.get('task', None) else None
-        
+
         # match upwork user to beehive user, to find corresponding work record, otherwise append to unknowns list (for admin email)
-        user_id = None
-        if upwork_user_id:
-            user = User.query.filter_by(upwork_user=upwork_user_id).first()
-            if user:
-                user_id = user.id
-            
+        user_id = user_ids.get(upwork_user_id) if upwork_user_id else None
         if not user_id:
             unrecognized_users.append({
                 'id': upwork_user_id,
@@ -309,74 +492,80 @@ def save_upwork_diaries(date):
                 'error': 'user not found'
             })
 
-        # create diary record in db
-        upwork_diary = UpworkDiary.insert_or_update(
-            user_id,
-            upwork_user_id,
-            upwork_user_name,
-            start_time_epoch_ms,
-            end_time_epoch_ms,
-            duration_min,
-            description
-        )
-        upwork_diaries.append(upwork_diary)
+        diary_values.append({
+            'user_id': user_id,
+            'upwork_user_id': upwork_user_id,
+            'upwork_user_name': upwork_user_name,
+            'start_time_epoch_ms': start_time_epoch_ms,
+            'end_time_epoch_ms': end_time_epoch_ms,
+            'duration_min': duration_min,
+            'description': description
+        })
+
+    # create or update diary records in db
+    upwork_diaries = UpworkDiary.upsert_many(diary_values)
 
     if unrecognized_users:
         send_admin_unrecognized_users_email(unrecognized_users)
 
     db.session.commit()
+    invalidate_all_cached_responses()
     return upwork_diaries
 
 def update_work_records_net_duration(upwork_diaries):
     if not upwork_diaries:
         current_app.logger.info(f'No upwork diaries given to process for work records duration calculation')
         return
-        
+
+    user_diaries = {}
     for upwork_diary in upwork_diaries:
-        user_id = upwork_diary.user_id
-        if not user_id: 
+        if not upwork_diary.user_id:
             current_app.logger.info(f'Skipping upwork diary {upwork_diary.id} with no beehive user id')
             continue
 
-        # match diary record to beehive work record
-        matched_work_records = db.session.query(WorkRecord) \
-            .filter(
-                WorkRecord.user_id == user_id,
-                and_(
-                    WorkRecord.start_time_diff_sec(upwork_diary.utc_start_time) < 172800,
-                    WorkRecord.end_time_diff_sec(upwork_diary.utc_end_time) < 172800
-                )
-            ) \
-            .order_by(WorkRecord.start_time_diff_sec(upwork_diary.utc_start_time).asc()) \
+        user_diaries.setdefault(upwork_diary.user_id, []).append(upwork_diary)
+
+    if not user_diaries:
+        return
+
+    price_per_hour = dict(
+        db.session.query(User.id, User.price_per_hour) \
+            .filter(User.id.in_(user_diaries.keys())) \
             .all()
+    )
+
+    values = []
+    for user_id, diaries in user_diaries.items():
+        # load the user's work records around all of the diaries at once and
+        # match them in memory
+        # the stored start time has whole seconds so the window is widened by a second
+        window = timedelta(seconds=MATCH_WINDOW_SECONDS + 1)
+        work_records = WorkRecord.query \
+            .filter(WorkRecord.user_id == user_id) \
+            .filter(WorkRecord.utc_start_time > min(d.utc_start_time for d in diaries) - window) \
+            .filter(WorkRecord.utc_start_time < max(d.utc_start_time for d in diaries) + window) \
+            .filter(WorkRecord.duration_seconds.isnot(None)) \
+            .all()
+
+        for upwork_diary, work_record, net_duration_seconds, upwork_duration_seconds in match_upwork_diaries(diaries, work_records):
+            current_app.logger.info(f'found corresponding work record ({work_record.id}) for diary record ({upwork_diary.id}). net seconds {net_duration_seconds}')
+
+            work_record_cost = None
+            work_record_upwork_cost = None
+            if price_per_hour.get(user_id):
+                work_record_cost = float(price_per_hour[user_id]) * net_duration_seconds / 60 / 60
+                work_record_upwork_cost = float(price_per_hour[user_id]) * upwork_duration_seconds / 3600 * (1 + UPWORK_MARKETPLACE_HOURLY_FEE)
+
+            values.append({
+                'work_record_id': work_record.id,
+                'upwork_diary_id': upwork_diary.id,
+                'net_duration_seconds': net_duration_seconds,
+                'cost': work_record_cost,
+                'upwork_duration_seconds': upwork_duration_seconds,
+                'upwork_cost': work_record_upwork_cost
+            })
 
-        for work_record in matched_work_records:
-            # work records in progress do not have end time
-            current_work_record_end_time_utc = work_record.utc_end_time
-            if not current_work_record_end_time_utc:
-                current_work_record_end_time_utc = datetime.utcnow()
-
-            # calculate intersection between the upwork diary and work record time ranges
-            work_record_net_duration_seconds = int((min(current_work_record_end_time_utc, upwork_diary.utc_end_time) - max(work_record.utc_start_time, upwork_diary.utc_start_time)).total_seconds())
-            if work_record_net_duration_seconds > 0:
-                current_app.logger.info(f'found corresponding work record ({work_record.id}) for diary record ({upwork_diary.id}). net seconds {work_record_net_duration_seconds}')
-                                
-                # calculate upwork time, as they calculate to the closest 10-minute segment
-                work_record_upwork_duration_seconds = int((min(current_work_record_end_time_utc, upwork_diary.rounded_utc_end_time) - max(work_record.utc_start_time, upwork_diary.rounded_utc_start_time)).total_seconds())
-
-                work_record_cost = None
-                work_record_upwork_cost = None
-                if upwork_diary.user.price_per_hour:
-                    work_record_cost = float(upwork_diary.user.price_per_hour) * work_record_net_duration_seconds / 60 / 60
-                    work_record_upwork_cost = float(upwork_diary.user.price_per_hour) * work_record_upwork_duration_seconds / 3600 * (1 + UPWORK_MARKETPLACE_HOURLY_FEE)
-                
-                WorkRecordUpworkDiary.insert_or_update(
-                    work_record.id,
-                    upwork_diary.id,
-                    work_record_net_duration_seconds,
-                    work_record_cost,
-                    work_record_upwork_duration_seconds,
-                    work_record_upwork_cost
-                )
+    WorkRecordUpworkDiary.upsert_many(values)
 
     db.session.commit()
+    invalidate_all_cached_responses()
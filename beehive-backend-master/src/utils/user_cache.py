@@ -0,0 +1,70 @@
+from flask import Flask
+
+from .subscribed_cache import SubscribedCache
+
+
+USER_CHANGED_CHANNEL = 'beehive:user-changed'
+
+
+class UserCache(SubscribedCache):
+    """
+    Per-process cache of detached users loaded as the current user of requests,
+    by user id. A user is dropped by every process when it is invalidated
+    """
+    channel = USER_CHANGED_CHANNEL
+    name = 'user'
+    ttl_seconds: float = 30
+    max_size: int = 1000
+
+    def init_app(self, app: Flask):
+        self.ttl_seconds = app.config.setdefault('USER_CACHE_TTL_SECONDS', self.ttl_seconds)
+        self.max_size = app.config.setdefault('USER_CACHE_SIZE', self.max_size)
+        super().init_app(app)
+
+    def get(self, user_id: str):
+        """
+        Get a cached user
+        Returns:
+            The detached user, or None if it is not cached
+        """
+        if not self._subscribed():
+            return None
+
+        return self._items.get_many([user_id]).get(user_id)
+
+    def set(self, user_id: str, user, generation: int):
+        """
+        Cache a user read from the database
+        Arguments:
+            user_id - id of the user
+            user - the detached user
+            generation - the cache generation from before the user was read
+        """
+        if not self._subscribed():
+            return
+
+        with self._lock:
+            if generation != self.generation:
+                return
+
+            self._items.set_many({user_id: user}, self.ttl_seconds)
+
+    def invalidate(self, user_id: str):
+        """
+        Drop a user from the cache of every process after it was changed. Must
+        be called after the change is committed
+        """
+        self._drop(user_id)
+        self._publish(user_id)
+
+    def _changed(self, message: dict):
+        user_id = message['data']
+        self._drop(user_id.decode() if isinstance(user_id, bytes) else user_id)
+
+    def _drop(self, user_id: str):
+        with self._lock:
+            self._items.delete_many([user_id])
+            self.generation += 1
+
+
+user_cache = UserCache()
@@ -0,0 +1,189 @@
+import importlib
+import pkgutil
+
+from flask import Flask
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+import src.models
+from src.utils.db import db
+
+
+# map all models so that relationships between them resolve
+for module in pkgutil.iter_modules(src.models.__path__):
+    importlib.import_module(f'src.models.{module.name}')
+
+
+class FakeRedis(object):
+    """
+    In-memory stand-in for the redis commands used by the code under test.
+    Expiry times are recorded in ttls but keys never expire, and pipeline
+    commands run when the pipeline is executed
+    """
+    def __init__(self):
+        self.values = {}
+        self.ttls = {}
+        self.locks = 0
+        self.executions = 0
+        self._held_locks = set()
+
+    @staticmethod
+    def _encode(value):
+        return value if isinstance(value, bytes) else str(value).encode()
+
+    def _expire(self, key, ex):
+        if ex is None:
+            self.ttls.pop(key, None)
+        else:
+            self.ttls[key] = ex
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def mget(self, keys):
+        return [self.values.get(key) for key in keys]
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.values:
+            return None
+        self.values[key] = self._encode(value)
+        self._expire(key, ex)
+        return True
+
+    def setex(self, key, ttl, value):
+        return self.set(key, value, ex=ttl)
+
+    def exists(self, *keys):
+        return sum(1 for key in keys if key in self.values)
+
+    def delete(self, *keys):
+        deleted = [key for key in keys if self.values.pop(key, None) is not None]
+        for key in deleted:
+            self.ttls.pop(key, None)
+        return len(deleted)
+
+    def expire(self, key, ttl):
+        if key in self.values:
+            self.ttls[key] = ttl
+
+    def incr(self, key):
+        value = int(self.values.get(key, b'0')) + 1
+        self.values[key] = self._encode(value)
+        return value
+
+    def hset(self, key, field=None, value=None, mapping=None):
+        values = self.values.setdefault(key, {})
+        if field is not None:
+            values[self._encode(field)] = self._encode(value)
+        for field, value in (mapping or {}).items():
+            values[self._encode(field)] = self._encode(value)
+
+    def hincrby(self, key, field, amount=1):
+        values = self.values.setdefault(key, {})
+        value = int(values.get(self._encode(field), b'0')) + amount
+        values[self._encode(field)] = self._encode(value)
+        return value
+
+    def hgetall(self, key):
+        return dict(self.values.get(key, {}))
+
+    def hdel(self, key, *fields):
+        for field in fields:
+            self.values.get(key, {}).pop(self._encode(field), None)
+
+    def rpush(self, key, *values):
+        self.values.setdefault(key, []).extend(self._encode(value) for value in values)
+        return len(self.values[key])
+
+    def llen(self, key):
+        return len(self.values.get(key, []))
+
+    def lrange(self, key, start, end):
+        values = self.values.get(key, [])
+        return values[start:] if end == -1 else values[start:end + 1]
+
+    def ltrim(self, key, start, end):
+        if key in self.values:
+            self.values[key] = self.lrange(key, start, end)
+
+    def publish(self, channel, message):
+        return 0
+
+    def lock(self, key, timeout=None, blocking_timeout=None):
+        return FakeLock(self, key)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakeLock(object):
+    def __init__(self, redis, key):
+        self._redis = redis
+        self._key = key
+
+    def acquire(self, blocking=True):
+        if self._key in self._redis._held_locks:
+            return False
+        self._redis._held_locks.add(self._key)
+        self._redis.values[self._key] = b'token'
+        self._redis.locks += 1
+        return True
+
+    def release(self):
+        self._redis._held_locks.discard(self._key)
+        self._redis.values.pop(self._key, None)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+
+class FakePipeline(object):
+    def __init__(self, redis):
+        self._redis = redis
+        self._commands = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self._commands.append((name, args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        self._redis.executions += 1
+        commands, self._commands = self._commands, []
+        return [getattr(self._redis, name)(*args, **kwargs) for name, args, kwargs in commands]
+
+
+@pytest.fixture
+def fake_redis():
+    return FakeRedis()
+
+
+@pytest.fixture
+def sqlite_app():
+    """
+    Flask app with the database on an in-memory sqlite database, tests create
+    the tables they use
+    """
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+
+    return app
+
+
+@pytest.fixture
+def statements():
+    """
+    SQL statements executed by the test
+    """
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(Engine, 'before_cursor_execute', listener)
+    yield statements
+    event.remove(Engine, 'before_cursor_execute', listener)
@@ -0,0 +1,24 @@
+from unittest.mock import patch
+
+from flask import Flask
+
+from src.commands import init_app
+
+# importing the jobs schedules their crons, which needs redis
+with patch('flask_rq2.functions.JobFunctions.cron'):
+    import src.jobs
+
+
+def test_backfill_all_runs_full_refreshes():
+    app = Flask(__name__)
+    init_app(app)
+
+    with patch('src.jobs.work.rebuild_work_match_index_job') as mock_rebuild_work_match_index, \
+            patch('src.jobs.stats.refresh_changed_contributor_stats') as mock_refresh_contributor_stats, \
+            patch('src.jobs.stats.refresh_changed_project_activity') as mock_refresh_project_activity:
+        result = app.test_cli_runner().invoke(args=['backfill', 'all'])
+
+    assert result.exit_code == 0, result.output
+    mock_rebuild_work_match_index.assert_called_once_with()
+    mock_refresh_contributor_stats.assert_called_once_with(full=True)
+    mock_refresh_project_activity.assert_called_once_with(full=True)
@@ -0,0 +1,68 @@
+import pytest
+
+from src.models.skill import Skill
+from src.models.tag import Tag
+from src.utils.catalogue_cache import catalogue_cache
+from src.utils.db import db
+
+
+@pytest.fixture
+def catalogue_app(sqlite_app, monkeypatch):
+    app = sqlite_app
+    catalogue_cache.init_app(app)
+
+    # as if subscribed to catalogue changes in redis
+    monkeypatch.setattr(catalogue_cache, '_subscribed', lambda: True)
+    catalogue_cache._clear()
+
+    with app.app_context():
+        db.metadata.create_all(db.engine, tables=[Tag.__table__, Skill.__table__])
+        yield app
+
+    catalogue_cache._clear()
+
+
+def test_names_are_resolved_in_bulk(catalogue_app, statements):
+    db.session.add(Tag('python'))
+    db.session.commit()
+    statements.clear()
+
+    tags = Tag.get_or_create_many([f'tag-{i}' for i in range(20)] + ['python', 'tag-3'])
+
+    assert [t.name for t in tags] == [f'tag-{i}' for i in range(20)] + ['python']
+    assert all(t.id is not None for t in tags)
+    # lookup, multi-row insert and lookup of the created tags
+    assert len(statements) == 3
+
+
+def test_new_names_differing_in_case_create_one_item(catalogue_app):
+    skills = Skill.get_or_create_many(['Go', 'go', 'GO'])
+
+    assert [s.name for s in skills] == ['Go']
+    assert Skill.query.count() == 1
+
+
+def test_committed_items_are_cached_until_the_catalogue_changes(catalogue_app, statements):
+    db.session.add_all([Tag('python'), Tag('go')])
+    db.session.commit()
+    db.session.expunge_all()
+
+    Tag.get_or_create_many(['python', 'go'])
+    db.session.expunge_all()
+    statements.clear()
+
+    tags = Tag.get_or_create_many(['go', 'python'])
+    assert [(t.id, t.name) for t in tags] == [(2, 'go'), (1, 'python')]
+    assert statements == []
+
+    # a change published by another process
+    catalogue_cache._clear()
+    Tag.get_or_create_many(['go', 'python'])
+    assert len(statements) == 1
+
+
+def test_items_created_by_the_session_are_not_cached(catalogue_app):
+    Tag.get_or_create_many(['python'])
+    db.session.rollback()
+
+    assert catalogue_cache.get_many(Tag, ['python']) == {}
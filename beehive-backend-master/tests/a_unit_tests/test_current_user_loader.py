@@ -0,0 +1,98 @@
+from unittest.mock import patch
+
+import pytest
+
+from src.models.project import Project, ProjectDelegator
+from src.models.skill import Skill, UserSkill
+from src.models.tag import Tag, UserTag
+from src.models.user import User
+from src.utils.db import db
+from src.utils.jwt import invalidate_cached_user, load_current_user
+from src.utils.user_cache import USER_CHANGED_CHANNEL, user_cache
+
+
+@pytest.fixture
+def user_app(sqlite_app, monkeypatch):
+    app = sqlite_app
+    app.config['JWT_IDENTITY_CLAIM'] = 'sub'
+    app.config['USER_CACHE_TTL_SECONDS'] = 60
+    app.config['USER_CACHE_SIZE'] = 10
+    user_cache.init_app(app)
+
+    # as if subscribed to user changes in redis
+    monkeypatch.setattr(user_cache, '_subscribed', lambda: True)
+    user_cache._clear()
+
+    with app.app_context():
+        tables = [User, Tag, UserTag, Skill, UserSkill, Project, ProjectDelegator]
+        db.metadata.create_all(db.engine, tables=[t.__table__ for t in tables])
+
+        user = User('user@test.test', 'hash', 'first', 'last', None, None, None, None, False, 'token', tags=[Tag('project:bees')], skills=[Skill('python')])
+        db.session.add(user)
+        db.session.add(Project(1, 'bees', None, None, delegators=[user]))
+        db.session.commit()
+        app.user_id = user.id
+
+    yield app
+
+    user_cache._clear()
+
+
+def test_cached_user_is_merged_without_queries(user_app, statements):
+    with user_app.test_request_context():
+        user = load_current_user({}, {'sub': user_app.user_id})
+        assert user in db.session
+
+    statements.clear()
+    with user_app.test_request_context():
+        user = load_current_user({}, {'sub': user_app.user_id})
+        assert user in db.session
+        assert [t.name for t in user.tags] == ['project:bees']
+        assert [s.name for s in user.skills] == ['python']
+        assert [d.project_id for d in user.project_delegators] == [1]
+
+    assert statements == []
+
+
+def test_invalidated_user_is_reloaded(user_app):
+    with user_app.test_request_context():
+        load_current_user({}, {'sub': user_app.user_id})
+
+    with user_app.app_context():
+        db.session.get(User, user_app.user_id).github_user = 'bee'
+        db.session.commit()
+
+    with patch('src.utils.subscribed_cache.rq') as mock_rq:
+        invalidate_cached_user(user_app.user_id)
+
+    # the change is published to the other processes
+    mock_rq.connection.publish.assert_called_once_with(USER_CHANGED_CHANNEL, user_app.user_id)
+    with user_app.test_request_context():
+        assert load_current_user({}, {'sub': user_app.user_id}).github_user == 'bee'
+
+
+def test_user_changed_by_another_process_is_reloaded(user_app):
+    with user_app.test_request_context():
+        load_current_user({}, {'sub': user_app.user_id})
+
+    with user_app.app_context():
+        db.session.get(User, user_app.user_id).github_user = 'bee'
+        db.session.commit()
+
+    # a change published by another process
+    user_cache._changed({'channel': USER_CHANGED_CHANNEL.encode(), 'data': user_app.user_id.encode()})
+    with user_app.test_request_context():
+        assert load_current_user({}, {'sub': user_app.user_id}).github_user == 'bee'
+
+
+def test_user_is_loaded_once_per_request(user_app, statements):
+    user_cache.ttl_seconds = 0
+    statements.clear()
+
+    with user_app.test_request_context():
+        user = load_current_user({}, {'sub': user_app.user_id})
+        assert load_current_user({}, {'sub': user_app.user_id}) is user
+        assert len(user.tags) == len(user.skills) == len(user.project_delegators) == 1
+
+    # the user is loaded with its tags, skills and delegator projects
+    assert len(statements) == 1
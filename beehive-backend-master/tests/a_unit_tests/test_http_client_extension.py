@@ -0,0 +1,53 @@
+from unittest.mock import patch
+
+from flask import Flask
+import pytest
+
+from src.utils.http_client import HTTPClient
+
+
+def create_http_client_app():
+    app = Flask(__name__)
+    app.config['CUCKOO_TIMEOUT_SECONDS'] = 10
+    app.config['PRAESEPE_TIMEOUT_SECONDS'] = 5
+    app.config['POLLINATOR_TIMEOUT_SECONDS'] = 60
+    app.config['SLACK_BOT_TIMEOUT_SECONDS'] = 5
+    return app
+
+
+def test_extension_uninitialized():
+    http_client = HTTPClient()
+
+    with pytest.raises(RuntimeError):
+        http_client.get('cuckoo', 'http://cuckoo/api')
+
+
+@patch('requests.Session.request')
+def test_requests_use_service_timeout(mock_request):
+    http_client = HTTPClient(create_http_client_app())
+
+    http_client.get('cuckoo', 'http://cuckoo/api')
+    assert mock_request.call_args.kwargs['timeout'] == (3.05, 10)
+
+    http_client.post('pollinator', 'http://pollinator/api', json={})
+    assert mock_request.call_args.kwargs['timeout'] == (3.05, 60)
+
+    http_client.post('pollinator', 'http://pollinator/api', timeout=1)
+    assert mock_request.call_args.kwargs['timeout'] == 1
+
+
+def test_sessions_are_pooled_per_service():
+    http_client = HTTPClient(create_http_client_app())
+
+    cuckoo_session = http_client._session('cuckoo')
+    assert http_client._session('cuckoo') is cuckoo_session
+    assert http_client._session('praesepe') is not cuckoo_session
+
+
+def test_only_idempotent_requests_are_retried():
+    http_client = HTTPClient(create_http_client_app())
+
+    retry = http_client._session('cuckoo').get_adapter('http://cuckoo').max_retries
+    assert retry.total == 2
+    assert 'GET' in retry.allowed_methods
+    assert 'POST' not in retry.allowed_methods
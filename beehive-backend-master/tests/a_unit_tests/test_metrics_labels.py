@@ -0,0 +1,22 @@
+from flask import Flask
+
+from src.utils.metrics import LabelCardinalityGuard, route_template_label
+
+
+def test_path_label_is_the_route_template():
+    app = Flask(__name__)
+    app.add_url_rule('/api/v1/work/<int:work_id>', 'work', lambda work_id: '')
+
+    with app.test_request_context('/api/v1/work/123'):
+        assert route_template_label() == '/api/v1/work/<int:work_id>'
+
+    with app.test_request_context('/api/v1/unknown/123'):
+        assert route_template_label() == 'none'
+
+
+def test_guard_caps_label_values():
+    app = Flask(__name__)
+    guard = LabelCardinalityGuard('path', 2)
+
+    with app.app_context():
+        assert [guard(value) for value in ['a', 'b', 'c', 'a', 'd', 'b']] == ['a', 'b', 'other', 'a', 'other', 'b']
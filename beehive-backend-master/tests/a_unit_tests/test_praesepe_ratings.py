@@ -0,0 +1,81 @@
+from unittest.mock import MagicMock, patch
+
+from flask import Flask
+import pytest
+
+from src.logic.praesepe import get_rating_items_by_object_key, ratings_cache
+
+
+@pytest.fixture
+def praesepe_app():
+    app = Flask(__name__)
+    app.config['PRAESEPE_BASE_URL'] = 'http://praesepe'
+    app.config['PRAESEPE_AUTH_TOKEN'] = 'token'
+    app.config['PRAESEPE_RATINGS_CACHE_TTL_SECONDS'] = 60
+
+    ratings_cache.clear()
+    with app.app_context():
+        yield app
+    ratings_cache.clear()
+
+
+def ratings_response(status_code, ratings=None):
+    res = MagicMock()
+    res.status_code = status_code
+    res.json.return_value = {'data': ratings or []}
+    return res
+
+
+@patch('src.logic.praesepe.http_client.get')
+def test_ratings_are_fetched_in_one_request(mock_get, praesepe_app):
+    mock_get.return_value = ratings_response(200, [
+        {'objectKey': 'wr-1', 'score': 4},
+        {'objectKey': 'wr-1', 'score': 5},
+        {'objectKey': 'wr-3', 'score': 2},
+    ])
+
+    ratings = get_rating_items_by_object_key('user', ['wr-1', 'wr-2', 'wr-3'])
+
+    assert mock_get.call_count == 1
+    assert mock_get.call_args.kwargs['params']['objectKeys'] == ['wr-1', 'wr-2', 'wr-3']
+    assert [r['score'] for r in ratings['wr-1']] == [4, 5]
+    assert ratings['wr-2'] is None
+    assert [r['score'] for r in ratings['wr-3']] == [2]
+
+
+@patch('src.logic.praesepe.http_client.get')
+def test_cached_ratings_are_not_fetched_again(mock_get, praesepe_app):
+    mock_get.return_value = ratings_response(200, [{'objectKey': 'wr-1', 'score': 4}])
+    get_rating_items_by_object_key('user', ['wr-1', 'wr-2'])
+
+    mock_get.return_value = ratings_response(200, [{'objectKey': 'wr-3', 'score': 3}])
+    ratings = get_rating_items_by_object_key('user', ['wr-1', 'wr-2', 'wr-3'])
+
+    assert mock_get.call_count == 2
+    assert mock_get.call_args.kwargs['params']['objectKeys'] == ['wr-3']
+    assert [r['score'] for r in ratings['wr-1']] == [4]
+    assert ratings['wr-2'] is None
+    assert [r['score'] for r in ratings['wr-3']] == [3]
+
+
+@patch('src.logic.praesepe.http_client.get')
+def test_failed_ratings_are_not_cached(mock_get, praesepe_app):
+    mock_get.return_value = ratings_response(500)
+    assert get_rating_items_by_object_key('user', ['wr-1']) == {'wr-1': None}
+
+    mock_get.return_value = ratings_response(200, [{'objectKey': 'wr-1', 'score': 4}])
+    ratings = get_rating_items_by_object_key('user', ['wr-1'])
+
+    assert mock_get.call_count == 2
+    assert [r['score'] for r in ratings['wr-1']] == [4]
+
+
+@patch('src.logic.praesepe.http_client.get')
+def test_ratings_cache_is_disabled_without_ttl(mock_get, praesepe_app):
+    praesepe_app.config['PRAESEPE_RATINGS_CACHE_TTL_SECONDS'] = 0
+    mock_get.return_value = ratings_response(400)
+
+    get_rating_items_by_object_key('user', ['wr-1'])
+    get_rating_items_by_object_key('user', ['wr-1'])
+
+    assert mock_get.call_count == 2
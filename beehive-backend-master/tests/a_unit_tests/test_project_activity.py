@@ -0,0 +1,116 @@
+from datetime import date, datetime, timedelta
+import json
+from unittest.mock import patch
+
+from marshmallow import ValidationError
+import pytest
+from sqlalchemy import event
+
+from src.logic.project_activity import (
+    PROJECT_ACTIVITY_QUEUED_KEY_PREFIX,
+    find_changed_project_days,
+    queue_task_project_activity_refresh,
+    queue_tasks_project_activity_refresh
+)
+from src.models.project_daily_activity import ProjectDailyActivity
+from src.models.tag import Tag, TaskTag
+from src.models.task import Task, TaskStatus, TaskType
+from src.models.work import Work
+from src.schemas.project import PROJECT_ACTIVITY_MAX_DAYS, ProjectActivityRequestSchema
+from src.utils.db import db
+
+# importing the jobs schedules their crons, which needs redis
+with patch('flask_rq2.functions.JobFunctions.cron'):
+    from src.jobs.stats import refresh_projects_activity
+
+
+def test_activity_window_is_bounded():
+    schema = ProjectActivityRequestSchema()
+    today = datetime.utcnow().date()
+
+    assert schema.load({'days': PROJECT_ACTIVITY_MAX_DAYS})['days'] == PROJECT_ACTIVITY_MAX_DAYS
+    assert schema.load({'startDate': (today - timedelta(days=PROJECT_ACTIVITY_MAX_DAYS - 1)).isoformat()})
+
+    with pytest.raises(ValidationError):
+        schema.load({'days': 10 ** 9})
+
+    with pytest.raises(ValidationError):
+        schema.load({'startDate': '0001-01-01'})
+
+    with pytest.raises(ValidationError):
+        schema.load({'startDate': '2020-01-01', 'endDate': '2022-01-01'})
+
+    assert schema.load({'startDate': '2020-01-01', 'endDate': '2020-12-31'})['start_date'] == date(2020, 1, 1)
+
+
+@pytest.fixture
+def activity_app(sqlite_app):
+    with sqlite_app.app_context():
+        # mysql's json_overlaps for the task id columns
+        event.listen(db.engine, 'connect', lambda connection, _: connection.create_function(
+            'json_overlaps', 2, lambda a, b: bool(set(json.loads(a)) & set(json.loads(b)))
+        ))
+        tables = [Tag, TaskTag, Task, Work, ProjectDailyActivity]
+        db.metadata.create_all(db.engine, tables=[t.__table__ for t in tables])
+        yield sqlite_app
+
+
+def create_task(project, created, updated=None):
+    task = Task.from_cuckoo('user', 'task', TaskStatus.ACCEPTED, 1, TaskType.CUCKOO_CODING, tags=[project], skills=[], repository_id=1)
+    task.created = created
+    task.updated = updated
+    db.session.add(task)
+    db.session.commit()
+
+    return task
+
+
+def test_only_days_affected_by_changes_are_refreshed(activity_app):
+    since = datetime(2024, 3, 10, 12)
+    project, unchanged_project = Tag('project:bees'), Tag('project:wasps')
+
+    # accepted before and updated since, so moved from its previous day to today
+    moved = create_task(project, datetime(2024, 1, 5), since + timedelta(hours=1))
+    previous_day = ProjectDailyActivity(project.id, date(2024, 2, 1))
+    previous_day.tasks_accepted = 1
+    previous_day.tasks_accepted_task_ids = [moved.id]
+    db.session.add(previous_day)
+
+    create_task(project, since + timedelta(minutes=30))
+    create_task(project, datetime(2024, 1, 1), datetime(2024, 1, 2))
+    create_task(unchanged_project, datetime(2024, 1, 1), datetime(2024, 1, 2))
+    db.session.commit()
+
+    assert find_changed_project_days(since) == {project.id: (date(2024, 2, 1), date(2024, 3, 10))}
+    assert find_changed_project_days(since + timedelta(days=1)) == {}
+
+
+def test_activity_refresh_is_queued_once_per_project(activity_app, fake_redis):
+    project, other_project = Tag('project:bees'), Tag('project:wasps')
+    tasks = [create_task(project, datetime.utcnow()), create_task(project, datetime.utcnow())]
+    other_task = create_task(other_project, datetime.utcnow())
+
+    with patch('src.logic.project_activity.rq') as mock_rq, \
+            patch.object(refresh_projects_activity, 'queue') as mock_queue:
+        mock_rq.connection = fake_redis
+        queue_tasks_project_activity_refresh(tasks)
+        queue_task_project_activity_refresh(tasks[0])
+        queue_task_project_activity_refresh(other_task)
+
+    assert [c.args[0] for c in mock_queue.call_args_list] == [[project.id], [other_project.id]]
+
+
+def test_queued_activity_refresh_recomputes_today(activity_app, fake_redis):
+    fake_redis.set(f'{PROJECT_ACTIVITY_QUEUED_KEY_PREFIX}1', 1)
+
+    with patch('src.logic.project_activity.rq') as mock_rq, \
+            patch('src.jobs.stats.refresh_project_activity') as mock_refresh, \
+            patch('src.jobs.stats.invalidate_cached_responses') as mock_invalidate:
+        mock_rq.connection = fake_redis
+        refresh_projects_activity([1])
+
+    # only today is refreshed, older days are left to the periodic refresh
+    today = datetime.utcnow().date()
+    mock_refresh.assert_called_once_with([1], today, today)
+    assert not fake_redis.exists(f'{PROJECT_ACTIVITY_QUEUED_KEY_PREFIX}1')
+    mock_invalidate.assert_called_once_with([1])
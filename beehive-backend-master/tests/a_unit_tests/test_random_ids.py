@@ -0,0 +1,53 @@
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from src.models.user_code import UserCode, UserCodeType
+from src.utils.db import add_with_random_ids, db
+
+
+@pytest.fixture
+def ids_app(sqlite_app):
+    with sqlite_app.app_context():
+        db.metadata.create_all(db.engine, tables=[UserCode.__table__])
+        yield sqlite_app
+
+
+def test_ids_are_allocated_without_queries(ids_app, statements):
+    ids = UserCode.allocate_ids(1000)
+    code = UserCode(UserCodeType.REGISTRATION)
+
+    assert len(set(ids)) == 1000
+    assert all(len(i) == 64 for i in ids + [code.id])
+    assert statements == []
+
+
+def test_taken_ids_are_reassigned(ids_app):
+    existing = UserCode(UserCodeType.REGISTRATION)
+    db.session.add(existing)
+    db.session.commit()
+    db.session.expunge_all()
+
+    taken = UserCode(UserCodeType.REGISTRATION)
+    taken.id = existing.id
+    first = UserCode(UserCodeType.REGISTRATION)
+    duplicate = UserCode(UserCodeType.REGISTRATION)
+    duplicate.id = first.id
+    add_with_random_ids([taken, first, duplicate])
+    db.session.commit()
+
+    assert taken.id != existing.id
+    assert duplicate.id != first.id
+    assert UserCode.query.count() == 4
+
+
+def test_other_integrity_errors_are_raised(ids_app):
+    pending = UserCode(UserCodeType.REGISTRATION)
+    db.session.add(pending)
+
+    invalid = UserCode(None)
+    with pytest.raises(IntegrityError):
+        add_with_random_ids([invalid])
+
+    # the rest of the transaction is kept
+    db.session.commit()
+    assert UserCode.query.count() == 1
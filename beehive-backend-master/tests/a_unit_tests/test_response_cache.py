@@ -0,0 +1,72 @@
+from unittest.mock import patch
+
+from flask import Flask, jsonify
+import pytest
+
+from src.utils.response_cache import cached_response, invalidate_cached_responses, project_tag
+
+
+@pytest.fixture
+def cache_app(fake_redis):
+    app = Flask(__name__)
+    app.config['RESPONSE_CACHE_ENABLED'] = True
+    app.config['RESPONSE_CACHE_TTL_SECONDS'] = 60
+
+    app.computed = 0
+
+    @app.route('/projects/<int:project_id>')
+    @cached_response(lambda project_id: project_tag(project_id))
+    def project_view(project_id):
+        app.computed += 1
+        return jsonify({'project': project_id, 'computed': app.computed})
+
+    with patch('src.utils.response_cache.rq') as mock_rq, patch('src.utils.response_cache._auth_scope', return_value='admin'):
+        mock_rq.connection = fake_redis
+        yield app
+
+
+def test_responses_are_cached_until_invalidated(cache_app):
+    client = cache_app.test_client()
+
+    first = client.get('/projects/1')
+    assert first.status_code == 200
+    assert client.get('/projects/1').json == first.json
+    assert cache_app.computed == 1
+
+    # query args are part of the key
+    client.get('/projects/1?page=2')
+    assert cache_app.computed == 2
+
+    # invalidating another project keeps the cached response
+    with cache_app.app_context():
+        invalidate_cached_responses(project_ids=[2])
+    assert client.get('/projects/1').json == first.json
+
+    with cache_app.app_context():
+        invalidate_cached_responses(project_ids=[1])
+    assert client.get('/projects/1').json['computed'] == 3
+
+
+def test_matching_etag_returns_not_modified(cache_app):
+    client = cache_app.test_client()
+
+    res = client.get('/projects/1')
+    etag = res.headers['ETag']
+    assert etag
+
+    res = client.get('/projects/1', headers={'If-None-Match': etag})
+    assert res.status_code == 304
+    assert res.data == b''
+
+    res = client.get('/projects/1', headers={'If-None-Match': '"other"'})
+    assert res.status_code == 200
+    assert res.json['project'] == 1
+
+
+def test_disabled_cache_computes_every_response(cache_app):
+    cache_app.config['RESPONSE_CACHE_ENABLED'] = False
+    client = cache_app.test_client()
+
+    client.get('/projects/1')
+    client.get('/projects/1')
+    assert cache_app.computed == 2
@@ -0,0 +1,74 @@
+import time
+from unittest.mock import MagicMock, patch
+
+from flask import Flask
+import pytest
+from redis import RedisError
+
+from src.utils.jwt import REVOKED_TOKEN_KEY_PREFIX, REVOKED_TOKENS_MIRRORED_KEY, add_revoked_token, is_token_revoked
+from src.utils.ttl_cache import TTLCache
+
+
+@pytest.fixture
+def jwt_app(fake_redis):
+    app = Flask(__name__)
+    app.config['JWT_UNREVOKED_TOKEN_CACHE_SECONDS'] = 60
+    app.config['JWT_UNREVOKED_TOKEN_CACHE_SIZE'] = 100
+
+    with app.app_context(), \
+            patch('src.utils.jwt.rq') as mock_rq, \
+            patch('src.utils.jwt.RevokedToken') as mock_revoked_token, \
+            patch('src.utils.jwt.unrevoked_token_cache', TTLCache()):
+        fake_redis.set(REVOKED_TOKENS_MIRRORED_KEY, 1)
+        fake_redis.set(f'{REVOKED_TOKEN_KEY_PREFIX}revoked', 1)
+        app.redis = mock_rq.connection = fake_redis
+        app.revoked_token = mock_revoked_token
+        yield app
+
+
+def test_unrevoked_tokens_are_cached(jwt_app):
+    assert is_token_revoked({}, {'jti': 'valid'}) is False
+    assert is_token_revoked({}, {'jti': 'valid'}) is False
+
+    assert jwt_app.redis.executions == 1
+    jwt_app.revoked_token.query.filter_by.assert_not_called()
+
+
+def test_revoked_tokens_are_not_cached(jwt_app):
+    assert is_token_revoked({}, {'jti': 'revoked'}) is True
+    assert is_token_revoked({}, {'jti': 'revoked'}) is True
+
+    assert jwt_app.redis.executions == 2
+
+
+def test_database_is_checked_until_tokens_are_mirrored(jwt_app):
+    jwt_app.redis.delete(REVOKED_TOKENS_MIRRORED_KEY)
+    jwt_app.revoked_token.query.filter_by.return_value.first.return_value = MagicMock()
+
+    assert is_token_revoked({}, {'jti': 'revoked-before-mirroring'}) is True
+    jwt_app.revoked_token.query.filter_by.assert_called_once_with(token_id='revoked-before-mirroring')
+
+
+def test_database_is_checked_after_a_revoked_token_failed_to_mirror(jwt_app):
+    with patch('src.utils.jwt.db'), \
+            patch.object(jwt_app.redis, 'setex', side_effect=RedisError('OOM command not allowed when used memory > maxmemory')):
+        add_revoked_token('revoked-unmirrored', 'user', expires=time.time() + 60)
+
+    assert not jwt_app.redis.exists(REVOKED_TOKENS_MIRRORED_KEY)
+    jwt_app.revoked_token.query.filter_by.return_value.first.return_value = MagicMock()
+
+    assert is_token_revoked({}, {'jti': 'revoked-unmirrored'}) is True
+    jwt_app.revoked_token.query.filter_by.assert_called_once_with(token_id='revoked-unmirrored')
+
+
+def test_cache_is_bounded():
+    cache = TTLCache(max_size=2)
+    cache.set_many({'a': 1}, 60)
+    cache.set_many({'b': 2}, 60)
+    cache.set_many({'c': 3}, 60)
+    cache.set_many({'d': 4}, -1)
+
+    assert cache.get_many(['a', 'b', 'c', 'd']) == {'b': 2, 'c': 3}
+
+    cache.delete_many(['c'])
+    assert cache.get_many(['c']) == {}
@@ -0,0 +1,48 @@
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from flask import Flask
+import pytest
+
+from src.models.task import TaskType
+from src.utils.slack_bot import notify_new_task_descriptions
+
+
+@pytest.fixture
+def slack_app():
+    app = Flask(__name__)
+    app.config['SLACK_BOT_BASE_URL'] = 'http://slack-bot'
+
+    with app.app_context(), patch('src.utils.slack_bot.http_client') as mock_http_client:
+        app.http_client = mock_http_client
+        yield app
+
+
+def new_tasks(count):
+    return [
+        SimpleNamespace(id=f'task{i}', description='description', func_name=None, task_type=TaskType.CUCKOO_CODING, delegating_user_id='user')
+        for i in range(count)
+    ]
+
+
+def test_descriptions_are_notified_in_a_single_message(slack_app):
+    slack_app.http_client.post.return_value = MagicMock(status_code=200)
+
+    notify_new_task_descriptions(new_tasks(3))
+
+    slack_app.http_client.post.assert_called_once()
+    _, url = slack_app.http_client.post.call_args.args
+    assert url == 'http://slack-bot/notify/descriptions'
+    assert [t['taskId'] for t in slack_app.http_client.post.call_args.kwargs['json']['tasks']] == ['task0', 'task1', 'task2']
+
+
+def test_descriptions_are_notified_one_by_one_without_batch_support(slack_app):
+    slack_app.http_client.post.side_effect = [MagicMock(status_code=404)] + [MagicMock(status_code=200)] * 2
+
+    notify_new_task_descriptions(new_tasks(2))
+
+    assert [call.args[1] for call in slack_app.http_client.post.call_args_list] == [
+        'http://slack-bot/notify/descriptions',
+        'http://slack-bot/notify/description',
+        'http://slack-bot/notify/description'
+    ]
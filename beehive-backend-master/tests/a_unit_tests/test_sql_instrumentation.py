@@ -0,0 +1,68 @@
+from flask import Flask, jsonify
+import pytest
+from sqlalchemy import text
+
+from src.utils.db import db
+from src.utils.sql_instrumentation import SQLInstrumentation, SQLRequestStats
+
+
+@pytest.fixture
+def instrumented_app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SQL_QUERY_BUDGET'] = 2
+    app.config['SQL_ENDPOINT_QUERY_BUDGETS'] = {'single_query': 0}
+    db.init_app(app)
+
+    instrumentation = SQLInstrumentation(app)
+
+    @app.route('/queries/<int:count>')
+    def queries(count):
+        for i in range(count):
+            db.session.execute(text(f'select {i}'))
+        return jsonify({})
+
+    @app.route('/single-query')
+    def single_query():
+        db.session.execute(text('select 1'))
+        return jsonify({})
+
+    app.instrumentation = instrumentation
+    yield app
+
+
+def test_statements_are_recorded_per_request(instrumented_app):
+    requests = []
+    instrumented_app.instrumentation.add_listener(lambda endpoint, stats: requests.append((endpoint, stats)))
+
+    client = instrumented_app.test_client()
+    client.get('/queries/3')
+    client.get('/queries/0')
+
+    assert [(endpoint, stats.count) for endpoint, stats in requests] == [('queries', 3), ('queries', 0)]
+    assert requests[0][1].duration > 0
+    assert len(requests[0][1].slowest) == 3
+
+
+def test_requests_over_budget_are_logged(instrumented_app, caplog):
+    client = instrumented_app.test_client()
+
+    client.get('/queries/2')
+    assert 'over its budget' not in caplog.text
+
+    client.get('/queries/3')
+    assert 'ran 3 sql statements over its budget of 2' in caplog.text
+
+    # endpoints can have their own budget
+    client.get('/single-query')
+    assert 'ran 1 sql statements over its budget of 0' in caplog.text
+
+
+def test_slowest_statements_are_kept():
+    stats = SQLRequestStats(2)
+    for duration, statement in [(0.1, 'a'), (0.3, 'b'), (0.2, 'c'), (0.05, 'd')]:
+        stats.record(statement, duration)
+
+    assert stats.count == 4
+    assert stats.duration == pytest.approx(0.65)
+    assert stats.slowest == [(0.3, 'b'), (0.2, 'c')]
@@ -0,0 +1,41 @@
+from datetime import date
+from unittest.mock import call, patch
+
+import pytest
+
+# importing the jobs schedules their crons, which needs redis
+with patch('flask_rq2.functions.JobFunctions.cron'):
+    from src.jobs.stats import REFRESH_CONTRIBUTOR_STATS_CHUNK_SIZE, refresh_changed_contributor_stats, refresh_changed_project_activity
+
+
+@pytest.fixture
+def mock_invalidate_cached_responses(sqlite_app):
+    with sqlite_app.app_context(), \
+            patch('src.jobs.stats.db'), \
+            patch('src.jobs.stats.invalidate_cached_responses') as mock_invalidate:
+        yield mock_invalidate
+
+
+def test_refreshed_contributor_stats_invalidate_cached_responses(mock_invalidate_cached_responses):
+    user_ids = [f'user-{i:03}' for i in range(REFRESH_CONTRIBUTOR_STATS_CHUNK_SIZE + 1)]
+    with patch('src.jobs.stats.get_contributor_stats_refreshed_until', return_value=None), \
+            patch('src.jobs.stats.set_contributor_stats_refreshed_until'), \
+            patch('src.jobs.stats.find_changed_contributors', return_value=set(user_ids)), \
+            patch('src.jobs.stats.refresh_contributor_stats', side_effect=[{1, 2}, {2}]):
+        refresh_changed_contributor_stats()
+
+    assert mock_invalidate_cached_responses.call_args_list == [
+        call({1, 2}, user_ids[:REFRESH_CONTRIBUTOR_STATS_CHUNK_SIZE]),
+        call({2}, user_ids[REFRESH_CONTRIBUTOR_STATS_CHUNK_SIZE:])
+    ]
+
+
+def test_refreshed_project_activity_invalidates_cached_responses(mock_invalidate_cached_responses):
+    project_days = {1: (date(2024, 1, 1), date(2024, 1, 5)), 2: (None, None)}
+    with patch('src.jobs.stats.get_project_activity_refreshed_until', return_value=None), \
+            patch('src.jobs.stats.set_project_activity_refreshed_until'), \
+            patch('src.jobs.stats.find_changed_project_days', return_value=project_days), \
+            patch('src.jobs.stats.refresh_project_activity'):
+        refresh_changed_project_activity()
+
+    assert mock_invalidate_cached_responses.call_args_list == [call([1]), call([2])]
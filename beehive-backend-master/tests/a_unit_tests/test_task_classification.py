@@ -0,0 +1,235 @@
+from datetime import timedelta
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.models.skill import Skill, TaskSkill
+from src.models.task import Task, TaskStatus, TaskType
+from src.models.task_classification import TaskClassification, TaskTypeClassification
+from src.logic.pollinator import (
+    TASK_CLASSIFICATION_ATTEMPTS_KEY,
+    TASK_CLASSIFICATION_LOCK_KEY,
+    TASK_CLASSIFICATION_PENDING_KEY,
+    TASK_CLASSIFICATION_SCHEDULED_KEY,
+    classify_tasks,
+    queue_task_classification
+)
+from src.utils.db import db
+
+# importing the jobs schedules their crons, which needs redis
+with patch('flask_rq2.functions.JobFunctions.cron'):
+    from src.jobs.pollinator import classify_pending_tasks
+
+
+@pytest.fixture
+def classification_app(sqlite_app, fake_redis):
+    app = sqlite_app
+    app.config['POLLINATOR_TASK_TYPE_BASE_URL'] = 'http://pollinator'
+    app.config['OUTGOING_AUTH_TOKEN'] = 'token'
+    app.config['TASK_CLASSIFICATION_CACHE_TTL_SECONDS'] = 60
+    app.config['TASK_CLASSIFICATION_BATCH_SIZE'] = 2
+    app.config['TASK_CLASSIFICATION_WINDOW_SECONDS'] = 10
+    app.config['TASK_CLASSIFICATION_MAX_ATTEMPTS'] = 2
+
+    with app.app_context(), \
+            patch('src.logic.pollinator.rq') as mock_rq, \
+            patch('src.jobs.pollinator.rq') as mock_jobs_rq, \
+            patch('src.logic.pollinator.http_client') as mock_http_client, \
+            patch.object(classify_pending_tasks, 'queue') as mock_queue, \
+            patch.object(classify_pending_tasks, 'schedule') as mock_schedule:
+        mock_rq.connection = fake_redis
+        mock_jobs_rq.connection = fake_redis
+        app.redis = fake_redis
+        app.classify_queue = mock_queue
+        app.classify_schedule = mock_schedule
+        app.http_client = mock_http_client
+
+        tables = [Task, Skill, TaskSkill, TaskClassification]
+        db.metadata.create_all(db.engine, tables=[t.__table__ for t in tables])
+        yield app
+
+
+def create_tasks(*descriptions):
+    skill = Skill.query.filter_by(name='python').first() or Skill('python')
+    tasks = [
+        Task.from_cuckoo('user', description, TaskStatus.PENDING, 1, TaskType.CUCKOO_CODING, tags=[], skills=[skill], repository_id=1)
+        for description in descriptions
+    ]
+    db.session.add_all(tasks)
+    db.session.commit()
+
+    return [task.id for task in tasks]
+
+
+def test_tasks_are_classified_in_a_single_request(classification_app):
+    classification_app.http_client.post.return_value = MagicMock(status_code=200, json=lambda: {'data': [
+        {'label': TaskTypeClassification.CREATE_PAGE.value},
+        {'label': TaskTypeClassification.CREATE_ENDPOINT.value}
+    ]})
+
+    task_ids = create_tasks('add a page', 'add an endpoint', 'add a page')
+    classified = classify_tasks(task_ids)
+
+    # duplicate descriptions are sent once
+    classification_app.http_client.post.assert_called_once()
+    assert classification_app.http_client.post.call_args.kwargs['json'] == {'inputs': [
+        {'task_description': 'add a page', 'task_skills': ['python']},
+        {'task_description': 'add an endpoint', 'task_skills': ['python']}
+    ]}
+    assert classified == {
+        task_ids[0]: TaskTypeClassification.CREATE_PAGE,
+        task_ids[1]: TaskTypeClassification.CREATE_ENDPOINT,
+        task_ids[2]: TaskTypeClassification.CREATE_PAGE
+    }
+    assert TaskClassification.query.count() == 3
+
+
+def test_cached_classifications_skip_pollinator(classification_app):
+    classification_app.http_client.post.return_value = MagicMock(status_code=200, json=lambda: {'data': {'label': TaskTypeClassification.CREATE_PAGE.value}})
+    classify_tasks(create_tasks('add a page'))
+
+    classification_app.http_client.post.reset_mock()
+    redelegated_task_ids = create_tasks('add a page')
+
+    assert classify_tasks(redelegated_task_ids) == {redelegated_task_ids[0]: TaskTypeClassification.CREATE_PAGE}
+    classification_app.http_client.post.assert_not_called()
+
+
+def test_cached_classifications_with_unknown_names_are_classified_again(classification_app):
+    classification_app.http_client.post.return_value = MagicMock(status_code=200, json=lambda: {'data': {'label': TaskTypeClassification.CREATE_PAGE.value}})
+    classify_tasks(create_tasks('add a page'))
+    for key in list(classification_app.redis.values):
+        classification_app.redis.values[key] = b'REMOVED'
+
+    classification_app.http_client.post.reset_mock()
+    task_ids = create_tasks('add a page')
+
+    assert classify_tasks(task_ids) == {task_ids[0]: TaskTypeClassification.CREATE_PAGE}
+    classification_app.http_client.post.assert_called_once()
+
+
+def test_unclassified_pending_tasks_are_queued_again_until_max_attempts(classification_app):
+    classification_app.http_client.post.return_value = MagicMock(status_code=500, text='unavailable')
+    task_ids = create_tasks('add a page')
+    classification_app.redis.rpush(TASK_CLASSIFICATION_PENDING_KEY, *task_ids)
+
+    classify_pending_tasks()
+
+    assert classification_app.redis.lrange(TASK_CLASSIFICATION_PENDING_KEY, 0, -1) == [task_ids[0].encode()]
+    assert classification_app.redis.hgetall(TASK_CLASSIFICATION_ATTEMPTS_KEY) == {task_ids[0].encode(): b'1'}
+    classification_app.classify_schedule.assert_called_once()
+
+    classify_pending_tasks()
+
+    # given up after TASK_CLASSIFICATION_MAX_ATTEMPTS
+    assert classification_app.redis.lrange(TASK_CLASSIFICATION_PENDING_KEY, 0, -1) == []
+    assert classification_app.redis.hgetall(TASK_CLASSIFICATION_ATTEMPTS_KEY) == {}
+    assert TaskClassification.query.count() == 0
+
+
+def test_pending_tasks_are_kept_when_classification_fails(classification_app):
+    task_ids = create_tasks('add a page', 'add an endpoint')
+    classification_app.redis.rpush(TASK_CLASSIFICATION_PENDING_KEY, *task_ids)
+
+    with patch('src.jobs.pollinator.classify_tasks', side_effect=Exception('database gone')):
+        with pytest.raises(Exception):
+            classify_pending_tasks()
+
+    assert classification_app.redis.lrange(TASK_CLASSIFICATION_PENDING_KEY, 0, -1) == [task_id.encode() for task_id in task_ids]
+
+    classification_app.http_client.post.return_value = MagicMock(status_code=200, json=lambda: {'data': [
+        {'label': TaskTypeClassification.CREATE_PAGE.value},
+        {'label': TaskTypeClassification.CREATE_ENDPOINT.value}
+    ]})
+    classify_pending_tasks()
+
+    assert classification_app.redis.lrange(TASK_CLASSIFICATION_PENDING_KEY, 0, -1) == []
+    assert classification_app.redis.hgetall(TASK_CLASSIFICATION_ATTEMPTS_KEY) == {}
+    assert TaskClassification.query.count() == 2
+
+
+def test_first_queued_tasks_schedule_a_classification_run(classification_app):
+    queue_task_classification(['1'])
+
+    classification_app.classify_schedule.assert_called_once_with(timedelta(seconds=10))
+    classification_app.classify_queue.assert_not_called()
+    assert classification_app.redis.get(TASK_CLASSIFICATION_SCHEDULED_KEY) == b'1'
+    assert classification_app.redis.ttls[TASK_CLASSIFICATION_SCHEDULED_KEY] == 21
+
+
+def test_tasks_queued_within_the_window_do_not_schedule_another_run(classification_app):
+    classification_app.redis.rpush(TASK_CLASSIFICATION_PENDING_KEY, '1', '2')
+    classification_app.redis.set(TASK_CLASSIFICATION_SCHEDULED_KEY, 1)
+
+    queue_task_classification(['3'])
+
+    classification_app.classify_schedule.assert_not_called()
+    classification_app.classify_queue.assert_not_called()
+
+
+def test_full_batch_of_queued_tasks_is_classified_immediately(classification_app):
+    queue_task_classification(['1'])
+    classification_app.classify_schedule.reset_mock()
+
+    queue_task_classification(['2'])
+
+    classification_app.classify_queue.assert_called_once_with()
+    classification_app.classify_schedule.assert_not_called()
+
+    # the batch size is only crossed once
+    queue_task_classification(['3'])
+    classification_app.classify_queue.assert_called_once_with()
+
+
+def test_pending_tasks_are_drained_in_batches(classification_app):
+    def predict(*args, json, **kwargs):
+        label = {'label': TaskTypeClassification.CREATE_PAGE.value}
+        data = [label] * len(json['inputs']) if 'inputs' in json else label
+        return MagicMock(status_code=200, json=lambda: {'data': data})
+
+    classification_app.http_client.post.side_effect = predict
+    task_ids = create_tasks('add a page', 'add a form', 'add a table')
+    classification_app.redis.rpush(TASK_CLASSIFICATION_PENDING_KEY, *task_ids)
+    classification_app.redis.set(TASK_CLASSIFICATION_SCHEDULED_KEY, 1)
+
+    classify_pending_tasks()
+
+    # a batch of TASK_CLASSIFICATION_BATCH_SIZE tasks, then the remaining task
+    assert [len(call.kwargs['json'].get('inputs', [None])) for call in classification_app.http_client.post.call_args_list] == [2, 1]
+    assert classification_app.redis.llen(TASK_CLASSIFICATION_PENDING_KEY) == 0
+    assert classification_app.redis.get(TASK_CLASSIFICATION_SCHEDULED_KEY) is None
+    assert TaskClassification.query.count() == 3
+    assert classification_app.redis.locks == 1
+
+
+def test_pending_tasks_are_left_to_the_running_classifier(classification_app):
+    task_ids = create_tasks('add a page')
+    classification_app.redis.rpush(TASK_CLASSIFICATION_PENDING_KEY, *task_ids)
+    classification_app.redis.lock(TASK_CLASSIFICATION_LOCK_KEY).acquire()
+
+    classify_pending_tasks()
+
+    classification_app.http_client.post.assert_not_called()
+    assert classification_app.redis.llen(TASK_CLASSIFICATION_PENDING_KEY) == 1
+
+
+def test_tasks_are_classified_one_by_one_without_batch_predictions(classification_app):
+    batch_response = MagicMock(status_code=404, text='not found')
+    page_response = MagicMock(status_code=200, json=lambda: {'data': {'label': TaskTypeClassification.CREATE_PAGE.value}})
+    endpoint_response = MagicMock(status_code=200, json=lambda: {'data': {'label': TaskTypeClassification.CREATE_ENDPOINT.value}})
+    classification_app.http_client.post.side_effect = [batch_response, page_response, endpoint_response]
+
+    task_ids = create_tasks('add a page', 'add an endpoint')
+    classified = classify_tasks(task_ids)
+
+    urls = [call.kwargs['url'] for call in classification_app.http_client.post.call_args_list]
+    assert urls == [
+        'http://pollinator/api/v1/predict/batch',
+        'http://pollinator/api/v1/predict',
+        'http://pollinator/api/v1/predict'
+    ]
+    assert classification_app.http_client.post.call_args_list[1].kwargs['json'] == {'input': {'task_description': 'add a page', 'task_skills': ['python']}}
+    assert classified == {
+        task_ids[0]: TaskTypeClassification.CREATE_PAGE,
+        task_ids[1]: TaskTypeClassification.CREATE_ENDPOINT
+    }
@@ -0,0 +1,86 @@
+import json
+
+from flask import Flask, jsonify
+from flask_jwt_extended import JWTManager, create_access_token, jwt_required
+import pytest
+
+from src.utils.tracing import Tracer, span, traced
+
+
+@traced('lookup', 'http')
+def lookup():
+    return 1
+
+
+def create_traced_app(server_timing=False):
+    app = Flask(__name__)
+    app.config['TRACE_SAMPLE_RATE'] = 1.0
+    app.config['SERVER_TIMING_ENABLED'] = server_timing
+    app.config['JWT_SECRET_KEY'] = 'test'
+    JWTManager(app)
+    Tracer(app)
+
+    @app.route('/traced')
+    def traced_view():
+        lookup()
+        lookup()
+        with span('serialize', 'serialization'):
+            return jsonify({})
+
+    @app.route('/authenticated')
+    @jwt_required()
+    def authenticated_view():
+        return jsonify({})
+
+    return app
+
+
+@pytest.fixture
+def traced_app():
+    return create_traced_app()
+
+
+def auth_headers(app, admin):
+    with app.app_context():
+        token = create_access_token('user', additional_claims={'bh-admin': admin})
+    return {'Authorization': f'Bearer {token}'}
+
+
+def parse_server_timing(header):
+    timings = {}
+    for entry in header.split(', '):
+        name, *params = entry.split(';')
+        timings[name] = dict(p.split('=', 1) for p in params)
+    return timings
+
+
+def test_server_timing_header_sums_spans_by_name():
+    res = create_traced_app(server_timing=True).test_client().get('/traced')
+
+    timings = parse_server_timing(res.headers['Server-Timing'])
+    assert list(timings) == ['lookup', 'serialize', 'total']
+    assert float(timings['total']['dur']) >= float(timings['lookup']['dur'])
+
+
+def test_server_timing_header_is_only_sent_to_admins(traced_app):
+    assert 'Server-Timing' not in traced_app.test_client().get('/traced').headers
+    assert 'Server-Timing' not in traced_app.test_client().get('/authenticated', headers=auth_headers(traced_app, False)).headers
+
+    res = traced_app.test_client().get('/authenticated', headers=auth_headers(traced_app, True))
+    assert res.status_code == 200
+    assert 'total' in parse_server_timing(res.headers['Server-Timing'])
+
+
+def test_sampled_requests_are_logged_as_json(traced_app, caplog):
+    caplog.set_level('INFO')
+    traced_app.test_client().get('/traced')
+
+    trace = json.loads(next(r.message for r in caplog.records if r.message.startswith('trace ')).removeprefix('trace '))
+    assert trace['endpoint'] == 'traced_view'
+    assert trace['status'] == 200
+    assert [(s['name'], s['kind']) for s in trace['spans']] == [('lookup', 'http'), ('lookup', 'http'), ('serialize', 'serialization')]
+
+
+def test_spans_outside_requests_are_ignored():
+    with span('job'):
+        pass
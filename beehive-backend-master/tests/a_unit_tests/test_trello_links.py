@@ -0,0 +1,57 @@
+import json
+from unittest.mock import MagicMock, patch
+
+from flask import Flask
+import pytest
+
+from src.logic.trello_links import get_quest_cards, get_task_card_links
+
+
+@pytest.fixture
+def trello_links_app():
+    app = Flask(__name__)
+    app.config['CUCKOO_FAN_OUT_MAX_WORKERS'] = 4
+    app.config['TRELLO_LINK_CHUNK_SIZE'] = 2
+    app.config['TRELLO_LINK_CACHE_TTL_SECONDS'] = 60
+
+    with app.app_context():
+        yield app
+
+
+def link(task_id):
+    return {'task_id': task_id, 'link': f'https://trello.com/c/{task_id}'}
+
+
+@patch('src.logic.trello_links.rq')
+@patch('src.logic.trello_links.get_trello_card_link')
+def test_only_uncached_links_are_fetched_in_chunks(mock_get_trello_card_link, mock_rq, trello_links_app):
+    cached = {'beehive-trello-link:t2': json.dumps(link('t2'))}
+    mock_rq.connection.mget.side_effect = lambda keys: [cached.get(k) for k in keys]
+    mock_get_trello_card_link.side_effect = lambda task_ids: [link(task_id) for task_id in task_ids if task_id != 't5']
+
+    links = get_task_card_links(['t1', 't2', 't3', 't4', 't5', 't1'])
+
+    # t2 is cached and t5 has no card
+    assert links == [link('t1'), link('t2'), link('t3'), link('t4')]
+    assert sorted(call.args[0] for call in mock_get_trello_card_link.call_args_list) == [['t1', 't3'], ['t4', 't5']]
+
+    pipeline = mock_rq.connection.pipeline.return_value
+    assert sorted(call.args[0] for call in pipeline.setex.call_args_list) == [
+        'beehive-trello-link:t1', 'beehive-trello-link:t3', 'beehive-trello-link:t4'
+    ]
+
+
+@patch('src.logic.trello_links.rq')
+@patch('src.logic.trello_links.get_trello_card_link')
+def test_cached_links_are_not_fetched(mock_get_trello_card_link, mock_rq, trello_links_app):
+    mock_rq.connection.mget.side_effect = lambda keys: [json.dumps(link(k.split(':')[1])) for k in keys]
+
+    assert get_task_card_links(['t1', 't2']) == [link('t1'), link('t2')]
+    assert mock_get_trello_card_link.call_count == 0
+
+
+@patch('src.logic.trello_links.get_card')
+def test_quest_cards_are_fetched_per_quest(mock_get_card, trello_links_app):
+    mock_get_card.side_effect = lambda quest_id: None if quest_id == 'q2' else {'shortLink': quest_id}
+
+    assert get_quest_cards(['q1', 'q2', 'q3']) == {'q1': {'shortLink': 'q1'}, 'q2': None, 'q3': {'shortLink': 'q3'}}
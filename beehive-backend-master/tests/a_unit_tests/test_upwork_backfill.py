@@ -0,0 +1,85 @@
+from datetime import date, datetime
+from unittest.mock import patch
+
+from flask import Flask
+import pytest
+
+from src.logic.upwork_backfill import (
+    UpworkBackfillStatus,
+    create_upwork_backfill,
+    get_pending_backfill_days,
+    get_upwork_backfill,
+    is_upwork_backfill_running,
+    set_upwork_backfill_day,
+    set_upwork_backfill_status,
+    upwork_backfill_lock
+)
+
+# importing the jobs schedules their crons, which needs redis
+with patch('flask_rq2.functions.JobFunctions.cron'):
+    from src.jobs.upwork import backfill_upwork_diaries
+
+
+@pytest.fixture
+def backfill_app(fake_redis):
+    app = Flask(__name__)
+    app.config['UPWORK_BACKFILL_STATE_TTL_SECONDS'] = 60
+
+    with app.app_context(), patch('src.logic.upwork_backfill.rq') as mock_rq:
+        mock_rq.connection = fake_redis
+        yield app
+
+
+def test_backfill_resumes_from_incomplete_days(backfill_app):
+    backfill_id = create_upwork_backfill(date(2023, 1, 30), date(2023, 2, 2))
+
+    backfill = get_upwork_backfill(backfill_id)
+    assert backfill['status'] == 'queued'
+    assert [d['date'] for d in backfill['days']] == ['20230130', '20230131', '20230201', '20230202']
+
+    set_upwork_backfill_status(backfill_id, UpworkBackfillStatus.RUNNING)
+    set_upwork_backfill_day(backfill_id, datetime(2023, 1, 30), UpworkBackfillStatus.COMPLETE, diaries=12)
+    set_upwork_backfill_day(backfill_id, datetime(2023, 1, 31), UpworkBackfillStatus.FAILED, error='fetching upwork diaries failed')
+    set_upwork_backfill_day(backfill_id, datetime(2023, 2, 1), UpworkBackfillStatus.RUNNING)
+    set_upwork_backfill_status(backfill_id, UpworkBackfillStatus.FAILED, error='1 days failed')
+
+    backfill = get_upwork_backfill(backfill_id)
+    assert backfill['status'] == 'failed'
+    assert backfill['error'] == '1 days failed'
+    assert backfill['days'][0]['diaries'] == 12
+    assert backfill['days'][1]['error'] == 'fetching upwork diaries failed'
+
+    # failed, interrupted and not started days are processed again
+    assert get_pending_backfill_days(backfill_id) == [datetime(2023, 1, 31), datetime(2023, 2, 1), datetime(2023, 2, 2)]
+
+    set_upwork_backfill_status(backfill_id, UpworkBackfillStatus.RUNNING)
+    assert 'error' not in get_upwork_backfill(backfill_id)
+
+
+def test_unknown_backfill(backfill_app):
+    assert get_upwork_backfill('unknown') is None
+    assert get_pending_backfill_days('unknown') == []
+
+
+def test_backfill_runs_once_at_a_time(backfill_app):
+    backfill_id = create_upwork_backfill(date(2023, 1, 30), date(2023, 1, 30))
+    assert not is_upwork_backfill_running(backfill_id)
+
+    lock = upwork_backfill_lock(backfill_id, timeout=60)
+    assert lock.acquire(blocking=False)
+    assert is_upwork_backfill_running(backfill_id)
+
+    # a second job of a running backfill leaves it to the running job
+    with patch('src.jobs.upwork.save_upwork_diaries') as mock_save_upwork_diaries:
+        backfill_upwork_diaries(backfill_id)
+    mock_save_upwork_diaries.assert_not_called()
+    assert get_upwork_backfill(backfill_id)['status'] == 'queued'
+
+    lock.release()
+    assert not is_upwork_backfill_running(backfill_id)
+
+    with patch('src.jobs.upwork.save_upwork_diaries', return_value=[]) as mock_save_upwork_diaries:
+        backfill_upwork_diaries(backfill_id)
+    mock_save_upwork_diaries.assert_called_once_with(datetime(2023, 1, 30))
+    assert get_upwork_backfill(backfill_id)['status'] == 'complete'
+    assert not is_upwork_backfill_running(backfill_id)
@@ -0,0 +1,130 @@
+import time
+from unittest.mock import patch
+
+from flask import Flask
+import pytest
+
+from src.models.upwork import UpworkAuthToken
+from src.utils.upwork import UpworkClient, UpworkClientManager
+
+
+def token(expires_in):
+    return {'access_token': 'access', 'refresh_token': 'refresh', 'token_type': 'Bearer', 'expires_in': expires_in, 'expires_at': time.time() + expires_in}
+
+
+@pytest.fixture
+def upwork_app():
+    app = Flask(__name__)
+    app.config['UPWORK_CONSUMER_KEY'] = 'key'
+    app.config['UPWORK_CONSUMER_SECRET'] = 'secret'
+    app.config['UPWORK_CALLBACK_URL'] = 'http://localhost/upwork/callback'
+    app.config['UPWORK_TOKEN_REFRESH_MARGIN_SECONDS'] = 300
+    app.config['UPWORK_ORGANIZATION_ID_TTL_SECONDS'] = 3600
+
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def redis(fake_redis):
+    with patch('src.utils.upwork.rq') as mock_rq:
+        mock_rq.connection = fake_redis
+        yield fake_redis
+
+
+def test_client_is_reused_without_refreshing_a_valid_token(upwork_app, redis):
+    manager = UpworkClientManager()
+    with patch('src.utils.upwork.UpworkClient') as mock_client, \
+            patch('src.utils.upwork.UpworkAuthToken.get_recent_token', return_value=token(86400)) as mock_get_recent_token:
+        mock_client.return_value.get_organization_id.return_value = 'org'
+
+        clients = [manager.get_client() for _ in range(7)]
+
+    assert all(c is clients[0] for c in clients)
+    assert mock_client.call_count == 1
+    assert mock_get_recent_token.call_count == 1
+    assert mock_client.return_value.refresh_token.call_count == 0
+    assert mock_client.return_value.get_organization_id.call_count == 1
+    assert clients[0].organization_id == 'org'
+
+
+def test_expiring_token_is_refreshed_once(upwork_app, redis):
+    manager = UpworkClientManager()
+    refreshed = token(86400)
+    with patch('src.utils.upwork.UpworkClient') as mock_client, \
+            patch('src.utils.upwork.UpworkAuthToken.get_recent_token', return_value=token(60)):
+        mock_client.return_value.refresh_token.return_value = refreshed
+
+        for _ in range(7):
+            client = manager.get_client()
+
+    assert mock_client.return_value.refresh_token.call_count == 1
+    assert redis.locks == 1
+    assert mock_client.call_count == 2
+    assert mock_client.call_args.args[3] == refreshed
+
+
+def test_refreshed_token_without_expiry_time_is_refreshed_when_expiring(upwork_app, redis):
+    manager = UpworkClientManager()
+    upwork_token = {k: v for k, v in token(86400).items() if k != 'expires_at'}
+    with patch('src.utils.upwork.UpworkClient') as mock_client, \
+            patch('src.utils.upwork.UpworkAuthToken.insert_or_update') as mock_insert_or_update, \
+            patch('src.utils.upwork.UpworkAuthToken.get_recent_token', return_value=token(60)), \
+            patch('src.utils.upwork.db'), \
+            patch('src.utils.upwork.requests.post') as mock_post:
+        # upwork token responses only have expires_in
+        mock_post.return_value.status_code = 200
+        mock_post.return_value.json.return_value = upwork_token
+        mock_insert_or_update.side_effect = lambda *args: UpworkAuthToken(*args)
+        mock_client.return_value.refresh_token.side_effect = \
+            lambda token: UpworkClient.refresh_token(mock_client.return_value, token=token)
+
+        manager.get_client()
+        assert mock_client.call_args.args[3]['expires_at'] == pytest.approx(time.time() + 86400, abs=60)
+
+        # the token is refreshed again once it is about to expire
+        with patch('src.utils.upwork.time.time', return_value=time.time() + 86400):
+            manager.get_client()
+
+    assert mock_post.call_count == 2
+
+
+def test_token_refreshed_by_another_worker_is_not_refreshed_again(upwork_app, redis):
+    manager = UpworkClientManager()
+    refreshed = token(86400)
+    with patch('src.utils.upwork.UpworkClient') as mock_client, \
+            patch('src.utils.upwork.UpworkAuthToken.get_recent_token', side_effect=[token(60), refreshed]):
+        manager.get_client()
+
+    assert mock_client.return_value.refresh_token.call_count == 0
+    assert mock_client.call_args.args[3] == refreshed
+
+
+def test_organization_id_is_shared_through_redis(upwork_app, redis):
+    with patch('src.utils.upwork.UpworkClient') as mock_client, \
+            patch('src.utils.upwork.UpworkAuthToken.get_recent_token', return_value=token(86400)):
+        mock_client.return_value.get_organization_id.return_value = 'org'
+
+        UpworkClientManager().get_client()
+        client = UpworkClientManager().get_client()
+
+    assert mock_client.return_value.get_organization_id.call_count == 1
+    assert client.organization_id == 'org'
+
+
+def test_refreshed_token_is_sent_by_the_sdk_session(upwork_app, redis):
+    manager = UpworkClientManager()
+    refreshed = dict(token(86400), access_token='refreshed-access', refresh_token='refreshed-refresh')
+    redis.set('beehive:upwork:organization-id', 'org')
+    with patch('src.utils.upwork.UpworkAuthToken.get_recent_token', return_value=token(3600)), \
+            patch('src.utils.upwork.UpworkClient.refresh_token', return_value=refreshed):
+        manager.get_client()
+
+        # the token is refreshed once it is about to expire, before the organization id expires
+        with patch('src.utils.upwork.time.time', return_value=time.time() + 3600):
+            client = manager.get_client()
+
+    session = client.client._Client__oauth
+    assert session.access_token == 'refreshed-access'
+    assert session.token['refresh_token'] == 'refreshed-refresh'
+    assert client.organization_id == 'org'
@@ -0,0 +1,81 @@
+import random
+
+from src.logic.upwork_matching import MATCH_WINDOW_SECONDS, WorkRecordIntervalIndex, match_upwork_diaries
+from src.models.upwork import UpworkDiary
+from src.models.work_record import WorkRecord
+
+
+BASE_EPOCH_MS = 1700000000000
+
+
+def work_record(id, start_offset_seconds, duration_seconds):
+    wr = WorkRecord('user', 1, False, BASE_EPOCH_MS + start_offset_seconds * 1000, 'UTC')
+    wr.id = id
+    wr.duration_seconds = duration_seconds
+    return wr
+
+
+def upwork_diary(id, start_offset_seconds, duration_seconds):
+    start_time_epoch_ms = BASE_EPOCH_MS + start_offset_seconds * 1000
+    diary = UpworkDiary('user', 'upwork-user', 'name', start_time_epoch_ms, start_time_epoch_ms + duration_seconds * 1000, duration_seconds // 60, None)
+    diary.id = id
+    return diary
+
+
+def brute_force_candidates(diary, work_records):
+    # the predicate of the previous per-diary sql query
+    matches = []
+    for wr in work_records:
+        if wr.duration_seconds is None:
+            continue
+        start_diff = (wr.start_time_epoch_ms - diary.start_time_epoch_ms) / 1000
+        end_diff = wr.start_time_epoch_ms / 1000 + wr.duration_seconds - diary.end_time_epoch_ms / 1000
+        if abs(int(start_diff)) < MATCH_WINDOW_SECONDS and abs(int(end_diff)) < MATCH_WINDOW_SECONDS:
+            matches.append((abs(start_diff), wr))
+    return [wr for _, wr in sorted(matches, key=lambda m: m[0])]
+
+
+def test_candidates_respect_window_bounds():
+    records = [
+        work_record(1, -MATCH_WINDOW_SECONDS, 600),         # starts exactly at the window edge
+        work_record(2, -MATCH_WINDOW_SECONDS + 1, 600),
+        work_record(3, 0, 600),
+        work_record(4, 100, None),                          # in progress
+        work_record(5, MATCH_WINDOW_SECONDS - 2, 0),
+        work_record(6, MATCH_WINDOW_SECONDS, 0),
+    ]
+    diary = upwork_diary(1, 0, 600)
+
+    assert [wr.id for wr in WorkRecordIntervalIndex(records).candidates(diary)] == [3, 5, 2]
+
+
+def test_candidates_match_brute_force():
+    rand = random.Random(0)
+    records = [
+        work_record(i, rand.randint(-10 * 24 * 3600, 10 * 24 * 3600), rand.choice([None, 0, rand.randint(1, 5 * 24 * 3600)]))
+        for i in range(2000)
+    ]
+    diaries = [upwork_diary(i, rand.randint(-3 * 24 * 3600, 3 * 24 * 3600), rand.randint(60, 600)) for i in range(200)]
+
+    index = WorkRecordIntervalIndex(records)
+    for diary in diaries:
+        # records at the same distance may come in any order
+        assert sorted(wr.id for wr in index.candidates(diary)) == sorted(wr.id for wr in brute_force_candidates(diary, records))
+
+
+def test_match_computes_overlaps():
+    records = [
+        work_record(1, 0, 3600),
+        work_record(2, 3600, 3600),
+        work_record(3, 7300, 60),
+    ]
+    # 10:05 - 10:15 relative to base, crossing the first and second records
+    diary = upwork_diary(1, 3300, 600)
+
+    matches = match_upwork_diaries([diary], records)
+
+    assert [(wr.id, net, upwork) for _, wr, net, upwork in matches] == [
+        # nearest start first, overlaps rounded out to 10 minute segments for upwork
+        (2, 300, (diary.rounded_utc_end_time - records[1].utc_start_time).total_seconds()),
+        (1, 300, (records[0].utc_end_time - diary.rounded_utc_start_time).total_seconds()),
+    ]
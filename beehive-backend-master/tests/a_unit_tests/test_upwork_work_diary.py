@@ -0,0 +1,44 @@
+from src.schemas.upwork import UpworkDiarySchema
+from src.utils.upwork import parse_work_diary
+
+
+def ingested_values(snapshot):
+    # the snapshot values read by save_upwork_diaries
+    return (
+        snapshot['user']['id'],
+        snapshot['user']['name'],
+        snapshot['time']['first_worked_int'],
+        snapshot['time']['last_worked_int'],
+        snapshot.get('duration_int'),
+        snapshot['task']['memo'] if snapshot.get('task') else None
+    )
+
+
+def snapshot(upwork_user_id, first_worked_int, duration_int, memo):
+    return {
+        'user': {'id': upwork_user_id, 'name': f'user {upwork_user_id}'},
+        'durationInt': duration_int,
+        'task': {'memo': memo} if memo is not None else None,
+        'time': {'firstWorkedInt': str(first_worked_int), 'lastWorkedInt': str(first_worked_int + duration_int * 60)}
+    }
+
+
+def test_lean_parser_matches_schema_load():
+    work_diary = {
+        'total': 3,
+        'snapshots': [
+            snapshot('a', 1712700000, 10, 'first task'),
+            snapshot('a', 1712700600, 4, None),
+            snapshot('b', 1712701200, 7, 'second task')
+        ]
+    }
+
+    parsed = parse_work_diary(work_diary)
+    loaded = UpworkDiarySchema().load(work_diary)
+
+    assert parsed['total'] == loaded['total']
+    assert [ingested_values(s) for s in parsed['snapshots']] == [ingested_values(s) for s in loaded['snapshots']]
+
+
+def test_lean_parser_handles_empty_diary():
+    assert parse_work_diary({'total': 0, 'snapshots': None}) == {'total': 0, 'snapshots': []}
@@ -0,0 +1,179 @@
+import json
+import random
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import event
+
+from src.logic.work_matching import draw_available_work, index_work, match_score, unindex_work
+from src.models.skill import Skill, TaskSkill, WorkSkill
+from src.models.tag import Tag, TaskTag, WorkTag
+from src.models.task import Task, TaskStatus, TaskType
+from src.models.work import Work, WorkStatus, WorkType
+from src.models.work_match_index import WorkMatchIndex
+from src.models.work_record import WorkRecord
+from src.utils.db import db
+
+
+def _register_mysql_functions(connection, _):
+    # mysql functions used by the work draw
+    connection.create_function('rand', 0, lambda: _register_mysql_functions.rand())
+    connection.create_function('least', 2, min)
+    connection.create_function('json_length', 1, lambda a: len(json.loads(a)))
+    connection.create_function('json_contains', 2, lambda a, b: json.loads(b) in json.loads(a))
+    connection.create_function('json_overlaps', 2, lambda a, b: bool(set(json.loads(a)) & set(json.loads(b))))
+
+
+@pytest.fixture
+def matching_app(sqlite_app):
+    # a constant random value draws the work with the lowest score
+    _register_mysql_functions.rand = lambda: 0.5
+
+    with sqlite_app.app_context():
+        event.listen(db.engine, 'connect', _register_mysql_functions)
+        tables = [Tag, TaskTag, WorkTag, Skill, TaskSkill, WorkSkill, Task, Work, WorkMatchIndex]
+        db.metadata.create_all(db.engine, tables=[t.__table__ for t in tables])
+        # the generated utc time columns of work records are mysql only
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql('CREATE TABLE work_record (id INTEGER PRIMARY KEY, work_id INTEGER, duration_seconds INTEGER, created DATETIME, updated DATETIME)')
+        yield sqlite_app
+
+
+def create_work(priority=2, tags=None, skills=None, status=WorkStatus.AVAILABLE):
+    task = Task.from_cuckoo('user', 'task', TaskStatus.PENDING, priority, TaskType.CUCKOO_CODING, tags=[], skills=[], repository_id=1)
+    db.session.add(task)
+    db.session.flush()
+
+    work = Work.from_cuckoo(task.id, status, WorkType.CUCKOO_CODING, 'work', priority=priority, tags=tags or [], skills=skills or [])
+    db.session.add(work)
+    index_work(work)
+    db.session.commit()
+
+    return work
+
+
+def record_work_time(work, duration_seconds):
+    db.session.execute(WorkRecord.__table__.insert().values(work_id=work.id, duration_seconds=duration_seconds))
+    index_work(work)
+    db.session.commit()
+
+
+def create_user(tags=None, skills=None):
+    return SimpleNamespace(id='user', tags=tags or [], skills=skills or [])
+
+
+def create_skills(count):
+    skills = [Skill(f'skill-{i}') for i in range(count)]
+    db.session.add_all(skills)
+    db.session.commit()
+
+    return skills
+
+
+def scores(user_skill_ids):
+    return dict(db.session.query(WorkMatchIndex.work_id, match_score(user_skill_ids)).all())
+
+
+def test_new_work_is_indexed(matching_app):
+    tag = Tag('project:bees')
+    skills = create_skills(2)
+    work = create_work(priority=3, tags=[tag], skills=skills)
+
+    entry = WorkMatchIndex.query.filter_by(work_id=work.id).one()
+    assert entry.priority == 3
+    assert entry.tag_ids == [tag.id]
+    assert entry.skill_ids == sorted(s.id for s in skills)
+    assert entry.normalized_duration == 0.1
+
+
+def test_index_is_refreshed_with_time_worked(matching_app):
+    work = create_work()
+    record_work_time(work, 120)
+
+    assert WorkMatchIndex.query.filter_by(work_id=work.id).one().normalized_duration == 2
+
+
+def test_complete_and_unindexed_work_is_dropped_from_index(matching_app):
+    complete_work, cancelled_work = create_work(), create_work()
+
+    complete_work.status = WorkStatus.COMPLETE
+    assert index_work(complete_work) is None
+    unindex_work(cancelled_work)
+    db.session.commit()
+
+    assert WorkMatchIndex.query.count() == 0
+
+
+def test_draw_only_returns_available_work(matching_app):
+    unavailable_work = create_work(status=WorkStatus.UNAVAILABLE)
+    reserved_work = create_work()
+    reserved_work.reserved_until_epoch_ms = 1
+    prohibited_work = create_work()
+    prohibited_work.prohibited_worker_id = 'user'
+    current_work = create_work()
+    db.session.commit()
+
+    # unavailable work is still indexed but never drawn
+    assert WorkMatchIndex.query.filter_by(work_id=unavailable_work.id).count() == 1
+    assert draw_available_work(create_user(), current_work.id) is None
+    assert draw_available_work(create_user()).id == current_work.id
+
+
+def test_draw_filters_tagged_work_by_user_tags(matching_app):
+    tag, other_tag = Tag('project:bees'), Tag('project:wasps')
+    db.session.add_all([tag, other_tag])
+    tagged_work = create_work(tags=[tag])
+
+    assert draw_available_work(create_user()) is None
+    assert draw_available_work(create_user(tags=[other_tag])) is None
+    assert draw_available_work(create_user(tags=[other_tag, tag])).id == tagged_work.id
+
+    untagged_work = create_work(priority=100)
+    assert draw_available_work(create_user(tags=[other_tag])).id == untagged_work.id
+
+
+def test_draw_favours_higher_priority(matching_app):
+    create_work(priority=1)
+    high_priority_work = create_work(priority=3)
+
+    assert draw_available_work(create_user()).id == high_priority_work.id
+
+
+def test_draw_favours_matched_skills(matching_app):
+    skills = create_skills(5)
+    no_match_work = create_work(skills=skills[3:])
+    single_match_work = create_work(skills=[skills[0], skills[3]])
+    full_match_work = create_work(skills=skills[:3])
+    user_skill_ids = {s.id for s in skills[:3]}
+
+    work_scores = scores(user_skill_ids)
+    assert work_scores[no_match_work.id] > work_scores[single_match_work.id] > work_scores[full_match_work.id]
+    assert draw_available_work(create_user(skills=skills[:3])).id == full_match_work.id
+
+
+def test_match_score_caps_matched_skills(matching_app):
+    skills = create_skills(10)
+    five_match_work = create_work(skills=skills[:5])
+    ten_match_work = create_work(skills=skills)
+
+    work_scores = scores({s.id for s in skills})
+    assert work_scores[five_match_work.id] == work_scores[ten_match_work.id]
+
+
+def test_draw_favours_less_time_worked(matching_app):
+    worked_work = create_work()
+    untouched_work = create_work()
+    record_work_time(worked_work, 600)
+
+    assert draw_available_work(create_user()).id == untouched_work.id
+
+
+def test_draw_is_weighted_random(matching_app):
+    low_priority_work = create_work(priority=1)
+    high_priority_work = create_work(priority=100)
+    _register_mysql_functions.rand = random.Random(1).random
+
+    drawn = [draw_available_work(create_user()).id for _ in range(50)]
+
+    # both candidates may be drawn but the higher priority one is heavily favoured
+    assert drawn.count(high_priority_work.id) > drawn.count(low_priority_work.id)
@@ -10,11 +10,11 @@ from src.models.work_record import WorkRecord
 from src.utils.grpc_client import GRPCClient
 
 
-@patch('src.resources.work.dispatch_cuckoo_event', return_value=True)
+@patch('src.resources.work.queue_cuckoo_event', return_value=True)
 @patch('src.resources.work.get_praesepe_authorization_code', new=Mock())
 @patch('src.resources.work.grpc_client')
 @patch('src.resources.work.run_beehave_pr_github_bot', new=Mock())
-def test_chain_qa_and_adequate_review(mock_grpc_client, mock_dispatch_cuckoo_event, app, active_token, active_token_user_id, second_active_token, second_active_token_user_id, inner_token):
+def test_chain_qa_and_adequate_review(mock_grpc_client, mock_queue_cuckoo_event, app, active_token, active_token_user_id, second_active_token, second_active_token_user_id, inner_token):
     task_coding_description = 'description for coding task'
     task_qa_description = 'description for qa chained task'
 
@@ -93,7 +93,7 @@ def test_chain_qa_and_adequate_review(mock_grpc_client, mock_dispatch_cuckoo_eve
     assert res.json['data']['work']['taskId'] == task_id
     assert res.json['data']['work']['workType'] == WorkType.CUCKOO_CODING
     assert res.json['data']['work']['description'] == task_coding_description
-    assert mock_dispatch_cuckoo_event.call_count == 0
+    assert mock_queue_cuckoo_event.call_count == 0
 
     work_id_1 = res.json['data']['work']['id']
     
@@ -119,7 +119,7 @@ def test_chain_qa_and_adequate_review(mock_grpc_client, mock_dispatch_cuckoo_eve
         json={'workId': work_id_1, 'startTimeEpochMs': int(time.time() * 1000), 'tzName': 'UTC'}
     )
     assert res.status_code == 200
-    assert mock_dispatch_cuckoo_event.call_count == 1
+    assert mock_queue_cuckoo_event.call_count == 1
 
     solution_url = 'https://github.com/my-org/my-repo/pull/1'
 
@@ -130,7 +130,7 @@ def test_chain_qa_and_adequate_review(mock_grpc_client, mock_dispatch_cuckoo_eve
         json={'workId': work_id_1, 'durationSeconds': 20, 'solutionUrl': solution_url}
     )
     assert res.status_code == 200
-    assert mock_dispatch_cuckoo_event.call_count == 2
+    assert mock_queue_cuckoo_event.call_count == 2
 
     # since we chained more work even though we finished the task should still be in process
     res = app.test_client().get(
@@ -139,7 +139,7 @@ def test_chain_qa_and_adequate_review(mock_grpc_client, mock_dispatch_cuckoo_eve
     )
     assert res.status_code == 200
     assert res.json['data']['status'] == TaskStatus.IN_PROCESS
-    assert mock_dispatch_cuckoo_event.call_count == 2
+    assert mock_queue_cuckoo_event.call_count == 2
 
     # get available work should now return a qa work item derived from the same task
     res = app.test_client().get('api/v1/work/available', headers={'Authorization': f'Bearer {second_active_token}'})
@@ -147,7 +147,7 @@ def test_chain_qa_and_adequate_review(mock_grpc_client, mock_dispatch_cuckoo_eve
     assert res.json['data']['work']['taskId'] == task_id
     assert res.json['data']['work']['workType'] == WorkType.CUCKOO_QA
     assert res.json['data']['work']['description'] == f'{task_qa_description}\n\n---\n\n**Original Task:**\n{task_coding_description}'
-    assert mock_dispatch_cuckoo_event.call_count == 2
+    assert mock_queue_cuckoo_event.call_count == 2
 
     work_id_2 = res.json['data']['work']['id']
 
@@ -173,7 +173,7 @@ def test_chain_qa_and_adequate_review(mock_grpc_client, mock_dispatch_cuckoo_eve
     )
     assert res.status_code == 404
     assert res.json == {'status': 'error', 'error': 'not_found'}
-    assert mock_dispatch_cuckoo_event.call_count == 2
+    assert mock_queue_cuckoo_event.call_count == 2
     assert mock_grpc_client.github_stub.GetPRInfo.call_count == 1
 
     # start work on qa work item
@@ -183,7 +183,7 @@ def test_chain_qa_and_adequate_review(mock_grpc_client, mock_dispatch_cuckoo_eve
         json={'workId': work_id_2, 'startTimeEpochMs': int(time.time() * 1000), 'tzName': 'UTC'}
     )
     assert res.status_code == 200
-    assert mock_dispatch_cuckoo_event.call_count == 3
+    assert mock_queue_cuckoo_event.call_count == 3
 
     # finish review work with some review
     res = app.test_client().post(
@@ -192,13 +192,13 @@ def test_chain_qa_and_adequate_review(mock_grpc_client, mock_dispatch_cuckoo_eve
         json={'workId': work_id_2, 'durationSeconds': 10, 'reviewStatus': ReviewStatus.ADEQUATE, 'reviewFeedback': 'this is review'}
     )
     assert res.status_code == 200
-    assert mock_dispatch_cuckoo_event.call_count == 4
+    assert mock_queue_cuckoo_event.call_count == 4
 
     # no other work items are available
     res = app.test_client().get('api/v1/work/available', headers={'Authorization': f'Bearer {second_active_token}'})
     assert res.status_code == 404
     assert res.json == {'status': 'error', 'error': 'not_found'}
-    assert mock_dispatch_cuckoo_event.call_count == 4
+    assert mock_queue_cuckoo_event.call_count == 4
     assert mock_grpc_client.github_stub.GetPRInfo.call_count == 1
 
     # task should now be solved and have the review feedback and status
@@ -210,16 +210,16 @@ def test_chain_qa_and_adequate_review(mock_grpc_client, mock_dispatch_cuckoo_eve
     assert res.json['data']['status'] == TaskStatus.SOLVED
     assert res.json['data']['reviewFeedback'] == 'this is review'
     assert res.json['data']['reviewStatus'] == ReviewStatus.ADEQUATE
-    assert mock_dispatch_cuckoo_event.call_count == 4
+    assert mock_queue_cuckoo_event.call_count == 4
 
 
-@patch('src.resources.work.dispatch_cuckoo_event', return_value=True)
-@patch('src.jobs.task.get_task_type_classification')
+@patch('src.resources.work.queue_cuckoo_event', return_value=True)
+@patch('src.jobs.task.queue_task_classification')
 @patch('src.models.work_record.WorkRecord.get_ratings', return_value={'id':1,'user':'user','object_key':'o','subject':'s','score':5.0,'text':'text'})
 @patch('src.resources.work.get_praesepe_authorization_code', new=Mock())
 @patch('src.resources.work.grpc_client')
 @patch('src.resources.work.run_beehave_pr_github_bot', new=Mock())
-def test_chain_qa_and_inadequate_review(mock_grpc_client, mock_work_record_get_ratings, mock_get_task_type_classification, mock_dispatch_cuckoo_event, app, active_token, active_token_user_id, second_active_token, second_active_token_user_id, inner_token, delegation):
+def test_chain_qa_and_inadequate_review(mock_grpc_client, mock_work_record_get_ratings, mock_queue_task_classification, mock_queue_cuckoo_event, app, active_token, active_token_user_id, second_active_token, second_active_token_user_id, inner_token, delegation):
     task_coding_description = 'description for faulty coding task'
     task_qa_description = 'description for qa chained task'
 
@@ -271,7 +271,7 @@ def test_chain_qa_and_inadequate_review(mock_grpc_client, mock_work_record_get_r
     )
     assert res.status_code == 200
     assert res.json['data']['status'] == TaskStatus.PENDING
-    assert mock_get_task_type_classification.call_count == 1
+    mock_queue_task_classification.assert_called_once_with([task_id])
     assert mock_work_record_get_ratings.call_count == 0
 
     # update developer user tags so work comes up in available work
@@ -290,7 +290,7 @@ def test_chain_qa_and_inadequate_review(mock_grpc_client, mock_work_record_get_r
     assert res.json['data']['work']['taskId'] == task_id
     assert res.json['data']['work']['workType'] == WorkType.CUCKOO_CODING
     assert res.json['data']['work']['description'] == task_coding_description
-    assert mock_dispatch_cuckoo_event.call_count == 0
+    assert mock_queue_cuckoo_event.call_count == 0
     assert mock_grpc_client.github_stub.GetPRInfo.call_count == 0
 
     work_id_1 = res.json['data']['work']['id']
@@ -302,7 +302,7 @@ def test_chain_qa_and_inadequate_review(mock_grpc_client, mock_work_record_get_r
         json={'workId': work_id_1, 'startTimeEpochMs': int(time.time() * 1000), 'tzName': 'UTC'}
     )
     assert res.status_code == 200
-    assert mock_dispatch_cuckoo_event.call_count == 1
+    assert mock_queue_cuckoo_event.call_count == 1
     assert mock_work_record_get_ratings.call_count == 0
 
     solution_url = 'https://github.com/my-org/my-repo/pull/1'
@@ -314,7 +314,7 @@ def test_chain_qa_and_inadequate_review(mock_grpc_client, mock_work_record_get_r
         json={'workId': work_id_1, 'durationSeconds': 20, 'solutionUrl': solution_url}
     )
     assert res.status_code == 200
-    assert mock_dispatch_cuckoo_event.call_count == 2
+    assert mock_queue_cuckoo_event.call_count == 2
     assert mock_work_record_get_ratings.call_count == 0
 
     # since we chained more work even though we finished the task should still be in process
@@ -324,7 +324,7 @@ def test_chain_qa_and_inadequate_review(mock_grpc_client, mock_work_record_get_r
     )
     assert res.status_code == 200
     assert res.json['data']['status'] == TaskStatus.IN_PROCESS
-    assert mock_dispatch_cuckoo_event.call_count == 2
+    assert mock_queue_cuckoo_event.call_count == 2
     assert mock_work_record_get_ratings.call_count == 0
 
     # update qa user tags so work comes up in available work
@@ -344,7 +344,7 @@ def test_chain_qa_and_inadequate_review(mock_grpc_client, mock_work_record_get_r
     assert res.json['data']['work']['taskId'] == task_id
     assert res.json['data']['work']['workType'] == WorkType.CUCKOO_QA
     assert res.json['data']['work']['description'] == f'{task_qa_description}\n\n---\n\n**Original Task:**\n{task_coding_description}'
-    assert mock_dispatch_cuckoo_event.call_count == 2
+    assert mock_queue_cuckoo_event.call_count == 2
     assert mock_work_record_get_ratings.call_count == 0
 
     work_id_2 = res.json['data']['work']['id']
@@ -363,7 +363,7 @@ def test_chain_qa_and_inadequate_review(mock_grpc_client, mock_work_record_get_r
     )
     assert res.status_code == 404
     assert res.json == {'status': 'error', 'error': 'not_found'}
-    assert mock_dispatch_cuckoo_event.call_count == 2
+    assert mock_queue_cuckoo_event.call_count == 2
     assert mock_work_record_get_ratings.call_count == 0
 
     # start work on qa work item
@@ -373,7 +373,7 @@ def test_chain_qa_and_inadequate_review(mock_grpc_client, mock_work_record_get_r
         json={'workId': work_id_2, 'startTimeEpochMs': int(time.time() * 1000), 'tzName': 'UTC'}
     )
     assert res.status_code == 200
-    assert mock_dispatch_cuckoo_event.call_count == 3
+    assert mock_queue_cuckoo_event.call_count == 3
     assert mock_work_record_get_ratings.call_count == 0
 
     # finish qa work with inadequate review
@@ -383,14 +383,14 @@ def test_chain_qa_and_inadequate_review(mock_grpc_client, mock_work_record_get_r
         json={'workId': work_id_2, 'durationSeconds': 10, 'reviewStatus': ReviewStatus.INADEQUATE}
     )
     assert res.status_code == 200
-    assert mock_dispatch_cuckoo_event.call_count == 4
+    assert mock_queue_cuckoo_event.call_count == 4
     assert mock_work_record_get_ratings.call_count == 0
 
     # no other work items are available for qa user
     res = app.test_client().get('api/v1/work/available', headers={'Authorization': f'Bearer {active_token}'})
     assert res.status_code == 404
     assert res.json == {'status': 'error', 'error': 'not_found'}
-    assert mock_dispatch_cuckoo_event.call_count == 4
+    assert mock_queue_cuckoo_event.call_count == 4
     assert mock_work_record_get_ratings.call_count == 0
 
     # task should now still be in process and have the review updated
@@ -401,7 +401,7 @@ def test_chain_qa_and_inadequate_review(mock_grpc_client, mock_work_record_get_r
     assert res.status_code == 200
     assert res.json['data']['status'] == TaskStatus.IN_PROCESS
     assert res.json['data']['reviewStatus'] == ReviewStatus.INADEQUATE
-    assert mock_dispatch_cuckoo_event.call_count == 4
+    assert mock_queue_cuckoo_event.call_count == 4
     assert mock_work_record_get_ratings.call_count == 0
 
     # get available work returns a coding work item
@@ -409,7 +409,7 @@ def test_chain_qa_and_inadequate_review(mock_grpc_client, mock_work_record_get_r
     assert res.status_code == 200
     assert res.json['data']['work']['taskId'] == task_id
     assert res.json['data']['work']['workType'] == WorkType.CUCKOO_CODING
-    assert mock_dispatch_cuckoo_event.call_count == 4
+    assert mock_queue_cuckoo_event.call_count == 4
     assert mock_work_record_get_ratings.call_count == 0
     
     # assert pull request data is fetched from robobee and exists in available work response
@@ -428,7 +428,7 @@ def test_chain_qa_and_inadequate_review(mock_grpc_client, mock_work_record_get_r
         json={'workId': work_id_3, 'startTimeEpochMs': int(time.time() * 1000), 'tzName': 'UTC'}
     )
     assert res.status_code == 200
-    assert mock_dispatch_cuckoo_event.call_count == 5
+    assert mock_queue_cuckoo_event.call_count == 5
     assert mock_work_record_get_ratings.call_count == 0
 
     # finish second coding work with some solution url
@@ -438,7 +438,7 @@ def test_chain_qa_and_inadequate_review(mock_grpc_client, mock_work_record_get_r
         json={'workId': work_id_3, 'durationSeconds': 40, 'solutionUrl': solution_url}
     )
     assert res.status_code == 200
-    assert mock_dispatch_cuckoo_event.call_count == 6
+    assert mock_queue_cuckoo_event.call_count == 6
 
     # get available work should return a second qa work item
     res = app.test_client().get('api/v1/work/available', headers={'Authorization': f'Bearer {active_token}'})
@@ -446,7 +446,7 @@ def test_chain_qa_and_inadequate_review(mock_grpc_client, mock_work_record_get_r
     assert res.json['data']['work']['taskId'] == task_id
     assert res.json['data']['work']['workType'] == WorkType.CUCKOO_QA
     assert res.json['data']['work']['description'] == f'{task_qa_description}\n\n---\n\n**Original Task:**\n{task_coding_description}'
-    assert mock_dispatch_cuckoo_event.call_count == 6
+    assert mock_queue_cuckoo_event.call_count == 6
     assert mock_work_record_get_ratings.call_count == 0
 
     work_id_4 = res.json['data']['work']['id']
@@ -466,7 +466,7 @@ def test_chain_qa_and_inadequate_review(mock_grpc_client, mock_work_record_get_r
         json={'workId': work_id_4, 'startTimeEpochMs': int(time.time() * 1000), 'tzName': 'UTC'}
     )
     assert res.status_code == 200
-    assert mock_dispatch_cuckoo_event.call_count == 7
+    assert mock_queue_cuckoo_event.call_count == 7
     assert mock_work_record_get_ratings.call_count == 0
 
     # finish qa work with inadequate review
@@ -476,14 +476,14 @@ def test_chain_qa_and_inadequate_review(mock_grpc_client, mock_work_record_get_r
         json={'workId': work_id_4, 'durationSeconds': 10, 'reviewStatus': ReviewStatus.INADEQUATE}
     )
     assert res.status_code == 200
-    assert mock_dispatch_cuckoo_event.call_count == 8
+    assert mock_queue_cuckoo_event.call_count == 8
     assert mock_work_record_get_ratings.call_count == 0
 
     # no other work items are available for qa user
     res = app.test_client().get('api/v1/work/available', headers={'Authorization': f'Bearer {active_token}'})
     assert res.status_code == 404
     assert res.json == {'status': 'error', 'error': 'not_found'}
-    assert mock_dispatch_cuckoo_event.call_count == 8
+    assert mock_queue_cuckoo_event.call_count == 8
     assert mock_work_record_get_ratings.call_count == 0
 
     # task should now be in status solved, although marked inadequate because chain has been exhausted
@@ -493,7 +493,7 @@ def test_chain_qa_and_inadequate_review(mock_grpc_client, mock_work_record_get_r
     )
     assert res.status_code == 200
     assert res.json['data']['status'] == TaskStatus.SOLVED
-    assert mock_dispatch_cuckoo_event.call_count == 8
+    assert mock_queue_cuckoo_event.call_count == 8
     assert mock_work_record_get_ratings.call_count == 0
 
     with app.app_context():
@@ -532,7 +532,7 @@ def test_chain_qa_and_inadequate_review(mock_grpc_client, mock_work_record_get_r
         }
     )
     assert res.status_code == 200
-    assert mock_dispatch_cuckoo_event.call_count == 8
+    assert mock_queue_cuckoo_event.call_count == 8
     assert mock_work_record_get_ratings.call_count == 1
 
     # work record has updated duration
@@ -547,7 +547,7 @@ def test_chain_qa_and_inadequate_review(mock_grpc_client, mock_work_record_get_r
         headers={'Authorization': f'Bearer {second_active_token}'})
     assert res.status_code == 200
     assert res.json['data']['work']['workType'] == WorkType.CUCKOO_ITERATION
-    assert mock_dispatch_cuckoo_event.call_count == 8
+    assert mock_queue_cuckoo_event.call_count == 8
     assert mock_work_record_get_ratings.call_count == 1
     work_id = res.json['data']['work']['id']
 
@@ -0,0 +1,70 @@
+from unittest.mock import patch
+
+from src.logic.cuckoo_outbox import deliver_cuckoo_outbox_batch, queue_cuckoo_event
+from src.models.cuckoo_outbox_event import CuckooOutboxEvent, CuckooOutboxEventStatus
+from src.utils.db import db
+
+
+@patch('src.logic.cuckoo_outbox.dispatch_cuckoo_event')
+def test_deliver_cuckoo_outbox_keeps_task_order(mock_dispatch_cuckoo_event, app):
+    # the first event of the failing task fails, everything else is delivered
+    mock_dispatch_cuckoo_event.side_effect = lambda task_id, payload: payload != {'eventType': 'FIRST', 'task': 'failing'}
+
+    with app.app_context():
+        events = [
+            queue_cuckoo_event('outbox1', {'eventType': 'FIRST', 'task': 'failing'}),
+            queue_cuckoo_event('outbox2', {'eventType': 'FIRST', 'task': 'delivered'}),
+            queue_cuckoo_event('outbox1', {'eventType': 'SECOND', 'task': 'failing'}),
+            queue_cuckoo_event('outbox2', {'eventType': 'SECOND', 'task': 'delivered'}),
+        ]
+        db.session.commit()
+        event_ids = [e.id for e in events]
+
+        try:
+            deliver_cuckoo_outbox_batch(100)
+
+            # the failing task's second event waits behind its first event
+            assert mock_dispatch_cuckoo_event.call_count == 3
+            statuses = [db.session.get(CuckooOutboxEvent, event_id).status for event_id in event_ids]
+            assert statuses == [
+                CuckooOutboxEventStatus.PENDING,
+                CuckooOutboxEventStatus.DELIVERED,
+                CuckooOutboxEventStatus.PENDING,
+                CuckooOutboxEventStatus.DELIVERED,
+            ]
+
+            failed_event = db.session.get(CuckooOutboxEvent, event_ids[0])
+            assert failed_event.attempts == 1
+            assert failed_event.next_attempt > failed_event.created
+
+            # the failed event is not due yet so nothing is delivered
+            deliver_cuckoo_outbox_batch(100)
+            assert mock_dispatch_cuckoo_event.call_count == 3
+        finally:
+            CuckooOutboxEvent.query.filter(CuckooOutboxEvent.id.in_(event_ids)).delete(synchronize_session=False)
+            db.session.commit()
+
+
+@patch('src.logic.cuckoo_outbox.dispatch_cuckoo_event', return_value=False)
+def test_deliver_cuckoo_outbox_dead_letters_failing_events(mock_dispatch_cuckoo_event, app):
+    app.config['CUCKOO_OUTBOX_MAX_ATTEMPTS'] = 1
+
+    with app.app_context():
+        events = [
+            queue_cuckoo_event('outbox3', {'eventType': 'FIRST'}),
+            queue_cuckoo_event('outbox3', {'eventType': 'SECOND'}),
+        ]
+        db.session.commit()
+        event_ids = [e.id for e in events]
+
+        try:
+            # the dead-lettered event no longer holds back the next event
+            deliver_cuckoo_outbox_batch(100)
+            deliver_cuckoo_outbox_batch(100)
+
+            assert mock_dispatch_cuckoo_event.call_count == 2
+            statuses = [db.session.get(CuckooOutboxEvent, event_id).status for event_id in event_ids]
+            assert statuses == [CuckooOutboxEventStatus.DEAD, CuckooOutboxEventStatus.DEAD]
+        finally:
+            CuckooOutboxEvent.query.filter(CuckooOutboxEvent.id.in_(event_ids)).delete(synchronize_session=False)
+            db.session.commit()
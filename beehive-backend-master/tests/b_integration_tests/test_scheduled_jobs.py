@@ -5,7 +5,7 @@ from unittest.mock import Mock, patch
 import pytest
 
 from src.models.task import Task, TaskStatus, TaskType
-from src.models.upwork import WorkRecordUpworkDiary
+from src.models.upwork import UpworkDiary, WorkRecordUpworkDiary
 from src.models.user import User
 from src.models.work import Work, WorkStatus, WorkType
 from src.models.work_record import WorkOutcome, WorkRecord
@@ -14,10 +14,17 @@ from src.utils.db import db
 from src.utils.upwork import UpworkClient
 
 
-@patch('src.jobs.work.dispatch_cuckoo_event', return_value=True)
-@patch('src.resources.work.dispatch_cuckoo_event', return_value=True)
+def backfilled_upwork_diary_ids(work_diary):
+    # ids of the upwork diaries saved for the snapshots of a mocked work diary, in snapshot order
+    start_times = [int(s['time']['first_worked_int']) * 1000 for s in work_diary.get('snapshots')]
+    upwork_diaries = UpworkDiary.query.filter(UpworkDiary.start_time_epoch_ms.in_(start_times)).all()
+    return [d.id for s in start_times for d in upwork_diaries if d.start_time_epoch_ms == s]
+
+
+@patch('src.jobs.work.queue_cuckoo_event', return_value=True)
+@patch('src.resources.work.queue_cuckoo_event', return_value=True)
 @patch('src.resources.work.get_praesepe_authorization_code', new=Mock())
-def test_find_deserted_cuckoo_work(mock_dispatch_cuckoo_event_resource, mock_dispatch_cuckoo_event_job, app, active_token, active_token_user_id, second_active_token, inner_token):
+def test_find_deserted_cuckoo_work(mock_queue_cuckoo_event_resource, mock_queue_cuckoo_event_job, app, active_token, active_token_user_id, second_active_token, inner_token):
     # import here since importing the job requires an initialized flask app
     from src.jobs.work import find_deserted_work
 
@@ -25,7 +32,7 @@ def test_find_deserted_cuckoo_work(mock_dispatch_cuckoo_event_resource, mock_dis
     with app.app_context():
         find_deserted_work.queue()
 
-    assert mock_dispatch_cuckoo_event_job.call_count == 0
+    assert mock_queue_cuckoo_event_job.call_count == 0
 
     with app.app_context():
         trello_user = User.query.filter_by(id=active_token_user_id).first().trello_user
@@ -66,7 +73,7 @@ def test_find_deserted_cuckoo_work(mock_dispatch_cuckoo_event_resource, mock_dis
     with app.app_context():
         find_deserted_work.queue()
 
-    assert mock_dispatch_cuckoo_event_job.call_count == 0
+    assert mock_queue_cuckoo_event_job.call_count == 0
 
     with app.app_context():
         work = Work.query.filter_by(task_id=task_id).all()
@@ -85,7 +92,7 @@ def test_find_deserted_cuckoo_work(mock_dispatch_cuckoo_event_resource, mock_dis
         json={'workId': work[0].id, 'startTimeEpochMs': int(time.time() * 1000), 'tzName': 'UTC'}
     )
     assert res.status_code == 200
-    assert mock_dispatch_cuckoo_event_resource.call_count == 1
+    assert mock_queue_cuckoo_event_resource.call_count == 1
 
     # get available work for the first user should return the active work item
     res = app.test_client().get('api/v1/work/available', headers={'Authorization': f'Bearer {active_token}'})
@@ -102,7 +109,7 @@ def test_find_deserted_cuckoo_work(mock_dispatch_cuckoo_event_resource, mock_dis
     with app.app_context():
         find_deserted_work.queue()
 
-    assert mock_dispatch_cuckoo_event_job.call_count == 0
+    assert mock_queue_cuckoo_event_job.call_count == 0
 
     with app.app_context():
         work = Work.query.filter_by(task_id=task_id).all()
@@ -138,7 +145,7 @@ def test_find_deserted_cuckoo_work(mock_dispatch_cuckoo_event_resource, mock_dis
     with app.app_context():
         find_deserted_work.queue()
 
-    assert mock_dispatch_cuckoo_event_job.call_count == 1
+    assert mock_queue_cuckoo_event_job.call_count == 1
 
     with app.app_context():
         work = Work.query.filter_by(task_id=task_id).all()
@@ -158,10 +165,10 @@ def test_find_deserted_cuckoo_work(mock_dispatch_cuckoo_event_resource, mock_dis
     assert res.json['data']['work']['taskId'] == task_id
 
 
-@patch('src.jobs.work.dispatch_cuckoo_event', return_value=True)
-@patch('src.resources.stats.dispatch_cuckoo_event', return_value=True)
+@patch('src.jobs.work.queue_cuckoo_event', return_value=True)
+@patch('src.resources.stats.queue_cuckoo_event', return_value=True)
 @patch('src.resources.work.get_praesepe_authorization_code', new=Mock())
-def test_find_past_reserved_cuckoo_work(mock_dispatch_cuckoo_event_resource, mock_dispatch_cuckoo_event_job, app, active_token, active_token_user_id, second_active_token, second_active_token_user_id, inner_token, admin_token):
+def test_find_past_reserved_cuckoo_work(mock_queue_cuckoo_event_resource, mock_queue_cuckoo_event_job, app, active_token, active_token_user_id, second_active_token, second_active_token_user_id, inner_token, admin_token):
     # import here since importing the job requires an initialized flask app
     from src.jobs.work import find_past_reserved_work
 
@@ -169,7 +176,7 @@ def test_find_past_reserved_cuckoo_work(mock_dispatch_cuckoo_event_resource, moc
     with app.app_context():
         find_past_reserved_work.queue()
 
-    assert mock_dispatch_cuckoo_event_job.call_count == 0
+    assert mock_queue_cuckoo_event_job.call_count == 0
 
     with app.app_context():
         trello_user = User.query.filter_by(id=active_token_user_id).first().trello_user
@@ -209,7 +216,7 @@ def test_find_past_reserved_cuckoo_work(mock_dispatch_cuckoo_event_resource, moc
     with app.app_context():
         find_past_reserved_work.queue()
 
-    assert mock_dispatch_cuckoo_event_job.call_count == 0
+    assert mock_queue_cuckoo_event_job.call_count == 0
 
     with app.app_context():
         work = Work.query.filter_by(task_id=task_id).all()
@@ -232,7 +239,7 @@ def test_find_past_reserved_cuckoo_work(mock_dispatch_cuckoo_event_resource, moc
         }
     )
     assert res.status_code == 200
-    assert mock_dispatch_cuckoo_event_resource.call_count == 1
+    assert mock_queue_cuckoo_event_resource.call_count == 1
 
     # verify reservation
     with app.app_context():
@@ -262,7 +269,7 @@ def test_find_past_reserved_cuckoo_work(mock_dispatch_cuckoo_event_resource, moc
     with app.app_context():
         find_past_reserved_work.queue()
 
-    assert mock_dispatch_cuckoo_event_job.call_count == 0
+    assert mock_queue_cuckoo_event_job.call_count == 0
 
     with app.app_context():
         work = Work.query.filter_by(task_id=task_id).all()
@@ -297,7 +304,7 @@ def test_find_past_reserved_cuckoo_work(mock_dispatch_cuckoo_event_resource, moc
     with app.app_context():
         find_past_reserved_work.queue()
 
-    assert mock_dispatch_cuckoo_event_job.call_count == 1
+    assert mock_queue_cuckoo_event_job.call_count == 1
 
     with app.app_context():
         work = Work.query.filter_by(task_id=task_id).all()
@@ -327,8 +334,8 @@ def test_find_past_reserved_cuckoo_work(mock_dispatch_cuckoo_event_resource, moc
 @patch.object(UpworkClient, 'get_work_diary')
 @patch.object(UpworkClient, 'get_organization_id', return_value='nkzlfefsnelbn4opkwhnra')
 @patch.object(UpworkClient, 'refresh_token', return_value={"access_token": "oauth2v2_1e3704277095e1a98ba48ea3e2928ab2","refresh_token": "oauth2v2_98a2b87a42e9c68db1236d4fa05f76bb","token_type": "Bearer","expires_in": 86400,"expires_at": "1712730000"})
-@patch('src.jobs.work.dispatch_cuckoo_event', new=Mock())
-@patch('src.resources.work.dispatch_cuckoo_event', new=Mock())
+@patch('src.jobs.work.queue_cuckoo_event', new=Mock())
+@patch('src.resources.work.queue_cuckoo_event', new=Mock())
 def test_find_net_duration_work_records(mock_refresh_token, mock_get_organization_id, mock_get_work_diary, app, active_token, active_token_user_id, inner_token):
     # import here since importing the job requires an initialized flask app
     from src.jobs.upwork import find_net_duration_work_records
@@ -458,7 +465,7 @@ def test_find_net_duration_work_records(mock_refresh_token, mock_get_organizatio
 @patch.object(UpworkClient, 'get_organization_id', return_value='nkzlfefsnelbn4opkwhnra')
 @patch.object(UpworkClient, 'refresh_token', return_value={"access_token": "oauth2v2_1e3704277095e1a98ba48ea3e2928ab2","refresh_token": "oauth2v2_98a2b87a42e9c68db1236d4fa05f76bb","token_type": "Bearer","expires_in": 86400,"expires_at": "1712730000"})
 @patch('src.jobs.upwork.dispatch_cuckoo_event', return_value=True)
-@patch('src.resources.work.dispatch_cuckoo_event', return_value=True)
+@patch('src.resources.work.queue_cuckoo_event', return_value=True)
 @patch('src.models.work_record.WorkRecord.get_ratings', return_value={'id':1,'user':'user','object_key':'o','subject':'s','score':5.0,'text':'text'})
 @patch('src.resources.work.get_praesepe_authorization_code', return_value='test_auth_code')
 @patch('src.utils.upwork.UpworkAuthToken.get_recent_token', return_value={"access_token":"access_token","refresh_token":"refresh_token","token_type":"token_type","expires_in":1,"expires_at":1111.111})
@@ -467,7 +474,7 @@ def test_find_net_duration_cuckoo_accepted_tasks_single_work_record(
     mock_get_recent_token,
     mock_get_praesepe_authorization_code,
     mock_work_record_get_ratings,
-    mock_dispatch_cuckoo_event_resource,
+    mock_queue_cuckoo_event_resource,
     mock_dispatch_cuckoo_event_job,
     mock_refresh_token,
     mock_get_organization_id,
@@ -546,7 +553,7 @@ def test_find_net_duration_cuckoo_accepted_tasks_single_work_record(
         json={'workId': work[0].id, 'startTimeEpochMs': int(time.time() * 1000), 'tzName': 'UTC'}
     )
     assert res.status_code == 200
-    assert mock_dispatch_cuckoo_event_resource.call_count == 1
+    assert mock_queue_cuckoo_event_resource.call_count == 1
     assert mock_get_praesepe_authorization_code.call_count == 1
 
     with app.app_context():
@@ -570,7 +577,7 @@ def test_find_net_duration_cuckoo_accepted_tasks_single_work_record(
         json={'workId': work_id, 'durationSeconds': duration_seconds, 'solutionUrl': solution_url}
     )
     assert res.status_code == 200
-    assert mock_dispatch_cuckoo_event_resource.call_count == 2
+    assert mock_queue_cuckoo_event_resource.call_count == 2
     assert mock_get_praesepe_authorization_code.call_count == 2
 
     with app.app_context():
@@ -684,8 +691,10 @@ def test_find_net_duration_cuckoo_accepted_tasks_single_work_record(
     )
     assert res.status_code == 200
     assert res.json['status'] == 'ok'
-    assert len(res.json['data']) == len(mock_get_work_diary.return_value.get('snapshots'))
-    upwork_diary_ids = [d.get('id') for d in res.json['data']]
+    assert res.json['data']['status'] == 'complete'
+    assert res.json['data']['days'][0]['diaries'] == len(mock_get_work_diary.return_value.get('snapshots'))
+    with app.app_context():
+        upwork_diary_ids = backfilled_upwork_diary_ids(mock_get_work_diary.return_value)
 
     with app.app_context():
         work = Work.query.filter_by(task_id=task_id).first()
@@ -726,7 +735,7 @@ def test_find_net_duration_cuckoo_accepted_tasks_single_work_record(
 @patch.object(UpworkClient, 'get_organization_id', return_value='nkzlfefsnelbn4opkwhnra')
 @patch.object(UpworkClient, 'refresh_token', return_value={"access_token": "oauth2v2_1e3704277095e1a98ba48ea3e2928ab2","refresh_token": "oauth2v2_98a2b87a42e9c68db1236d4fa05f76bb","token_type": "Bearer","expires_in": 86400,"expires_at": "1712730000"})
 @patch('src.jobs.upwork.dispatch_cuckoo_event', return_value=True)
-@patch('src.resources.work.dispatch_cuckoo_event', return_value=True)
+@patch('src.resources.work.queue_cuckoo_event', return_value=True)
 @patch('src.models.work_record.WorkRecord.get_ratings', return_value={'id':1,'user':'user','object_key':'o','subject':'s','score':5.0,'text':'text'})
 @patch('src.resources.work.get_praesepe_authorization_code', return_value='test_auth_code')
 @patch('src.utils.upwork.UpworkAuthToken.get_recent_token', return_value={"access_token":"access_token","refresh_token":"refresh_token","token_type":"token_type","expires_in":1,"expires_at":1111.111})
@@ -735,7 +744,7 @@ def test_find_net_duration_cuckoo_accepted_tasks_multiple_work_record(
     mock_get_recent_token,
     mock_get_praesepe_authorization_code,
     mock_work_record_get_ratings,
-    mock_dispatch_cuckoo_event_resource,
+    mock_queue_cuckoo_event_resource,
     mock_dispatch_cuckoo_event_job,
     mock_refresh_token,
     mock_get_organization_id,
@@ -792,7 +801,7 @@ def test_find_net_duration_cuckoo_accepted_tasks_multiple_work_record(
         json={'workId': work_id, 'startTimeEpochMs': first_start_time_epoch_ms, 'tzName': 'UTC'}
     )
     assert res.status_code == 200
-    assert mock_dispatch_cuckoo_event_resource.call_count == 1
+    assert mock_queue_cuckoo_event_resource.call_count == 1
     assert mock_get_praesepe_authorization_code.call_count == 1
 
     with app.app_context():
@@ -818,7 +827,7 @@ def test_find_net_duration_cuckoo_accepted_tasks_multiple_work_record(
         json={'workId': work_id, 'durationSeconds': first_duration_seconds, 'solutionUrl': solution_url}
     )
     assert res.status_code == 200
-    assert mock_dispatch_cuckoo_event_resource.call_count == 2
+    assert mock_queue_cuckoo_event_resource.call_count == 2
     assert mock_get_praesepe_authorization_code.call_count == 2
 
     # delegator starts review
@@ -843,7 +852,7 @@ def test_find_net_duration_cuckoo_accepted_tasks_multiple_work_record(
         }
     )
     assert res.status_code == 200
-    assert mock_dispatch_cuckoo_event_resource.call_count == 2
+    assert mock_queue_cuckoo_event_resource.call_count == 2
     assert mock_work_record_get_ratings.call_count == 1
     assert mock_get_praesepe_authorization_code.call_count == 2
 
@@ -868,7 +877,7 @@ def test_find_net_duration_cuckoo_accepted_tasks_multiple_work_record(
         json={'workId': work[1].id, 'startTimeEpochMs': second_start_time_epoch_ms, 'tzName': 'UTC'}
     )
     assert res.status_code == 200
-    assert mock_dispatch_cuckoo_event_resource.call_count == 3
+    assert mock_queue_cuckoo_event_resource.call_count == 3
     assert mock_get_praesepe_authorization_code.call_count == 2
 
     with app.app_context():
@@ -891,7 +900,7 @@ def test_find_net_duration_cuckoo_accepted_tasks_multiple_work_record(
         json={'workId': work[1].id, 'durationSeconds': second_duration_seconds, 'solutionUrl': solution_url}
     )
     assert res.status_code == 200
-    assert mock_dispatch_cuckoo_event_resource.call_count == 4
+    assert mock_queue_cuckoo_event_resource.call_count == 4
     assert mock_work_record_get_ratings.call_count == 1
     assert mock_get_praesepe_authorization_code.call_count == 3
 
@@ -1041,8 +1050,10 @@ def test_find_net_duration_cuckoo_accepted_tasks_multiple_work_record(
     )
     assert res.status_code == 200
     assert res.json['status'] == 'ok'
-    assert len(res.json['data']) == len(mock_get_work_diary.return_value.get('snapshots'))
-    upwork_diary_ids = [d.get('id') for d in res.json['data']]
+    assert res.json['data']['status'] == 'complete'
+    assert res.json['data']['days'][0]['diaries'] == len(mock_get_work_diary.return_value.get('snapshots'))
+    with app.app_context():
+        upwork_diary_ids = backfilled_upwork_diary_ids(mock_get_work_diary.return_value)
 
     with app.app_context():
         work_record_upwork_diary = WorkRecordUpworkDiary.query.filter(WorkRecordUpworkDiary.work_record_id.in_(work_record_ids)).all()
@@ -1,7 +1,11 @@
 import time
 from unittest.mock import Mock, patch
 
+import pytest
+
+from src.models.contributor_stats import ContributorStats
 from src.models.honeycomb import Honeycomb
+from src.models.tag import Tag
 from src.models.task import TaskType
 from src.models.user import User
 from src.utils.db import db
@@ -35,7 +39,7 @@ def test_stats_completed_work_endpoint_bad_params(app, admin_token):
     assert res.json['error'] == 'malformed_request'
 
 
-@patch('src.resources.work.dispatch_cuckoo_event', new=Mock())
+@patch('src.resources.work.queue_cuckoo_event', new=Mock())
 @patch('src.resources.work.get_praesepe_authorization_code', new=Mock())
 @patch('src.resources.work.run_beehave_pr_github_bot', new=Mock())
 def test_stats_completed_work_endpoint(
@@ -119,7 +123,7 @@ def test_stats_completed_work_endpoint(
     assert completed_tasks[0]['workerId'] == active_token_user_id
 
 
-@patch('src.resources.work.dispatch_cuckoo_event', new=Mock())
+@patch('src.resources.work.queue_cuckoo_event', new=Mock())
 @patch('src.resources.work.get_praesepe_authorization_code', new=Mock())
 @patch('src.resources.work.run_beehave_pr_github_bot', new=Mock())
 def test_stats_completed_work_endpoint_multiple_work_records(
@@ -233,7 +237,7 @@ def test_stats_completed_work_endpoint_multiple_work_records(
     assert completed_tasks[0]['workerId'] == active_token_user_id
 
 
-@patch('src.resources.work.dispatch_cuckoo_event', new=Mock())
+@patch('src.resources.work.queue_cuckoo_event', new=Mock())
 @patch('src.resources.work.get_praesepe_authorization_code', new=Mock())
 @patch('src.resources.work.run_beehave_pr_github_bot', new=Mock())
 def test_stats_completed_work_endpoint_different_users(
@@ -419,10 +423,10 @@ def test_stats_honeycomb_endpoint(app, admin_token):
         db.session.delete(honeycomb_1)
 
 
-@patch('src.resources.stats.dispatch_cuckoo_event', return_value=True)
+@patch('src.resources.stats.queue_cuckoo_event', return_value=True)
 @patch('src.resources.work.get_praesepe_authorization_code', new=Mock())
 def test_stats_reserve_work_endpoint(
-    mock_dispatch_cuckoo_event, app, active_token, admin_token, inner_token, active_token_user_id, second_active_token, second_active_token_user_id
+    mock_queue_cuckoo_event, app, active_token, admin_token, inner_token, active_token_user_id, second_active_token, second_active_token_user_id
 ):
     tag = 'project:random'
 
@@ -491,7 +495,7 @@ def test_stats_reserve_work_endpoint(
         }
     )
     assert res.status_code == 200
-    assert mock_dispatch_cuckoo_event.call_count == 1
+    assert mock_queue_cuckoo_event.call_count == 1
     assert res.json['data']['reservedWorkerId'] == second_active_token_user_id
     assert epoch_expected_reserved - res.json['data']['reservedUntilEpochMs'] < 50
 
@@ -514,7 +518,7 @@ def test_stats_reserve_work_endpoint(
         headers={'Authorization': f'Bearer {admin_token}'}
     )
     assert res.status_code == 404
-    assert mock_dispatch_cuckoo_event.call_count == 1
+    assert mock_queue_cuckoo_event.call_count == 1
 
     # dismiss reservation from second user should succeed
     res = app.test_client().delete(
@@ -522,7 +526,7 @@ def test_stats_reserve_work_endpoint(
         headers={'Authorization': f'Bearer {admin_token}'}
     )
     assert res.status_code == 200
-    assert mock_dispatch_cuckoo_event.call_count == 2
+    assert mock_queue_cuckoo_event.call_count == 2
     
     # get available work for first user should now show this task
     res = app.test_client().get(
@@ -532,10 +536,10 @@ def test_stats_reserve_work_endpoint(
     assert res.json['data']['work']['taskId'] == task_id
 
 
-@patch('src.resources.stats.dispatch_cuckoo_event', return_value=True)
+@patch('src.resources.stats.queue_cuckoo_event', return_value=True)
 @patch('src.resources.work.get_praesepe_authorization_code', new=Mock())
 def test_stats_prohibit_work_endpoint(
-    mock_dispatch_cuckoo_event, app, active_token, admin_token, inner_token, active_token_user_id, second_active_token, second_active_token_user_id
+    mock_queue_cuckoo_event, app, active_token, admin_token, inner_token, active_token_user_id, second_active_token, second_active_token_user_id
 ):
     tag = 'project:random'
 
@@ -599,7 +603,7 @@ def test_stats_prohibit_work_endpoint(
         headers={'Authorization': f'Bearer {admin_token}'}
     )
     assert res.status_code == 200
-    assert mock_dispatch_cuckoo_event.call_count == 1
+    assert mock_queue_cuckoo_event.call_count == 1
     assert res.json['data']['prohibitedWorkerId'] == second_active_token_user_id
 
     # get available work for first user should return this task since its unprohibited for him
@@ -621,7 +625,7 @@ def test_stats_prohibit_work_endpoint(
         headers={'Authorization': f'Bearer {admin_token}'}
     )
     assert res.status_code == 404
-    assert mock_dispatch_cuckoo_event.call_count == 1
+    assert mock_queue_cuckoo_event.call_count == 1
 
     # dismiss prohibition from second user should succeed
     res = app.test_client().delete(
@@ -629,7 +633,7 @@ def test_stats_prohibit_work_endpoint(
         headers={'Authorization': f'Bearer {admin_token}'}
     )
     assert res.status_code == 200
-    assert mock_dispatch_cuckoo_event.call_count == 2
+    assert mock_queue_cuckoo_event.call_count == 2
     
     # get available work for second user should now show this task
     res = app.test_client().get(
@@ -637,3 +641,107 @@ def test_stats_prohibit_work_endpoint(
         headers={'Authorization': f'Bearer {second_active_token}'})
     assert res.status_code == 200
     assert res.json['data']['work']['taskId'] == task_id
+
+
+def test_stats_contributors_endpoint(app, active_token, admin_token, inner_token, active_token_user_id):
+    with app.app_context():
+        trello_user = User.query.filter_by(id=active_token_user_id).first().trello_user
+
+    # create task
+    res = app.test_client().post(
+        'api/v1/task/cuckoo',
+        headers={'X-BEE-AUTH': inner_token},
+        json={
+            'description': 'Test task',
+            'userName': trello_user
+        }
+    )
+    assert res.status_code == 200
+
+    task_id = res.json['data']['id']
+
+    # set task ids so the fixture teardown can delete them
+    test_stats_contributors_endpoint.task_ids = [task_id]
+
+    # get available work returns the single work item
+    res = app.test_client().get('api/v1/work/available', headers={'Authorization': f'Bearer {active_token}'})
+    assert res.status_code == 200
+    work_id = res.json['data']['work']['id']
+
+    # skip work which should be reflected in the contributor stats
+    res = app.test_client().post(
+        'api/v1/work/skip',
+        headers={'Authorization': f'Bearer {active_token}'},
+        json={'workId': work_id, 'startTimeEpochMs': int(time.time() * 1000), 'tzName': 'UTC'}
+    )
+    assert res.status_code == 200
+
+    res = app.test_client().get(
+        'api/v1/stats/contributors',
+        headers={'Authorization': f'Bearer {admin_token}'},
+        query_string={'resultsPerPage': 1000, 'page': 1}
+    )
+    assert res.status_code == 200
+    assert res.json['data']['page'] == 1
+
+    contributor = next(filter(lambda c: c['id'] == active_token_user_id, res.json['data']['data']))
+    assert contributor['activeWork'] == 'none'
+    assert contributor['numberOfTotalWorks'] == '1'
+    assert contributor['numberOfSkippedWorks'] == '1'
+    assert contributor['skippedTotalWorksRatio'] == '1.00'
+    assert contributor['averageIterationsPerWork'] == '1.0000'
+
+
+@pytest.fixture
+def project_contributor_stats(app, active_token_user_id, second_active_token_user_id):
+    with app.app_context():
+        project = Tag(f'project:budget-{int(time.time() * 1000)}')
+        db.session.add(project)
+        db.session.flush()
+
+        for user_id in (active_token_user_id, second_active_token_user_id):
+            stats = ContributorStats(user_id, project.id)
+            stats.total_works = 1
+            db.session.add(stats)
+        db.session.commit()
+        project_id = project.id
+
+    yield project_id
+
+    with app.app_context():
+        ContributorStats.query.filter_by(project_id=project_id).delete()
+        Tag.query.filter_by(id=project_id).delete()
+        db.session.commit()
+
+
+def test_stats_users_endpoints_query_budgets(app, query_budget, admin_token, active_token, second_active_token):
+    # responses are built on every request rather than served from the cache
+    app.config['RESPONSE_CACHE_ENABLED'] = False
+    headers = {'Authorization': f'Bearer {admin_token}'}
+
+    # the statements of a page do not grow with the number of users on it
+    for url, budget in (('api/v1/stats/contributors', 4), ('api/v1/stats/user', 5)):
+        counts = []
+        for results_per_page in (1, 1000):
+            with query_budget(budget) as requests:
+                res = app.test_client().get(url, headers=headers, query_string={'resultsPerPage': results_per_page, 'page': 1})
+            assert res.status_code == 200
+            counts.append(requests[0][1].count)
+        assert counts[0] == counts[1], url
+
+    with query_budget(3):
+        res = app.test_client().get('api/v1/community/contributors', headers=headers)
+    assert res.status_code == 200
+    assert len(res.json['data']['breakdown']) >= 3
+
+
+def test_project_contributors_endpoint_query_budget(app, query_budget, admin_token, project_contributor_stats):
+    app.config['RESPONSE_CACHE_ENABLED'] = False
+
+    with query_budget(3):
+        res = app.test_client().get(
+            f'api/v1/dashboards/projects/{project_contributor_stats}/contributors',
+            headers={'Authorization': f'Bearer {admin_token}'}
+        )
+    assert res.status_code == 200
+    assert len(res.json['data']['contributors']) == 2
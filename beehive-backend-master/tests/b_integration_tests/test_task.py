@@ -1,6 +1,8 @@
 from base64 import b32encode
 import time
+from unittest.mock import patch
 
+from src.models.tag import Tag
 from src.models.task import TaskStatus, TaskType
 from src.models.user import User
 from src.models.work import WorkStatus
@@ -51,6 +53,80 @@ def test_cuckoo_task_post_endpoint_valid_task(app, active_token, active_token_us
     assert res.json['data']['status'] == TaskStatus.PENDING
 
 
+def test_task_delete_endpoint_invalidates_cached_responses(app, active_token, active_token_user_id, inner_token):
+    with app.app_context():
+        trello_user = User.query.filter_by(id=active_token_user_id).first().trello_user
+
+    res = app.test_client().post(
+        'api/v1/task/cuckoo',
+        headers={'X-BEE-AUTH': inner_token},
+        json={'description': 'Deleted task', 'userName': trello_user, 'tags': ['project:deleted-task', 'other-tag']}
+    )
+    assert res.status_code == 200
+    task_id = res.json['data']['id']
+
+    with app.app_context():
+        project_id = Tag.query.filter_by(name='project:deleted-task').one().id
+
+    with patch('src.resources.task.invalidate_cached_responses') as mock_invalidate_cached_responses:
+        res = app.test_client().delete(
+            f'api/v1/task/{task_id}',
+            headers={'Authorization': f'Bearer {active_token}'}
+        )
+    assert res.status_code == 200
+    mock_invalidate_cached_responses.assert_called_once_with([project_id])
+
+
+def test_cuckoo_task_bulk_post_endpoint(app, active_token, active_token_user_id, inner_token):
+    with app.app_context():
+        trello_user = User.query.filter_by(id=active_token_user_id).first().trello_user
+
+    # post a batch with valid tasks, a task without description and tasks of an unknown user, repository and quest
+    res = app.test_client().post(
+        'api/v1/task/cuckoo/bulk',
+        headers={'X-BEE-AUTH': inner_token},
+        json={
+            'tasks': [
+                {'description': 'First bulk task', 'userName': trello_user, 'tags': ['bulk-tag'], 'skills': ['python']},
+                {'userName': trello_user},
+                {'description': 'Unknown user task', 'userName': 'nope'},
+                {'description': 'Unknown repository task', 'userName': trello_user, 'repositoryName': 'nope'},
+                {'description': 'Unknown quest task', 'userName': trello_user, 'questId': 'nope'},
+                {'description': 'Second bulk task', 'userName': trello_user, 'tags': ['bulk-tag'], 'priority': 1}
+            ]
+        }
+    )
+    assert res.status_code == 200
+
+    results = res.json['data']['tasks']
+    assert results[1]['error'] == 'malformed_request'
+    assert results[2]['error'] == 'user_not_found'
+    assert results[3]['error'] == 'repository_not_found'
+    assert results[4]['error'] == 'quest_not_found'
+    task_ids = [results[0]['id'], results[5]['id']]
+
+    # set task ids so the fixture teardown can delete them
+    test_cuckoo_task_bulk_post_endpoint.task_ids = task_ids
+
+    # the valid tasks were created and prepared
+    for task_id in task_ids:
+        res = app.test_client().get(
+            f'api/v1/task/{task_id}',
+            headers={'Authorization': f'Bearer {active_token}'}
+        )
+        assert res.status_code == 200
+        assert res.json['data']['status'] == TaskStatus.PENDING
+        assert res.json['data']['tags'] == ['bulk-tag']
+
+    # the batch size is limited
+    res = app.test_client().post(
+        'api/v1/task/cuckoo/bulk',
+        headers={'X-BEE-AUTH': inner_token},
+        json={'tasks': []}
+    )
+    assert res.status_code == 400
+
+
 def test_cuckoo_task_put_endpoint_non_existing_task(app, active_token_user_id, inner_token):
     with app.app_context():
         trello_user = User.query.filter_by(id=active_token_user_id).first().trello_user
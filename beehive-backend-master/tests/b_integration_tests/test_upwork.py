@@ -1,5 +1,6 @@
 import csv
 from datetime import datetime, timedelta
+import gzip
 from io import StringIO
 import json
 import os
@@ -14,6 +15,13 @@ from src.utils.db import db
 from src.models.upwork import UpworkDiary, WorkRecordUpworkDiary
 
 
+def backfilled_upwork_diary_ids(work_diary):
+    # ids of the upwork diaries saved for the snapshots of a mocked work diary, in snapshot order
+    start_times = [int(s['time']['first_worked_int']) * 1000 for s in work_diary.get('snapshots')]
+    upwork_diaries = UpworkDiary.query.filter(UpworkDiary.start_time_epoch_ms.in_(start_times)).all()
+    return [d.id for s in start_times for d in upwork_diaries if d.start_time_epoch_ms == s]
+
+
 @patch.object(UpworkClient, 'get_access_token', return_value={"access_token": "oauth2v2_1e3704277095e1a98ba48ea3e2928ab2","refresh_token": "oauth2v2_98a2b87a42e9c68db1236d4fa05f76bb","token_type": "Bearer","expires_in": 86400,"expires_at": "1712730000"})
 @patch.object(UpworkClient, 'get_organization_id', return_value='nkzlfefsnelbn4opkwhnra')
 @patch.object(UpworkClient, 'refresh_token', return_value={"access_token": "oauth2v2_1e3704277095e1a98ba48ea3e2928ab2","refresh_token": "oauth2v2_98a2b87a42e9c68db1236d4fa05f76bb","token_type": "Bearer","expires_in": 86400,"expires_at": "1712730000"})
@@ -86,12 +94,36 @@ def test_upwork_workdiary(mock_get_recent_token, mock_refresh_token, mock_get_or
     )
     assert res.status_code == 200
     assert res.json['status'] == 'ok'
-    assert len(res.json['data']) == len(mock_get_work_diary.return_value.get('snapshots'))
+    assert res.json['data']['status'] == 'complete'
+    assert res.json['data']['days'][0]['diaries'] == len(mock_get_work_diary.return_value.get('snapshots'))
+    backfill_id = res.json['data']['id']
 
-    # remove created upwork diary objects
-    upwork_diary_ids = [d.get('id') for d in res.json['data']]
+    # backfill progress is available by its id
+    res = app.test_client().get(
+        f'/api/v1/backoffice/upwork-diary/{backfill_id}',
+        headers={'X-BEE-AUTH': inner_token}
+    )
+    assert res.status_code == 200
+    assert res.json['data']['status'] == 'complete'
+    assert [d['date'] for d in res.json['data']['days']] == ['20230101']
+    assert res.json['data']['days'][0]['status'] == 'complete'
+
+    # completed backfills are not resumed
+    res = app.test_client().post(
+        f'/api/v1/backoffice/upwork-diary/{backfill_id}',
+        headers={'X-BEE-AUTH': inner_token}
+    )
+    assert res.status_code == 400
 
+    res = app.test_client().get(
+        f'/api/v1/backoffice/upwork-diary/unknown',
+        headers={'X-BEE-AUTH': inner_token}
+    )
+    assert res.status_code == 404
+
+    # remove created upwork diary objects
     with app.app_context():
+        upwork_diary_ids = backfilled_upwork_diary_ids(mock_get_work_diary.return_value)
         UpworkDiary.query.filter(UpworkDiary.id.in_(upwork_diary_ids)).delete(synchronize_session=False)
         db.session.commit()
 
@@ -118,7 +150,8 @@ def test_upwork_cost_report_no_work_records(mock_get_recent_token, mock_refresh_
     )
     assert res.status_code == 200
     assert res.json['status'] == 'ok'
-    assert len(res.json['data']) == len(mock_get_work_diary.return_value.get('snapshots'))
+    assert res.json['data']['status'] == 'complete'
+    assert res.json['data']['days'][0]['diaries'] == len(mock_get_work_diary.return_value.get('snapshots'))
 
     # inner token unauthorized
     res = app.test_client().get(
@@ -140,6 +173,16 @@ def test_upwork_cost_report_no_work_records(mock_get_recent_token, mock_refresh_
     assert res.status_code == 200
     assert res.headers['Content-Disposition'] == f'attachment; filename={expected_filename}'
     assert res.headers['Content-Type'] == 'text/csv; charset=utf-8'
+
+    # the same report can be streamed gzip compressed
+    gzip_res = app.test_client().get(
+        f'/api/v1/backoffice/cost-report',
+        headers={'Authorization': f'Bearer {admin_token}'},
+        query_string={'startDate': start_date, 'endDate': end_date, 'gzip': 'true'}
+    )
+    assert gzip_res.status_code == 200
+    assert gzip_res.headers['Content-Disposition'] == f'attachment; filename={expected_filename}.gz'
+    assert gzip.decompress(gzip_res.data).decode('utf-8') == res.text
     
     reader = csv.reader(res.text.split('\n'), delimiter=',')
     rows = [row for row in reader if len(row)>0]
@@ -156,7 +199,7 @@ def test_upwork_cost_report_no_work_records(mock_get_recent_token, mock_refresh_
 
 
 @patch('src.resources.work.get_praesepe_authorization_code', new=Mock())
-@patch('src.resources.work.dispatch_cuckoo_event', new=Mock())
+@patch('src.resources.work.queue_cuckoo_event', new=Mock())
 @patch.object(UpworkClient, 'get_work_diary')
 @patch.object(UpworkClient, 'get_organization_id', return_value='nkzlfefsnelbn4opkwhnra')
 @patch.object(UpworkClient, 'refresh_token', return_value={"access_token": "oauth2v2_1e3704277095e1a98ba48ea3e2928ab2","refresh_token": "oauth2v2_98a2b87a42e9c68db1236d4fa05f76bb","token_type": "Bearer","expires_in": 86400,"expires_at": "1712730000"})
@@ -233,7 +276,8 @@ def test_upwork_cost_report_with_matching_work_records(mock_get_recent_token, mo
     )
     assert res.status_code == 200
     assert res.json['status'] == 'ok'
-    assert len(res.json['data']) == len(mock_get_work_diary.return_value.get('snapshots'))
+    assert res.json['data']['status'] == 'complete'
+    assert res.json['data']['days'][0]['diaries'] == len(mock_get_work_diary.return_value.get('snapshots'))
 
     # get cost report with admin token
     expected_filename = f'cost_{start_date}-{end_date}.csv'
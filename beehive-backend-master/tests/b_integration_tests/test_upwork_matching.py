@@ -0,0 +1,55 @@
+import random
+import time
+
+from sqlalchemy import and_
+
+from src.logic.upwork_matching import WorkRecordIntervalIndex
+from src.models.task import Task, TaskStatus, TaskType
+from src.models.upwork import UpworkDiary
+from src.models.work import Work, WorkStatus, WorkType
+from src.models.work_record import WorkRecord
+from src.utils.db import db
+
+
+def test_interval_index_matches_sql_path(app, active_token_user_id):
+    rand = random.Random(0)
+    now_epoch_ms = int(time.time() * 1000)
+
+    with app.app_context():
+        task = Task.from_cuckoo(active_token_user_id, 'upwork matching task', TaskStatus.ACCEPTED, 1, TaskType.CUCKOO_CODING)
+        db.session.add(task)
+        db.session.flush()
+        work = Work.from_cuckoo(task.id, WorkStatus.COMPLETE, WorkType.CUCKOO_CODING, 'upwork matching work')
+        db.session.add(work)
+        db.session.flush()
+
+        for _ in range(300):
+            work_record = WorkRecord(active_token_user_id, work.id, False, now_epoch_ms - rand.randint(0, 14 * 24 * 3600 * 1000), 'UTC')
+            work_record.duration_seconds = rand.choice([None, 0, rand.randint(1, 3 * 24 * 3600)])
+            db.session.add(work_record)
+        db.session.commit()
+        task_id = task.id
+
+        try:
+            work_records = WorkRecord.query.filter_by(user_id=active_token_user_id).all()
+            index = WorkRecordIntervalIndex(work_records)
+
+            for _ in range(50):
+                start_time_epoch_ms = now_epoch_ms - rand.randint(2 * 24 * 3600 * 1000, 10 * 24 * 3600 * 1000)
+                diary = UpworkDiary(active_token_user_id, 'test-upwork-user', 'name', start_time_epoch_ms, start_time_epoch_ms + rand.randint(60, 600) * 1000, 10, None)
+
+                # the previous per-diary matching query
+                sql_matches = db.session.query(WorkRecord) \
+                    .filter(
+                        WorkRecord.user_id == active_token_user_id,
+                        and_(
+                            WorkRecord.start_time_diff_sec(diary.utc_start_time) < 172800,
+                            WorkRecord.end_time_diff_sec(diary.utc_end_time) < 172800
+                        )
+                    ) \
+                    .all()
+
+                assert sorted(wr.id for wr in index.candidates(diary)) == sorted(wr.id for wr in sql_matches)
+        finally:
+            db.session.delete(Task.query.get(task_id))
+            db.session.commit()
@@ -5,10 +5,11 @@ from bh_grpc.generated.beehive.robobee.v1.github_pb2 import GetPRInfoRequest, Ge
 
 import pytest
 
-from src.models.task import Task, TaskStatus
-from src.models.work import Work, WorkType
+from src.models.task import Task, TaskStatus, TaskType
+from src.models.work import Work, WorkStatus, WorkType
+from src.models.work_match_index import WorkMatchIndex
 from src.models.user import User
-from src.models.work_record import WorkRecord
+from src.models.work_record import WorkOutcome, WorkRecord
 from src.utils.db import db
 from src.utils.grpc_client import GRPCClient
 
@@ -20,7 +21,7 @@ def test_work_record_crud_get_endpoint_no_jwt(app):
     assert res.json == {'status': 'error', 'error': 'unauthorized'}
 
 
-@patch('src.resources.work.dispatch_cuckoo_event', new=Mock())
+@patch('src.resources.work.queue_cuckoo_event', new=Mock())
 @patch('src.resources.work.get_praesepe_authorization_code', new=Mock())
 def test_work_record_crud_get_endpoint_success(app, active_token, active_token_user_id, second_active_token, inner_token):
     with app.app_context():
@@ -605,7 +606,7 @@ def test_available_work_get_endpoint_order_by_priority(app, active_token, active
         )
 
 
-@patch('src.resources.work.dispatch_cuckoo_event', new=Mock())
+@patch('src.resources.work.queue_cuckoo_event', new=Mock())
 @patch('src.resources.work.get_praesepe_authorization_code', new=Mock())
 @patch('src.resources.work.run_beehave_pr_github_bot', new=Mock())
 def test_contributor_work_history_no_ratings(app, active_token, active_token_user_id, inner_token):
@@ -666,7 +667,7 @@ def test_contributor_work_history_no_ratings(app, active_token, active_token_use
         assert len(history[0]['ratings']) == 0
 
 
-@patch('src.resources.work.dispatch_cuckoo_event', new=Mock())
+@patch('src.resources.work.queue_cuckoo_event', new=Mock())
 @patch('src.resources.work.get_praesepe_authorization_code', new=Mock())
 @patch('src.resources.work.run_beehave_pr_github_bot', new=Mock())
 def test_contributor_work_history_with_rating(app, active_token, active_token_user_id, inner_token):
@@ -732,7 +733,7 @@ def test_contributor_work_history_with_rating(app, active_token, active_token_us
         assert len(history[0]['ratings']) == 1
 
 
-@patch('src.resources.work.dispatch_cuckoo_event', new=Mock())
+@patch('src.resources.work.queue_cuckoo_event', new=Mock())
 @patch('src.resources.work.get_praesepe_authorization_code', new=Mock())
 def test_available_work_get_endpoint_multiple_available_work_items(app, active_token, active_token_user_id, inner_token):
     with app.app_context():
@@ -870,11 +871,11 @@ def test_available_work_get_endpoint_multiple_available_work_items(app, active_t
     assert res.json['data']['workRecord']['workId'] == work_id_1
 
 
-@patch('src.resources.work.dispatch_cuckoo_event', return_value=True)
+@patch('src.resources.work.queue_cuckoo_event', return_value=True)
 @patch('src.resources.work.get_praesepe_authorization_code', new=Mock())
 @patch('src.resources.work.grpc_client')
 @patch('src.resources.work.run_beehave_pr_github_bot', new=Mock())
-def test_cuckoo_work_lifecycle(mock_grpc_client, mock_dispatch_cuckoo_event, app, inner_token, active_token, active_token_user_id, second_active_token, delegation):
+def test_cuckoo_work_lifecycle(mock_grpc_client, mock_queue_cuckoo_event, app, inner_token, active_token, active_token_user_id, second_active_token, delegation):
     description = 'Cuckoo task'
     tag = f'project:{delegation[0].name}'
 
@@ -907,7 +908,7 @@ def test_cuckoo_work_lifecycle(mock_grpc_client, mock_dispatch_cuckoo_event, app
         }
     )
     assert res.status_code == 200
-    assert mock_dispatch_cuckoo_event.call_count == 0
+    assert mock_queue_cuckoo_event.call_count == 0
 
     task_id = res.json['data']['id']
 
@@ -940,7 +941,7 @@ def test_cuckoo_work_lifecycle(mock_grpc_client, mock_dispatch_cuckoo_event, app
     )
     assert res.status_code == 200
     assert res.json['data']['work']['taskId'] == task_id
-    assert mock_dispatch_cuckoo_event.call_count == 0
+    assert mock_queue_cuckoo_event.call_count == 0
 
     work_id = res.json['data']['work']['id']
 
@@ -951,7 +952,7 @@ def test_cuckoo_work_lifecycle(mock_grpc_client, mock_dispatch_cuckoo_event, app
         json={'workId': work_id, 'startTimeEpochMs': int(time.time() * 1000), 'tzName': 'UTC'}
     )
     assert res.status_code == 200
-    assert mock_dispatch_cuckoo_event.call_count == 1
+    assert mock_queue_cuckoo_event.call_count == 1
 
     solution_url = 'https://github.com/my-org/my-repo/pull/1'
 
@@ -962,7 +963,7 @@ def test_cuckoo_work_lifecycle(mock_grpc_client, mock_dispatch_cuckoo_event, app
         json={'workId': work_id, 'durationSeconds': 20, 'solutionUrl': solution_url}
     )
     assert res.status_code == 200
-    assert mock_dispatch_cuckoo_event.call_count == 2
+    assert mock_queue_cuckoo_event.call_count == 2
 
     # get work data
     res = app.test_client().get(f'api/v1/work/{work_id}', headers={'Authorization': f'Bearer {active_token}'})
@@ -973,7 +974,7 @@ def test_cuckoo_work_lifecycle(mock_grpc_client, mock_dispatch_cuckoo_event, app
     assert res.json['data'][0]['work']['task']['id'] == task_id
     assert res.json['data'][0]['durationSeconds'] == 20
     assert res.json['data'][0]['solutionUrl'] == solution_url
-    assert mock_dispatch_cuckoo_event.call_count == 2
+    assert mock_queue_cuckoo_event.call_count == 2
 
     # get task data - should be solved
     res = app.test_client().get(
@@ -984,7 +985,7 @@ def test_cuckoo_work_lifecycle(mock_grpc_client, mock_dispatch_cuckoo_event, app
     assert res.json['data']['description'] == description
     assert res.json['data']['status'] == TaskStatus.SOLVED
     assert res.json['data']['feedback'] is None
-    assert mock_dispatch_cuckoo_event.call_count == 2
+    assert mock_queue_cuckoo_event.call_count == 2
     
     with app.app_context():
         work_record = WorkRecord.query.filter_by(work_id=work_id).all()
@@ -1017,7 +1018,7 @@ def test_cuckoo_work_lifecycle(mock_grpc_client, mock_dispatch_cuckoo_event, app
         )
         assert res.status_code == 200
 
-    assert mock_dispatch_cuckoo_event.call_count == 2
+    assert mock_queue_cuckoo_event.call_count == 2
 
     # work record has updated start of review with correct timestamp
     with app.app_context():
@@ -1033,7 +1034,7 @@ def test_cuckoo_work_lifecycle(mock_grpc_client, mock_dispatch_cuckoo_event, app
         headers={'Authorization': f'Bearer {active_token}'})
     assert res.status_code == 200
     assert res.json['data']['work']['workType'] == WorkType.CUCKOO_ITERATION
-    assert mock_dispatch_cuckoo_event.call_count == 2
+    assert mock_queue_cuckoo_event.call_count == 2
 
     review_work_id = res.json['data']['work']['id']
 
@@ -1062,7 +1063,7 @@ def test_cuckoo_work_lifecycle(mock_grpc_client, mock_dispatch_cuckoo_event, app
         json={'workId': review_work_id, 'startTimeEpochMs': int(time.time() * 1000), 'tzName': 'UTC'}
     )
     assert res.status_code == 200
-    assert mock_dispatch_cuckoo_event.call_count == 3
+    assert mock_queue_cuckoo_event.call_count == 3
 
     # finish work with same solution url
     res = app.test_client().post(
@@ -1071,10 +1072,126 @@ def test_cuckoo_work_lifecycle(mock_grpc_client, mock_dispatch_cuckoo_event, app
         json={'workId': review_work_id, 'durationSeconds': 400, 'solutionUrl': solution_url}
     )
     assert res.status_code == 200
-    assert mock_dispatch_cuckoo_event.call_count == 4
+    assert mock_queue_cuckoo_event.call_count == 4
 
 
 
+def test_contributor_work_history_query_budget(app, query_budget, active_token, active_token_user_id):
+    # accepted tasks with work completed by the user
+    with app.app_context():
+        task_ids = []
+        for i in range(3):
+            task = Task.from_cuckoo(active_token_user_id, f'History task {i}', TaskStatus.ACCEPTED, 2, TaskType.CUCKOO_CODING, tags=[], skills=[])
+            db.session.add(task)
+            db.session.flush()
+
+            work = Work.from_cuckoo(task.id, WorkStatus.COMPLETE, WorkType.CUCKOO_CODING, f'History work {i}', tags=[], skills=[])
+            db.session.add(work)
+            db.session.flush()
+
+            work_record = WorkRecord(active_token_user_id, work.id, False, int(time.time() * 1000), 'UTC', WorkOutcome.SOLVED)
+            work_record.duration_seconds = 20
+            db.session.add(work_record)
+            task_ids.append(task.id)
+        db.session.commit()
+
+    # set task ids so the fixture teardown can delete them
+    test_contributor_work_history_query_budget.task_ids = task_ids
+
+    # the statements do not grow with the number of work records
+    with patch('src.resources.work.get_rating_items') as mock_rating, query_budget(3):
+        mock_rating.return_value = None
+        res = app.test_client().get('api/v1/work/history', headers={'Authorization': f'Bearer {active_token}'})
+    assert res.status_code == 200
+    assert len(res.json['data']) == 3
+
+
+@patch('src.resources.work.queue_cuckoo_event', return_value=True)
+@patch('src.resources.work.get_praesepe_authorization_code', new=Mock())
+@patch('src.resources.work.run_beehave_pr_github_bot', new=Mock())
+def test_work_match_index_maintenance(mock_queue_cuckoo_event, app, inner_token, active_token, active_token_user_id):
+    with app.app_context():
+        trello_user = User.query.filter_by(id=active_token_user_id).first().trello_user
+
+    def index_entries(task_id):
+        with app.app_context():
+            return {
+                entry.work_id: entry
+                for entry in WorkMatchIndex.query.join(Work).filter(Work.task_id == task_id).all()
+            }
+
+    # created work is indexed
+    res = app.test_client().post(
+        'api/v1/task/cuckoo',
+        headers={'X-BEE-AUTH': inner_token},
+        json={'description': 'Indexed task', 'userName': trello_user, 'priority': 3}
+    )
+    assert res.status_code == 200
+    task_id = res.json['data']['id']
+    test_work_match_index_maintenance.task_ids = [task_id]
+
+    with app.app_context():
+        work_id = Work.query.filter_by(task_id=task_id).one().id
+    entries = index_entries(task_id)
+    assert list(entries) == [work_id]
+    assert entries[work_id].priority == 3
+    assert entries[work_id].normalized_duration == 0.1
+
+    # cancelled work stays indexed with the time invested in it
+    res = app.test_client().post(
+        'api/v1/work/start',
+        headers={'Authorization': f'Bearer {active_token}'},
+        json={'workId': work_id, 'startTimeEpochMs': int(time.time() * 1000), 'tzName': 'UTC'}
+    )
+    assert res.status_code == 200
+    res = app.test_client().post(
+        'api/v1/work/finish',
+        headers={'Authorization': f'Bearer {active_token}'},
+        json={'workId': work_id, 'durationSeconds': 120}
+    )
+    assert res.status_code == 200
+    assert index_entries(task_id)[work_id].normalized_duration == 2
+
+    # finished work is dropped from the index
+    res = app.test_client().post(
+        'api/v1/work/start',
+        headers={'Authorization': f'Bearer {active_token}'},
+        json={'workId': work_id, 'startTimeEpochMs': int(time.time() * 1000), 'tzName': 'UTC'}
+    )
+    assert res.status_code == 200
+    res = app.test_client().post(
+        'api/v1/work/finish',
+        headers={'Authorization': f'Bearer {active_token}'},
+        json={'workId': work_id, 'durationSeconds': 20, 'solutionUrl': 'https://github.com/my-org/my-repo/pull/1'}
+    )
+    assert res.status_code == 200
+    assert index_entries(task_id) == {}
+
+    # work delegated for requested modifications is indexed
+    with patch('src.models.work_record.get_rating_items') as mock_rating:
+        mock_rating.return_value = [{}]
+
+        res = app.test_client().put(
+            'api/v1/task/cuckoo',
+            headers={'X-BEE-AUTH': inner_token},
+            json={'taskId': task_id, 'userName': trello_user, 'status': TaskStatus.MODIFICATIONS_REQUESTED.name}
+        )
+        assert res.status_code == 200
+
+    entries = index_entries(task_id)
+    assert len(entries) == 1
+    assert work_id not in entries
+
+    # work of cancelled tasks is dropped from the index
+    res = app.test_client().put(
+        'api/v1/task/cuckoo',
+        headers={'X-BEE-AUTH': inner_token},
+        json={'taskId': task_id, 'userName': trello_user, 'status': TaskStatus.CANCELLED.name}
+    )
+    assert res.status_code == 200
+    assert index_entries(task_id) == {}
+
+
 def test_work_solution_review_post_no_jwt(app):
     # review solution work requires jwt
     res = app.test_client().post('api/v1/work/review', json={'workRecordId': 114})
@@ -1099,9 +1216,9 @@ def test_work_solution_review_post_no_work(app, active_token, delegation):
     assert res.json == {'status': 'error', 'error': 'not_found'}
 
 
-@patch('src.resources.work.dispatch_cuckoo_event', return_value=True)
+@patch('src.resources.work.queue_cuckoo_event', return_value=True)
 @patch('src.resources.work.get_praesepe_authorization_code', new=Mock())
-def test_work_solution_review_post_active_work(mock_dispatch_cuckoo_event, app, active_token, active_token_user_id, inner_token, delegation):
+def test_work_solution_review_post_active_work(mock_queue_cuckoo_event, app, active_token, active_token_user_id, inner_token, delegation):
     with app.app_context():
         trello_user = User.query.filter_by(id=active_token_user_id).first().trello_user
     tag = f'project:{delegation[0].name}'
@@ -1138,7 +1255,7 @@ def test_work_solution_review_post_active_work(mock_dispatch_cuckoo_event, app,
     assert res.status_code == 200
     assert res.json['data']['work']['taskId'] == task_id
     work_id = res.json['data']['work']['id']
-    assert mock_dispatch_cuckoo_event.call_count == 0
+    assert mock_queue_cuckoo_event.call_count == 0
 
     # start work on work item
     res = app.test_client().post(
@@ -1147,7 +1264,7 @@ def test_work_solution_review_post_active_work(mock_dispatch_cuckoo_event, app,
         json={'workId': work_id, 'startTimeEpochMs': int(time.time() * 1000), 'tzName': 'UTC'}
     )
     assert res.status_code == 200
-    assert mock_dispatch_cuckoo_event.call_count == 1
+    assert mock_queue_cuckoo_event.call_count == 1
 
     with app.app_context():
         work_record = WorkRecord.query.filter_by(work_id=work_id).all()
@@ -1160,14 +1277,14 @@ def test_work_solution_review_post_active_work(mock_dispatch_cuckoo_event, app,
         headers={'Authorization': f'Bearer {active_token}'},
         json={'workRecordId': work_record.id}
     )
-    assert mock_dispatch_cuckoo_event.call_count == 1
+    assert mock_queue_cuckoo_event.call_count == 1
     assert res.status_code == 404
 
 
-@patch('src.resources.work.dispatch_cuckoo_event', return_value=True)
+@patch('src.resources.work.queue_cuckoo_event', return_value=True)
 @patch('src.resources.work.get_praesepe_authorization_code', new=Mock())
 @patch('src.resources.work.run_beehave_pr_github_bot', new=Mock())
-def test_work_solution_review_post_no_delegator_permissions(mock_dispatch_cuckoo_event, app, active_token, active_token_user_id, second_active_token, second_active_token_user_id, inner_token, delegation):
+def test_work_solution_review_post_no_delegator_permissions(mock_queue_cuckoo_event, app, active_token, active_token_user_id, second_active_token, second_active_token_user_id, inner_token, delegation):
     with app.app_context():
         trello_user = User.query.filter_by(id=active_token_user_id).first().trello_user
     description = 'Test description'
@@ -1207,7 +1324,7 @@ def test_work_solution_review_post_no_delegator_permissions(mock_dispatch_cuckoo
     )
     assert res.status_code == 200
     assert res.json['data']['work']['taskId'] == task_id
-    assert mock_dispatch_cuckoo_event.call_count == 0
+    assert mock_queue_cuckoo_event.call_count == 0
 
     work_id = res.json['data']['work']['id']
 
@@ -1218,7 +1335,7 @@ def test_work_solution_review_post_no_delegator_permissions(mock_dispatch_cuckoo
         json={'workId': work_id, 'startTimeEpochMs': int(time.time() * 1000), 'tzName': 'UTC'}
     )
     assert res.status_code == 200
-    assert mock_dispatch_cuckoo_event.call_count == 1
+    assert mock_queue_cuckoo_event.call_count == 1
 
     solution_url = 'https://github.com/my-org/my-repo/pull/1'
 
@@ -1229,7 +1346,7 @@ def test_work_solution_review_post_no_delegator_permissions(mock_dispatch_cuckoo
         json={'workId': work_id, 'durationSeconds': 20, 'solutionUrl': solution_url}
     )
     assert res.status_code == 200
-    assert mock_dispatch_cuckoo_event.call_count == 2
+    assert mock_queue_cuckoo_event.call_count == 2
 
     with app.app_context():
         work_record = WorkRecord.query.filter_by(work_id=work_id).all()
@@ -1298,7 +1415,7 @@ def test_work_solution_review_post_no_delegator_permissions(mock_dispatch_cuckoo
             }
         )
         assert res.status_code == 200
-    assert mock_dispatch_cuckoo_event.call_count == 2
+    assert mock_queue_cuckoo_event.call_count == 2
 
     with app.app_context():
         work_record = WorkRecord.query.filter_by(work_id=work_id).all()
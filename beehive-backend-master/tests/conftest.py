@@ -1,3 +1,4 @@
+from contextlib import contextmanager
 import time
 from flask_jwt_extended import create_access_token, decode_token
 import pytest
@@ -12,6 +13,7 @@ from src.models.task_template import TaskTemplate
 from src.models.user import User
 from src.utils.db import db
 from src.utils.rq import rq
+from src.utils.sql_instrumentation import sql_instrumentation
 
 
 @pytest.fixture
@@ -267,3 +269,30 @@ def delegation(app, active_token_user_id, active_token):
         
 
         db.session.commit()
+
+
+@pytest.fixture
+def query_budget():
+    """
+    Fail the test when a request made inside the block runs more sql statements
+    than its budget, e.g.
+        with query_budget(5):
+            app.test_client().get('api/v1/...')
+    """
+    @contextmanager
+    def budget(max_queries):
+        requests = []
+        listener = lambda endpoint, stats: requests.append((endpoint, stats))
+
+        sql_instrumentation.add_listener(listener)
+        try:
+            yield requests
+        finally:
+            sql_instrumentation.remove_listener(listener)
+
+        for endpoint, stats in requests:
+            if stats.count > max_queries:
+                slowest = '\n'.join(f'  {duration * 1000:.1f}ms {statement}' for duration, statement in stats.slowest)
+                pytest.fail(f'{endpoint} ran {stats.count} sql statements over its budget of {max_queries}, slowest:\n{slowest}')
+
+    return budget